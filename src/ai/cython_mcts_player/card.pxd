@@ -36,3 +36,8 @@ cdef bint is_unknown(Card this) nogil
 
 cdef bint wins(Card this, Card other, Suit trump_suit) nogil
 cdef Card marriage_pair(Card card) nogil
+
+# The position of a card in model.card.Card.get_all_cards(), in [0, 20). It is
+# the same as model.card.Card.index. Null and unknown cards don't have an index.
+cdef int card_index(Card this) nogil
+cdef Card card_from_index(int index) nogil
@@ -21,3 +21,19 @@ cdef Card marriage_pair(Card self) nogil:
   if self.card_value == CardValue.KING:
     result.card_value = CardValue.QUEEN
   return result
+
+cdef CardValue[5] _CARD_VALUES = [CardValue.JACK, CardValue.QUEEN,
+                                  CardValue.KING, CardValue.TEN, CardValue.ACE]
+
+cdef int card_index(Card this) nogil:
+  cdef int value_index
+  for value_index in range(5):
+    if _CARD_VALUES[value_index] == this.card_value:
+      return (<int> this.suit - 1) * 5 + value_index
+  return -1
+
+cdef Card card_from_index(int index) nogil:
+  cdef Card result
+  result.suit = <Suit> (index // 5 + 1)
+  result.card_value = _CARD_VALUES[index % 5]
+  return result
@@ -10,3 +10,4 @@ from ai.cython_mcts_player.card_test import *
 from ai.cython_mcts_player.game_state_test import *
 from ai.cython_mcts_player.mcts_test import *
 from ai.cython_mcts_player.player_action_test import *
+from ai.cython_mcts_player.permutations_test import *
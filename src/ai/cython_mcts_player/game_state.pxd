@@ -33,3 +33,15 @@ cdef bint is_game_over(GameState *this) nogil
 cdef (Points, Points) game_points(GameState *this) nogil
 
 cdef GameState from_python_game_state(py_game_state)
+
+# The fixed-size binary encoding from model/game_state_codec.py. The Cython
+# GameState doesn't store the won tricks, the marriage suits and the public
+# cards, so encode_game_state() stores the cards from the won tricks as unknown
+# and the public cards as an empty bitmask. The pending trick points are stored
+# as marriage suits that give the same number of points.
+# decode_game_state() ignores the won tricks and the public cards.
+cdef enum:
+  GAME_STATE_CODE_SIZE = 32
+
+cdef void encode_game_state(GameState *this, unsigned char *code) nogil
+cdef void decode_game_state(const unsigned char *code, GameState *this) nogil
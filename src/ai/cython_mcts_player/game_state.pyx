@@ -2,7 +2,8 @@
 #  Use of this source code is governed by a BSD-style license that can be
 #  found in the LICENSE file.
 
-from ai.cython_mcts_player.card cimport CardValue, is_null
+from ai.cython_mcts_player.card cimport CardValue, is_null, is_unknown, \
+  card_index, card_from_index
 from libc.string cimport memset
 from model.player_id import PlayerId as PyPlayerId
 
@@ -126,3 +127,134 @@ cdef GameState from_python_game_state(py_game_state):
     game_state.current_trick[
       1].card_value = py_game_state.current_trick.two.card_value
   return game_state
+
+# These constants must be kept in sync with model/game_state_codec.py.
+cdef enum:
+  _LOCATION_HAND = 0
+  _LOCATION_TALON = 2
+  _LOCATION_TRUMP_CARD = 3
+  _LOCATION_CURRENT_TRICK = 4
+  _LOCATION_WON_TRICKS = 6
+  _LOCATION_HAND_AND_CURRENT_TRICK = 10
+  _UNKNOWN = 0xFF
+  _NUM_CARDS = 20
+  _PUBLIC_CARDS = 20
+  _TRICK_POINTS = 23
+  _OPPONENT_POINTS = 25
+  _FLAGS = 26
+  _HAND_SIZES = 27
+  _TALON_SIZE = 28
+  _MARRIAGES = 29
+  _MARRIAGE_BITS = 11
+
+cdef int _encode_marriages(Points pending_trick_points, Suit trump) nogil:
+  """
+  Returns the marriage suits, in the format used by the codec, that are worth
+  pending_trick_points: the trump marriage first, if needed, followed by the
+  other suits in their natural order.
+  """
+  cdef int bits = 0
+  cdef int num_marriages = 0
+  cdef int suit
+  if pending_trick_points >= 40:
+    bits |= (trump - 1) << 3
+    num_marriages += 1
+    pending_trick_points -= 40
+  for suit in range(4):
+    if pending_trick_points < 20:
+      break
+    if suit == trump - 1:
+      continue
+    bits |= suit << (3 + 2 * num_marriages)
+    num_marriages += 1
+    pending_trick_points -= 20
+  return bits | num_marriages
+
+cdef void encode_game_state(GameState *this, unsigned char *code) nogil:
+  cdef int player, i, index, num_cards
+  cdef int hand_sizes = 0
+  cdef int marriages = 0
+  cdef Card card
+  memset(code, _UNKNOWN, _NUM_CARDS)
+  memset(code + _NUM_CARDS, 0, GAME_STATE_CODE_SIZE - _NUM_CARDS)
+  for player in range(2):
+    num_cards = 0
+    while num_cards < 5 and \
+        not is_null(this.cards_in_hand[player][num_cards]):
+      card = this.cards_in_hand[player][num_cards]
+      if not is_unknown(card):
+        code[card_index(card)] = (_LOCATION_HAND + player) << 4 | num_cards
+      num_cards += 1
+    hand_sizes |= num_cards << (3 * player)
+    card = this.current_trick[player]
+    if not is_null(card):
+      index = card_index(card)
+      if code[index] >> 4 == _LOCATION_HAND + player:
+        code[index] += (_LOCATION_HAND_AND_CURRENT_TRICK - _LOCATION_HAND) << 4
+      else:
+        code[index] = (_LOCATION_CURRENT_TRICK + player) << 4
+    marriages |= _encode_marriages(this.pending_trick_points[player],
+                                   this.trump) << (_MARRIAGE_BITS * player)
+  num_cards = 0
+  while num_cards < 9 and not is_null(this.talon[num_cards]):
+    card = this.talon[num_cards]
+    if not is_unknown(card):
+      code[card_index(card)] = _LOCATION_TALON << 4 | num_cards
+    num_cards += 1
+  code[_TALON_SIZE] = num_cards
+  code[_HAND_SIZES] = hand_sizes
+  if not is_null(this.trump_card):
+    code[card_index(this.trump_card)] = _LOCATION_TRUMP_CARD << 4
+  code[_TRICK_POINTS] = this.trick_points[0]
+  code[_TRICK_POINTS + 1] = this.trick_points[1]
+  if is_talon_closed(this):
+    code[_OPPONENT_POINTS] = this.opponent_points_when_talon_was_closed
+  code[_FLAGS] = (this.trump - 1) | this.next_player << 2 | \
+                 (this.player_that_closed_the_talon + 1) << 3
+  for i in range(3):
+    code[_MARRIAGES + i] = (marriages >> (8 * i)) & 0xFF
+
+cdef void decode_game_state(const unsigned char *code, GameState *this) nogil:
+  cdef int player, i, index, location, position, suit, bits
+  cdef Card card
+  memset(this, 0, sizeof(GameState))
+  for player in range(2):
+    for i in range((code[_HAND_SIZES] >> (3 * player)) & 0b111):
+      this.cards_in_hand[player][i].suit = Suit.UNKNOWN_SUIT
+      this.cards_in_hand[player][i].card_value = CardValue.UNKNOWN_VALUE
+  for i in range(code[_TALON_SIZE]):
+    this.talon[i].suit = Suit.UNKNOWN_SUIT
+    this.talon[i].card_value = CardValue.UNKNOWN_VALUE
+  for index in range(_NUM_CARDS):
+    if code[index] == _UNKNOWN:
+      continue
+    location = code[index] >> 4
+    position = code[index] & 0b1111
+    card = card_from_index(index)
+    if location < _LOCATION_TALON:
+      this.cards_in_hand[location - _LOCATION_HAND][position] = card
+    elif location == _LOCATION_TALON:
+      this.talon[position] = card
+    elif location == _LOCATION_TRUMP_CARD:
+      this.trump_card = card
+    elif location < _LOCATION_WON_TRICKS:
+      this.current_trick[location - _LOCATION_CURRENT_TRICK] = card
+    elif location >= _LOCATION_HAND_AND_CURRENT_TRICK:
+      player = location - _LOCATION_HAND_AND_CURRENT_TRICK
+      this.cards_in_hand[player][position] = card
+      this.current_trick[player] = card
+  this.trump = <Suit> ((code[_FLAGS] & 0b11) + 1)
+  this.next_player = (code[_FLAGS] >> 2) & 1
+  this.player_that_closed_the_talon = ((code[_FLAGS] >> 3) & 0b11) - 1
+  if is_talon_closed(this):
+    this.opponent_points_when_talon_was_closed = code[_OPPONENT_POINTS]
+  cdef int marriages = code[_MARRIAGES] | code[_MARRIAGES + 1] << 8 | \
+                       code[_MARRIAGES + 2] << 16
+  for player in range(2):
+    this.trick_points[player] = code[_TRICK_POINTS + player]
+    if this.trick_points[player] != 0:
+      continue
+    bits = marriages >> (_MARRIAGE_BITS * player)
+    for i in range(bits & 0b111):
+      suit = ((bits >> (3 + 2 * i)) & 0b11) + 1
+      this.pending_trick_points[player] += 40 if suit == this.trump else 20
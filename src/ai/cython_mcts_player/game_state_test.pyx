@@ -2,16 +2,22 @@
 #  Use of this source code is governed by a BSD-style license that can be
 #  found in the LICENSE file.
 
+import random
 import unittest
 
-from ai.cython_mcts_player.game_state cimport from_python_game_state
+from libc.string cimport memcmp
+
+from ai.cython_mcts_player.game_state cimport from_python_game_state, \
+  encode_game_state, decode_game_state, GAME_STATE_CODE_SIZE
 from ai.cython_mcts_player.game_state cimport GameState, is_to_lead, \
   is_talon_closed, must_follow_suit, is_game_over, game_points, opponent
 from ai.cython_mcts_player.card cimport Card, Suit, CardValue
 from model.game_state import GameState as PyGameState
+from model.game_state_codec import encode_game_state as py_encode_game_state
 from model.game_state_test_utils import get_game_state_for_tests, \
   get_game_state_with_all_tricks_played
 from model.game_state_validation import GameStateValidator
+from model.player_action import get_available_actions
 from model.player_id import PlayerId as PyPlayerId
 
 
@@ -232,3 +238,50 @@ class GameStateTest(unittest.TestCase):
     self.assertFalse(is_talon_closed(&game_state))
     self.assertFalse(must_follow_suit(&game_state))
     self.assertFalse(is_game_over(&game_state))
+
+
+def _get_game_states_and_views(num_games):
+  game_states = []
+  for seed in range(num_games):
+    rng = random.Random(seed)
+    game_state = PyGameState.new(random_seed=seed)
+    while not game_state.is_game_over:
+      game_states.append(game_state)
+      game_states.append(game_state.next_player_view())
+      action = rng.choice(get_available_actions(game_state))
+      game_state = action.execute(game_state)
+  return game_states
+
+
+class GameStateCodecTest(unittest.TestCase):
+  def test_decode_python_code(self):
+    cdef GameState expected
+    cdef GameState actual
+    cdef bytes code
+    for py_game_state in _get_game_states_and_views(20):
+      expected = from_python_game_state(py_game_state)
+      code = py_encode_game_state(py_game_state)
+      decode_game_state(code, &actual)
+      self.assertEqual(0, memcmp(&expected, &actual, sizeof(GameState)),
+                       msg=py_game_state)
+
+  def test_encode_and_decode(self):
+    cdef GameState game_state
+    cdef GameState decoded_game_state
+    cdef unsigned char[GAME_STATE_CODE_SIZE] code
+    cdef int i
+    for py_game_state in _get_game_states_and_views(20):
+      game_state = from_python_game_state(py_game_state)
+      encode_game_state(&game_state, code)
+      decode_game_state(code, &decoded_game_state)
+      self.assertEqual(0, memcmp(&game_state, &decoded_game_state,
+                                 sizeof(GameState)), msg=py_game_state)
+      # The Python code also stores the won tricks, the public cards and the
+      # exact marriage suits. Everything else must be encoded the same way.
+      py_code = py_encode_game_state(py_game_state)
+      for i in range(20):
+        if 6 <= py_code[i] >> 4 < 10:
+          self.assertEqual(0xFF, code[i], msg=py_game_state)
+        else:
+          self.assertEqual(py_code[i], code[i], msg=py_game_state)
+      self.assertEqual(py_code[23:29], bytes(code[23:29]), msg=py_game_state)
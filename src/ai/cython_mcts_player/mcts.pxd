@@ -13,6 +13,19 @@ ctypedef Node *PNode
 
 cdef int MAX_CHILDREN
 
+# Running statistics for the rewards obtained on the paths that pass through a
+# node. The mean and M2 (the sum of the squared differences from the mean) are
+# updated using Welford's algorithm. If num_bins is positive, histogram points
+# to an array of num_bins counters for equal-width bins covering [-1, 1].
+cdef struct RewardStats:
+  int count
+  double mean
+  double m2
+  float min
+  float max
+  int num_bins
+  int *histogram
+
 cdef struct Node:
   GameState game_state
   Node *parent
@@ -30,16 +43,22 @@ cdef struct Node:
 
   # If Mcts is run with save_rewards=True, the children of the root node will
   # save all the rewards obtained on paths that pass through them in this list.
+  # If stream_rewards is also True, they only keep the running statistics in
+  # reward_stats instead.
   vector[float] *rewards
+  RewardStats *reward_stats
 
 cdef Node *init_node(GameState *game_state, Node *parent,
                      Points *bummerl_score) nogil
 cdef bint run_one_iteration(Node *root_node, float exploration_param,
                             bint select_best_child, bint save_rewards,
-                            Points *bummerl_score) nogil
+                            Points *bummerl_score, bint stream_rewards= *,
+                            int reward_histogram_bins= *) nogil
 cdef Node *build_tree(GameState *game_state, int max_iterations,
                       float exploration_param, bint select_best_child,
-                      bint save_rewards= *, Points *bummerl_score= *) nogil
+                      bint save_rewards= *, Points *bummerl_score= *,
+                      bint stream_rewards= *,
+                      int reward_histogram_bins= *) nogil
 cdef void delete_tree(Node *root_node) nogil
 
 cdef list best_actions_for_tests(Node *node)
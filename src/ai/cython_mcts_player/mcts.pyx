@@ -6,7 +6,7 @@
 
 import logging
 
-from libc.math cimport log, sqrt
+from libc.math cimport INFINITY, log, sqrt
 from libc.stdlib cimport free, malloc, rand, srand
 from libc.string cimport memset
 from libc.time cimport time
@@ -150,9 +150,34 @@ cdef void _update_children_ucb(Node *node, float exploration_param,
         selection_score += node.children[i].exploration_score
         node.best_children[i] = (selection_score == max_selection_score)
 
+cdef RewardStats *_new_reward_stats(int num_bins) nogil:
+  cdef RewardStats *stats = <RewardStats *> malloc(sizeof(RewardStats))
+  memset(stats, 0, sizeof(RewardStats))
+  stats.min = INFINITY
+  stats.max = -INFINITY
+  if num_bins > 0:
+    stats.num_bins = num_bins
+    stats.histogram = <int *> malloc(num_bins * sizeof(int))
+    memset(stats.histogram, 0, num_bins * sizeof(int))
+  return stats
+
+cdef void _add_reward(RewardStats *stats, float reward) nogil:
+  stats.count += 1
+  cdef double delta = reward - stats.mean
+  stats.mean += delta / stats.count
+  stats.m2 += delta * (reward - stats.mean)
+  stats.min = min(stats.min, reward)
+  stats.max = max(stats.max, reward)
+  cdef int bin_index
+  if stats.num_bins > 0:
+    bin_index = <int> ((reward + 1) / 2 * stats.num_bins)
+    bin_index = min(max(bin_index, 0), stats.num_bins - 1)
+    stats.histogram[bin_index] += 1
+
 cdef void _backpropagate(Node *end_node, float score,
                          float exploration_param, bint select_best_child,
-                         bint save_rewards) nogil:
+                         bint save_rewards, bint stream_rewards,
+                         int reward_histogram_bins) nogil:
   cdef Node *node = end_node
   cdef float score_for_player
   while node != NULL:
@@ -166,33 +191,42 @@ cdef void _backpropagate(Node *end_node, float score,
     if save_rewards:
       # Are we on the first layer in the tree?
       if node.parent != NULL and node.parent.parent == NULL:
-        if node.rewards == NULL:
-          node.rewards = new vector[float]()
-        node.rewards.push_back(score_for_player)
+        if stream_rewards:
+          if node.reward_stats == NULL:
+            node.reward_stats = _new_reward_stats(reward_histogram_bins)
+          _add_reward(node.reward_stats, score_for_player)
+        else:
+          if node.rewards == NULL:
+            node.rewards = new vector[float]()
+          node.rewards.push_back(score_for_player)
 
     node = node.parent
 
 cdef bint run_one_iteration(Node *root_node, float exploration_param,
                             bint select_best_child, bint save_rewards,
-                            Points *bummerl_score) nogil:
+                            Points *bummerl_score, bint stream_rewards=False,
+                            int reward_histogram_bins=0) nogil:
   cdef Node *selected_node = _selection(root_node, select_best_child)
   if selected_node is NULL:
     return True
   cdef Node *end_node = _fully_expand(selected_node, bummerl_score)
   _backpropagate(end_node, end_node.ucb, exploration_param, select_best_child,
-                 save_rewards)
+                 save_rewards, stream_rewards, reward_histogram_bins)
   return False
 
 cdef Node *build_tree(GameState *game_state, int max_iterations,
                       float exploration_param, bint select_best_child,
                       bint save_rewards=False,
-                      Points *bummerl_score=NULL) nogil:
+                      Points *bummerl_score=NULL,
+                      bint stream_rewards=False,
+                      int reward_histogram_bins=0) nogil:
   cdef Node *root_node = init_node(game_state, NULL, bummerl_score)
   cdef int iterations = 0
   while True:
     iterations += 1
     if run_one_iteration(root_node, exploration_param, select_best_child,
-                         save_rewards, bummerl_score):
+                         save_rewards, bummerl_score, stream_rewards,
+                         reward_histogram_bins):
       break
     if 0 < max_iterations <= iterations:
       break
@@ -243,6 +277,10 @@ cdef void delete_tree(Node *root_node) nogil:
       delete_tree(root_node.children[i])
   if root_node.rewards != NULL:
     del root_node.rewards
+  if root_node.reward_stats != NULL:
+    if root_node.reward_stats.histogram != NULL:
+      free(root_node.reward_stats.histogram)
+    free(root_node.reward_stats)
   free(root_node)
 
 # Initialize the RNG.
@@ -13,7 +13,6 @@ from scipy.stats import bootstrap
 
 from libcpp.vector cimport vector
 
-from ai.cython_mcts_player.card cimport Card
 from ai.cython_mcts_player.game_state cimport from_python_game_state, \
   GameState, from_python_player_id, PlayerId, Points
 from ai.cython_mcts_player.mcts cimport MAX_CHILDREN
@@ -21,17 +20,19 @@ from ai.cython_mcts_player.mcts cimport Node
 from ai.cython_mcts_player.mcts cimport build_tree
 from ai.cython_mcts_player.mcts cimport run_one_iteration, init_node
 from ai.cython_mcts_player.mcts cimport delete_tree
-from ai.cython_mcts_player.player cimport build_scoring_info
-from ai.cython_mcts_player.player cimport from_python_permutations
+from ai.cython_mcts_player.player cimport build_scoring_info, \
+  to_python_reward_stats
+from ai.cython_mcts_player.permutations cimport Permutations
 from ai.cython_mcts_player.player cimport populate_game_view
 from ai.cython_mcts_player.player_action cimport ActionType
 from ai.cython_mcts_player.player_action cimport to_python_player_action
 from ai.heuristic_player import HeuristicPlayer
-from ai.mcts_player import generate_permutations
+from ai.cython_mcts_player.permutations import generate_permutations
 from ai.mcts_player_options import MctsPlayerOptions
 from ai.merge_scoring_infos_func import ActionsWithScores, average_ucb, \
   are_all_nodes_fully_simulated
-from ai.merge_scoring_infos_func_with_deps import lower_ci_bound_on_raw_rewards
+from ai.merge_scoring_infos_func_with_deps import \
+  lower_ci_bound_on_raw_rewards, reward_stats_confidence_interval
 from model.game_state import GameState as PyGameState
 from model.player_action import PlayerAction
 from model.player_pair import PlayerPair
@@ -49,6 +50,9 @@ cdef _score_ci(Node *node):
                      method='percentile')
       ci_low = ci.confidence_interval.low
       ci_upp = ci.confidence_interval.high
+  if (not node.fully_simulated) and (node.reward_stats != NULL):
+    ci_low, ci_upp = reward_stats_confidence_interval(
+      to_python_reward_stats(node.reward_stats))
   if node.player != node.parent.player:
     ci_low, ci_upp = -ci_upp, -ci_low
   return ci_low, ci_upp
@@ -165,7 +169,9 @@ def run_mcts_and_collect_data(py_game_state: PyGameState,
                                              options.exploration_param,
                                              options.select_best_child,
                                              options.save_rewards,
-                                             bummerl_score)
+                                             bummerl_score,
+                                             options.stream_rewards,
+                                             options.reward_histogram_bins)
       iteration += 1
       if is_fully_simulated:
         break
@@ -196,14 +202,14 @@ def run_mcts_player_step_by_step(py_game_view: PyGameState,
   cdef PlayerId opponent_id = from_python_player_id(
     py_game_view.next_player.opponent())
 
-  cdef vector[vector[Card]] permutations
-  from_python_permutations(generate_permutations(py_game_view, options),
-                           &permutations)
+  cdef Permutations permutations = generate_permutations(py_game_view,
+                                                         options)
 
   cdef int i, j
-  for i in range(permutations.size()):
+  for i in range(permutations.num_permutations):
     game_state = game_view
-    populate_game_view(&game_state, &permutations[i], opponent_id)
+    populate_game_view(&game_state, permutations.cards_set.data(),
+                       permutations.permutation(i), opponent_id)
     root_nodes.push_back(init_node(&game_state, NULL, bummerl_score))
 
   cdef int iteration = 1
@@ -211,7 +217,7 @@ def run_mcts_player_step_by_step(py_game_view: PyGameState,
   dataframes = []
   max_iterations = options.max_iterations
   if options.reallocate_computational_budget:
-    max_iterations = int(total_budget / permutations.size())
+    max_iterations = int(total_budget / permutations.num_permutations)
   while True:
     is_fully_simulated = True
     for _ in range(iterations_step):
@@ -219,7 +225,8 @@ def run_mcts_player_step_by_step(py_game_view: PyGameState,
       for i in range(root_nodes.size()):
         permutation_is_fully_simulated = run_one_iteration(
           root_nodes[i], options.exploration_param, options.select_best_child,
-          options.save_rewards, bummerl_score)
+          options.save_rewards, bummerl_score, options.stream_rewards,
+          options.reward_histogram_bins)
         is_fully_simulated = \
           is_fully_simulated and permutation_is_fully_simulated
       iteration += 1
@@ -295,7 +302,9 @@ def overlap_between_mcts_and_heuristic(py_game_state: PyGameState,
   cdef Node *root_node = build_tree(&game_state, options.max_iterations,
                                     options.exploration_param,
                                     options.select_best_child,
-                                    options.save_rewards)
+                                    options.save_rewards, NULL,
+                                    options.stream_rewards,
+                                    options.reward_histogram_bins)
   data = []
   _accumulate_overlap(root_node, py_game_state, 0, data)
   delete_tree(root_node)
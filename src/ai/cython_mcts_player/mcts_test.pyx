@@ -161,3 +161,55 @@ class MctsTest(unittest.TestCase):
   def test_forcing_the_issue_player_one_always_wins(self):
     game_state = get_game_state_for_forcing_the_issue_puzzle()
     self._assert_player_one_always_wins(game_state)
+
+  def test_save_rewards(self):
+    cdef GameState game_state = from_python_game_state(
+      get_game_state_for_tempo_puzzle())
+    cdef Node *root_node = build_tree(&game_state, max_iterations=100,
+                                      exploration_param=1,
+                                      select_best_child=True,
+                                      save_rewards=True)
+    cdef int i
+    cdef Node *child
+    for i in range(MAX_CHILDREN):
+      if root_node.actions[i].action_type == ActionType.NO_ACTION:
+        break
+      if root_node.children[i] == NULL:
+        continue
+      child = root_node.children[i]
+      self.assertTrue(child.reward_stats == NULL)
+      self.assertEqual(child.n, child.rewards.size())
+      self.assertAlmostEqual(child.q, sum(list(child.rewards[0])), places=3)
+    delete_tree(root_node)
+
+  def test_stream_rewards(self):
+    cdef GameState game_state = from_python_game_state(
+      get_game_state_for_tempo_puzzle())
+    cdef Node *root_node = build_tree(&game_state, max_iterations=100,
+                                      exploration_param=1,
+                                      select_best_child=True,
+                                      save_rewards=True,
+                                      bummerl_score=NULL,
+                                      stream_rewards=True,
+                                      reward_histogram_bins=4)
+    cdef int i, j, histogram_total
+    cdef Node *child
+    for i in range(MAX_CHILDREN):
+      if root_node.actions[i].action_type == ActionType.NO_ACTION:
+        break
+      if root_node.children[i] == NULL:
+        continue
+      child = root_node.children[i]
+      self.assertTrue(child.rewards == NULL)
+      self.assertEqual(child.n, child.reward_stats.count)
+      self.assertAlmostEqual(child.q / child.n, child.reward_stats.mean,
+                             places=3)
+      self.assertLessEqual(child.reward_stats.min, child.reward_stats.mean)
+      self.assertGreaterEqual(child.reward_stats.max, child.reward_stats.mean)
+      self.assertGreaterEqual(child.reward_stats.m2, 0)
+      self.assertEqual(4, child.reward_stats.num_bins)
+      histogram_total = 0
+      for j in range(4):
+        histogram_total += child.reward_stats.histogram[j]
+      self.assertEqual(child.n, histogram_total)
+    delete_tree(root_node)
@@ -0,0 +1,36 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+# distutils: language=c++
+
+from libcpp.vector cimport vector
+
+from ai.cython_mcts_player.card cimport Card
+
+ctypedef unsigned long long PermutationRank
+
+# A compact representation of a list of permutations of the unseen cards. Each
+# permutation is stored as n indices in cards_set, where the first m indices
+# are sorted (the cards in the opponent's hand) and the remaining ones give the
+# order of the cards in the talon.
+cdef class Permutations:
+  cdef vector[Card] cards_set
+  cdef int n
+  cdef int num_permutations
+  # Stores num_permutations x n indices contiguously.
+  cdef vector[unsigned char] indices
+
+  cdef unsigned char *permutation(self, int i) nogil
+
+cdef PermutationRank num_permutations(int n, int m) nogil
+cdef PermutationRank random_rank(PermutationRank r) nogil
+cdef void sims_table_unrank(PermutationRank c, int n, int m,
+                            unsigned char *permutation) nogil
+cdef void generate_sims_table_permutations(int n, int m, int num_requested,
+                                           PermutationRank increment,
+                                           vector[unsigned char] *indices) nogil
+cdef void generate_random_permutations(int n, int m, int num_requested,
+                                       vector[unsigned char] *indices) nogil
+
+cdef Permutations from_python_permutations(py_cards_set, py_permutations)
@@ -0,0 +1,266 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+# distutils: language=c++
+
+import logging
+from typing import List, Tuple
+
+from cython.operator cimport dereference as deref
+from libc.stdlib cimport rand, RAND_MAX
+from libcpp.algorithm cimport sort
+from libcpp.map cimport map
+from libcpp.unordered_set cimport unordered_set
+from libcpp.vector cimport vector
+
+from ai.cython_mcts_player.card cimport Card
+
+from ai.mcts_player import generate_permutations as py_generate_permutations
+from ai.mcts_player_options import MctsPlayerOptions
+from ai.permutations import sims_table_perm_generator, random_perm_generator, \
+  get_best_increment
+from ai.utils import get_unseen_cards
+from model.game_state import GameState as PyGameState
+
+# There are at most 14 unseen cards in a game of Schnapsen. The random generator
+# packs each permutation in a PermutationRank using four bits per index, so it
+# can only be used for at most 16 cards.
+cdef int _MAX_N = 16
+
+
+cdef class Permutations:
+  cdef unsigned char *permutation(self, int i) nogil:
+    return self.indices.data() + i * self.n
+
+  def __len__(self):
+    return self.num_permutations
+
+
+cdef PermutationRank num_permutations(int n, int m) nogil:
+  """Returns n! / m!, the number of permutations with the first m sorted."""
+  cdef PermutationRank result = 1
+  cdef int i
+  for i in range(m + 1, n + 1):
+    result *= i
+  return result
+
+cdef void _sort_first_m(unsigned char *permutation, int m) nogil:
+  # Insertion sort, since m is at most 5.
+  cdef int i, j
+  cdef unsigned char value
+  for i in range(1, m):
+    value = permutation[i]
+    j = i - 1
+    while j >= 0 and permutation[j] > value:
+      permutation[j + 1] = permutation[j]
+      j -= 1
+    permutation[j + 1] = value
+
+cdef void sims_table_unrank(PermutationRank c, int n, int m,
+                            unsigned char *permutation) nogil:
+  """
+  Native version of SimsTablePermGenerator.generate_permutation(): it converts
+  c to the mixed radix number with radices [m+1, ..., n] and applies the
+  corresponding swaps from the Sims table. The first m entries are sorted.
+  """
+  cdef unsigned char[16] digits
+  cdef int i
+  cdef unsigned char tmp
+  for i in range(m, n):
+    digits[i] = c % (i + 1)
+    c = c // (i + 1)
+  for i in range(n):
+    permutation[i] = i
+  for i in range(n - 1, m - 1, -1):
+    tmp = permutation[i]
+    permutation[i] = permutation[i - digits[i]]
+    permutation[i - digits[i]] = tmp
+  _sort_first_m(permutation, m)
+
+cdef int _num_bits(PermutationRank value) nogil:
+  cdef int num_bits = 0
+  while value > 0:
+    num_bits += 1
+    value >>= 1
+  return num_bits
+
+cdef PermutationRank random_rank(PermutationRank r) nogil:
+  """
+  Returns a uniformly distributed random number in [0, r). RAND_MAX can be as
+  low as 2^15 - 1 (e.g., on Windows), so it concatenates the bits of as many
+  rand() values as needed and uses rejection sampling to avoid the modulo bias.
+  RAND_MAX + 1 is assumed to be a power of two.
+  """
+  if r <= 1:
+    return 0
+  cdef int bits_per_call = _num_bits(RAND_MAX)
+  cdef int num_bits = _num_bits(r - 1)
+  cdef PermutationRank mask = (<PermutationRank> -1) >> (64 - num_bits)
+  cdef PermutationRank value
+  cdef int num_random_bits
+  while True:
+    value = 0
+    num_random_bits = 0
+    while num_random_bits < num_bits:
+      value = (value << bits_per_call) | <PermutationRank> rand()
+      num_random_bits += bits_per_call
+    value &= mask
+    if value < r:
+      return value
+
+cdef void generate_sims_table_permutations(
+    int n, int m, int num_requested, PermutationRank increment,
+    vector[unsigned char] *indices) nogil:
+  """
+  Native version of sims_table_perm_generator(). It appends num_requested
+  permutations of [0, 1, ..., n-1] to indices, starting from a random counter.
+  The increment should be relative prime to n! / m!.
+  """
+  cdef PermutationRank r = num_permutations(n, m)
+  cdef PermutationRank counter = 0 if m == n else random_rank(r)
+  cdef int i
+  if num_requested > r:
+    num_requested = <int> r
+  cdef size_t offset = indices.size()
+  indices.resize(offset + num_requested * n)
+  for i in range(num_requested):
+    sims_table_unrank(counter, n, m, indices.data() + offset + i * n)
+    counter = (counter + increment) % r
+
+cdef PermutationRank _pack(unsigned char *permutation, int n) nogil:
+  cdef PermutationRank key = 0
+  cdef int i
+  for i in range(n):
+    key = (key << 4) | permutation[i]
+  return key
+
+cdef void generate_random_permutations(int n, int m, int num_requested,
+                                       vector[unsigned char] *indices) nogil:
+  """
+  Native version of random_perm_generator(). It appends num_requested unique
+  random permutations of [0, 1, ..., n-1] to indices, where the first m entries
+  are sorted.
+  """
+  cdef PermutationRank r = num_permutations(n, m)
+  if num_requested > r:
+    num_requested = <int> r
+  cdef unordered_set[PermutationRank] seen
+  cdef unsigned char[16] permutation
+  cdef int i, j
+  cdef unsigned char tmp
+  for i in range(n):
+    permutation[i] = i
+  while <int> seen.size() < num_requested:
+    # Fisher-Yates shuffle.
+    for i in range(n - 1, 0, -1):
+      j = rand() % (i + 1)
+      tmp = permutation[i]
+      permutation[i] = permutation[j]
+      permutation[j] = tmp
+    _sort_first_m(permutation, m)
+    if not seen.insert(_pack(permutation, n)).second:
+      continue
+    for i in range(n):
+      indices.push_back(permutation[i])
+
+cdef Permutations _new_permutations(py_cards_set):
+  cdef Permutations permutations = Permutations()
+  for card in py_cards_set:
+    permutations.cards_set.push_back(
+      Card(suit=card.suit, card_value=card.card_value))
+  permutations.n = len(py_cards_set)
+  return permutations
+
+cdef Permutations from_python_permutations(py_cards_set, py_permutations):
+  """
+  Converts the permutations of py_cards_set returned by a PermutationsGenerator
+  to the compact representation. py_permutations can be any iterable, so the
+  permutations are consumed one at a time.
+  """
+  cdef Permutations permutations = _new_permutations(py_cards_set)
+  card_indices = {card: i for i, card in enumerate(py_cards_set)}
+  for py_permutation in py_permutations:
+    for card in py_permutation:
+      permutations.indices.push_back(card_indices[card])
+    permutations.num_permutations += 1
+  return permutations
+
+def generate_permutations(py_game_view: PyGameState,
+                          options: MctsPlayerOptions) -> Permutations:
+  """
+  Equivalent of ai.mcts_player.generate_permutations(). If the perm_generator
+  is sims_table_perm_generator or random_perm_generator, the permutations are
+  generated natively, without creating any Python objects for them. Otherwise,
+  it falls back to the Python generator.
+  """
+  py_cards_set = get_unseen_cards(py_game_view)
+  cdef int n = len(py_cards_set)
+  cdef int m = len(
+    [card for card in
+     py_game_view.cards_in_hand[py_game_view.next_player.opponent()] if
+     card is None])
+  increment = get_best_increment(n, m)
+  if n > _MAX_N or \
+      (options.perm_generator == sims_table_perm_generator and
+       increment is None) or \
+      options.perm_generator not in (sims_table_perm_generator,
+                                     random_perm_generator):
+    return from_python_permutations(
+      py_cards_set, py_generate_permutations(py_game_view, options))
+
+  cdef PermutationRank total_permutations = num_permutations(n, m)
+  cdef int num_requested = options.max_permutations
+  if total_permutations < num_requested:
+    num_requested = <int> total_permutations
+  logging.info("CythonMctsPlayer: Num permutations: %s out of %s",
+               num_requested, total_permutations)
+  cdef Permutations permutations = _new_permutations(py_cards_set)
+  cdef PermutationRank c_increment = increment or 1
+  if options.perm_generator == sims_table_perm_generator:
+    with nogil:
+      generate_sims_table_permutations(n, m, num_requested, c_increment,
+                                       &permutations.indices)
+  else:
+    with nogil:
+      generate_random_permutations(n, m, num_requested, &permutations.indices)
+  permutations.num_permutations = num_requested
+  return permutations
+
+def collapse_equivalent_permutations(
+    py_game_view: PyGameState,
+    Permutations permutations) -> Tuple[Permutations, List[int]]:
+  """
+  Equivalent of ai.mcts_player.collapse_equivalent_permutations(). It returns
+  one permutation for each group of equivalent permutations and the sizes of
+  the groups. If the talon is closed, the permutations that only differ in the
+  order of the cards in the talon are equivalent.
+  """
+  if not py_game_view.is_talon_closed:
+    return permutations, [1] * permutations.num_permutations
+  cdef int m = len(
+    [card for card in
+     py_game_view.cards_in_hand[py_game_view.next_player.opponent()] if
+     card is None])
+  cdef Permutations result = _new_permutations([])
+  result.cards_set = permutations.cards_set
+  result.n = permutations.n
+  cdef map[vector[unsigned char], int] groups
+  cdef map[vector[unsigned char], int].iterator group
+  cdef vector[unsigned char] key
+  cdef unsigned char *permutation
+  cdef int i
+  weights = []
+  for i in range(permutations.num_permutations):
+    permutation = permutations.permutation(i)
+    key.assign(permutation, permutation + permutations.n)
+    sort(key.begin() + m, key.end())
+    group = groups.find(key)
+    if group != groups.end():
+      weights[deref(group).second] += 1
+      continue
+    groups[key] = result.num_permutations
+    result.indices.insert(result.indices.end(), key.begin(), key.end())
+    result.num_permutations += 1
+    weights.append(1)
+  return result, weights
@@ -0,0 +1,170 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+# distutils: language=c++
+
+# cython: warn.unused=False
+
+import math
+import unittest
+
+from libcpp.vector cimport vector
+
+from ai.cython_mcts_player.permutations cimport Permutations, \
+  num_permutations, sims_table_unrank, generate_sims_table_permutations, \
+  generate_random_permutations, random_rank
+from ai.cython_mcts_player.permutations import generate_permutations, \
+  collapse_equivalent_permutations
+from ai.cython_mcts_player.player import seed_random_generator
+from ai.mcts_player_options import MctsPlayerOptions
+from ai.permutations import SimsTablePermGenerator, random_perm_generator, \
+  lexicographic_perm_generator
+from ai.utils import get_unseen_cards
+from model.game_state import GameState
+from model.game_state_test_utils import get_game_view_for_duck_puzzle
+from model.player_action import CloseTheTalonAction
+
+
+cdef list _to_list(vector[unsigned char] *indices, int n):
+  return [[indices[0][i * n + j] for j in range(n)]
+          for i in range(<int> indices.size() // n)]
+
+
+class PermutationsTest(unittest.TestCase):
+  def test_num_permutations(self):
+    for n in range(15):
+      for m in range(min(5, n) + 1):
+        self.assertEqual(math.factorial(n) // math.factorial(m),
+                         num_permutations(n, m), msg=(n, m))
+
+  def test_random_rank(self):
+    seed_random_generator(1234)
+    self.assertEqual(0, random_rank(1))
+    counts = [0] * 3
+    for _ in range(3000):
+      counts[random_rank(3)] += 1
+    for count in counts:
+      self.assertAlmostEqual(1000, count, delta=100)
+    # The rank of a permutation of 14 cards needs more bits than a rand() value
+    # has on some platforms.
+    r = num_permutations(14, 5)
+    ranks = [random_rank(r) for _ in range(1000)]
+    self.assertTrue(all(rank < r for rank in ranks))
+    self.assertGreater(max(ranks), r * 0.9)
+    self.assertTrue(any(rank >> 15 & 0xFFFF for rank in ranks))
+    self.assertEqual(1000, len(set(ranks)))
+
+  def test_sims_table_unrank(self):
+    cdef unsigned char[16] permutation
+    for n, m in [(3, 0), (5, 2), (6, 5), (7, 7)]:
+      generator = SimsTablePermGenerator(n, m, counter=0, increment=1)
+      for c in range(num_permutations(n, m)):
+        sims_table_unrank(c, n, m, permutation)
+        self.assertEqual(generator.generate_permutation(c),
+                         [permutation[i] for i in range(n)], msg=(n, m, c))
+    generator = SimsTablePermGenerator(14, 5, counter=0, increment=1)
+    for c in [0, 1, 12345678, num_permutations(14, 5) - 1]:
+      sims_table_unrank(c, 14, 5, permutation)
+      self.assertEqual(generator.generate_permutation(c),
+                       [permutation[i] for i in range(14)], msg=c)
+
+  def test_generate_sims_table_permutations(self):
+    cdef vector[unsigned char] indices
+    generate_sims_table_permutations(5, 2, 10, 17, &indices)
+    permutations = _to_list(&indices, 5)
+    self.assertEqual(10, len(permutations))
+    self.assertEqual(10, len(set(tuple(p) for p in permutations)))
+    for permutation in permutations:
+      self.assertEqual(sorted(permutation[:2]), permutation[:2])
+      self.assertEqual(list(range(5)), sorted(permutation))
+
+    # More permutations requested than possible.
+    indices.clear()
+    generate_sims_table_permutations(5, 2, 100, 17, &indices)
+    permutations = _to_list(&indices, 5)
+    self.assertEqual(60, len(set(tuple(p) for p in permutations)))
+
+    indices.clear()
+    generate_sims_table_permutations(5, 5, 10, 1, &indices)
+    self.assertEqual([[0, 1, 2, 3, 4]], _to_list(&indices, 5))
+
+  def test_generate_random_permutations(self):
+    cdef vector[unsigned char] indices
+    generate_random_permutations(6, 4, 10, &indices)
+    permutations = _to_list(&indices, 6)
+    self.assertEqual(10, len(permutations))
+    self.assertEqual(10, len(set(tuple(p) for p in permutations)))
+    for permutation in permutations:
+      self.assertEqual(sorted(permutation[:4]), permutation[:4])
+      self.assertEqual(list(range(6)), sorted(permutation))
+
+    indices.clear()
+    generate_random_permutations(6, 4, 100, &indices)
+    permutations = _to_list(&indices, 6)
+    self.assertEqual(30, len(set(tuple(p) for p in permutations)))
+
+  def _assert_permutations_of_unseen_cards(self, game_view,
+                                           Permutations permutations,
+                                           int expected_num_permutations):
+    cards_set = get_unseen_cards(game_view)
+    self.assertEqual(expected_num_permutations, len(permutations))
+    self.assertEqual(len(cards_set), permutations.n)
+    self.assertEqual(
+      [(card.suit, card.card_value) for card in cards_set],
+      [(card.suit, card.card_value) for card in permutations.cards_set])
+    for i in range(permutations.num_permutations):
+      self.assertEqual(list(range(len(cards_set))),
+                       sorted(permutations.permutation(i)[j]
+                              for j in range(permutations.n)))
+
+  def test_generate_permutations(self):
+    game_view = GameState.new(random_seed=0).next_player_view()
+    for perm_generator in [random_perm_generator, lexicographic_perm_generator]:
+      options = MctsPlayerOptions(perm_generator=perm_generator,
+                                  max_permutations=20)
+      permutations = generate_permutations(game_view, options)
+      self._assert_permutations_of_unseen_cards(game_view, permutations, 20)
+
+    # Sims table: there are only 4 permutations for the duck puzzle.
+    game_view = get_game_view_for_duck_puzzle()
+    options = MctsPlayerOptions(max_permutations=20)
+    permutations = generate_permutations(game_view, options)
+    self._assert_permutations_of_unseen_cards(game_view, permutations, 4)
+
+  def test_collapse_equivalent_permutations(self):
+    # The talon is not closed, so all permutations are distinct.
+    game_state = GameState.new(random_seed=0)
+    options = MctsPlayerOptions(perm_generator=lexicographic_perm_generator,
+                                max_permutations=100)
+    permutations = generate_permutations(game_state.next_player_view(), options)
+    collapsed, weights = collapse_equivalent_permutations(
+      game_state.next_player_view(), permutations)
+    self.assertIs(permutations, collapsed)
+    self.assertEqual([1] * 100, weights)
+
+    # The talon is closed. The lexicographic generator only permutes the talon
+    # cards for the first 100 permutations, so they are all equivalent.
+    game_view = CloseTheTalonAction(game_state.next_player).execute(
+      game_state).next_player_view()
+    permutations = generate_permutations(game_view, options)
+    collapsed, weights = collapse_equivalent_permutations(game_view,
+                                                          permutations)
+    self.assertEqual([100], weights)
+    self._assert_permutations_of_unseen_cards(game_view, collapsed, 1)
+
+    # All permutations from the Sims table are distinct, but the groups must
+    # cover all of them.
+    options = MctsPlayerOptions(max_permutations=1000)
+    permutations = generate_permutations(game_view, options)
+    collapsed, weights = collapse_equivalent_permutations(game_view,
+                                                          permutations)
+    self.assertEqual(1000, sum(weights))
+    self._assert_permutations_of_unseen_cards(game_view, collapsed,
+                                              len(weights))
+    cdef Permutations typed_collapsed = collapsed
+    cdef int i, j
+    for i in range(typed_collapsed.num_permutations):
+      for j in range(5, typed_collapsed.n - 1):
+        self.assertLess(typed_collapsed.permutation(i)[j],
+                        typed_collapsed.permutation(i)[j + 1])
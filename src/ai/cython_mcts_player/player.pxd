@@ -4,16 +4,14 @@
 
 # distutils: language=c++
 
-from libcpp.vector cimport vector
-
 from ai.cython_mcts_player.card cimport Card
 from ai.cython_mcts_player.game_state cimport GameState, PlayerId
-from ai.cython_mcts_player.mcts cimport Node
-
-cdef void from_python_permutations(py_permutations,
-                                   vector[vector[Card]] *permutations)
+from ai.cython_mcts_player.mcts cimport Node, RewardStats
 
-cdef void populate_game_view(GameState *game_view, vector[Card] *permutation,
+cdef void populate_game_view(GameState *game_view, Card *cards_set,
+                             unsigned char *permutation,
                              PlayerId opponent_id) nogil
 
+cdef to_python_reward_stats(RewardStats *reward_stats)
+
 cdef build_scoring_info(Node *root_node)
@@ -6,47 +6,66 @@
 
 # cython: warn.unused=False
 
-from typing import List, Optional
+import dataclasses
+import math
+import multiprocessing
+import os
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Optional, Union, Iterator, Tuple
 
+from libc.stdlib cimport srand
+from libc.string cimport memcpy
+from libc.time cimport time
 from libcpp.vector cimport vector
 
-from ai.cython_mcts_player.card cimport Card, is_unknown
+from ai.cython_mcts_player.card cimport Card, is_unknown, card_index, \
+  card_from_index
 from ai.cython_mcts_player.game_state cimport GameState, PlayerId, \
   from_python_player_id, from_python_game_state, Points
 from ai.cython_mcts_player.mcts cimport Node, build_tree, MAX_CHILDREN, \
-  delete_tree
+  delete_tree, RewardStats
+from ai.cython_mcts_player.permutations cimport Permutations, \
+  from_python_permutations
 from ai.cython_mcts_player.player_action cimport ActionType, \
-  to_python_player_action
+  to_python_player_action, action_id
+from ai.cython_mcts_player.permutations import generate_permutations, \
+  collapse_equivalent_permutations
 from ai.mcts_player import BaseMctsPlayer
 from ai.mcts_player_options import MctsPlayerOptions
 
-from ai.merge_scoring_infos_func import ActionsWithScores, ScoringInfo
+from ai.merge_scoring_infos_func import ActionsWithScores, ScoringInfo, \
+  RewardStats as PyRewardStats
+from ai.utils import get_unseen_cards
 from model.card import Card as PyCard
 from model.game_state import GameState as PyGameState
+from model.player_action import PlayerAction as PyPlayerAction
 from model.player_id import PlayerId as PyPlayerId
 
-cdef void from_python_permutations(py_permutations,
-                                   vector[vector[Card]] *permutations):
-  cdef vector[Card] permutation
-  for py_permutation in py_permutations:
-    permutation.clear()
-    for card in py_permutation:
-      permutation.push_back(Card(suit=card.suit, card_value=card.card_value))
-    permutations.push_back(permutation)
-
-cdef void populate_game_view(GameState *game_view, vector[Card] *permutation,
+cdef void populate_game_view(GameState *game_view, Card *cards_set,
+                             unsigned char *permutation,
                              PlayerId opponent_id) nogil:
   cdef int i
   cdef int perm_index = 0
   for i in range(5):
     if is_unknown(game_view.cards_in_hand[opponent_id][i]):
-      game_view.cards_in_hand[opponent_id][i] = permutation[0][perm_index]
+      game_view.cards_in_hand[opponent_id][i] = \
+        cards_set[permutation[perm_index]]
       perm_index += 1
   for i in range(9):
     if is_unknown(game_view.talon[i]):
-      game_view.talon[i] = permutation[0][perm_index]
+      game_view.talon[i] = cards_set[permutation[perm_index]]
       perm_index += 1
 
+cdef to_python_reward_stats(RewardStats *reward_stats):
+  histogram = None
+  if reward_stats.num_bins > 0:
+    histogram = [reward_stats.histogram[i]
+                 for i in range(reward_stats.num_bins)]
+  return PyRewardStats(count=reward_stats.count, mean=reward_stats.mean,
+                       m2=reward_stats.m2, min=reward_stats.min,
+                       max=reward_stats.max, histogram=histogram)
+
 cdef build_scoring_info(Node *root_node):
   actions_with_scores = {}
   cdef int i
@@ -67,30 +86,225 @@ cdef build_scoring_info(Node *root_node):
       scoring_info.rewards = list(node.rewards[0])
       if node.player != root_node.player:
         scoring_info.rewards = [-reward for reward in scoring_info.rewards]
+    if node.reward_stats != NULL:
+      scoring_info.reward_stats = to_python_reward_stats(node.reward_stats)
+      if node.player != root_node.player:
+        scoring_info.reward_stats = scoring_info.reward_stats.negated()
     actions_with_scores[py_action] = scoring_info
   return actions_with_scores
 
 cdef list _run_mcts_single_threaded(GameState *game_view,
-                                    vector[vector[Card]] *permutations,
+                                    Permutations permutations,
                                     PlayerId opponent_id,
                                     Points * bummerl_score,
                                     int max_iterations,
                                     bint select_best_child,
                                     float exploration_param,
-                                    bint save_rewards):
+                                    bint save_rewards,
+                                    bint stream_rewards,
+                                    int reward_histogram_bins):
   cdef int i
   cdef GameState game_state
   cdef Node *root_node
   cdef list py_root_nodes = []
-  for i in range(permutations.size()):
+  for i in range(permutations.num_permutations):
     game_state = game_view[0]
-    populate_game_view(&game_state, &permutations[0][i], opponent_id)
+    populate_game_view(&game_state, permutations.cards_set.data(),
+                       permutations.permutation(i), opponent_id)
     root_node = build_tree(&game_state, max_iterations, exploration_param,
-                           select_best_child, save_rewards, bummerl_score)
+                           select_best_child, save_rewards, bummerl_score,
+                           stream_rewards, reward_histogram_bins)
     py_root_nodes.append(build_scoring_info(root_node))
     delete_tree(root_node)
   return py_root_nodes
 
+# When num_processes is not 1, the permutations are processed by a pool of
+# worker processes. For each batch of permutations, the game view, the
+# permutations and the results are stored in a shared memory block, so no
+# Python objects are pickled except for the tasks, which only contain the name
+# of the block and a range of permutations. The block has the following layout,
+# where each section starts at a multiple of 8 bytes:
+#   * the header: n (the number of unseen cards) and the number of permutations;
+#   * the GameState struct of the game view;
+#   * the indices of the unseen cards (see card_index()), one byte each;
+#   * the permutations, n bytes each (see Permutations.indices);
+#   * the results: MAX_CHILDREN rows of _NUM_RESULT_VALUES doubles for each
+#     permutation, one row for each child of the root node: action_id, q, n,
+#     score, fully_simulated, terminal. Missing children have action_id -1.
+cdef int _NUM_RESULT_VALUES = 6
+cdef int _CHUNKS_PER_PROCESS = 4
+
+cdef struct _SharedBatchLayout:
+  Py_ssize_t game_view
+  Py_ssize_t cards_set
+  Py_ssize_t indices
+  Py_ssize_t results
+  Py_ssize_t size
+
+cdef Py_ssize_t _align(Py_ssize_t offset):
+  return (offset + 7) // 8 * 8
+
+cdef _SharedBatchLayout _get_shared_batch_layout(int n, int num_permutations):
+  cdef _SharedBatchLayout layout
+  layout.game_view = _align(2 * sizeof(int))
+  layout.cards_set = _align(layout.game_view + sizeof(GameState))
+  layout.indices = layout.cards_set + n
+  layout.results = _align(layout.indices + num_permutations * n)
+  layout.size = layout.results + \
+                num_permutations * MAX_CHILDREN * _NUM_RESULT_VALUES * \
+                sizeof(double)
+  return layout
+
+cdef _write_shared_batch(GameState *game_view, Permutations permutations):
+  """
+  Writes the game view and the permutations in a new shared memory block. The
+  caller must close and unlink it.
+  """
+  cdef _SharedBatchLayout layout = _get_shared_batch_layout(
+    permutations.n, permutations.num_permutations)
+  shared_memory = SharedMemory(create=True, size=layout.size)
+  cdef unsigned char[::1] buffer = shared_memory.buf
+  cdef unsigned char *data = &buffer[0]
+  cdef int i
+  (<int *> data)[0] = permutations.n
+  (<int *> data)[1] = permutations.num_permutations
+  memcpy(data + layout.game_view, game_view, sizeof(GameState))
+  for i in range(permutations.n):
+    data[layout.cards_set + i] = card_index(permutations.cards_set[i])
+  if permutations.indices.size() > 0:
+    memcpy(data + layout.indices, permutations.indices.data(),
+           permutations.indices.size())
+  return shared_memory
+
+cdef void _write_results(Node *root_node, double *results) nogil:
+  cdef int i
+  cdef double *row
+  cdef Node *node
+  cdef bint has_action = True
+  for i in range(MAX_CHILDREN):
+    row = results + i * _NUM_RESULT_VALUES
+    if root_node.actions[i].action_type == ActionType.NO_ACTION:
+      has_action = False
+    node = root_node.children[i] if has_action else NULL
+    if node == NULL:
+      row[0] = -1
+      continue
+    row[0] = action_id(root_node.actions[i])
+    row[1] = node.q if node.player == root_node.player else -node.q
+    row[2] = node.n
+    row[3] = node.ucb if node.player == root_node.player else -node.ucb
+    row[4] = node.fully_simulated
+    row[5] = node.terminal
+
+cdef list _read_results(unsigned char[::1] buffer):
+  cdef unsigned char *data = &buffer[0]
+  cdef int num_permutations = (<int *> data)[1]
+  cdef _SharedBatchLayout layout = _get_shared_batch_layout(
+    (<int *> data)[0], num_permutations)
+  cdef double *row = <double *> (data + layout.results)
+  cdef int i, j
+  cdef list actions_with_scores_list = []
+  for i in range(num_permutations):
+    actions_with_scores = {}
+    for j in range(MAX_CHILDREN):
+      if row[0] >= 0:
+        actions_with_scores[PyPlayerAction.from_action_id(<int> row[0])] = \
+          ScoringInfo(q=row[1], n=<int> row[2], score=row[3],
+                      fully_simulated=bool(row[4]), terminal=bool(row[5]))
+      row += _NUM_RESULT_VALUES
+    actions_with_scores_list.append(actions_with_scores)
+  return actions_with_scores_list
+
+cdef void _run_mcts_on_shared_batch_range(
+    unsigned char[::1] buffer, int start, int end, PlayerId opponent_id,
+    Points *bummerl_score, int max_iterations, bint select_best_child,
+    float exploration_param):
+  cdef unsigned char *data = &buffer[0]
+  cdef int n = (<int *> data)[0]
+  cdef _SharedBatchLayout layout = _get_shared_batch_layout(
+    n, (<int *> data)[1])
+  cdef GameState game_view
+  memcpy(&game_view, data + layout.game_view, sizeof(GameState))
+  cdef vector[Card] cards_set
+  cdef int i
+  for i in range(n):
+    cards_set.push_back(card_from_index(data[layout.cards_set + i]))
+  cdef double *results = <double *> (data + layout.results)
+  cdef GameState game_state
+  cdef Node *root_node
+  for i in range(start, end):
+    game_state = game_view
+    populate_game_view(&game_state, cards_set.data(),
+                       data + layout.indices + i * n, opponent_id)
+    root_node = build_tree(&game_state, max_iterations, exploration_param,
+                           select_best_child, False, bummerl_score)
+    _write_results(root_node, results + i * MAX_CHILDREN * _NUM_RESULT_VALUES)
+    delete_tree(root_node)
+
+@dataclasses.dataclass
+class _ProcessPoolWorkerState:
+  """
+  The state of a worker process from the process pool. The player ID and the
+  options are set once, when the worker is started.
+  """
+
+  player_id: Optional[PyPlayerId] = None
+  options: Optional[MctsPlayerOptions] = None
+
+_WORKER_STATE = _ProcessPoolWorkerState()
+
+def _init_process_pool_worker(player_id: PyPlayerId,
+                              options: MctsPlayerOptions):
+  _WORKER_STATE.player_id = player_id
+  _WORKER_STATE.options = options
+  # The forked workers inherit the RNG state, so they would all use the same
+  # sequence of random numbers.
+  srand(time(NULL) ^ os.getpid())
+
+def _run_mcts_on_shared_batch(task: Tuple[str, int, int, int, int, int]):
+  name, start, end, max_iterations, points_one, points_two = task
+  cdef Points[2] bummerl_score
+  bummerl_score[0] = points_one
+  bummerl_score[1] = points_two
+  shared_memory = SharedMemory(name=name)
+  try:
+    _run_mcts_on_shared_batch_range(
+      shared_memory.buf, start, end,
+      from_python_player_id(_WORKER_STATE.player_id.opponent()),
+      bummerl_score, max_iterations, _WORKER_STATE.options.select_best_child,
+      _WORKER_STATE.options.exploration_param)
+  finally:
+    shared_memory.close()
+
+cdef list _run_mcts_in_process_pool(pool, int num_processes,
+                                    GameState *game_view,
+                                    Permutations permutations,
+                                    int max_iterations,
+                                    Points *bummerl_score):
+  shared_memory = _write_shared_batch(game_view, permutations)
+  cdef int num_permutations = permutations.num_permutations
+  try:
+    chunk_size = max(1, math.ceil(
+      num_permutations / (_CHUNKS_PER_PROCESS * num_processes)))
+    tasks = [(shared_memory.name, start,
+              min(start + chunk_size, num_permutations), max_iterations,
+              bummerl_score[0], bummerl_score[1])
+             for start in range(0, num_permutations, chunk_size)]
+    pool.map(_run_mcts_on_shared_batch, tasks)
+    return _read_results(shared_memory.buf)
+  finally:
+    shared_memory.close()
+    shared_memory.unlink()
+
+
+def seed_random_generator(seed: int) -> None:
+  """
+  Seeds the C random number generator used by the Cython implementation of the
+  Mcts algorithm and the permutations, in the current process. By default, it
+  is seeded with the current time.
+  """
+  srand(seed & 0xFFFFFFFF)
+
 
 class CythonMctsPlayer(BaseMctsPlayer):
   """Cython-based implementation of BaseMctsPlayer."""
@@ -98,32 +312,77 @@ class CythonMctsPlayer(BaseMctsPlayer):
   def __init__(self, player_id: PyPlayerId, cheater: bool = False,
                options: Optional[MctsPlayerOptions] = None):
     super().__init__(player_id, cheater, options)
-    if options.num_processes != 1:
-      raise ValueError(
-        f"CythonMctsPlayer: Options specify {options.num_processes} threads, "
-        "but multi-threading is not supported. Running in single-threaded mode")
+    self._pool = None
+    if self._options.num_processes != 1:
+      if self._options.save_rewards:
+        raise ValueError(
+          "CythonMctsPlayer: save_rewards is only supported if num_processes "
+          "is 1")
+      # Start the resource tracker before the workers, so they share it with
+      # this process. Otherwise, each worker starts its own tracker that
+      # reports the shared memory blocks unlinked by this process as leaked.
+      # SharedMemory only uses the resource tracker on POSIX systems.
+      if os.name == "posix":
+        resource_tracker.ensure_running()
+      # pylint: disable=consider-using-with
+      self._pool = multiprocessing.Pool(
+        processes=self._options.num_processes,
+        initializer=_init_process_pool_worker,
+        initargs=(self.id, self._options))
+      # pylint: enable=consider-using-with
+
+  def cleanup(self) -> None:
+    if self._pool is not None:
+      self._pool.terminate()
+      self._pool.join()
+
+  def _generate_permutation_batches(self, game_view: PyGameState) -> Iterator[
+    Tuple[Permutations, List[int]]]:
+    # The native permutations are compact enough to be processed in one batch.
+    permutations = generate_permutations(game_view, self._options)
+    if self._options.collapse_equivalent_permutations:
+      yield collapse_equivalent_permutations(game_view, permutations)
+    else:
+      yield permutations, [1] * len(permutations)
 
   def run_mcts_algorithm(self, py_game_view: PyGameState,
-                         py_permutations: List[List[PyCard]],
-                         game_points = None) -> List[ActionsWithScores]:
+                         py_permutations: Union[Permutations,
+                                                List[List[PyCard]]],
+                         game_points = None,
+                         num_permutations = None) -> List[ActionsWithScores]:
+    """
+    The permutations are usually generated natively by
+    _generate_permutation_batches(), but a list of Python permutations of the
+    unseen cards is also accepted.
+    """
     cdef GameState game_view = from_python_game_state(py_game_view)
-    cdef vector[vector[Card]] permutations
+    cdef Permutations permutations
     cdef int max_iterations = self._options.max_iterations or -1
     cdef int total_budget
-    from_python_permutations(py_permutations, &permutations)
+    if isinstance(py_permutations, Permutations):
+      permutations = py_permutations
+    else:
+      permutations = from_python_permutations(get_unseen_cards(py_game_view),
+                                              py_permutations)
     options = self._options
+    num_permutations = num_permutations or permutations.num_permutations
     if options.reallocate_computational_budget and \
         max_iterations > 0 and \
-        permutations.size() < options.max_permutations:
+        num_permutations < options.max_permutations:
       total_budget = options.max_permutations * options.max_iterations
-      max_iterations = <int> (total_budget / permutations.size())
+      max_iterations = <int> (total_budget / num_permutations)
     cdef Points[2] bummerl_score
     bummerl_score[0] = 0
     bummerl_score[1] = 0
     if options.use_game_points and game_points is not None:
       bummerl_score[0] = game_points.one
       bummerl_score[1] = game_points.two
+    if self._pool is not None:
+      return _run_mcts_in_process_pool(
+        self._pool, self._options.num_processes, &game_view, permutations,
+        max_iterations, bummerl_score)
     return _run_mcts_single_threaded(
-      &game_view, &permutations, from_python_player_id(self.id.opponent()),
+      &game_view, permutations, from_python_player_id(self.id.opponent()),
       bummerl_score, max_iterations, options.select_best_child,
-      options.exploration_param, options.save_rewards)
+      options.exploration_param, options.save_rewards, options.stream_rewards,
+      options.reward_histogram_bins)
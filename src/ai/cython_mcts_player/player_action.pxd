@@ -20,5 +20,9 @@ cdef struct PlayerAction:
 cdef void get_available_actions(GameState *game_state,
                                 PlayerAction * actions) nogil
 cdef GameState execute(GameState *game_state, PlayerAction action) nogil
+# The same dense integer ids as model.player_action.PlayerAction.action_id. For
+# invalid actions, action_id() returns -1.
+cdef int action_id(PlayerAction action) nogil
+cdef PlayerAction from_action_id(int action_id) nogil
 cdef PlayerAction from_python_player_action(py_player_action)
 cdef to_python_player_action(PlayerAction action)
@@ -4,14 +4,13 @@
 
 from libc.string cimport memset
 
-from ai.cython_mcts_player.card cimport CardValue, is_null, Suit, wins
+from ai.cython_mcts_player.card cimport CardValue, is_null, Suit, wins, \
+  card_index, card_from_index
 from ai.cython_mcts_player.game_state cimport is_to_lead, must_follow_suit, \
-  opponent, is_talon_closed, Points, from_python_player_id, to_python_player_id
-from model.card import Card as PyCard
-from model.card_value import CardValue as PyCardValue
+  opponent, is_talon_closed, Points, from_python_player_id
 from model.player_action import PlayCardAction, AnnounceMarriageAction, \
-  ExchangeTrumpCardAction, CloseTheTalonAction
-from model.suit import Suit as PySuit
+  ExchangeTrumpCardAction, CloseTheTalonAction, \
+  PlayerAction as PyPlayerAction
 
 cdef bint _is_following_suit(PlayerAction action, GameState *game_state) nogil:
   cdef PlayerId opp_id = opponent(action.player_id)
@@ -264,6 +263,51 @@ cdef GameState execute(GameState *game_state, PlayerAction action) nogil:
     return _execute_close_the_talon_action(game_state, action)
   raise ValueError(f"Unrecognized action_type: {action.action_type}")
 
+# The layout of the action ids, as described in model/player_action.py.
+cdef int _NUM_ACTION_IDS_PER_PLAYER = 42
+cdef int _MARRIAGE_ACTION_ID_OFFSET = 20
+cdef int _EXCHANGE_TRUMP_CARD_ACTION_ID = 40
+cdef int _CLOSE_THE_TALON_ACTION_ID = 41
+
+cdef int action_id(PlayerAction action) nogil:
+  cdef int first_action_id = action.player_id * _NUM_ACTION_IDS_PER_PLAYER
+  cdef int index
+  if action.player_id != 0 and action.player_id != 1:
+    return -1
+  if action.action_type == ActionType.PLAY_CARD or \
+      action.action_type == ActionType.ANNOUNCE_MARRIAGE:
+    index = card_index(action.card)
+    if index == -1:
+      return -1
+    if action.action_type == ActionType.PLAY_CARD:
+      return first_action_id + index
+    if action.card.card_value != CardValue.QUEEN and \
+        action.card.card_value != CardValue.KING:
+      return -1
+    return first_action_id + _MARRIAGE_ACTION_ID_OFFSET + index
+  if action.action_type == ActionType.EXCHANGE_TRUMP_CARD:
+    return first_action_id + _EXCHANGE_TRUMP_CARD_ACTION_ID
+  if action.action_type == ActionType.CLOSE_THE_TALON:
+    return first_action_id + _CLOSE_THE_TALON_ACTION_ID
+  return -1
+
+cdef PlayerAction from_action_id(int action_id) nogil:
+  cdef PlayerAction action
+  memset(&action, 0, sizeof(action))
+  action.player_id = <PlayerId> (action_id // _NUM_ACTION_IDS_PER_PLAYER)
+  action_id = action_id % _NUM_ACTION_IDS_PER_PLAYER
+  if action_id == _EXCHANGE_TRUMP_CARD_ACTION_ID:
+    action.action_type = ActionType.EXCHANGE_TRUMP_CARD
+  elif action_id == _CLOSE_THE_TALON_ACTION_ID:
+    action.action_type = ActionType.CLOSE_THE_TALON
+  elif action_id >= _MARRIAGE_ACTION_ID_OFFSET:
+    action.action_type = ActionType.ANNOUNCE_MARRIAGE
+    action.card = card_from_index(action_id - _MARRIAGE_ACTION_ID_OFFSET)
+  else:
+    action.action_type = ActionType.PLAY_CARD
+    action.card = card_from_index(action_id)
+  return action
+
 cdef PlayerAction from_python_player_action(py_player_action):
   cdef PlayerAction action
   memset(&action, 0, sizeof(action))
@@ -285,17 +329,7 @@ cdef PlayerAction from_python_player_action(py_player_action):
   return action
 
 cdef to_python_player_action(PlayerAction action):
-  py_player_id = to_python_player_id(action.player_id)
-  if action.action_type == ActionType.PLAY_CARD:
-    return PlayCardAction(py_player_id,
-                          PyCard(PySuit(action.card.suit),
-                                 PyCardValue(action.card.card_value)))
-  if action.action_type == ActionType.ANNOUNCE_MARRIAGE:
-    return AnnounceMarriageAction(py_player_id,
-                                  PyCard(PySuit(action.card.suit),
-                                         PyCardValue(action.card.card_value)))
-  if action.action_type == ActionType.EXCHANGE_TRUMP_CARD:
-    return ExchangeTrumpCardAction(py_player_id)
-  if action.action_type == ActionType.CLOSE_THE_TALON:
-    return CloseTheTalonAction(py_player_id)
-  raise ValueError(f"Unrecognized player action: {action}")
+  cdef int py_action_id = action_id(action)
+  if py_action_id == -1:
+    raise ValueError(f"Unrecognized player action: {action}")
+  return PyPlayerAction.from_action_id(py_action_id)
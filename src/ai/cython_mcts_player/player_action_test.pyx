@@ -14,7 +14,7 @@ from ai.cython_mcts_player.game_state cimport GameState, \
   is_game_over, game_points
 from ai.cython_mcts_player.player_action cimport ActionType, PlayerAction, \
   execute, get_available_actions, from_python_player_action, \
-  to_python_player_action
+  to_python_player_action, action_id, from_action_id
 
 from model.card import Card as PyCard
 from model.card_value import CardValue as PyCardValue
@@ -23,7 +23,8 @@ from model.game_state_test_utils import get_game_state_for_tests, \
   get_game_state_with_all_tricks_played, \
   get_game_state_with_empty_talon_for_tests
 from model.player_action import PlayCardAction, AnnounceMarriageAction, \
-  ExchangeTrumpCardAction, CloseTheTalonAction
+  ExchangeTrumpCardAction, CloseTheTalonAction, NUM_ACTION_IDS, \
+  PlayerAction as PyPlayerAction
 from model.player_id import PlayerId as PyPlayerId
 from model.suit import Suit as PySuit
 
@@ -382,3 +383,40 @@ class ToPythonPlayerActionTest(unittest.TestCase):
     with self.assertRaisesRegex(ValueError, "Unrecognized player action"):
       to_python_player_action(PlayerAction(<ActionType> 10, 1,
                                            Card(Suit.HEARTS, CardValue.KING)))
+
+  def test_returns_interned_actions(self):
+    py_action = to_python_player_action(
+      PlayerAction(ActionType.PLAY_CARD, 1, Card(Suit.CLUBS, CardValue.ACE)))
+    self.assertIs(PyPlayerAction.from_action_id(py_action.action_id),
+                  py_action)
+
+
+class ActionIdTest(unittest.TestCase):
+  def test_same_action_ids_as_python_actions(self):
+    cdef PlayerAction action
+    num_valid_action_ids = 0
+    for py_action_id in range(NUM_ACTION_IDS):
+      try:
+        py_action = PyPlayerAction.from_action_id(py_action_id)
+      except ValueError:
+        continue
+      num_valid_action_ids += 1
+      action = from_python_player_action(py_action)
+      self.assertEqual(py_action_id, action_id(action))
+      self.assertEqual(action, from_action_id(py_action_id))
+      self.assertEqual(py_action, to_python_player_action(action))
+    self.assertEqual(60, num_valid_action_ids)
+
+  def test_invalid_actions(self):
+    self.assertEqual(-1, action_id(
+      PlayerAction(ActionType.NO_ACTION, 0,
+                   Card(Suit.NO_SUIT, CardValue.NO_VALUE))))
+    self.assertEqual(-1, action_id(
+      PlayerAction(ActionType.PLAY_CARD, 0,
+                   Card(Suit.UNKNOWN_SUIT, CardValue.UNKNOWN_VALUE))))
+    self.assertEqual(-1, action_id(
+      PlayerAction(ActionType.ANNOUNCE_MARRIAGE, 1,
+                   Card(Suit.HEARTS, CardValue.JACK))))
+    self.assertEqual(-1, action_id(
+      PlayerAction(ActionType.CLOSE_THE_TALON, 2,
+                   Card(Suit.HEARTS, CardValue.KING))))
@@ -2,12 +2,16 @@
 #  Use of this source code is governed by a BSD-style license that can be
 #  found in the LICENSE file.
 
+import dataclasses
+import enum
 import functools
+import math
 import multiprocessing
 import os.path
+import pickle
 import random
 import time
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 
 import pandas
 from pandas import DataFrame
@@ -174,53 +178,191 @@ def evaluate_player_pair_in_process(num_bummerls: int,
           "num_actions_requested": num_actions_requested}
 
 
-def evaluate_player_pair_in_parallel(players: PlayerPair[str],
-                                     num_bummerls: int = 1000,
-                                     num_processes: int = 4) -> MetricsDict:
-  num_bummerls_per_process = num_bummerls // num_processes
-  num_bummerls_to_run = [num_bummerls_per_process] * num_processes
-  for i in range(num_bummerls % num_processes):
-    num_bummerls_to_run[i] += 1
-  print(f"Number of bummerls for each worker: {num_bummerls_to_run}")
-
+@dataclasses.dataclass(frozen=True)
+class SprtOptions:
+  """
+  Options for the sequential test used to stop a match as soon as the result
+  is decided. It runs two one-sided sequential probability ratio tests on the
+  win rate p of player ONE: p = 0.5 against p = 0.5 + indifference, and p = 0.5
+  against p = 0.5 - indifference.
+  """
+
+  indifference: float = 0.05
+  """
+  The win rates in (0.5 - indifference, 0.5 + indifference) are considered
+  equivalent to 0.5.
+  """
+
+  alpha: float = 0.05
+  """
+  The probability of declaring one of the players better (for each of them)
+  when the win rate is 0.5.
+  """
+
+  beta: float = 0.05
+  """
+  The probability of missing that a player is better when the win rate is at
+  least indifference away from 0.5.
+  """
+
+
+class SprtResult(enum.Enum):
+  """The possible outcomes of sprt_decision()."""
+  ONE_IS_BETTER = enum.auto()
+  TWO_IS_BETTER = enum.auto()
+  EQUIVALENT = enum.auto()
+  """The win rate is inside the indifference zone."""
+
+
+def sprt_decision(bummerls: PlayerPair[int],
+                  options: SprtOptions) -> Optional[SprtResult]:
+  """
+  Returns the outcome of the sequential test from SprtOptions, given the
+  number of bummerls won by each player so far, or None if more bummerls are
+  needed. A player is better as soon as its one-sided test rejects p = 0.5. The
+  players are equivalent when both one-sided tests accept p = 0.5.
+  """
+  upper_bound = math.log((1 - options.beta) / options.alpha)
+  lower_bound = math.log(options.beta / (1 - options.alpha))
+
+  def log_likelihood_ratio(p: float) -> float:
+    return bummerls.one * math.log(p / 0.5) + \
+           bummerls.two * math.log((1 - p) / 0.5)
+
+  llr_one = log_likelihood_ratio(0.5 + options.indifference)
+  llr_two = log_likelihood_ratio(0.5 - options.indifference)
+  if llr_one >= upper_bound:
+    return SprtResult.ONE_IS_BETTER
+  if llr_two >= upper_bound:
+    return SprtResult.TWO_IS_BETTER
+  if llr_one <= lower_bound and llr_two <= lower_bound:
+    return SprtResult.EQUIVALENT
+  return None
+
+
+# The checkpoint maps each pair of player names to the number of bummerls that
+# were already simulated and their merged metrics.
+Checkpoint = Dict[Tuple[str, str], Tuple[int, MetricsDict]]
+
+
+def _load_checkpoint(checkpoint_path: Optional[str]) -> Checkpoint:
+  if checkpoint_path is None or not os.path.exists(checkpoint_path):
+    return {}
+  with open(checkpoint_path, "rb") as input_file:
+    return pickle.load(input_file)
+
+
+def _save_checkpoint(checkpoint_path: str, checkpoint: Checkpoint) -> None:
+  # Write to a temporary file first, so the checkpoint is not corrupted if the
+  # process is killed while writing it.
+  with open(checkpoint_path + ".tmp", "wb") as output_file:
+    pickle.dump(checkpoint, output_file)
+  os.replace(checkpoint_path + ".tmp", checkpoint_path)
+
+
+def evaluate_player_pair_in_parallel(
+    players: PlayerPair[str], num_bummerls: int = 1000, *,
+    num_processes: int = 4, bummerls_per_batch: int = 10,
+    checkpoint_path: Optional[str] = None,
+    sprt_options: Optional[SprtOptions] = None) -> MetricsDict:
+  """
+  Simulates num_bummerls bummerls between the two players. The bummerls are
+  split in batches of bummerls_per_batch bummerls that are sent to the worker
+  processes as soon as they are idle, so a slow worker doesn't delay the
+  others. If checkpoint_path is not None, the merged metrics are saved there
+  after each batch and the bummerls that were already simulated for this pair
+  of players are skipped when the evaluation is restarted. If sprt_options is
+  not None, the match stops as soon as sprt_decision() reaches a result: the
+  batches that are still running are discarded and the workers are
+  terminated.
+  """
+  # pylint: disable=too-many-arguments
+  key = (players.one, players.two)
+  checkpoint = _load_checkpoint(checkpoint_path)
+  num_bummerls_done, merged_metrics = checkpoint.get(key, (0, None))
+  # The checkpoint can have more bummerls if num_bummerls was decreased.
+  num_bummerls_to_run = max(0, num_bummerls - num_bummerls_done)
+  if num_bummerls_done > 0:
+    print(f"Resuming from checkpoint: {num_bummerls_done} bummerls done")
+    if sprt_options is not None and \
+        sprt_decision(merged_metrics["bummerls"], sprt_options) is not None:
+      num_bummerls_to_run = 0
+  batches = [bummerls_per_batch] * (num_bummerls_to_run // bummerls_per_batch)
+  if num_bummerls_to_run % bummerls_per_batch > 0:
+    batches.append(num_bummerls_to_run % bummerls_per_batch)
+  if len(batches) == 0:
+    return merged_metrics
+
+  # Exiting the with statement terminates the workers, so breaking out of the
+  # loop stops the batches that are in progress.
   with multiprocessing.Pool(processes=num_processes) as pool:
-    metrics_dicts = pool.map(
-      functools.partial(evaluate_player_pair_in_process, players=players),
-      num_bummerls_to_run)
-
-  merged_metrics = metrics_dicts[0]
-  for metric_dict in metrics_dicts[1:]:
-    accumulate_metrics(merged_metrics, metric_dict)
+    for metrics in pool.imap_unordered(
+        functools.partial(evaluate_player_pair_in_process, players=players),
+        batches):
+      if merged_metrics is None:
+        merged_metrics = metrics
+      else:
+        accumulate_metrics(merged_metrics, metrics)
+      num_bummerls_done += metrics["bummerls"].one + metrics["bummerls"].two
+      print(f"\rSimulated {num_bummerls_done} out of {num_bummerls} "
+            f"bummerls ({merged_metrics['bummerls']})...", end="")
+      if checkpoint_path is not None:
+        checkpoint[key] = (num_bummerls_done, merged_metrics)
+        _save_checkpoint(checkpoint_path, checkpoint)
+      if sprt_options is not None:
+        result = sprt_decision(merged_metrics["bummerls"], sprt_options)
+        if result is not None:
+          print(f"\nSPRT: {result.name} after {num_bummerls_done} bummerls")
+          break
+  print(end="\r")
   return merged_metrics
 
 
-def evaluate_one_player_vs_opponent_list(player: str,
-                                         opponents: List[str]) -> DataFrame:
+def evaluate_one_player_vs_opponent_list(
+    player: str, opponents: List[str],
+    checkpoint_path: Optional[str] = None,
+    sprt_options: Optional[SprtOptions] = None) -> DataFrame:
   rows = []
   for opponent in opponents:
     print(f"Simulating {player} vs {opponent}")
     players = PlayerPair(player, opponent)
-    metrics = evaluate_player_pair_in_parallel(players)
+    metrics = evaluate_player_pair_in_parallel(
+      players, checkpoint_path=checkpoint_path, sprt_options=sprt_options)
     _print_metrics(metrics)
     rows.append([player, opponent] + _get_results_row(metrics))
   columns = ["player_one", "player_two"] + _get_metrics_column_names()
   return pandas.DataFrame(rows, columns=columns)
 
 
-def evaluate_all_player_pairs(player_names: List[str] = None) -> DataFrame:
+def evaluate_all_player_pairs(player_names: List[str] = None,
+                              checkpoint_path: Optional[str] = None,
+                              sprt_options: Optional[SprtOptions] = None) -> \
+    DataFrame:
   dataframes = []
   player_names = player_names or list(PLAYER_NAMES)
   for i, player_to_evaluate in enumerate(player_names):
     dataframes.append(evaluate_one_player_vs_opponent_list(
-      player_to_evaluate, player_names[:i + 1]))
+      player_to_evaluate, player_names[:i + 1], checkpoint_path,
+      sprt_options))
   return pandas.concat(dataframes)
 
 
 def main():
-  dataframe = evaluate_all_player_pairs()
+  # If the evaluation is interrupted, running it again resumes from the
+  # checkpoint. It is deleted once all the results are saved, so the next
+  # evaluation starts from scratch. Pass sprt_options=SprtOptions() to stop
+  # each player pair early once one player is found to be better or the players
+  # are found to be equivalent; the results then have a different number of
+  # bummerls for each player pair.
+  checkpoint_path = os.path.join(os.path.dirname(__file__),
+                                 "eval_checkpoint.pickle")
+  dataframe = evaluate_all_player_pairs(checkpoint_path=checkpoint_path,
+                                        sprt_options=None)
   # noinspection PyTypeChecker
   dataframe.to_csv(os.path.join(os.path.dirname(__file__), "eval_results.csv"),
                    index=False)
+  if os.path.exists(checkpoint_path):
+    os.remove(checkpoint_path)
 
 
 if __name__ == "__main__":
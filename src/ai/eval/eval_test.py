@@ -0,0 +1,132 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+import os
+import pickle
+import random
+import tempfile
+import unittest
+
+from ai.eval.eval import SprtOptions, SprtResult, sprt_decision, \
+  evaluate_player_pair_in_parallel
+from model.player_pair import PlayerPair
+
+
+class SprtDecisionTest(unittest.TestCase):
+  def test_no_decision_without_enough_bummerls(self):
+    options = SprtOptions()
+    self.assertIsNone(sprt_decision(PlayerPair(0, 0), options))
+    self.assertIsNone(sprt_decision(PlayerPair(5, 5), options))
+    self.assertIsNone(sprt_decision(PlayerPair(10, 2), options))
+    self.assertIsNone(sprt_decision(PlayerPair(2, 10), options))
+
+  def test_one_player_is_better(self):
+    options = SprtOptions()
+    self.assertEqual(SprtResult.ONE_IS_BETTER,
+                     sprt_decision(PlayerPair(40, 0), options))
+    self.assertEqual(SprtResult.TWO_IS_BETTER,
+                     sprt_decision(PlayerPair(0, 40), options))
+    self.assertEqual(SprtResult.ONE_IS_BETTER,
+                     sprt_decision(PlayerPair(600, 400), options))
+    self.assertEqual(SprtResult.TWO_IS_BETTER,
+                     sprt_decision(PlayerPair(400, 600), options))
+
+  def test_equivalent_players(self):
+    options = SprtOptions()
+    self.assertEqual(SprtResult.EQUIVALENT,
+                     sprt_decision(PlayerPair(500, 500), options))
+    self.assertEqual(SprtResult.EQUIVALENT,
+                     sprt_decision(PlayerPair(505, 495), options))
+    # A wider indifference zone needs fewer bummerls.
+    self.assertIsNone(sprt_decision(PlayerPair(100, 100), options))
+    self.assertEqual(
+      SprtResult.EQUIVALENT,
+      sprt_decision(PlayerPair(100, 100), SprtOptions(indifference=0.1)))
+
+  def test_error_rates_for_equal_players(self):
+    rng = random.Random(1234)
+    options = SprtOptions(indifference=0.1, alpha=0.05, beta=0.05)
+    results = {result: 0 for result in SprtResult}
+    num_matches = 500
+    for _ in range(num_matches):
+      bummerls = PlayerPair(0, 0)
+      result = None
+      while result is None:
+        if rng.random() < 0.5:
+          bummerls.one += 1
+        else:
+          bummerls.two += 1
+        result = sprt_decision(bummerls, options)
+      results[result] += 1
+    # Each player is declared better in about alpha of the matches.
+    self.assertLess(results[SprtResult.ONE_IS_BETTER], 0.1 * num_matches)
+    self.assertLess(results[SprtResult.TWO_IS_BETTER], 0.1 * num_matches)
+    self.assertGreater(results[SprtResult.EQUIVALENT], 0.8 * num_matches)
+
+
+class EvaluatePlayerPairInParallelTest(unittest.TestCase):
+  def setUp(self):
+    # pylint: disable=consider-using-with
+    self._temp_dir = tempfile.TemporaryDirectory()
+    # pylint: enable=consider-using-with
+    self._checkpoint_path = os.path.join(self._temp_dir.name,
+                                         "checkpoint.pickle")
+    self._players = PlayerPair("Random", "RandomTalon")
+
+  def tearDown(self):
+    self._temp_dir.cleanup()
+
+  def _evaluate(self, num_bummerls: int, **kwargs):
+    return evaluate_player_pair_in_parallel(
+      self._players, num_bummerls, num_processes=2, bummerls_per_batch=2,
+      checkpoint_path=self._checkpoint_path, **kwargs)
+
+  def _load_checkpoint(self):
+    with open(self._checkpoint_path, "rb") as input_file:
+      return pickle.load(input_file)
+
+  def test_without_checkpoint(self):
+    metrics = evaluate_player_pair_in_parallel(
+      self._players, 5, num_processes=2, bummerls_per_batch=2)
+    self.assertEqual(5, metrics["bummerls"].one + metrics["bummerls"].two)
+    self.assertFalse(os.path.exists(self._checkpoint_path))
+
+  def test_save_and_resume(self):
+    metrics = self._evaluate(5)
+    self.assertEqual(5, metrics["bummerls"].one + metrics["bummerls"].two)
+    checkpoint = self._load_checkpoint()
+    self.assertEqual([("Random", "RandomTalon")], list(checkpoint))
+    num_bummerls_done, saved_metrics = checkpoint[("Random", "RandomTalon")]
+    self.assertEqual(5, num_bummerls_done)
+    self.assertEqual(metrics, saved_metrics)
+
+    # Only the remaining bummerls are simulated.
+    resumed_metrics = self._evaluate(8)
+    self.assertEqual(
+      8, resumed_metrics["bummerls"].one + resumed_metrics["bummerls"].two)
+    self.assertGreaterEqual(resumed_metrics["games"].one,
+                            metrics["games"].one)
+    self.assertGreaterEqual(resumed_metrics["games"].two,
+                            metrics["games"].two)
+    self.assertEqual(8, self._load_checkpoint()[("Random", "RandomTalon")][0])
+
+    # The checkpoint can have more bummerls than requested.
+    self.assertEqual(resumed_metrics, self._evaluate(3))
+    self.assertEqual(8, self._load_checkpoint()[("Random", "RandomTalon")][0])
+
+  def test_checkpoint_keeps_other_player_pairs(self):
+    self._evaluate(2)
+    self._players = PlayerPair("RandomTalon", "Random")
+    self._evaluate(3)
+    checkpoint = self._load_checkpoint()
+    self.assertEqual(2, checkpoint[("Random", "RandomTalon")][0])
+    self.assertEqual(3, checkpoint[("RandomTalon", "Random")][0])
+
+  def test_resume_after_sprt_decision(self):
+    metrics = {"bummerls": PlayerPair(100, 0)}
+    with open(self._checkpoint_path, "wb") as output_file:
+      pickle.dump({("Random", "RandomTalon"): (100, metrics)}, output_file)
+    self.assertEqual(metrics, self._evaluate(1000, sprt_options=SprtOptions()))
+    self.assertEqual(100,
+                     self._load_checkpoint()[("Random", "RandomTalon")][0])
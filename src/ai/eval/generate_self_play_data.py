@@ -0,0 +1,282 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+"""
+Generates self-play datasets for training and analysis. It plays games between
+two players from PLAYER_NAMES in parallel, across multiple processes, and
+records every decision.
+
+The games are split in shards of games_per_shard games. Each shard is stored in
+the output folder as the following NumPy arrays, with one row per decision,
+which can be loaded with np.load(mmap_mode="r") or with load_shard():
+
+  * shard_NNNNN.game_views.npy: the game view that the player saw, encoded with
+    model/game_state_codec.py; shape (N, GAME_STATE_CODE_SIZE), uint8.
+  * shard_NNNNN.legal_actions.npy: the legal actions, indexed by action id;
+    shape (N, NUM_ACTION_IDS), bool.
+  * shard_NNNNN.actions.npy: the action id of the chosen action; shape (N,),
+    uint8.
+  * shard_NNNNN.scores.npy: the score of each action returned by
+    get_actions_and_scores(), indexed by action id, or NaN for the actions
+    without a score and the players that don't compute scores; shape
+    (N, NUM_ACTION_IDS), float32.
+  * shard_NNNNN.game_indices.npy: the index of the game in which the decision
+    was made; shape (N,), int64.
+
+The games themselves are stored in a game archive (see model/game_archive.py)
+called shard_NNNNN.sga.
+
+The manifest.json file stores the config and the list of completed shards. A
+shard is added to the manifest only after all its files were written, so an
+interrupted run can be resumed and a dataset can be extended with more shards
+by running it again with a larger num_shards. Each game and the random number
+generators used by the players are seeded from the config seed and the game
+index, so a shard can be regenerated deterministically, independently of the
+other shards and the number of processes (as long as the players don't have a
+time budget).
+"""
+
+import dataclasses
+import json
+import logging
+import multiprocessing
+import os
+import random
+from typing import Dict, Optional, List, Any, Tuple
+
+import numpy as np
+
+from ai.cython_mcts_player.player import seed_random_generator
+from ai.eval.players import PLAYER_NAMES
+from ai.mcts_player import BaseMctsPlayer, find_action_with_max_score
+from ai.player import Player
+from main_wrapper import main_wrapper
+from model.game import Game
+from model.game_archive import GameArchiveWriter, get_index_path
+from model.game_state import GameState
+from model.game_state_codec import GAME_STATE_CODE_SIZE, \
+  encode_game_state_into
+from model.player_action import NUM_ACTION_IDS, get_available_actions, \
+  PlayerAction
+from model.player_id import PlayerId
+from model.player_pair import PlayerPair
+
+_MANIFEST = "manifest.json"
+_ARRAY_NAMES = ["game_views", "legal_actions", "actions", "scores",
+                "game_indices"]
+
+
+@dataclasses.dataclass(frozen=True)
+class SelfPlayConfig:
+  """The parameters that determine the content of a self-play dataset."""
+
+  player_one: str
+  """The name of player ONE, from PLAYER_NAMES."""
+
+  player_two: str
+  """The name of player TWO, from PLAYER_NAMES."""
+
+  seed: int = 0
+  """The seed from which all the games and players' decisions are derived."""
+
+  games_per_shard: int = 100
+  """The number of games stored in each shard."""
+
+
+def _get_shard_prefix(output_folder: str, shard_index: int) -> str:
+  return os.path.join(output_folder, f"shard_{shard_index:05d}")
+
+
+def _seed_game(config: SelfPlayConfig, game_index: int) -> Game:
+  """
+  Creates the game with the given index and seeds the random number generators
+  used by the players for this game.
+  """
+  rng = random.Random(f"{config.seed}:{game_index}")
+  random.seed(rng.getrandbits(64))
+  seed_random_generator(rng.getrandbits(32))
+  dealer = PlayerId.ONE if game_index % 2 == 0 else PlayerId.TWO
+  return Game(dealer=dealer, seed=rng.getrandbits(63))
+
+
+def _save_array(path: str, array: np.ndarray) -> None:
+  with open(path + ".tmp", "wb") as output_file:
+    np.save(output_file, array)
+  os.replace(path + ".tmp", path)
+
+
+def _request_action(player: Player,
+                    game_view: GameState) -> Tuple[PlayerAction,
+                                                   Dict[int, float]]:
+  """
+  Returns the action chosen by player and the scores of the actions, indexed by
+  action id, if the player computes them.
+  """
+  if not isinstance(player, BaseMctsPlayer):
+    return player.request_next_action(game_view), {}
+  actions_and_scores = player.get_actions_and_scores(game_view)
+  scores = {action.action_id: score[0] if isinstance(score, tuple) else score
+            for action, score in actions_and_scores}
+  return find_action_with_max_score(actions_and_scores), scores
+
+
+@dataclasses.dataclass
+class _ShardDecisions:
+  """The decisions recorded for a shard, before they are stored as arrays."""
+
+  game_views: bytearray = dataclasses.field(default_factory=bytearray)
+  legal_actions: List[List[int]] = dataclasses.field(default_factory=list)
+  actions: bytearray = dataclasses.field(default_factory=bytearray)
+  scores: List[Dict[int, float]] = dataclasses.field(default_factory=list)
+  game_indices: List[int] = dataclasses.field(default_factory=list)
+
+  def play_game(self, game: Game, players: PlayerPair[Player],
+                game_index: int) -> None:
+    """Plays the game until it is over and records every decision."""
+    while not game.game_state.is_game_over:
+      player = players[game.game_state.next_player]
+      if player.cheater:
+        game_view = game.game_state
+      else:
+        game_view = game.game_state.next_player_view()
+      action, scores = _request_action(player, game_view)
+      self.game_views.extend(bytes(GAME_STATE_CODE_SIZE))
+      encode_game_state_into(game_view, self.game_views,
+                             len(self.game_views) - GAME_STATE_CODE_SIZE)
+      self.legal_actions.append([a.action_id for a in
+                                 get_available_actions(game_view)])
+      self.actions.append(action.action_id)
+      self.scores.append(scores)
+      self.game_indices.append(game_index)
+      game.play_action(action)
+
+  def to_arrays(self) -> Dict[str, np.ndarray]:
+    """Returns the arrays stored in the shard files, indexed by name."""
+    num_decisions = len(self.actions)
+    legal_actions = np.zeros((num_decisions, NUM_ACTION_IDS), dtype=bool)
+    scores = np.full((num_decisions, NUM_ACTION_IDS), np.nan, dtype=np.float32)
+    for i in range(num_decisions):
+      legal_actions[i, self.legal_actions[i]] = True
+      for action_id, score in self.scores[i].items():
+        scores[i, action_id] = score
+    return {
+      "game_views": np.frombuffer(self.game_views, dtype=np.uint8).reshape(
+        (num_decisions, GAME_STATE_CODE_SIZE)),
+      "legal_actions": legal_actions,
+      "actions": np.frombuffer(self.actions, dtype=np.uint8),
+      "scores": scores,
+      "game_indices": np.array(self.game_indices, dtype=np.int64),
+    }
+
+
+def _generate_shard(config: SelfPlayConfig, output_folder: str,
+                    shard_index: int) -> Dict[str, Any]:
+  """
+  Plays the games from one shard, writes the shard files and returns its
+  manifest entry.
+  """
+  players = PlayerPair(PLAYER_NAMES[config.player_one](PlayerId.ONE),
+                       PLAYER_NAMES[config.player_two](PlayerId.TWO))
+  prefix = _get_shard_prefix(output_folder, shard_index)
+  archive_path = prefix + ".sga"
+  for path in [archive_path + ".tmp", get_index_path(archive_path + ".tmp")]:
+    if os.path.exists(path):
+      os.remove(path)
+
+  decisions = _ShardDecisions()
+  first_game = shard_index * config.games_per_shard
+  with GameArchiveWriter(archive_path + ".tmp") as archive:
+    for game_index in range(first_game, first_game + config.games_per_shard):
+      game = _seed_game(config, game_index)
+      decisions.play_game(game, players, game_index)
+      archive.append_game(game)
+  for player in [players.one, players.two]:
+    if isinstance(player, BaseMctsPlayer):
+      player.cleanup()
+
+  arrays = decisions.to_arrays()
+  for name in _ARRAY_NAMES:
+    _save_array(f"{prefix}.{name}.npy", arrays[name])
+  os.replace(get_index_path(archive_path + ".tmp"),
+             get_index_path(archive_path))
+  os.replace(archive_path + ".tmp", archive_path)
+  return {"index": shard_index, "num_games": config.games_per_shard,
+          "num_decisions": len(decisions.actions)}
+
+
+def _generate_shard_star(args) -> Dict[str, Any]:
+  return _generate_shard(*args)
+
+
+def _load_manifest(output_folder: str,
+                   config: SelfPlayConfig) -> Dict[str, Any]:
+  manifest_path = os.path.join(output_folder, _MANIFEST)
+  if not os.path.exists(manifest_path):
+    return {"config": dataclasses.asdict(config), "shards": []}
+  with open(manifest_path, "r", encoding="utf-8") as input_file:
+    manifest = json.load(input_file)
+  if manifest["config"] != dataclasses.asdict(config):
+    raise ValueError(
+      f"The dataset in {output_folder} was generated with a different config: "
+      f"{manifest['config']}")
+  return manifest
+
+
+def _save_manifest(output_folder: str, manifest: Dict[str, Any]) -> None:
+  manifest_path = os.path.join(output_folder, _MANIFEST)
+  with open(manifest_path + ".tmp", "w", encoding="utf-8") as output_file:
+    json.dump(manifest, output_file, indent=2)
+  os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def generate_self_play_data(config: SelfPlayConfig, output_folder: str,
+                            num_shards: int,
+                            num_processes: Optional[int] = None) -> Dict[
+  str, Any]:
+  """
+  Generates the shards with indices in [0, num_shards) that are not already in
+  the manifest from output_folder, using num_processes worker processes (by
+  default, one per CPU). Returns the updated manifest.
+  """
+  os.makedirs(output_folder, exist_ok=True)
+  manifest = _load_manifest(output_folder, config)
+  completed_shards = {shard["index"] for shard in manifest["shards"]}
+  tasks = [(config, output_folder, shard_index) for shard_index in
+           range(num_shards) if shard_index not in completed_shards]
+  logging.info("Generating %d shards (%d already completed)", len(tasks),
+               len(completed_shards))
+  if len(tasks) == 0:
+    return manifest
+  num_processes = num_processes or multiprocessing.cpu_count()
+  with multiprocessing.Pool(min(num_processes, len(tasks))) as pool:
+    for shard in pool.imap_unordered(_generate_shard_star, tasks):
+      manifest["shards"].append(shard)
+      manifest["shards"].sort(key=lambda s: s["index"])
+      _save_manifest(output_folder, manifest)
+      logging.info("Shard %d done: %d decisions", shard["index"],
+                   shard["num_decisions"])
+  return manifest
+
+
+def load_shard(output_folder: str, shard_index: int,
+               mmap_mode: Optional[str] = "r") -> Dict[str, np.ndarray]:
+  """Returns the arrays from a shard, memory-mapped by default."""
+  prefix = _get_shard_prefix(output_folder, shard_index)
+  return {name: np.load(f"{prefix}.{name}.npy", mmap_mode=mmap_mode) for name
+          in _ARRAY_NAMES}
+
+
+def main():
+  config = SelfPlayConfig(player_one="Heuristic",
+                          player_two="MctsPlayer30perm1000iter", seed=0,
+                          games_per_shard=100)
+  output_folder = os.path.join(os.path.dirname(__file__), "data", "self_play")
+  manifest = generate_self_play_data(config, output_folder, num_shards=10)
+  logging.info("%d decisions in %d shards",
+               sum(shard["num_decisions"] for shard in manifest["shards"]),
+               len(manifest["shards"]))
+
+
+if __name__ == "__main__":
+  main_wrapper(main)
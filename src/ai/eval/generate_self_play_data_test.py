@@ -0,0 +1,87 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from ai.eval.generate_self_play_data import SelfPlayConfig, \
+  generate_self_play_data, load_shard
+from model.game_archive import GameArchiveReader
+from model.game_state_codec import GAME_STATE_CODE_SIZE
+from model.player_action import NUM_ACTION_IDS
+
+
+class GenerateSelfPlayDataTest(unittest.TestCase):
+  def setUp(self):
+    # pylint: disable=consider-using-with
+    self._temp_dir = tempfile.TemporaryDirectory()
+    # pylint: enable=consider-using-with
+    self._config = SelfPlayConfig(player_one="Random", player_two="Heuristic",
+                                  seed=1234, games_per_shard=3)
+
+  def tearDown(self):
+    self._temp_dir.cleanup()
+
+  def _generate(self, folder_name: str, num_shards: int, num_processes: int):
+    output_folder = os.path.join(self._temp_dir.name, folder_name)
+    generate_self_play_data(self._config, output_folder, num_shards,
+                            num_processes)
+    return output_folder
+
+  def _assert_same_files(self, expected_folder: str, actual_folder: str):
+    file_names = sorted(os.listdir(expected_folder))
+    self.assertEqual(file_names, sorted(os.listdir(actual_folder)))
+    for file_name in file_names:
+      with open(os.path.join(expected_folder, file_name), "rb") as input_file:
+        expected_content = input_file.read()
+      with open(os.path.join(actual_folder, file_name), "rb") as input_file:
+        self.assertEqual(expected_content, input_file.read(), msg=file_name)
+
+  def test_shards(self):
+    output_folder = self._generate("data", 2, 1)
+    for shard_index in range(2):
+      arrays = load_shard(output_folder, shard_index)
+      num_decisions = len(arrays["actions"])
+      self.assertGreater(num_decisions, 0)
+      self.assertEqual((num_decisions, GAME_STATE_CODE_SIZE),
+                       arrays["game_views"].shape)
+      self.assertEqual((num_decisions, NUM_ACTION_IDS),
+                       arrays["legal_actions"].shape)
+      self.assertEqual((num_decisions, NUM_ACTION_IDS), arrays["scores"].shape)
+      # The chosen actions are legal.
+      self.assertTrue(np.all(
+        arrays["legal_actions"][np.arange(num_decisions), arrays["actions"]]))
+      # Neither player computes scores.
+      self.assertTrue(np.all(np.isnan(arrays["scores"])))
+      self.assertEqual(
+        [3 * shard_index, 3 * shard_index + 1, 3 * shard_index + 2],
+        sorted(set(arrays["game_indices"].tolist())))
+      archive_path = os.path.join(output_folder, f"shard_{shard_index:05d}.sga")
+      with GameArchiveReader(archive_path) as reader:
+        self.assertEqual(3, len(reader))
+        self.assertEqual(num_decisions,
+                         sum(len(game.actions) for game in reader.games()))
+
+  def test_same_output_for_any_number_of_processes(self):
+    self._assert_same_files(self._generate("one_process", 2, 1),
+                            self._generate("two_processes", 2, 2))
+
+  def test_resume(self):
+    expected_folder = self._generate("expected", 2, 1)
+    output_folder = self._generate("resumed", 1, 1)
+    self.assertEqual(
+      1, len(generate_self_play_data(self._config, output_folder, 1, 1)[
+               "shards"]))
+    self._generate("resumed", 2, 2)
+    self._assert_same_files(expected_folder, output_folder)
+
+  def test_different_config(self):
+    output_folder = self._generate("data", 1, 1)
+    config = SelfPlayConfig(player_one="Random", player_two="Heuristic",
+                            seed=0, games_per_shard=3)
+    with self.assertRaisesRegex(ValueError, "different config"):
+      generate_self_play_data(config, output_folder, 1, 1)
@@ -0,0 +1,102 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+# pylint: disable=invalid-name
+
+"""
+Regenerates ai/sims_table_increments.py, the table with the precomputed
+increments used by SimsTablePermGenerator for all the (n, m) pairs that can
+occur in a game of Schnapsen.
+"""
+
+import logging
+import math
+import multiprocessing
+import os
+import random
+from typing import List, Tuple
+
+from ai.permutations import SimsTablePermGenerator, dispersion, \
+  _next_relative_prime, SCHNAPSEN_N_M_PAIRS
+from main_wrapper import main_wrapper
+
+# The number of candidate increments evaluated for each (n, m) pair. If there
+# are fewer relative primes to r, all of them are evaluated.
+_MAX_CANDIDATES = 1000
+
+# The number of counters (i.e., first permutations) used to score each
+# candidate increment. The counter is random at runtime, so the increment should
+# maximize the dispersion on average, not only for a particular counter.
+_NUM_COUNTERS = 8
+
+
+def _candidate_increments(r: int, rng: random.Random) -> List[int]:
+  if r - 1 <= _MAX_CANDIDATES:
+    return [i for i in range(1, r) if math.gcd(i, r) == 1]
+  return sorted(set(_next_relative_prime(rng.randint(1, r - 1), r) for _ in
+                    range(_MAX_CANDIDATES)))
+
+
+def _find_best_increment(n_m: Tuple[int, int]) -> Tuple[int, int, int, float]:
+  n, m = n_m
+  r = math.factorial(n) // math.factorial(m)
+  if n in (m, 1):
+    return n, m, 1, 0
+  rng = random.Random(n * 100 + m)
+  generator = SimsTablePermGenerator(n, m, counter=0, increment=1)
+  counters = [rng.randint(0, r - 1) for _ in range(_NUM_COUNTERS)]
+
+  def average_dispersion(inc):
+    total = 0
+    for counter in counters:
+      first_6_permutations = \
+        [generator.generate_permutation(x) for x in
+         [(counter + k * inc) % r for k in range(6)]]
+      total += dispersion(first_6_permutations, m)
+    return total / len(counters)
+
+  best_dispersion, best_increment = max(
+    (average_dispersion(inc), inc) for inc in _candidate_increments(r, rng))
+  logging.info("For n=%s, m=%s, r=%s, the best increment found was %s with "
+               "average dispersion %.3f.", n, m, r, best_increment,
+               best_dispersion)
+  return n, m, best_increment, best_dispersion
+
+
+def _write_table(results: List[Tuple[int, int, int, float]]) -> None:
+  lines = [
+    "#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.",
+    "#  Use of this source code is governed by a BSD-style license that can be",
+    "#  found in the LICENSE file.",
+    "",
+    "# Generated by ai/eval/generate_sims_table_increments.py. Do not edit.",
+    "",
+    "from typing import Dict, Tuple",
+    "",
+    "SIMS_TABLE_INCREMENTS: Dict[Tuple[int, int], int] = {",
+  ]
+  for n, m, increment, _ in sorted(results):
+    lines.append(f"  ({n}, {m}): {increment},")
+  lines.append("}")
+  lines.append("\"\"\"")
+  lines.append(
+    "The increment that maximizes the average dispersion of the first six")
+  lines.append(
+    "permutations generated by SimsTablePermGenerator(n, m), keyed by (n, m).")
+  lines.append("\"\"\"")
+  path = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                      "sims_table_increments.py")
+  with open(path, "w", encoding="utf-8") as output_file:
+    output_file.write("\n".join(lines) + "\n")
+  logging.info("Saved %d increments to %s", len(results), path)
+
+
+def main():
+  with multiprocessing.Pool() as pool:
+    results = pool.map(_find_best_increment, SCHNAPSEN_N_M_PAIRS)
+  _write_table(results)
+
+
+if __name__ == "__main__":
+  main_wrapper(main)
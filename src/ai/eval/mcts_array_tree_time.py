@@ -0,0 +1,62 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+"""
+Compares the time needed by Mcts and ArrayMcts (see
+ai/mcts_array_tree_with_deps.py) to build the same trees, for a few numbers of
+iterations, with and without select_best_child.
+Run it with "python -O" to exclude the debug-only validations.
+"""
+
+import logging
+import random
+import timeit
+from typing import Type
+
+from ai.mcts_algorithm import Mcts
+from ai.mcts_array_tree_with_deps import ArrayMcts
+from main_wrapper import main_wrapper
+from model.game_state import GameState
+from model.player_id import PlayerId
+
+_NUM_REPEATS = 10
+
+
+def _time_build_tree(mcts_class: Type[Mcts], game_state: GameState,
+                     max_iterations: int, select_best_child: bool) -> float:
+  """Returns the time taken by one call to build_tree(), in seconds."""
+
+  def _build_tree():
+    random.seed(0)
+    mcts = mcts_class(game_state.next_player, exploration_param=1)
+    mcts.build_tree(game_state, max_iterations, select_best_child)
+
+  # timeit disables the garbage collector by default, but the collections
+  # triggered by the nodes of the tree are part of the time needed by
+  # build_tree(), so they are included.
+  return timeit.Timer(_build_tree, setup="gc.enable()").timeit(number=1)
+
+
+def main():
+  game_state = GameState.new(dealer=PlayerId.ONE, random_seed=0)
+  for select_best_child in [False, True]:
+    for max_iterations in [200, 2000, 10000]:
+      # The two classes are timed alternately, so they are equally affected by
+      # other processes. Use the fastest run, since the others are slowed down
+      # by other processes.
+      times = {Mcts: [], ArrayMcts: []}
+      for _ in range(_NUM_REPEATS):
+        for mcts_class, class_times in times.items():
+          class_times.append(_time_build_tree(
+            mcts_class, game_state, max_iterations, select_best_child))
+      mcts_time = min(times[Mcts])
+      array_mcts_time = min(times[ArrayMcts])
+      logging.info(
+        "select_best_child=%s, %d iterations: Mcts %.3fs, ArrayMcts %.3fs "
+        "(%.2fx)", select_best_child, max_iterations, mcts_time,
+        array_mcts_time, mcts_time / array_mcts_time)
+
+
+if __name__ == "__main__":
+  main_wrapper(main)
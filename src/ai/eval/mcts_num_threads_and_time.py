@@ -11,6 +11,7 @@ from cpuinfo import cpuinfo
 from pandas import DataFrame
 
 from ai.cython_mcts_player.player import CythonMctsPlayer
+from ai.mcts_player import MctsPlayer
 from ai.mcts_player_options import MctsPlayerOptions
 from main_wrapper import main_wrapper
 from model.game_state import GameState
@@ -39,7 +40,8 @@ def num_threads_and_time(class_under_test, options: MctsPlayerOptions):
   # Save the dataframe with the timing info.
   dataframe = DataFrame(data, columns=["seed", "num_threads", "duration_sec"])
   folder = os.path.join(os.path.dirname(__file__), "data")
-  csv_path = os.path.join(folder, "num_threads_and_time.csv")
+  csv_path = os.path.join(
+    folder, f"num_threads_and_time_{class_under_test.__name__}.csv")
   # noinspection PyTypeChecker
   dataframe.to_csv(csv_path, index=False)
 
@@ -61,12 +63,18 @@ def num_threads_and_time(class_under_test, options: MctsPlayerOptions):
             f"{options.max_permutations} permutations x " +
             f"{options.max_iterations} iterations on\n" +
             cpuinfo.get_cpu_info()["brand_raw"])
-  plt.savefig(os.path.join(folder, "num_threads_and_time.png"))
+  plt.savefig(os.path.join(
+    folder, f"num_threads_and_time_{class_under_test.__name__}.png"))
+  plt.close()
 
 
 def _main():
-  options = MctsPlayerOptions(max_iterations=4000, max_permutations=100)
-  num_threads_and_time(CythonMctsPlayer, options)
+  # Both players use a pool of worker processes if num_processes is not 1. The
+  # CythonMctsPlayer's workers exchange the game view, the permutations and the
+  # results through shared memory.
+  for class_under_test in [MctsPlayer, CythonMctsPlayer]:
+    options = MctsPlayerOptions(max_iterations=4000, max_permutations=100)
+    num_threads_and_time(class_under_test, options)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,136 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+"""
+Measures the inter-process communication overhead of MctsPlayer, with and
+without MctsPlayerOptions.lean_process_pool. It uses a very small number of
+iterations per permutation, so the time per move is dominated by the overhead
+of sending the tasks to the worker processes and the results back. It also
+reports the number of bytes pickled for each move.
+Run it with "python -O" to exclude the debug-only validations.
+"""
+
+import array
+import functools
+import logging
+import math
+import pickle
+import random
+import timeit
+from typing import List, Tuple
+
+from ai.mcts_player import MctsPlayer, generate_permutations, run_mcts, \
+  _encode_actions_with_scores
+from ai.mcts_player_options import MctsPlayerOptions
+from main_wrapper import main_wrapper
+from model.card import Card
+from model.game_state import GameState
+from model.player_action import get_available_actions
+
+_NUM_GAMES = 10
+_NUM_PROCESSES = 4
+_MAX_ITERATIONS = 1
+_MAX_PERMUTATIONS = 100
+_NUM_REPEATS = 3
+
+
+def _get_game_views(num_games: int) -> List[GameState]:
+  """
+  Plays num_games random games and returns the game views for all the moves
+  where the talon is not closed, since those are the ones where the player
+  needs the most permutations.
+  """
+  game_views = []
+  for seed in range(num_games):
+    rng = random.Random(seed)
+    game_state = GameState.new(random_seed=seed)
+    while not game_state.is_game_over:
+      if not game_state.must_follow_suit():
+        game_views.append(game_state.next_player_view())
+      action = rng.choice(get_available_actions(game_state))
+      game_state = action.execute(game_state)
+  return game_views
+
+
+def _get_pickled_bytes(game_view: GameState, permutations: List[List[Card]],
+                       options: MctsPlayerOptions) -> Tuple[int, int]:
+  """
+  Returns the number of bytes pickled for one move by the default process pool
+  and by the lean process pool. It only counts the task arguments and the
+  results, not the framing added by multiprocessing.Pool.
+  """
+  player_id = game_view.next_player
+  results = [run_mcts(permutation, game_view, player_id, options) for
+             permutation in permutations]
+  # Pool.map() and the lean pool split the permutations in the same chunks.
+  chunk_size = max(1, math.ceil(len(permutations) / (_NUM_PROCESSES * 4)))
+  chunk_starts = range(0, len(permutations), chunk_size)
+  # Pool.map() pickles the partial object with each chunk of permutations.
+  func = functools.partial(run_mcts, game_view=game_view, player_id=player_id,
+                           options=options)
+  default_bytes = len(pickle.dumps(func)) * len(chunk_starts) + \
+                  len(pickle.dumps(permutations)) + len(pickle.dumps(results))
+
+  # The lean pool writes the game view and the permutations to shared memory,
+  # so the only pickled data are the tasks and the arrays of results.
+  tasks = [("psm_00000000", 1, start,
+            min(start + chunk_size, len(permutations)), len(permutations))
+           for start in chunk_starts]
+  num_actions = array.array("B")
+  values = array.array("d")
+  for actions_with_scores in results:
+    _encode_actions_with_scores(actions_with_scores, num_actions, values)
+  lean_bytes = len(pickle.dumps(tasks)) + len(
+    pickle.dumps((num_actions, values)))
+  return default_bytes, lean_bytes
+
+
+def _time_per_move(game_views: List[GameState],
+                   options: MctsPlayerOptions) -> float:
+  players = {player_id: MctsPlayer(player_id, False, options) for player_id in
+             {game_view.next_player for game_view in game_views}}
+  try:
+    def _run():
+      for game_view in game_views:
+        players[game_view.next_player].request_next_action(game_view)
+
+    timer = timeit.Timer(_run)
+    timer.timeit(number=1)  # Warm-up: start the workers and load the modules.
+    time_taken = min(timer.repeat(repeat=_NUM_REPEATS, number=1))
+  finally:
+    for player in players.values():
+      player.cleanup()
+  return time_taken / len(game_views)
+
+
+def main():
+  game_views = _get_game_views(_NUM_GAMES)
+  logging.info("Measuring %d moves from %d random games", len(game_views),
+               _NUM_GAMES)
+
+  options = MctsPlayerOptions(max_iterations=_MAX_ITERATIONS,
+                              max_permutations=_MAX_PERMUTATIONS,
+                              num_processes=_NUM_PROCESSES)
+  total_default_bytes = 0
+  total_lean_bytes = 0
+  for game_view in game_views:
+    permutations = list(generate_permutations(game_view, options))
+    default_bytes, lean_bytes = _get_pickled_bytes(game_view, permutations,
+                                                   options)
+    total_default_bytes += default_bytes
+    total_lean_bytes += lean_bytes
+  logging.info("Pickled bytes per move: default %.0f, lean %.0f",
+               total_default_bytes / len(game_views),
+               total_lean_bytes / len(game_views))
+
+  default_time = _time_per_move(game_views, options)
+  options.lean_process_pool = True
+  lean_time = _time_per_move(game_views, options)
+  logging.info("Time per move: default %.2f ms, lean %.2f ms (%.2f ms saved)",
+               default_time * 1e3, lean_time * 1e3,
+               (default_time - lean_time) * 1e3)
+
+
+if __name__ == "__main__":
+  main_wrapper(main)
@@ -0,0 +1,162 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+"""
+Measures the time needed by the most frequent operations on the model classes
+(deep_copy(), next_player_view(), PlayerAction.execute(), PlayerAction.apply()
+followed by PlayerAction.undo(), get_available_actions() and the binary
+encoding from model/game_state_codec.py compared to pickle) on all the game
+states from a set of random games.
+Run it with "python -O" to exclude the debug-only validations. Without "-O", it
+also measures PlayerAction.execute() for each ValidationLevel.
+"""
+
+import logging
+import pickle
+import random
+import timeit
+from typing import List, Tuple, Callable
+
+from main_wrapper import main_wrapper
+from model.game_state import GameState
+from model.game_state_codec import encode_game_state, decode_game_state, \
+  GAME_STATE_CODE_SIZE
+from model.game_state_validation import ValidationLevel, \
+  get_validation_level, set_validation_level
+from model.player_action import PlayerAction, get_available_actions
+
+_NUM_GAMES = 100
+_NUM_REPEATS = 5
+
+_StatesAndActions = List[Tuple[GameState, PlayerAction]]
+
+
+def _play_random_games(num_games: int) -> _StatesAndActions:
+  """
+  Plays num_games random games and returns all the game states that were
+  reached, together with the action that was executed on each of them.
+  """
+  states_and_actions = []
+  for seed in range(num_games):
+    rng = random.Random(seed)
+    game_state = GameState.new(random_seed=seed)
+    while not game_state.is_game_over:
+      action = rng.choice(get_available_actions(game_state))
+      states_and_actions.append((game_state, action))
+      game_state = action.execute(game_state)
+  return states_and_actions
+
+
+def _time_it(name: str, func: Callable[[], None], num_calls: int) -> float:
+  timer = timeit.Timer(func)
+  number, _ = timer.autorange()
+  # Use the fastest run, since the others are slowed down by other processes.
+  time_taken = min(timer.repeat(repeat=_NUM_REPEATS, number=number))
+  avg_time_us = time_taken / number / num_calls * 1e6
+  logging.info("%s: %.3f us per call", name, avg_time_us)
+  return avg_time_us
+
+
+def _time_deep_copy(states_and_actions: _StatesAndActions) -> None:
+  def _deep_copy():
+    for game_state, _ in states_and_actions:
+      game_state.deep_copy()
+
+  _time_it("deep_copy", _deep_copy, len(states_and_actions))
+
+
+def _time_next_player_view(states_and_actions: _StatesAndActions) -> None:
+  def _next_player_view():
+    for game_state, _ in states_and_actions:
+      game_state.next_player_view()
+
+  _time_it("next_player_view", _next_player_view, len(states_and_actions))
+
+
+def _time_execute(states_and_actions: _StatesAndActions,
+                  name: str = "execute") -> None:
+  def _execute():
+    for game_state, action in states_and_actions:
+      action.execute(game_state)
+
+  _time_it(name, _execute, len(states_and_actions))
+
+
+def _time_apply_and_undo(states_and_actions: _StatesAndActions) -> None:
+  # apply() modifies the game states in place, so it needs game states that
+  # don't share their fields. Each apply() is undone, so they can be reused.
+  mutable_states_and_actions = [(game_state.deep_copy(), action) for
+                                game_state, action in states_and_actions]
+
+  def _apply_and_undo():
+    for game_state, action in mutable_states_and_actions:
+      action.undo(game_state, action.apply(game_state))
+
+  _time_it("apply + undo", _apply_and_undo, len(states_and_actions))
+
+
+def _time_get_available_actions(states_and_actions: _StatesAndActions) -> None:
+  def _get_available_actions():
+    for game_state, _ in states_and_actions:
+      get_available_actions(game_state)
+
+  _time_it("get_available_actions", _get_available_actions,
+           len(states_and_actions))
+
+
+def _time_codec(game_views: List[GameState]) -> None:
+  """Times the binary encoding of the game views compared to pickle."""
+  codes = [encode_game_state(game_view) for game_view in game_views]
+  pickles = [pickle.dumps(game_view) for game_view in game_views]
+  logging.info("Game view size: %d bytes encoded, %.1f bytes pickled",
+               GAME_STATE_CODE_SIZE, sum(map(len, pickles)) / len(pickles))
+
+  def _encode():
+    for game_view in game_views:
+      encode_game_state(game_view)
+
+  def _decode():
+    for code in codes:
+      decode_game_state(code)
+
+  def _pickle_dumps():
+    for game_view in game_views:
+      pickle.dumps(game_view)
+
+  def _pickle_loads():
+    for data in pickles:
+      pickle.loads(data)
+
+  _time_it("encode_game_state", _encode, len(game_views))
+  _time_it("decode_game_state", _decode, len(game_views))
+  _time_it("pickle.dumps", _pickle_dumps, len(game_views))
+  _time_it("pickle.loads", _pickle_loads, len(game_views))
+
+
+def _time_execute_for_each_validation_level(
+    states_and_actions: _StatesAndActions) -> None:
+  validation_level = get_validation_level()
+  for level in ValidationLevel:
+    set_validation_level(level)
+    _time_execute(states_and_actions, f"execute (validation: {level.name})")
+  set_validation_level(validation_level)
+
+
+def main():
+  states_and_actions = _play_random_games(_NUM_GAMES)
+  logging.info("Timing %d game states from %d random games",
+               len(states_and_actions), _NUM_GAMES)
+  _time_deep_copy(states_and_actions)
+  _time_next_player_view(states_and_actions)
+  _time_execute(states_and_actions)
+  _time_apply_and_undo(states_and_actions)
+  _time_get_available_actions(states_and_actions)
+  _time_codec([game_state.next_player_view() for game_state, _ in
+               states_and_actions])
+  if __debug__:
+    _time_execute_for_each_validation_level(states_and_actions)
+
+
+if __name__ == "__main__":
+  main_wrapper(main)
@@ -0,0 +1,93 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+# pylint: disable=invalid-name
+
+"""
+Compares the permutation generators in terms of dispersion and generation time
+for all the (n, m) pairs that can occur in a game of Schnapsen.
+"""
+
+import logging
+import math
+import os
+import time
+
+import matplotlib.pyplot as plt
+from pandas import DataFrame
+
+from ai.permutations import random_perm_generator, \
+  lexicographic_perm_generator, sims_table_perm_generator, \
+  floyd_perm_generator, SCHNAPSEN_N_M_PAIRS
+from ai.permutations_with_deps import dispersion
+from main_wrapper import main_wrapper
+from model.card import Card
+
+_NUM_PERMUTATIONS_REQUESTED = 667
+_NUM_RUNS = 5
+_PERM_GENERATORS = [random_perm_generator, lexicographic_perm_generator,
+                    sims_table_perm_generator, floyd_perm_generator]
+
+
+def _generate_data() -> DataFrame:
+  all_cards = Card.get_all_cards()
+  data = []
+  for n, m in SCHNAPSEN_N_M_PAIRS:
+    num_requested = min(_NUM_PERMUTATIONS_REQUESTED,
+                        math.factorial(n) // math.factorial(m))
+    if num_requested < 2:
+      continue
+    cards_set = all_cards[:n]
+    for perm_generator in _PERM_GENERATORS:
+      for run in range(_NUM_RUNS):
+        start_time = time.process_time()
+        permutations = list(perm_generator(cards_set, m, num_requested))
+        duration_sec = time.process_time() - start_time
+        data.append((n, m, perm_generator.__name__, run, num_requested,
+                     duration_sec, dispersion(permutations, m)))
+      logging.info("n=%s, m=%s, %s: %s", n, m, perm_generator.__name__,
+                   data[-1])
+  return DataFrame(data, columns=["n", "m", "generator", "run",
+                                  "num_permutations", "duration_sec",
+                                  "dispersion"])
+
+
+def _plot_results(dataframe: DataFrame, folder: str):
+  dataframe = dataframe.groupby(["n", "m", "generator"]).mean().reset_index()
+  _, axes = plt.subplots(nrows=1, ncols=2, figsize=(14, 6))
+  for perm_generator in _PERM_GENERATORS:
+    name = perm_generator.__name__
+    filtered_dataframe = dataframe[dataframe["generator"].eq(name)]
+    axes[0].scatter(filtered_dataframe.duration_sec,
+                    filtered_dataframe.dispersion, label=name, s=10)
+    labels = [f"({n}, {m})" for n, m in
+              zip(filtered_dataframe.n, filtered_dataframe.m)]
+    axes[1].plot(labels, filtered_dataframe.dispersion, label=name)
+  axes[0].set_xscale("log")
+  axes[0].set_xlabel("Generation time (seconds)")
+  axes[0].set_ylabel("Dispersion")
+  axes[1].set_xlabel("(n, m)")
+  axes[1].set_ylabel("Dispersion")
+  axes[1].tick_params(axis="x", labelrotation=90, labelsize=6)
+  for ax in axes:
+    ax.grid(which="both", linestyle="--")
+    ax.legend(loc=0)
+  plt.suptitle(f"Dispersion vs generation time for up to "
+               f"{_NUM_PERMUTATIONS_REQUESTED} permutations "
+               f"({_NUM_RUNS} runs each)")
+  plt.tight_layout()
+  plt.savefig(os.path.join(folder, "permutations_dispersion_and_time.png"))
+
+
+def main():
+  folder = os.path.join(os.path.dirname(__file__), "data")
+  dataframe = _generate_data()
+  # noinspection PyTypeChecker
+  dataframe.to_csv(
+    os.path.join(folder, "permutations_dispersion_and_time.csv"), index=False)
+  _plot_results(dataframe, folder)
+
+
+if __name__ == "__main__":
+  main_wrapper(main)
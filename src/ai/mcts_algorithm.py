@@ -4,12 +4,15 @@
 
 import abc
 import copy
+import dataclasses
 import logging
 import math
 import pprint
 import random
-from typing import Dict, List, Optional, Generic, TypeVar, Type, Tuple
+from typing import Dict, List, Optional, Generic, TypeVar, Type, Tuple, \
+  Iterable
 
+from ai.merge_scoring_infos_func import RewardStats
 from model.game_state import GameState
 from model.player_action import get_available_actions, PlayerAction
 from model.player_id import PlayerId
@@ -24,6 +27,60 @@ def ucb_for_player(node: "Node", player_id: PlayerId):
 
 _State = TypeVar("_State")
 _Action = TypeVar("_Action")
+_Child = TypeVar("_Child")
+
+
+def get_best_children(node) -> List[Tuple[_Child, _Action]]:
+  """
+  Returns the children of node that have the best UCB for node.player and the
+  actions that lead to them. The node can be a Node or any other object with
+  the same player and children attributes (e.g., ArrayTreeNode).
+  """
+  player = node.player
+  children_with_ucbs = \
+    [(ucb_for_player(child, player), child, action)
+     for action, child in node.children.items() if child is not None]
+  if len(children_with_ucbs) == 0:
+    # TODO(mcts): Find out why this happens.
+    logging.error("MctsAlgorithm: All children are None: %s",
+                  pprint.pformat(node.children, indent=True))
+    return [(child, action) for action, child in node.children.items()]
+  best_ucb = max(ucb for ucb, child, action in children_with_ucbs)
+  return [(child, action) for ucb, child, action in children_with_ucbs if
+          ucb == best_ucb]
+
+
+def select_child(candidates: Iterable[Tuple[_Child, float]],
+                 num_candidates: int, select_best_child: bool) -> _Child:
+  """
+  The selection step for one node of the tree.
+
+  :param candidates: The children that are not fully simulated, together with
+  their selection scores.
+  :param num_candidates: The number of children in candidates.
+  :param select_best_child: If True, it returns a random child among the ones
+  with the highest selection score. Otherwise, it returns a random child and
+  the selection scores are not used.
+  """
+  if select_best_child:
+    # The best children are collected in one pass over the children. Ties are
+    # rare, so the list usually has one element.
+    max_selection_score = None
+    best_children = []
+    for child, score in candidates:
+      if max_selection_score is None or score > max_selection_score:
+        max_selection_score = score
+        best_children = [child]
+      elif score == max_selection_score:
+        best_children.append(child)
+    return random.choice(best_children)
+  # Pick the index-th child.
+  index = random.randrange(num_candidates)
+  for child, _ in candidates:
+    if index == 0:
+      return child
+    index -= 1
+  raise AssertionError("Should not reach this code")  # pragma: no cover
 
 
 class Node(abc.ABC, Generic[_State, _Action]):
@@ -31,9 +88,13 @@ class Node(abc.ABC, Generic[_State, _Action]):
 
   # pylint: disable=too-many-instance-attributes
 
+  __slots__ = ("_state", "parent", "children", "untried_actions", "q", "n",
+               "ucb", "exploration_score", "fully_simulated", "rewards",
+               "reward_stats", "num_not_fully_simulated_children")
+
   def __init__(self, state: _State, parent: Optional["Node"]):
     """Instantiates a new Node given a State object and a parent node."""
-    self.state = state
+    self._state = state
     self.parent = parent
     self.children: Optional[Dict[_Action, "Node"]] = None
     self.untried_actions: Optional[List[_Action]] = None
@@ -42,15 +103,53 @@ class Node(abc.ABC, Generic[_State, _Action]):
     self.ucb = None
     self.exploration_score = 0
     self.fully_simulated = False
+    # If Mcts is run with save_rewards, the children of the root node will save
+    # all the rewards obtained on paths that pass through them in one of these
+    # fields, depending on SaveRewardsOptions.stream_rewards.
+    self.rewards: Optional[List[float]] = None
+    self.reward_stats: Optional[RewardStats] = None
+    # The number of children that are not created yet or are not fully
+    # simulated. It is updated by the children when they become fully simulated,
+    # so it doesn't have to be recomputed during each Mcts iteration.
+    self.num_not_fully_simulated_children = 0
     if not self.terminal:
       actions = self._get_available_actions()
       self.children = {action: None for action in actions}
       self.untried_actions = actions
+      self.num_not_fully_simulated_children = len(actions)
     else:
       score = self._get_reward_for_terminal_node()
       opponent = _PLAYER_FOR_TERMINAL_NODES.opponent()
       self.ucb = score[_PLAYER_FOR_TERMINAL_NODES] - score[opponent]
-      self.fully_simulated = True
+      self._mark_fully_simulated()
+
+  @property
+  def state(self) -> _State:
+    return self._state
+
+  def _mark_fully_simulated(self):
+    self.fully_simulated = True
+    if self.parent is not None:
+      self.parent.num_not_fully_simulated_children -= 1
+
+  def __getstate__(self):
+    state = dict(getattr(self, "__dict__", {}))
+    for name in _get_slots(type(self)):
+      state[name] = getattr(self, name)
+    return state
+
+  def __setstate__(self, state):
+    # Nodes pickled before Node used __slots__ store their __dict__, which has
+    # no "_state" and no "num_not_fully_simulated_children".
+    if "state" in state:
+      state["_state"] = state.pop("state")
+    if "num_not_fully_simulated_children" not in state:
+      children = state["children"] or {}
+      state["num_not_fully_simulated_children"] = len(
+        [child for child in children.values() if
+         child is None or not child.fully_simulated])
+    for name, value in state.items():
+      setattr(self, name, value)
 
   @property
   @abc.abstractmethod
@@ -97,13 +196,24 @@ class Node(abc.ABC, Generic[_State, _Action]):
     It returns the newly created node.
     """
     assert not self.fully_expanded
-    action = random.choice(self.untried_actions)
+    action = self.pop_random_untried_action()
     new_state = self._get_next_state(action)
     child = self.__class__(new_state, self)
     self.children[action] = child
-    self.untried_actions.remove(action)
     return child
 
+  def pop_random_untried_action(self) -> _Action:
+    """
+    Removes a random action from untried_actions and returns it. The last action
+    in the list takes its place, so the other actions are not shifted.
+    """
+    untried_actions = self.untried_actions
+    index = random.randrange(len(untried_actions))
+    action = untried_actions[index]
+    untried_actions[index] = untried_actions[-1]
+    untried_actions.pop()
+    return action
+
   @abc.abstractmethod
   def _get_next_state(self, action: _Action) -> _State:
     """
@@ -111,6 +221,18 @@ class Node(abc.ABC, Generic[_State, _Action]):
     the game state represented by this node.
     """
 
+  def expand_to_terminal(self) -> "Node":
+    """
+    Expands one new node on each level, starting with the current node, until a
+    terminal node is reached (i.e., the expansion and simulation steps of the
+    Mcts algorithm). It returns the terminal node. Subclasses can override it to
+    avoid creating a new state for each intermediate node.
+    """
+    node = self
+    while not node.terminal:
+      node = node.expand()
+    return node
+
   def update_children_ucb(self, exploration_param: float):
     if self.children is None:
       return
@@ -119,33 +241,21 @@ class Node(abc.ABC, Generic[_State, _Action]):
         node.update_ucb(exploration_param)
 
   def update_ucb(self, exploration_param: float):
-    if self.terminal or self.fully_simulated:
+    if self.fully_simulated:
+      # Terminal nodes are always fully simulated.
       return
-    num_not_fully_simulated_children = len(
-      [child for child in self.children.values() if
-       child is None or not child.fully_simulated])
-    if num_not_fully_simulated_children > 0:
+    if self.num_not_fully_simulated_children > 0:
       self.ucb = self.q / self.n
       self.exploration_score = exploration_param * math.sqrt(
         2 * math.log(self.parent.n) / self.n)
     else:
-      children_scores = [ucb_for_player(child, self.player) for child in
-                         self.children.values() if child is not None]
-      self.ucb = max(children_scores)
-      self.fully_simulated = True
+      player = self.player
+      self.ucb = max(ucb_for_player(child, player) for child in
+                     self.children.values())
+      self._mark_fully_simulated()
 
   def best_children(self) -> List[Tuple["Node", _Action]]:
-    children_with_ucbs = \
-      [(ucb_for_player(child, self.player), child, action)
-       for action, child in self.children.items() if child is not None]
-    if len(children_with_ucbs) == 0:
-      # TODO(mcts): Find out why this happens.
-      logging.error("MctsAlgorithm: All children are None: %s",
-                    pprint.pformat(self.children, indent=True))
-      return [(child, action) for action, child in self.children.items()]
-    best_ucb = max(ucb for ucb, child, action in children_with_ucbs)
-    return [(child, action) for ucb, child, action in children_with_ucbs if
-            ucb == best_ucb]
+    return get_best_children(self)
 
   def best_actions(self) -> List[_Action]:
     return [action for child, action in self.best_children()]
@@ -155,12 +265,57 @@ class Node(abc.ABC, Generic[_State, _Action]):
            f"FullSim:{self.fully_simulated}"
 
 
+def _get_slots(cls: type) -> List[str]:
+  """Returns the names of the __slots__ defined by cls and its base classes."""
+  slots = []
+  for base_class in cls.__mro__:
+    slots.extend(base_class.__dict__.get("__slots__", ()))
+  return slots
+
+
 class SchnapsenNode(Node[GameState, PlayerAction]):
-  """Implementation of the Node class for the game of Schnapsen."""
+  """
+  Implementation of the Node class for the game of Schnapsen.
+
+  The nodes created by expand_to_terminal() don't store their game state. It is
+  created from the parent's state when it is first needed (e.g., when the node
+  is selected for expansion).
+  """
+
+  __slots__ = ("_terminal", "_next_player", "_action")
+
+  def __init__(self, state: GameState, parent: Optional["SchnapsenNode"],
+               action: Optional[PlayerAction] = None):
+    """
+    :param action: The action that leads from the parent's state to this node's
+    state. If not None, the node doesn't keep a reference to state, so state can
+    be modified after the constructor returns.
+    """
+    self._terminal = state.is_game_over
+    self._next_player = state.next_player
+    self._action = action
+    super().__init__(state, parent)
+    if action is not None:
+      self._state = None
+
+  @property
+  def state(self) -> GameState:
+    if self._state is None:
+      self._state = self._action.execute(self.parent.state)
+    return self._state
+
+  def __setstate__(self, state):
+    # Nodes pickled before the game states were created lazily.
+    if "_terminal" not in state:
+      game_state = state.get("state", state.get("_state"))
+      state["_terminal"] = game_state.is_game_over
+      state["_next_player"] = game_state.next_player
+      state["_action"] = None
+    super().__setstate__(state)
 
   @property
   def terminal(self) -> bool:
-    return self.state.is_game_over
+    return self._terminal
 
   def _get_available_actions(self) -> List[PlayerAction]:
     assert not self.terminal
@@ -174,11 +329,30 @@ class SchnapsenNode(Node[GameState, PlayerAction]):
     return score
 
   def _player(self) -> PlayerId:
-    return self.state.next_player
+    return self._next_player
 
   def _get_next_state(self, action: PlayerAction) -> GameState:
     return action.execute(self.state)
 
+  def expand_to_terminal(self) -> Node:
+    """
+    Same as Node.expand_to_terminal(), but it walks a single copy of this node's
+    state using PlayerAction.apply(), so the new nodes don't need a game state
+    of their own.
+    """
+    if self.terminal:
+      return self
+    state = self.state.deep_copy()
+    node = self
+    while not node.terminal:
+      assert not node.fully_expanded
+      action = node.pop_random_untried_action()
+      action.apply(state)
+      child = SchnapsenNode(state, node, action)
+      node.children[action] = child
+      node = child
+    return node
+
 
 def debug_print(node: Node, indent: int = 1):
   if node is None:
@@ -195,14 +369,59 @@ def debug_print(node: Node, indent: int = 1):
     debug_print(child, indent + 1)
 
 
+@dataclasses.dataclass(frozen=True)
+class SaveRewardsOptions:
+  """
+  Configures how the children of the root node save the rewards obtained on all
+  the paths that pass through them.
+  """
+
+  stream_rewards: bool = False
+  """
+  If True, the children of the root node only keep running statistics about the
+  rewards (Node.reward_stats). Otherwise, they store every reward
+  (Node.rewards).
+  """
+
+  reward_histogram_bins: int = 0
+  """
+  If positive and stream_rewards is True, the reward statistics also include a
+  histogram with this many bins.
+  """
+
+  def save_reward(self, node, reward: float):
+    """
+    Saves a reward for node. The node can be a Node or any other object with
+    writable rewards and reward_stats attributes.
+    """
+    if not self.stream_rewards:
+      if node.rewards is None:
+        node.rewards = []
+      node.rewards.append(reward)
+      return
+    if node.reward_stats is None:
+      histogram = None
+      if self.reward_histogram_bins > 0:
+        histogram = [0] * self.reward_histogram_bins
+      node.reward_stats = RewardStats(histogram=histogram)
+    node.reward_stats.add(reward)
+
+
 class Mcts(Generic[_State, _Action]):
   def __init__(self, player_id: PlayerId,
                node_class: Type[Node[_State, _Action]] = SchnapsenNode,
-               exploration_param: float = 0):
+               exploration_param: float = 0,
+               save_rewards: Optional[SaveRewardsOptions] = None):
+    """
+    :param save_rewards: If not None, the children of the root node save the
+    rewards obtained on all the paths that pass through them, as configured by
+    these options.
+    """
     self._player_id = player_id
     self._node_class = node_class
     self._max_iterations = None
     self._exploration_param = exploration_param
+    self._save_rewards = save_rewards
 
   def build_tree(self, state: _State,
                  max_iterations: Optional[int] = None,
@@ -214,7 +433,7 @@ class Mcts(Generic[_State, _Action]):
       state_copy = state.deep_copy()
     else:
       state_copy = copy.deepcopy(state)
-    root_node = self._node_class(state_copy, None)
+    root_node = self._create_root_node(state_copy)
     iterations = 0
     while True:
       iterations += 1
@@ -227,6 +446,9 @@ class Mcts(Generic[_State, _Action]):
     #   debug_print(root_node, 0)
     return root_node
 
+  def _create_root_node(self, state: _State) -> Node[_State, _Action]:
+    return self._node_class(state, None)
+
   def run_one_iteration(self, root_node: Node,
                         select_best_child: bool = False) -> bool:
     """Returns True if the entire game tree is already constructed."""
@@ -242,36 +464,32 @@ class Mcts(Generic[_State, _Action]):
     while not node.terminal:
       if not node.fully_expanded:
         return node
-      not_fully_simulated_children = [child for child in
-                                      node.children.values() if
-                                      not child.fully_simulated]
-      if len(not_fully_simulated_children) == 0:
+      if node.num_not_fully_simulated_children == 0:
         # This can only happen once we expanded the whole game tree.
         return None
-      if select_best_child:
-        children_with_selection_score = \
-          [(child, ucb_for_player(child, node.player) + child.exploration_score)
-           for child in not_fully_simulated_children]
-        max_selection_score = max(
-          score for _, score in children_with_selection_score)
-        best_children = [child for child, score in children_with_selection_score
-                         if score == max_selection_score]
-        node = random.choice(best_children)
-      else:
-        node = random.choice(not_fully_simulated_children)
+      player = node.player
+      node = select_child(
+        ((child, ucb_for_player(child, player) + child.exploration_score if
+          select_best_child else 0) for child in node.children.values() if
+         not child.fully_simulated),
+        node.num_not_fully_simulated_children, select_best_child)
     raise AssertionError("Should not reach this code")  # pragma: no cover
 
   @staticmethod
   def _fully_expand(node: Node) -> Node:
-    while not node.terminal:
-      assert not node.fully_expanded
-      node = node.expand()
-    return node
+    assert node.terminal or not node.fully_expanded
+    return node.expand_to_terminal()
 
   def _backpropagate(self, node: Node, score: float):
     while node is not None:
+      score_for_player = \
+        score if node.player == _PLAYER_FOR_TERMINAL_NODES else -score
       if not node.terminal:
         node.n += 1
-        node.q += score if node.player == _PLAYER_FOR_TERMINAL_NODES else -score
+        node.q += score_for_player
         node.update_children_ucb(self._exploration_param)
+      if self._save_rewards is not None:
+        # Are we on the first layer in the tree?
+        if node.parent is not None and node.parent.parent is None:
+          self._save_rewards.save_reward(node, score_for_player)
       node = node.parent
@@ -8,7 +8,7 @@ import random
 import unittest
 from typing import List
 
-from ai.mcts_algorithm import Mcts, Node
+from ai.mcts_algorithm import Mcts, Node, SaveRewardsOptions
 from model.card import Card
 from model.card_value import CardValue
 from model.game_state import GameState
@@ -179,6 +179,109 @@ class SchnapsenMctsAlgorithmTest(unittest.TestCase):
     self.assertAlmostEqual(0.33, leaf.ucb, delta=0.01)
     self.assertTrue(leaf.fully_simulated)
 
+  def test_save_rewards(self):
+    game_state = get_game_state_for_tempo_puzzle()
+    mcts = Mcts(PlayerId.ONE, save_rewards=SaveRewardsOptions())
+    root_node = mcts.build_tree(game_state, 100, True)
+    self.assertIsNone(root_node.rewards)
+    for child in root_node.children.values():
+      if child is None:
+        continue
+      self.assertIsNone(child.reward_stats)
+      self.assertEqual(child.n, len(child.rewards))
+      self.assertAlmostEqual(child.q, sum(child.rewards))
+
+  def test_stream_rewards(self):
+    game_state = get_game_state_for_tempo_puzzle()
+    mcts = Mcts(PlayerId.ONE, save_rewards=SaveRewardsOptions(
+      stream_rewards=True, reward_histogram_bins=4))
+    root_node = mcts.build_tree(game_state, 100, True)
+    self.assertIsNone(root_node.reward_stats)
+    for child in root_node.children.values():
+      if child is None:
+        continue
+      self.assertIsNone(child.rewards)
+      self.assertEqual(child.n, child.reward_stats.count)
+      self.assertAlmostEqual(child.q / child.n, child.reward_stats.mean)
+      self.assertLessEqual(child.reward_stats.min, child.reward_stats.mean)
+      self.assertGreaterEqual(child.reward_stats.max, child.reward_stats.mean)
+      self.assertEqual(child.n, sum(child.reward_stats.histogram))
+
+  def test_game_states_of_the_nodes_expanded_in_place(self):
+    game_state = GameState.new(random_seed=0)
+    mcts = Mcts(game_state.next_player)
+    root_node = mcts.build_tree(game_state, 100, True)
+    nodes_and_states = [(root_node, game_state)]
+    while len(nodes_and_states) > 0:
+      node, expected_state = nodes_and_states.pop()
+      self.assertEqual(expected_state.is_game_over, node.terminal)
+      if node.terminal:
+        self.assertEqual(PlayerId.ONE, node.player)
+      else:
+        self.assertEqual(expected_state.next_player, node.player)
+      self.assertEqual(expected_state, node.state)
+      if node.children is None:
+        continue
+      for action, child in node.children.items():
+        if child is not None:
+          nodes_and_states.append((child, action.execute(expected_state)))
+
+  def test_pickle_tree_with_nodes_expanded_in_place(self):
+    game_state = GameState.new(random_seed=0)
+    mcts = Mcts(game_state.next_player)
+    root_node = mcts.build_tree(game_state, 100, True)
+    nodes = [(root_node, pickle.loads(pickle.dumps(root_node)))]
+    while len(nodes) > 0:
+      node, unpickled_node = nodes.pop()
+      self.assertEqual(node.ucb, unpickled_node.ucb)
+      self.assertEqual(node.terminal, unpickled_node.terminal)
+      self.assertEqual(node.player, unpickled_node.player)
+      self.assertEqual(node.state, unpickled_node.state)
+      if node.children is None:
+        continue
+      for action, child in node.children.items():
+        if child is not None:
+          nodes.append((child, unpickled_node.children[action]))
+
+  def test_num_not_fully_simulated_children(self):
+    game_state = GameState.new(random_seed=0)
+    mcts = Mcts(game_state.next_player)
+    root_node = mcts.build_tree(game_state, 200, True)
+    self.assertFalse(hasattr(root_node, "__dict__"))
+    nodes = [root_node]
+    while len(nodes) > 0:
+      node = nodes.pop()
+      if node.children is None:
+        self.assertEqual(0, node.num_not_fully_simulated_children)
+        continue
+      self.assertEqual(
+        len([child for child in node.children.values() if
+             child is None or not child.fully_simulated]),
+        node.num_not_fully_simulated_children)
+      nodes.extend(child for child in node.children.values() if
+                   child is not None)
+
+  def test_same_tree_for_the_same_random_seed(self):
+    game_state = GameState.new(random_seed=0)
+    trees = []
+    for _ in range(2):
+      random.seed(1234)
+      mcts = Mcts(game_state.next_player, exploration_param=1)
+      trees.append(mcts.build_tree(game_state, 200, True))
+    nodes = [tuple(trees)]
+    while len(nodes) > 0:
+      node1, node2 = nodes.pop()
+      self.assertEqual((node1.q, node1.n, node1.ucb),
+                       (node2.q, node2.n, node2.ucb))
+      self.assertEqual(node1.untried_actions, node2.untried_actions)
+      if node1.children is None:
+        continue
+      self.assertEqual(list(node1.children.keys()),
+                       list(node2.children.keys()))
+      for action, child in node1.children.items():
+        if child is not None:
+          nodes.append((child, node2.children[action]))
+
   def test_max_iterations(self):
     class TestMcts(Mcts):
       def __init__(self, *args, **kwargs):
@@ -0,0 +1,528 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+"""
+An alternative tree backend for the Python Mcts algorithm, where the nodes are
+stored in preallocated arrays instead of one SchnapsenNode object per node. The
+statistics used by the selection and backpropagation steps are stored in NumPy
+arrays and the structure of the tree is stored in Python lists (see ArrayTree).
+
+Each node is identified by its index in the arrays. When a non-terminal node is
+created, a contiguous block of indices is reserved for all its children, so the
+selection scores of the children of a node are computed by one NumPy
+expression over a slice of the arrays. The q values and the UCBs are stored
+from the point of view of the player that receives the rewards (see
+_PLAYER_FOR_TERMINAL_NODES), so the expression doesn't need a sign per child
+and the backpropagation step updates all the nodes on the path with a few
+vectorized operations on their indices. The exploration scores of the nodes
+that are not fully simulated only depend on their n and their parent's n, so
+they are computed when they are needed instead of being updated for all the
+children of the nodes on the path.
+
+The game states are only stored for the root and for the nodes that are
+expanded from a previous iteration (see SchnapsenNode.expand_to_terminal()),
+so a tree has very few objects that are tracked by the garbage collector and
+the memory it uses is predictable.
+
+The algorithm is the same as the one implemented by Mcts and SchnapsenNode,
+including the calls to the random number generator, so for the same random
+seed ArrayMcts and Mcts build the same tree.
+"""
+
+import math
+import random
+from typing import Optional, List, Dict, Tuple
+
+import numpy as np
+
+from ai.mcts_algorithm import Mcts, SaveRewardsOptions, SchnapsenNode, \
+  get_best_children
+from ai.merge_scoring_infos_func import RewardStats
+from model.game_state import GameState
+from model.player_action import get_available_actions, PlayerAction
+from model.player_id import PlayerId
+
+# Same as _PLAYER_FOR_TERMINAL_NODES in ai/mcts_algorithm.py. The rewards are
+# backpropagated from this player's point of view.
+_PLAYER_FOR_TERMINAL_NODES = PlayerId.ONE
+
+# The parent index of the root node.
+_NO_PARENT = -1
+
+# The minimum number of nodes for which space is allocated when the arrays are
+# full.
+_CAPACITY_INCREMENT = 4096
+
+# The names, types and initial values of the NumPy arrays stored by ArrayTree.
+# These are the fields used by the vectorized selection and backpropagation
+# steps.
+_ARRAYS: Tuple[Tuple[str, type, object], ...] = (
+  ("q", np.float64, 0),
+  ("n", np.float64, 0),
+  ("ucb", np.float64, math.nan),
+  ("exploration_score", np.float64, 0),
+  ("fully_simulated", np.bool_, False),
+)
+
+# The names and initial values of the lists stored by ArrayTree. These are the
+# fields that are only read and written one node at a time.
+_LISTS: Tuple[Tuple[str, object], ...] = (
+  ("created", False),
+  ("terminal", False),
+  ("player", 0),
+  ("parent", _NO_PARENT),
+  ("action_id", 0),
+  ("first_child", 0),
+  ("num_children", 0),
+  ("num_not_fully_simulated_children", 0),
+  ("untried", 0),
+  ("num_untried", 0),
+  ("states", None),
+)
+
+
+def _exploration_score(exploration_param: float, parent_n: float,
+                       n: float) -> float:
+  """Same as the exploration score computed by Node.update_ucb()."""
+  return exploration_param * math.sqrt(2 * math.log(parent_n) / n)
+
+
+class ArrayTree:
+  """
+  Stores the nodes of an Mcts tree in arrays, indexed by node index. The root
+  node has index zero. The children of node i have the indices
+  first_child[i] to first_child[i] + num_children[i] - 1. A child index is
+  reserved when its parent is created, but the child is only created when the
+  action that leads to it is tried (see created).
+
+  The statistics used to select the children and updated by backpropagation
+  are stored in NumPy arrays. The structure of the tree is stored in
+  preallocated Python lists, since it's only accessed one element at a time and
+  reading or writing a single element of a NumPy array is several times slower.
+  """
+
+  # pylint: disable=too-many-instance-attributes
+
+  def __init__(self, capacity: int = _CAPACITY_INCREMENT,
+               exploration_param: float = 0):
+    self.size = 0
+    self.capacity = 0
+    self.exploration_param = exploration_param
+    # Node.q and Node.ucb from the point of view of _PLAYER_FOR_TERMINAL_NODES.
+    # The UCB is NaN if Node.ucb is None (i.e., until the first update).
+    self.q = np.zeros(0, np.float64)
+    # Node.n, stored as float64 so it's not converted when the exploration
+    # scores are computed.
+    self.n = np.zeros(0, np.float64)
+    self.ucb = np.zeros(0, np.float64)
+    # Only up to date for the fully simulated nodes and the root node. See
+    # get_exploration_score().
+    self.exploration_score = np.zeros(0, np.float64)
+    self.fully_simulated = np.zeros(0, np.bool_)
+    self.created: List[bool] = []
+    self.terminal: List[bool] = []
+    # The PlayerId value of the player that has to make a move in this node.
+    self.player: List[int] = []
+    self.parent: List[int] = []
+    # The PlayerAction.action_id of the action that leads to this node.
+    self.action_id: List[int] = []
+    self.first_child: List[int] = []
+    self.num_children: List[int] = []
+    self.num_not_fully_simulated_children: List[int] = []
+    # The children that were not created yet are untried[first_child[i]] to
+    # untried[first_child[i] + num_untried[i] - 1], as offsets from
+    # first_child[i]. They are removed with swap-remove, the same as
+    # Node.untried_actions.
+    self.untried: List[int] = []
+    self.num_untried: List[int] = []
+    # The game states of the root node and of the nodes that were expanded in
+    # a previous iteration. None for all the other nodes.
+    self.states: List[Optional[GameState]] = []
+    # The rewards saved for the children of the root node (see
+    # Mcts.save_rewards).
+    self.rewards: Dict[int, List[float]] = {}
+    self.reward_stats: Dict[int, RewardStats] = {}
+    self._grow(capacity)
+
+  def _grow(self, num_nodes: int):
+    """Allocates space for num_nodes more nodes."""
+    new_capacity = self.capacity + num_nodes
+    for name, dtype, initial_value in _ARRAYS:
+      buffer = np.full(new_capacity, initial_value, dtype)
+      buffer[:self.capacity] = getattr(self, name)
+      setattr(self, name, buffer)
+    for name, initial_value in _LISTS:
+      getattr(self, name).extend([initial_value] * num_nodes)
+    self.capacity = new_capacity
+
+  def reserve(self, num_nodes: int) -> int:
+    """
+    Reserves the indices for num_nodes new nodes and returns the first one. The
+    nodes are not created. When the arrays are full, their capacity is at least
+    doubled, so the arrays are copied only a few times.
+    """
+    first_index = self.size
+    self.size += num_nodes
+    if self.size > self.capacity:
+      self._grow(max(_CAPACITY_INCREMENT, self.capacity,
+                     self.size - self.capacity))
+    return first_index
+
+  def create(self, index: int, state: GameState, parent: int):
+    """
+    Creates the node with the given index (see Node.__init__()). The tree
+    doesn't keep a reference to the state, so it can be modified afterwards.
+    Each index is created at most once, so the fields that don't depend on the
+    state (e.g., q, n, ucb, fully_simulated) are already initialized by
+    _grow().
+    """
+    self.created[index] = True
+    self.parent[index] = parent
+    if not state.is_game_over:
+      self.player[index] = state.next_player.value
+      actions = get_available_actions(state)
+      num_children = len(actions)
+      first_child = self.reserve(num_children)
+      self.first_child[index] = first_child
+      self.num_children[index] = num_children
+      self.num_not_fully_simulated_children[index] = num_children
+      self.num_untried[index] = num_children
+      last_child = first_child + num_children
+      self.action_id[first_child:last_child] = [action.action_id for action in
+                                                actions]
+      self.untried[first_child:last_child] = range(num_children)
+    else:
+      self.terminal[index] = True
+      self.player[index] = _PLAYER_FOR_TERMINAL_NODES.value
+      # Same as SchnapsenNode._get_reward_for_terminal_node().
+      score = state.game_points
+      opponent = _PLAYER_FOR_TERMINAL_NODES.opponent()
+      self.ucb[index] = \
+        score[_PLAYER_FOR_TERMINAL_NODES] / 3 - score[opponent] / 3
+      self.mark_fully_simulated(index)
+
+  def mark_fully_simulated(self, index: int):
+    self.fully_simulated[index] = True
+    parent = self.parent[index]
+    if parent != _NO_PARENT:
+      self.num_not_fully_simulated_children[parent] -= 1
+
+  def get_state(self, index: int) -> GameState:
+    """
+    Returns the game state of a created node. If it's not stored, it is created
+    from the parent's game state and stored.
+    """
+    state = self.states[index]
+    if state is None:
+      action = PlayerAction.from_action_id(self.action_id[index])
+      state = action.execute(self.get_state(self.parent[index]))
+      self.states[index] = state
+    return state
+
+  def _has_player_for_terminal_nodes(self, index: int) -> bool:
+    return self.player[index] == _PLAYER_FOR_TERMINAL_NODES.value
+
+  def get_q(self, index: int) -> float:
+    """Returns Node.q for the given node."""
+    q = float(self.q[index])
+    return q if self._has_player_for_terminal_nodes(index) else -q
+
+  def get_ucb(self, index: int) -> Optional[float]:
+    """Returns Node.ucb for the given node."""
+    ucb = float(self.ucb[index])
+    if math.isnan(ucb):
+      return None
+    return ucb if self._has_player_for_terminal_nodes(index) else -ucb
+
+  def get_exploration_score(self, index: int) -> float:
+    """
+    Returns Node.exploration_score for the given node. It is only stored for
+    the nodes that are no longer updated (i.e., fully simulated nodes and the
+    root node).
+    """
+    parent = self.parent[index]
+    if parent == _NO_PARENT or self.fully_simulated[index]:
+      return float(self.exploration_score[index])
+    return _exploration_score(self.exploration_param, float(self.n[parent]),
+                              float(self.n[index]))
+
+  def pop_random_untried_child(self, index: int) -> int:
+    """Same as Node.pop_random_untried_action(), but it returns the child."""
+    first_child = self.first_child[index]
+    num_untried = self.num_untried[index]
+    untried_index = first_child + random.randrange(num_untried)
+    child = first_child + self.untried[untried_index]
+    self.untried[untried_index] = self.untried[first_child + num_untried - 1]
+    self.num_untried[index] = num_untried - 1
+    return child
+
+  def select_path(self, index: int,
+                  select_best_child: bool) -> Optional[List[int]]:
+    """
+    Same as Mcts._selection(), starting from the node with the given index. It
+    returns the indices of the nodes from this node to the selected node.
+    """
+    path = [index]
+    # The terminal children have n == 0, but they are fully simulated, so the
+    # selection scores computed for them by _select_child() are ignored.
+    with np.errstate(divide="ignore", invalid="ignore"):
+      while not self.terminal[index]:
+        if self.num_untried[index] > 0:
+          return path
+        if self.num_not_fully_simulated_children[index] == 0:
+          # This can only happen once we expanded the whole game tree.
+          return None
+        index = self._select_child(index, select_best_child)
+        path.append(index)
+    raise AssertionError("Should not reach this code")  # pragma: no cover
+
+  def _select_child(self, index: int, select_best_child: bool) -> int:
+    """
+    Same as ai.mcts_algorithm.select_child() for a fully expanded node. The
+    selection scores of all the children are computed by one expression over
+    their slice of the arrays.
+    """
+    first_child = self.first_child[index]
+    last_child = first_child + self.num_children[index]
+    fully_simulated = self.fully_simulated[first_child:last_child]
+    if not select_best_child:
+      offset = random.randrange(self.num_not_fully_simulated_children[index])
+      return first_child + int(np.flatnonzero(~fully_simulated)[offset])
+    # The exploration scores are computed in place, since creating a new array
+    # for each operation takes longer than the operation itself.
+    scores = np.divide(2 * math.log(self.n[index]),
+                       self.n[first_child:last_child])
+    np.sqrt(scores, out=scores)
+    scores *= self.exploration_param
+    if self._has_player_for_terminal_nodes(index):
+      scores += self.ucb[first_child:last_child]
+    else:
+      scores -= self.ucb[first_child:last_child]
+    scores[fully_simulated] = -math.inf
+    # There are only a few children, so the best ones are faster to find in a
+    # list than with NumPy.
+    scores = scores.tolist()
+    max_score = max(scores)
+    best_children = [offset for offset, score in enumerate(scores) if
+                     score == max_score]
+    return first_child + random.choice(best_children)
+
+  def expand_to_terminal(self, path: List[int]):
+    """
+    Same as SchnapsenNode.expand_to_terminal() for the last node on path. It
+    appends the indices of the new nodes to path, so the last one is a terminal
+    node. The UCBs of the new nodes are set by backpropagate().
+    """
+    node = path[-1]
+    state = self.get_state(node).deep_copy()
+    while not state.is_game_over:
+      child = self.pop_random_untried_child(node)
+      PlayerAction.from_action_id(self.action_id[child]).apply(state)
+      self.create(child, state, node)
+      path.append(child)
+      node = child
+
+  def backpropagate(self, path: List[int]):
+    """
+    Same as Mcts._backpropagate(), without saving the rewards, for the path of
+    node indices that goes from the root node to a terminal node. All the
+    non-terminal nodes on the path are updated at once.
+    """
+    indices = np.array(path[:-1])
+    self.n[indices] += 1
+    self.q[indices] += self.ucb[path[-1]]
+    children = indices[1:]
+    self.ucb[children] = self.q[children] / self.n[children]
+    # A node can only become fully simulated if one of its children became fully
+    # simulated in this iteration, so this goes up from the terminal node until
+    # it finds a node that still has children that are not fully simulated.
+    for index in reversed(path[1:-1]):
+      if self.num_not_fully_simulated_children[index] > 0:
+        break
+      self._update_ucb_of_fully_simulated_node(index)
+
+  def _update_ucb_of_fully_simulated_node(self, index: int):
+    """
+    Same as Node.update_ucb() for a node whose children are all fully
+    simulated. The exploration score is the one computed by the previous
+    update, before n was incremented by backpropagate(). It's zero if this is
+    the first update.
+    """
+    first_child = self.first_child[index]
+    children_ucb = self.ucb[first_child:first_child + self.num_children[index]]
+    if self._has_player_for_terminal_nodes(index):
+      self.ucb[index] = children_ucb.max()
+    else:
+      self.ucb[index] = children_ucb.min()
+    previous_n = self.n[index] - 1
+    if previous_n > 0:
+      self.exploration_score[index] = _exploration_score(
+        self.exploration_param, self.n[self.parent[index]] - 1, previous_n)
+    self.mark_fully_simulated(index)
+
+
+class ArrayTreeNode:
+  """
+  Read-only view of a node from an ArrayTree, with the same attributes as Node.
+  It can be used instead of the nodes returned by Mcts.build_tree(). The views
+  are created on demand, so two views of the same node are equal, but not
+  identical.
+  """
+
+  def __init__(self, tree: ArrayTree, index: int):
+    self._tree = tree
+    self._index = index
+
+  @property
+  def tree(self) -> ArrayTree:
+    return self._tree
+
+  @property
+  def index(self) -> int:
+    """The index of this node in the arrays of the tree."""
+    return self._index
+
+  @property
+  def state(self) -> GameState:
+    return self._tree.get_state(self._index)
+
+  @property
+  def parent(self) -> Optional["ArrayTreeNode"]:
+    parent = self._tree.parent[self._index]
+    return None if parent == _NO_PARENT else ArrayTreeNode(self._tree, parent)
+
+  @property
+  def children(self) -> Optional[Dict[PlayerAction, "ArrayTreeNode"]]:
+    if self.terminal:
+      return None
+    tree = self._tree
+    first_child = tree.first_child[self._index]
+    children = {}
+    for child in range(first_child,
+                       first_child + tree.num_children[self._index]):
+      action = PlayerAction.from_action_id(tree.action_id[child])
+      children[action] = ArrayTreeNode(tree, child) if tree.created[
+        child] else None
+    return children
+
+  @property
+  def untried_actions(self) -> Optional[List[PlayerAction]]:
+    if self.terminal:
+      return None
+    tree = self._tree
+    first_child = tree.first_child[self._index]
+    return [PlayerAction.from_action_id(
+      tree.action_id[first_child + tree.untried[first_child + offset]])
+      for offset in range(tree.num_untried[self._index])]
+
+  @property
+  def q(self) -> float:
+    return self._tree.get_q(self._index)
+
+  @property
+  def n(self) -> int:
+    return int(self._tree.n[self._index])
+
+  @property
+  def ucb(self) -> Optional[float]:
+    return self._tree.get_ucb(self._index)
+
+  @property
+  def exploration_score(self) -> float:
+    return self._tree.get_exploration_score(self._index)
+
+  @property
+  def fully_simulated(self) -> bool:
+    return bool(self._tree.fully_simulated[self._index])
+
+  @property
+  def terminal(self) -> bool:
+    return self._tree.terminal[self._index]
+
+  @property
+  def fully_expanded(self) -> bool:
+    return self.terminal or self._tree.num_untried[self._index] == 0
+
+  @property
+  def player(self) -> PlayerId:
+    return PlayerId(self._tree.player[self._index])
+
+  @property
+  def rewards(self) -> Optional[List[float]]:
+    return self._tree.rewards.get(self._index)
+
+  @rewards.setter
+  def rewards(self, value: List[float]):
+    self._tree.rewards[self._index] = value
+
+  @property
+  def reward_stats(self) -> Optional[RewardStats]:
+    return self._tree.reward_stats.get(self._index)
+
+  @reward_stats.setter
+  def reward_stats(self, value: RewardStats):
+    self._tree.reward_stats[self._index] = value
+
+  def best_children(self) -> List[Tuple["ArrayTreeNode", PlayerAction]]:
+    return get_best_children(self)
+
+  def best_actions(self) -> List[PlayerAction]:
+    return [action for child, action in self.best_children()]
+
+  def __eq__(self, other):
+    return isinstance(other, ArrayTreeNode) and self._tree is other.tree and \
+           self._index == other.index
+
+  def __hash__(self):
+    return hash(self._index)
+
+  def __repr__(self):
+    return f"Q:{self.q}, N:{self.n}, UCB({self.player}):{self.ucb} " + \
+           f"FullSim:{self.fully_simulated}"
+
+
+class ArrayMcts(Mcts[GameState, PlayerAction]):
+  """
+  Same as Mcts for the game of Schnapsen, but the tree is stored in an
+  ArrayTree. build_tree() returns an ArrayTreeNode view of the root node. The
+  selection, expansion and backpropagation steps work directly on the node
+  indices, without creating any views.
+  """
+
+  def __init__(self, player_id: PlayerId,
+               exploration_param: float = 0,
+               save_rewards: Optional[SaveRewardsOptions] = None):
+    """See Mcts.__init__()."""
+    super().__init__(player_id, SchnapsenNode, exploration_param, save_rewards)
+
+  def _create_root_node(self, state: GameState) -> ArrayTreeNode:
+    tree = ArrayTree(exploration_param=self._exploration_param)
+    root = tree.reserve(1)
+    tree.create(root, state, _NO_PARENT)
+    tree.states[root] = state
+    return ArrayTreeNode(tree, root)
+
+  def run_one_iteration(self, root_node: ArrayTreeNode,
+                        select_best_child: bool = False) -> bool:
+    """Returns True if the entire game tree is already constructed."""
+    tree = root_node.tree
+    path = tree.select_path(root_node.index, select_best_child)
+    if path is None:
+      return True
+    tree.expand_to_terminal(path)
+    tree.backpropagate(path)
+    if self._save_rewards is not None:
+      self._save_reward(tree, path)
+    return False
+
+  def _save_reward(self, tree: ArrayTree, path: List[int]):
+    """
+    Same as the rewards saved by Mcts._backpropagate(). Only the child of the
+    root node on the path saves the reward.
+    """
+    child = path[1]
+    reward = float(tree.ucb[path[-1]])
+    if tree.player[child] != _PLAYER_FOR_TERMINAL_NODES.value:
+      reward = -reward
+    self._save_rewards.save_reward(ArrayTreeNode(tree, child), reward)
@@ -0,0 +1,95 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+import random
+import unittest
+
+from ai.mcts_algorithm import Mcts, Node, SaveRewardsOptions
+from ai.mcts_array_tree_with_deps import ArrayMcts, ArrayTree, ArrayTreeNode
+from model.game_state import GameState
+from model.game_state_test_utils import \
+  get_game_state_for_elimination_play_puzzle, get_game_state_for_tempo_puzzle
+
+
+class ArrayMctsTest(unittest.TestCase):
+  def _assert_trees_equal(self, node: Node, array_node: ArrayTreeNode):
+    self.assertEqual(node.state, array_node.state)
+    self.assertEqual(node.q, array_node.q)
+    self.assertEqual(node.n, array_node.n)
+    self.assertEqual(node.ucb, array_node.ucb)
+    self.assertEqual(node.exploration_score, array_node.exploration_score)
+    self.assertEqual(node.fully_simulated, array_node.fully_simulated)
+    self.assertEqual(node.fully_expanded, array_node.fully_expanded)
+    self.assertEqual(node.terminal, array_node.terminal)
+    self.assertEqual(node.player, array_node.player)
+    self.assertEqual(node.rewards, array_node.rewards)
+    self.assertEqual(node.reward_stats, array_node.reward_stats)
+    self.assertEqual(node.untried_actions, array_node.untried_actions)
+    if node.children is None:
+      self.assertIsNone(array_node.children)
+      return
+    self.assertEqual(list(node.children.keys()),
+                     list(array_node.children.keys()))
+    for action, child in node.children.items():
+      array_child = array_node.children[action]
+      if child is None:
+        self.assertIsNone(array_child)
+      else:
+        self.assertEqual(array_node, array_child.parent)
+        self._assert_trees_equal(child, array_child)
+
+  def _build_both_trees(self, game_state: GameState, max_iterations, **kwargs):
+    select_best_child = kwargs.pop("select_best_child", True)
+    random.seed(1234)
+    root_node = Mcts(game_state.next_player, **kwargs).build_tree(
+      game_state, max_iterations, select_best_child)
+    random.seed(1234)
+    array_root_node = ArrayMcts(game_state.next_player, **kwargs).build_tree(
+      game_state, max_iterations, select_best_child)
+    return root_node, array_root_node
+
+  def test_same_tree_as_mcts(self):
+    for seed in range(5):
+      for select_best_child in [True, False]:
+        game_state = GameState.new(random_seed=seed)
+        root_node, array_root_node = self._build_both_trees(
+          game_state, 200, exploration_param=1,
+          select_best_child=select_best_child)
+        self._assert_trees_equal(root_node, array_root_node)
+
+  def test_same_fully_simulated_tree_as_mcts(self):
+    game_state = get_game_state_for_elimination_play_puzzle()
+    root_node, array_root_node = self._build_both_trees(game_state, None)
+    self.assertIsNotNone(array_root_node.children)
+    self._assert_trees_equal(root_node, array_root_node)
+    self.assertEqual(root_node.best_actions(), array_root_node.best_actions())
+
+  def test_save_rewards(self):
+    game_state = get_game_state_for_tempo_puzzle()
+    root_node, array_root_node = self._build_both_trees(
+      game_state, 100, save_rewards=SaveRewardsOptions())
+    self._assert_trees_equal(root_node, array_root_node)
+    root_node, array_root_node = self._build_both_trees(
+      game_state, 100, save_rewards=SaveRewardsOptions(
+        stream_rewards=True, reward_histogram_bins=4))
+    self._assert_trees_equal(root_node, array_root_node)
+
+  def test_index(self):
+    game_state = GameState.new(random_seed=0)
+    array_root_node = ArrayMcts(game_state.next_player).build_tree(
+      game_state, 100)
+    self.assertEqual(0, array_root_node.index)
+    for child in array_root_node.children.values():
+      if child is not None:
+        self.assertEqual(array_root_node.index, child.tree.parent[child.index])
+        self.assertEqual(array_root_node, child.parent)
+
+  def test_arrays_grow(self):
+    tree = ArrayTree(capacity=10)
+    self.assertEqual(0, tree.reserve(8))
+    self.assertEqual(8, tree.reserve(100))
+    self.assertEqual(108, tree.size)
+    self.assertGreaterEqual(tree.capacity, 108)
+    self.assertEqual(tree.capacity, len(tree.q))
+    self.assertEqual(tree.capacity, len(tree.states))
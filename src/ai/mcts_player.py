@@ -3,15 +3,22 @@
 #  found in the LICENSE file.
 
 import abc
+import array
 import copy
+import dataclasses
 import functools
+import itertools
 import logging
 import math
 import multiprocessing
+import os
 import random
-from typing import List, Optional
+import struct
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Optional, Iterator, Sequence, Iterable, Tuple, Dict
 
-from ai.mcts_algorithm import Mcts, ucb_for_player
+from ai.mcts_algorithm import Mcts, ucb_for_player, SaveRewardsOptions
 from ai.mcts_player_options import MctsPlayerOptions
 from ai.merge_scoring_infos_func import ScoringInfo, ActionsWithScores, \
   AggregatedScores
@@ -19,12 +26,14 @@ from ai.player import Player
 from ai.utils import populate_game_view, get_unseen_cards
 from model.card import Card
 from model.game_state import GameState
+from model.game_state_codec import GAME_STATE_CODE_SIZE, \
+  encode_game_state_into, decode_game_state
 from model.player_action import PlayerAction
 from model.player_id import PlayerId
 from model.player_pair import PlayerPair
 
 
-def _find_action_with_max_score(
+def find_action_with_max_score(
     actions_and_scores: AggregatedScores) -> PlayerAction:
   """
   Given a list of PlayerActions and merged scores across all perfect information
@@ -37,50 +46,261 @@ def _find_action_with_max_score(
   return random.choice(actions_with_max_score)
 
 
-def generate_permutations(game_view: GameState,
-                          options: MctsPlayerOptions) -> List[List[Card]]:
+def _num_opponent_unknown_cards(game_view: GameState) -> int:
+  return len([card for card in
+              game_view.cards_in_hand[game_view.next_player.opponent()] if
+              card is None])
+
+
+def get_num_permutations(game_view: GameState,
+                         options: MctsPlayerOptions) -> int:
   """
-  Given a game view that represents an imperfect information game, this function
-  returns the card permutations that should be used by the Mcts algorithm to
-  generate a list of perfect information games and process them.
+  Returns the number of permutations that generate_permutations() will return
+  for the given game view. It is computed without generating them.
   """
-  cards_set = get_unseen_cards(game_view)
-  num_unknown_cards = len(cards_set)
-  num_opponent_unknown_cards = len(
-    [card for card in
-     game_view.cards_in_hand[game_view.next_player.opponent()] if
-     card is None])
+  num_unknown_cards = len(get_unseen_cards(game_view))
+  num_opponent_unknown_cards = _num_opponent_unknown_cards(game_view)
   total_permutations = \
     math.comb(num_unknown_cards, num_opponent_unknown_cards) * \
     math.perm(num_unknown_cards - num_opponent_unknown_cards)
-  num_permutations_to_process = min(total_permutations,
-                                    options.max_permutations)
-  logging.info("MctsPlayer: Num permutations: %s out of %s",
-               num_permutations_to_process, total_permutations)
-  permutations = options.perm_generator(
-    cards_set, num_opponent_unknown_cards, num_permutations_to_process)
-  return permutations
+  return min(total_permutations, options.max_permutations)
+
+
+def generate_permutations(game_view: GameState,
+                          options: MctsPlayerOptions) -> Iterator[List[Card]]:
+  """
+  Given a game view that represents an imperfect information game, this function
+  returns an iterator over the card permutations that should be used by the
+  Mcts algorithm to generate a list of perfect information games and process
+  them. The permutations are generated lazily. They are consistent with the play
+  so far: the cards that the opponent cannot hold, because of the rules for
+  following suit once the talon is closed, are revealed in the talon of the
+  game view (see GameState.inferred_talon_cards), so they are not part of the
+  unseen cards.
+  """
+  cards_set = get_unseen_cards(game_view)
+  num_permutations_to_process = get_num_permutations(game_view, options)
+  logging.info("MctsPlayer: Num permutations: %s", num_permutations_to_process)
+  return options.perm_generator(cards_set,
+                                _num_opponent_unknown_cards(game_view),
+                                num_permutations_to_process)
+
+
+def collapse_equivalent_permutations(
+    game_view: GameState,
+    permutations: Iterable[List[Card]]) -> Iterator[Tuple[List[Card], int]]:
+  """
+  Groups the permutations that lead to indistinguishable perfect information
+  games. It returns an iterator over (permutation, weight) pairs, one for each
+  group, where the weight is the size of the group. If the talon is closed, no
+  more cards are drawn from it, so the order of the cards in the talon doesn't
+  matter. Otherwise, all the permutations are distinct and have weight 1; they
+  are not consumed eagerly in this case.
+  """
+  if not game_view.is_talon_closed:
+    for permutation in permutations:
+      yield permutation, 1
+    return
+  num_opponent_unknown_cards = _num_opponent_unknown_cards(game_view)
+  groups: Dict[Tuple[Card, ...], int] = {}
+  for permutation in permutations:
+    # noinspection PyTypeChecker
+    key = tuple(permutation[:num_opponent_unknown_cards] +
+                sorted(permutation[num_opponent_unknown_cards:]))
+    groups[key] = groups.get(key, 0) + 1
+  for key, weight in groups.items():
+    yield list(key), weight
 
 
 def run_mcts(permutation: List[Card], game_view: GameState,
              player_id: PlayerId,
              options: MctsPlayerOptions) -> ActionsWithScores:
   game_state = populate_game_view(game_view, permutation)
-  mcts_algorithm = Mcts(player_id, exploration_param=options.exploration_param)
+  mcts_class = Mcts
+  if options.use_array_tree:
+    # NumPy is not a dependency of the main app, so it's only imported if the
+    # array tree is used.
+    # pylint: disable=import-outside-toplevel
+    from ai.mcts_array_tree_with_deps import ArrayMcts
+    # pylint: enable=import-outside-toplevel
+    mcts_class = ArrayMcts
+  save_rewards = None
+  if options.save_rewards:
+    save_rewards = SaveRewardsOptions(
+      stream_rewards=options.stream_rewards,
+      reward_histogram_bins=options.reward_histogram_bins)
+  mcts_algorithm = mcts_class(
+    player_id, exploration_param=options.exploration_param,
+    save_rewards=save_rewards)
   root_node = mcts_algorithm.build_tree(game_state, options.max_iterations,
                                         options.select_best_child)
   actions_with_scores = {}
   for action, child in root_node.children.items():
     if child is None:
       continue
-    actions_with_scores[action] = ScoringInfo(
-      q=(child.q if child.player == root_node.player else -child.q),
+    same_player = child.player == root_node.player
+    scoring_info = ScoringInfo(
+      q=(child.q if same_player else -child.q),
       n=child.n, score=ucb_for_player(child, root_node.player),
       fully_simulated=child.fully_simulated,
       terminal=child.terminal)
+    if child.rewards is not None:
+      scoring_info.rewards = \
+        child.rewards if same_player else [-reward for reward in child.rewards]
+    if child.reward_stats is not None:
+      scoring_info.reward_stats = \
+        child.reward_stats if same_player else child.reward_stats.negated()
+    actions_with_scores[action] = scoring_info
   return actions_with_scores
 
 
+def _get_options_for_batch(options: MctsPlayerOptions,
+                           num_permutations: int) -> MctsPlayerOptions:
+  """
+  Returns the options used to process a batch out of num_permutations
+  permutations. If needed, it reallocates the computational budget (see
+  MctsPlayerOptions.reallocate_computational_budget).
+  """
+  if options.reallocate_computational_budget and \
+      options.max_iterations is not None and \
+      num_permutations < options.max_permutations:
+    options = copy.copy(options)
+    total_budget = options.max_permutations * options.max_iterations
+    options.max_iterations = total_budget / num_permutations
+  return options
+
+
+# The lean process pool (see MctsPlayerOptions.lean_process_pool) uses the
+# functions below. For each batch of permutations, the game view and the
+# permutations are written once in a shared memory block with this layout:
+#   * the header: the permutation size and the number of permutations;
+#   * the game view, encoded with model.game_state_codec;
+#   * the permutations, one byte per card (Card.index).
+# The tasks only contain the name of the block and a range of permutation
+# indices. The results are sent back as two arrays: the number of actions for
+# each permutation and _NUM_VALUES_PER_ACTION values for each action.
+_SHARED_BATCH_HEADER = struct.Struct("<II")
+_NUM_VALUES_PER_ACTION = 6
+_CHUNKS_PER_PROCESS = 4
+
+# A lean task: shared memory name, the range of permutations to process (start,
+# end) and the total number of permutations (see _get_options_for_batch()).
+_LeanTask = Tuple[str, int, int, int]
+
+# The results for a lean task (see _encode_actions_with_scores()).
+_LeanResults = Tuple[array.array, array.array]
+
+
+def _write_shared_batch(game_view: GameState,
+                        permutations: Sequence[List[Card]]) -> SharedMemory:
+  """
+  Writes the game view and the permutations in a new shared memory block. The
+  caller must close and unlink it.
+  """
+  permutation_size = len(permutations[0])
+  permutations_bytes = bytes(
+    card.index for permutation in permutations for card in permutation)
+  offset = _SHARED_BATCH_HEADER.size + GAME_STATE_CODE_SIZE
+  size = offset + len(permutations_bytes)
+  shared_memory = SharedMemory(create=True, size=size)
+  _SHARED_BATCH_HEADER.pack_into(shared_memory.buf, 0, permutation_size,
+                                 len(permutations))
+  encode_game_state_into(game_view, shared_memory.buf,
+                         _SHARED_BATCH_HEADER.size)
+  shared_memory.buf[offset:size] = permutations_bytes
+  return shared_memory
+
+
+def _read_shared_batch(name: str) -> Tuple[GameState, List[List[Card]]]:
+  shared_memory = SharedMemory(name=name)
+  try:
+    permutation_size, num_permutations = _SHARED_BATCH_HEADER.unpack_from(
+      shared_memory.buf, 0)
+    game_view = decode_game_state(shared_memory.buf, _SHARED_BATCH_HEADER.size)
+    offset = _SHARED_BATCH_HEADER.size + GAME_STATE_CODE_SIZE
+    permutations_bytes = bytes(
+      shared_memory.buf[offset:offset + num_permutations * permutation_size])
+  finally:
+    shared_memory.close()
+  all_cards = Card.get_all_cards()
+  permutations = [
+    [all_cards[card_index] for card_index in
+     permutations_bytes[start:start + permutation_size]]
+    for start in range(0, len(permutations_bytes), permutation_size)] \
+    if permutation_size > 0 else [[] for _ in range(num_permutations)]
+  return game_view, permutations
+
+
+def _encode_actions_with_scores(actions_with_scores: ActionsWithScores,
+                                num_actions: array.array,
+                                values: array.array):
+  num_actions.append(len(actions_with_scores))
+  for action, scoring_info in actions_with_scores.items():
+    values.extend((action.action_id, scoring_info.q, scoring_info.n,
+                   scoring_info.score, scoring_info.fully_simulated,
+                   scoring_info.terminal))
+
+
+def _decode_actions_with_scores(
+    num_actions: array.array, values: array.array) -> List[ActionsWithScores]:
+  actions_with_scores_list = []
+  offset = 0
+  for count in num_actions:
+    actions_with_scores = {}
+    for _ in range(count):
+      action_id, q, n, score, fully_simulated, terminal = \
+        values[offset:offset + _NUM_VALUES_PER_ACTION]
+      actions_with_scores[PlayerAction.from_action_id(int(action_id))] = \
+        ScoringInfo(q=q, n=int(n), score=score,
+                    fully_simulated=bool(fully_simulated),
+                    terminal=bool(terminal))
+      offset += _NUM_VALUES_PER_ACTION
+    actions_with_scores_list.append(actions_with_scores)
+  return actions_with_scores_list
+
+
+@dataclasses.dataclass
+class _LeanPoolWorkerState:
+  """
+  The state of a worker process from a lean process pool. The player ID and
+  the options are set once, when the worker is started.
+  """
+
+  player_id: Optional[PlayerId] = None
+  options: Optional[MctsPlayerOptions] = None
+
+  batch: Optional[Tuple[str, GameState, List[List[Card]]]] = None
+  """
+  The name of the last shared memory block read by the worker and its content.
+  It is cached, since a worker usually processes several chunks from the same
+  batch.
+  """
+
+
+_WORKER_STATE = _LeanPoolWorkerState()
+
+
+def _init_lean_pool_worker(player_id: PlayerId, options: MctsPlayerOptions):
+  _WORKER_STATE.player_id = player_id
+  _WORKER_STATE.options = options
+  _WORKER_STATE.batch = None
+
+
+def _run_mcts_on_shared_batch(task: _LeanTask) -> _LeanResults:
+  name, start, end, num_permutations = task
+  if _WORKER_STATE.batch is None or _WORKER_STATE.batch[0] != name:
+    _WORKER_STATE.batch = (name, *_read_shared_batch(name))
+  _, game_view, permutations = _WORKER_STATE.batch
+  options = _get_options_for_batch(_WORKER_STATE.options, num_permutations)
+  num_actions = array.array("B")
+  values = array.array("d")
+  for permutation in permutations[start:end]:
+    _encode_actions_with_scores(
+      run_mcts(permutation, game_view, _WORKER_STATE.player_id, options),
+      num_actions, values)
+  return num_actions, values
+
+
 class BaseMctsPlayer(Player, abc.ABC):
   """Base class for a Player that uses the Mcts algorithm."""
 
@@ -96,34 +316,60 @@ class BaseMctsPlayer(Player, abc.ABC):
     super().__init__(player_id, cheater)
     self._options = options or MctsPlayerOptions()
 
-  def _generate_permutations(self, game_view: GameState) -> List[List[Card]]:
+  def _generate_permutation_batches(self, game_view: GameState) -> Iterator[
+    Tuple[Sequence[List[Card]], List[int]]]:
+    """
+    Splits the permutations returned by generate_permutations() in batches of
+    MctsPlayerOptions.permutations_batch_size. Only one batch of permutations
+    is kept in memory at a time. Each batch comes with the weights of its
+    permutations (see collapse_equivalent_permutations()).
+    """
     permutations = generate_permutations(game_view, self._options)
-    assert len(permutations) == 1 or not self.cheater
-    return permutations
+    if self._options.collapse_equivalent_permutations:
+      weighted_permutations = collapse_equivalent_permutations(game_view,
+                                                               permutations)
+    else:
+      weighted_permutations = ((permutation, 1) for permutation in permutations)
+    batch_size = self._options.permutations_batch_size
+    while True:
+      batch = list(itertools.islice(weighted_permutations, batch_size))
+      if len(batch) == 0:
+        return
+      yield [permutation for permutation, _ in batch], \
+            [weight for _, weight in batch]
 
   def get_actions_and_scores(self, game_view: GameState, game_points: Optional[
     PlayerPair[int]] = None) -> AggregatedScores:
-    permutations = self._generate_permutations(game_view)
-    actions_with_scores_list = self.run_mcts_algorithm(game_view, permutations,
-                                                       game_points)
+    num_permutations = get_num_permutations(game_view, self._options)
+    assert num_permutations == 1 or not self.cheater
+    actions_with_scores_list = []
+    all_weights = []
+    for permutations, weights in self._generate_permutation_batches(game_view):
+      actions_with_scores_list.extend(
+        self.run_mcts_algorithm(game_view, permutations, game_points,
+                                num_permutations))
+      all_weights.extend(weights)
     if __debug__:
       for actions_with_scores in actions_with_scores_list:
         for action, score in actions_with_scores.items():
           print(action, "-->", score)
         print()
-    actions_and_scores = self._options.merge_scoring_info_func(
-      actions_with_scores_list)
-    return actions_and_scores
+    if self._options.collapse_equivalent_permutations:
+      # Each permutation stands for a group of equivalent permutations.
+      return self._options.merge_scoring_info_func(actions_with_scores_list,
+                                                   weights=all_weights)
+    return self._options.merge_scoring_info_func(actions_with_scores_list)
 
   def request_next_action(self, game_view: GameState, game_points: Optional[
     PlayerPair[int]] = None) -> PlayerAction:
     actions_and_scores = self.get_actions_and_scores(game_view, game_points)
-    return _find_action_with_max_score(actions_and_scores)
+    return find_action_with_max_score(actions_and_scores)
 
   @abc.abstractmethod
   def run_mcts_algorithm(self, game_view: GameState,
-                         permutations: List[List[Card]],
-                         game_points: Optional[PlayerPair[int]] = None) -> List[
+                         permutations: Sequence[List[Card]],
+                         game_points: Optional[PlayerPair[int]] = None,
+                         num_permutations: Optional[int] = None) -> List[
     ActionsWithScores]:
     """
     This method is overridden by subclasses to run a particular implementation
@@ -131,7 +377,10 @@ class BaseMctsPlayer(Player, abc.ABC):
     convert the imperfect information game in a list of perfect information
     games. It returns a list of ActionsWithScores dicts, one for each
     permutation. If provided, the game_points argument represents the score at
-    bummerl level.
+    bummerl level. The permutations can be only one batch out of
+    num_permutations processed for this game view; num_permutations is used to
+    reallocate the computational budget. If it is None, it defaults to the
+    number of permutations in this batch.
     """
 
   def cleanup(self) -> None:
@@ -151,16 +400,30 @@ class MctsPlayer(BaseMctsPlayer):
                options: Optional[MctsPlayerOptions] = None):
     super().__init__(player_id, cheater, options)
     self._pool = None
+    if self._options.lean_process_pool and self._options.save_rewards:
+      raise ValueError(
+        "MctsPlayerOptions.lean_process_pool does not support save_rewards")
     if options.num_processes != 1:
       # pylint: disable=consider-using-with
-      self._pool = multiprocessing.Pool(processes=self._options.num_processes)
+      if self._options.lean_process_pool:
+        # Start the resource tracker before the workers, so they share it with
+        # this process. Otherwise, each worker starts its own tracker that
+        # reports the shared memory blocks unlinked by this process as leaked.
+        # SharedMemory only uses the resource tracker on POSIX systems.
+        if os.name == "posix":
+          resource_tracker.ensure_running()
+        self._pool = multiprocessing.Pool(
+          processes=self._options.num_processes,
+          initializer=_init_lean_pool_worker,
+          initargs=(self.id, self._options))
+      else:
+        self._pool = multiprocessing.Pool(
+          processes=self._options.num_processes)
       # pylint: enable=consider-using-with
       logging.info("MctsPlayer: Multiprocessing pool using %s processes.",
                    self._options.num_processes)
     else:
       logging.info("MctsPlayer: Mcts will run in-process.")
-    if options.save_rewards:
-      raise ValueError("save_rewards is not supported by MctsPlayer")
     if options.use_game_points:
       logging.warning("MctsPlayer: MctsPlayerOptions.use_game_points is True, "
                       "but MctsPlayer ignores game_points.")
@@ -171,16 +434,15 @@ class MctsPlayer(BaseMctsPlayer):
       self._pool.join()
 
   def run_mcts_algorithm(self, game_view: GameState,
-                         permutations: List[List[Card]],
-                         game_points: Optional[PlayerPair[int]] = None) -> List[
+                         permutations: Sequence[List[Card]],
+                         game_points: Optional[PlayerPair[int]] = None,
+                         num_permutations: Optional[int] = None) -> List[
     ActionsWithScores]:
-    options = self._options
-    if options.reallocate_computational_budget and \
-        options.max_iterations is not None and \
-        len(permutations) < options.max_permutations:
-      options = copy.copy(options)
-      total_budget = options.max_permutations * options.max_iterations
-      options.max_iterations = total_budget / len(permutations)
+    num_permutations = num_permutations or len(permutations)
+    if self._pool is not None and self._options.lean_process_pool:
+      return self._run_mcts_in_lean_pool(game_view, permutations,
+                                         num_permutations)
+    options = _get_options_for_batch(self._options, num_permutations)
     if self._pool is not None:
       actions_with_scores_list = self._pool.map(
         functools.partial(run_mcts, game_view=game_view, player_id=self.id,
@@ -191,3 +453,29 @@ class MctsPlayer(BaseMctsPlayer):
         run_mcts(permutation, game_view, self.id, options)
         for permutation in permutations]
     return actions_with_scores_list
+
+  def _run_mcts_in_lean_pool(
+      self, game_view: GameState, permutations: Sequence[List[Card]],
+      num_permutations: int) -> List[ActionsWithScores]:
+    """
+    Same as run_mcts_algorithm(), but the game view and the permutations are
+    sent to the workers through shared memory and the tasks are ranges of
+    permutation indices (see MctsPlayerOptions.lean_process_pool).
+    """
+    shared_memory = _write_shared_batch(game_view, permutations)
+    try:
+      chunk_size = max(1, math.ceil(
+        len(permutations) /
+        (_CHUNKS_PER_PROCESS * self._options.num_processes)))
+      tasks = [(shared_memory.name, start,
+                min(start + chunk_size, len(permutations)), num_permutations)
+               for start in range(0, len(permutations), chunk_size)]
+      results = self._pool.map(_run_mcts_on_shared_batch, tasks)
+    finally:
+      shared_memory.close()
+      shared_memory.unlink()
+    actions_with_scores_list = []
+    for num_actions, values in results:
+      actions_with_scores_list.extend(
+        _decode_actions_with_scores(num_actions, values))
+    return actions_with_scores_list
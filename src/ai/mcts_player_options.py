@@ -38,7 +38,9 @@ class MctsPlayerOptions:
   num_processes: int = multiprocessing.cpu_count()
   """
   The number of processes to be used in the pool to process the permutations in
-  parallel.
+  parallel. CythonMctsPlayer's worker processes read the game view and the
+  permutations from shared memory and write their results there; in this case,
+  save_rewards is only supported if num_processes is 1.
   """
 
   perm_generator: Optional[PermutationsGenerator] = sims_table_perm_generator
@@ -47,6 +49,25 @@ class MctsPlayerOptions:
   be processed when request_next_action() is called.
   """
 
+  permutations_batch_size: Optional[int] = 128
+  """
+  The permutations are generated lazily and processed in batches of this size,
+  so the memory used by the permutations doesn't grow with max_permutations,
+  except for the set of unique permutations kept by random_perm_generator().
+  For MctsPlayer, it should be a multiple of num_processes. If None, all the
+  permutations are processed in one batch.
+  """
+
+  collapse_equivalent_permutations: bool = False
+  """
+  If True, the permutations that lead to indistinguishable perfect information
+  games (e.g., they only differ in the order of the cards in a closed talon) are
+  processed only once and the number of equivalent permutations is passed to
+  merge_scoring_info_func as weights (see MergeScoringInfosFunc). The
+  computational budget per permutation doesn't change, so fewer Mcts trees are
+  built in total.
+  """
+
   merge_scoring_info_func: Optional[MergeScoringInfosFunc] = average_ucb
   """
   The function that merges all the ScoringInfos across all the processed
@@ -79,6 +100,22 @@ class MctsPlayerOptions:
   debug the algorithm, etc.
   """
 
+  stream_rewards: bool = False
+  """
+  Only used if save_rewards is True. If True, instead of saving all the
+  individual rewards, the children of the root node only keep running
+  statistics about them (count, mean, M2, min, max and an optional histogram).
+  The memory used and the time needed to return the results no longer grow with
+  the number of iterations. See RewardStats.
+  """
+
+  reward_histogram_bins: int = 0
+  """
+  Only used if save_rewards and stream_rewards are True. If positive, the reward
+  statistics also include a histogram of the rewards with this many equal-width
+  bins covering the interval [-1, 1].
+  """
+
   reallocate_computational_budget: bool = True
   """
   The total computational budget is given by max_permutations * max_iterations.
@@ -98,6 +135,27 @@ class MctsPlayerOptions:
   conservative if it's leading and more aggressive if it's behind.
   """
 
+  use_array_tree: bool = False
+  """
+  If True, the Python MctsPlayer stores the Mcts trees in preallocated NumPy
+  arrays instead of one Node object per node (see
+  ai/mcts_array_tree_with_deps.py). It builds the same trees, using less memory
+  and creating far fewer objects for the garbage collector. It requires NumPy,
+  which is not a dependency of the main app. CythonMctsPlayer already stores its
+  trees in C structs, so it ignores this option.
+  """
+
+  lean_process_pool: bool = False
+  """
+  Only used by MctsPlayer if num_processes is not 1. If True, the options are
+  sent to the worker processes only once, when the pool is created. For each
+  batch of permutations, the game view and the permutations are sent through
+  shared memory, the workers process ranges of permutations and they send the
+  results back as arrays of numbers instead of pickled ScoringInfo dicts. This
+  reduces the inter-process communication overhead. It does not support
+  save_rewards.
+  """
+
 
 def mcts_player_options_v1() -> MctsPlayerOptions:
   """
@@ -2,17 +2,23 @@
 #  Use of this source code is governed by a BSD-style license that can be
 #  found in the LICENSE file.
 
+import array
 import functools
 import os
 import unittest
 from typing import Optional, List
 
+from ai.cython_mcts_player.permutations import generate_permutations as \
+  cython_generate_permutations
 from ai.cython_mcts_player.player import CythonMctsPlayer
-from ai.mcts_player import MctsPlayer
+from ai.mcts_player import MctsPlayer, generate_permutations, \
+  collapse_equivalent_permutations, _encode_actions_with_scores, \
+  _decode_actions_with_scores, _write_shared_batch, _read_shared_batch
 from ai.mcts_player_options import MctsPlayerOptions, mcts_player_options_v1
+from ai.permutations import lexicographic_perm_generator
 from ai.merge_scoring_infos_func import best_action_frequency, \
   average_ucb, ActionsWithScores, merge_ucbs_using_simple_average, \
-  merge_ucbs_using_weighted_average, count_visits
+  merge_ucbs_using_weighted_average, count_visits, ScoringInfo
 from ai.utils import get_unseen_cards, populate_game_view
 from model.card import Card
 from model.card_value import CardValue
@@ -23,7 +29,8 @@ from model.game_state_test_utils import get_game_view_for_duck_puzzle, \
   get_game_view_for_the_last_trump_puzzle, \
   get_game_state_for_know_your_opponent_puzzle, \
   get_game_view_for_grab_the_brass_ring_puzzle
-from model.player_action import PlayCardAction
+from model.player_action import PlayCardAction, CloseTheTalonAction, \
+  AnnounceMarriageAction, ExchangeTrumpCardAction
 from model.player_id import PlayerId
 from model.player_pair import PlayerPair
 from model.suit import Suit
@@ -164,11 +171,125 @@ class MctsPlayerSelectBestChildTest(MctsPlayerTest):
     self._mcts_player = MctsPlayer(PlayerId.ONE, options=options)
 
 
-class MctsPlayerWithSaveRewards(unittest.TestCase):
-  def test_cannot_instantiate_with_save_rewards(self) -> None:
-    options = MctsPlayerOptions(max_iterations=None, save_rewards=True)
-    with self.assertRaisesRegex(ValueError, "save_rewards is not supported"):
-      MctsPlayer(PlayerId.ONE, options=options)
+class MctsPlayerSaveRewardsTest(MctsPlayerTest):
+  def setUp(self) -> None:
+    options = MctsPlayerOptions(max_iterations=None, save_rewards=True,
+                                num_processes=1)
+    self._mcts_player = MctsPlayer(PlayerId.ONE, options=options)
+
+
+class MctsPlayerStreamRewardsTest(MctsPlayerTest):
+  def setUp(self) -> None:
+    options = MctsPlayerOptions(max_iterations=None, save_rewards=True,
+                                stream_rewards=True, reward_histogram_bins=10,
+                                num_processes=1)
+    self._mcts_player = MctsPlayer(PlayerId.ONE, options=options)
+
+
+class MctsPlayerArrayTreeTest(MctsPlayerTest):
+  def setUp(self) -> None:
+    options = MctsPlayerOptions(max_iterations=None, select_best_child=True,
+                                save_rewards=True, use_array_tree=True,
+                                num_processes=1)
+    self._mcts_player = MctsPlayer(PlayerId.ONE, options=options)
+
+
+class MctsPlayerLeanProcessPoolTest(MctsPlayerTest):
+  def setUp(self) -> None:
+    options = MctsPlayerOptions(max_iterations=None, lean_process_pool=True)
+    self._mcts_player = MctsPlayer(PlayerId.ONE, options=options)
+
+
+class LeanProcessPoolTest(unittest.TestCase):
+  def test_encode_and_decode_actions_with_scores(self):
+    actions_with_scores_list = [
+      {
+        PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.ACE)):
+          ScoringInfo(q=1.5, n=3, score=0.5, fully_simulated=True,
+                      terminal=False),
+        AnnounceMarriageAction(PlayerId.ONE,
+                               Card(Suit.HEARTS, CardValue.KING)):
+          ScoringInfo(q=-2.0, n=4, score=-0.5, fully_simulated=False,
+                      terminal=True),
+      },
+      {},
+      {
+        ExchangeTrumpCardAction(PlayerId.TWO):
+          ScoringInfo(q=0.0, n=1, score=0.0, fully_simulated=False,
+                      terminal=False),
+        CloseTheTalonAction(PlayerId.TWO):
+          ScoringInfo(q=1.0, n=1, score=1.0, fully_simulated=True,
+                      terminal=True),
+      },
+    ]
+    num_actions = array.array("B")
+    values = array.array("d")
+    for actions_with_scores in actions_with_scores_list:
+      _encode_actions_with_scores(actions_with_scores, num_actions, values)
+    decoded = _decode_actions_with_scores(num_actions, values)
+    self.assertEqual(actions_with_scores_list, decoded)
+    for expected, actual in zip(actions_with_scores_list, decoded):
+      self.assertEqual(list(expected.keys()), list(actual.keys()))
+
+  def test_write_and_read_shared_batch(self):
+    game_view = GameState.new(random_seed=0).next_player_view()
+    options = MctsPlayerOptions(max_permutations=10)
+    permutations = list(generate_permutations(game_view, options))
+    shared_memory = _write_shared_batch(game_view, permutations)
+    try:
+      actual_game_view, actual_permutations = _read_shared_batch(
+        shared_memory.name)
+    finally:
+      shared_memory.close()
+      shared_memory.unlink()
+    self.assertEqual(game_view, actual_game_view)
+    self.assertEqual(permutations, actual_permutations)
+
+  def test_write_and_read_shared_batch_with_no_unknown_cards(self):
+    game_view = get_game_state_for_who_laughs_last_puzzle()
+    shared_memory = _write_shared_batch(game_view, [[]])
+    try:
+      actual_game_view, actual_permutations = _read_shared_batch(
+        shared_memory.name)
+    finally:
+      shared_memory.close()
+      shared_memory.unlink()
+    self.assertEqual(game_view, actual_game_view)
+    self.assertEqual([[]], actual_permutations)
+
+  def test_same_iterations_as_the_default_process_pool(self):
+    game_view = get_game_view_for_duck_puzzle()
+    permutations = list(
+      generate_permutations(game_view, MctsPlayerOptions(max_permutations=4)))
+    results = []
+    for lean_process_pool in [False, True]:
+      options = MctsPlayerOptions(max_iterations=10, num_processes=2,
+                                  max_permutations=10,
+                                  lean_process_pool=lean_process_pool)
+      player = MctsPlayer(game_view.next_player, False, options)
+      try:
+        # Run two batches, so the workers switch to a new shared memory block.
+        for _ in range(2):
+          results.append(player.run_mcts_algorithm(game_view, permutations))
+      finally:
+        player.cleanup()
+    for actions_with_scores_list in results:
+      self.assertEqual(len(permutations), len(actions_with_scores_list))
+      self.assertEqual(
+        [25] * len(permutations),
+        [sum(scoring_info.n for scoring_info in actions_with_scores.values())
+         for actions_with_scores in actions_with_scores_list])
+      self.assertEqual(
+        [set(actions_with_scores.keys()) for actions_with_scores in
+         actions_with_scores_list],
+        [set(actions_with_scores.keys()) for actions_with_scores in
+         results[0]])
+
+  def test_save_rewards_is_not_supported(self):
+    options = MctsPlayerOptions(num_processes=2, lean_process_pool=True,
+                                save_rewards=True)
+    with self.assertRaisesRegex(ValueError, "save_rewards"):
+      MctsPlayer(PlayerId.ONE, False, options)
 
 
 class CythonMctsPlayerMaxAverageUcbTest(MctsPlayerTest):
@@ -214,12 +335,43 @@ class CythonMctsPlayerMergeUcbsUsingWeightedAverageTest(MctsPlayerTest):
     self._mcts_player = CythonMctsPlayer(PlayerId.ONE, options=options)
 
 
-class CythonMctsPlayerWithParallelismTest(unittest.TestCase):
-  def test_cannot_instantiate_with_multi_threading(self) -> None:
-    options = MctsPlayerOptions(max_iterations=None, num_processes=10)
-    with self.assertRaisesRegex(ValueError, "10 threads"):
+class CythonMctsPlayerWithParallelismTest(MctsPlayerTest):
+  def setUp(self) -> None:
+    options = MctsPlayerOptions(max_iterations=None)
+    self._mcts_player = CythonMctsPlayer(PlayerId.ONE, options=options)
+
+  def test_cannot_save_rewards(self) -> None:
+    options = MctsPlayerOptions(max_iterations=None, num_processes=10,
+                                save_rewards=True)
+    with self.assertRaisesRegex(ValueError, "save_rewards"):
       CythonMctsPlayer(PlayerId.ONE, options=options)
 
+  def test_same_results_as_single_process(self) -> None:
+    game_view = get_game_view_for_duck_puzzle()
+    permutations = cython_generate_permutations(game_view,
+                                                MctsPlayerOptions())
+    results = []
+    for num_processes in [1, 2]:
+      options = MctsPlayerOptions(max_iterations=None,
+                                  num_processes=num_processes)
+      player = CythonMctsPlayer(game_view.next_player, options=options)
+      try:
+        # Run it twice, so the workers use a second shared memory block.
+        for _ in range(2):
+          results.append([
+            {action: (scoring_info.score, scoring_info.n,
+                      scoring_info.fully_simulated, scoring_info.terminal)
+             for action, scoring_info in actions_with_scores.items()}
+            for actions_with_scores in
+            player.run_mcts_algorithm(game_view, permutations)])
+      finally:
+        player.cleanup()
+    self.assertEqual(len(permutations), len(results[0]))
+    # The q values are not compared, since the order of the iterations, and so
+    # the order in which the rewards are added, depends on the random seed.
+    for actions_with_scores_list in results[1:]:
+      self.assertEqual(results[0], actions_with_scores_list)
+
 
 class CythonMctsPlayerSelectBestChildTest(MctsPlayerTest):
   def setUp(self) -> None:
@@ -238,6 +390,17 @@ class CythonMctsPlayerSaveRewardsTest(MctsPlayerTest):
     self._mcts_player = CythonMctsPlayer(PlayerId.ONE, options=options)
 
 
+class CythonMctsPlayerStreamRewardsTest(MctsPlayerTest):
+  def setUp(self) -> None:
+    options = MctsPlayerOptions(max_iterations=None,
+                                select_best_child=True,
+                                save_rewards=True,
+                                stream_rewards=True,
+                                reward_histogram_bins=10,
+                                num_processes=1)
+    self._mcts_player = CythonMctsPlayer(PlayerId.ONE, options=options)
+
+
 class CythonMctsPlayerV1Test(MctsPlayerTest):
   def setUp(self) -> None:
     options = mcts_player_options_v1()
@@ -336,3 +499,86 @@ class ReallocateComputationalBudgetTest(unittest.TestCase):
 
   def test_cython_mcts_player(self):
     self._run_test(CythonMctsPlayer)
+
+  def test_permutations_processed_in_batches(self):
+    # There are 4 permutations possible, processed in batches of 3 and 1. The
+    # computational budget is reallocated based on the total number of
+    # permutations, not the size of each batch: 4 permutations of 25 iterations.
+    game_view = get_game_view_for_duck_puzzle()
+    options = MctsPlayerOptions(
+      num_processes=1,
+      max_permutations=10,
+      max_iterations=10,
+      permutations_batch_size=3,
+      merge_scoring_info_func=functools.partial(self._assert_num_iterations,
+                                                10 * 10),
+      reallocate_computational_budget=True)
+    for player_class in [MctsPlayer, CythonMctsPlayer]:
+      player = player_class(game_view.next_player, False, options)
+      player.get_actions_and_scores(game_view)
+
+
+class CollapseEquivalentPermutationsTest(unittest.TestCase):
+  def test_talon_is_not_closed(self):
+    game_view = GameState.new(random_seed=0).next_player_view()
+    options = MctsPlayerOptions(max_permutations=20)
+    permutations = list(generate_permutations(game_view, options))
+    self.assertEqual(
+      [(permutation, 1) for permutation in permutations],
+      list(collapse_equivalent_permutations(game_view, permutations)))
+
+  def test_talon_is_closed(self):
+    game_state = GameState.new(random_seed=0)
+    game_view = CloseTheTalonAction(game_state.next_player).execute(
+      game_state).next_player_view()
+
+    # The lexicographic generator only permutes the talon cards for the first
+    # 100 permutations, so they are all equivalent.
+    options = MctsPlayerOptions(perm_generator=lexicographic_perm_generator,
+                                max_permutations=100)
+    permutations = list(generate_permutations(game_view, options))
+    weighted_permutations = list(
+      collapse_equivalent_permutations(game_view, permutations))
+    self.assertEqual(1, len(weighted_permutations))
+    permutation, weight = weighted_permutations[0]
+    self.assertEqual(100, weight)
+    self.assertEqual(permutations[0][:5], permutation[:5])
+    self.assertEqual(sorted(permutations[0][5:]), permutation[5:])
+
+    # Two permutations that only differ in the order of the talon cards.
+    cards = get_unseen_cards(game_view)
+    permutations = [cards, cards[:5] + list(reversed(cards[5:])),
+                    list(reversed(cards[:5])) + cards[5:]]
+    weighted_permutations = list(
+      collapse_equivalent_permutations(game_view, permutations))
+    self.assertEqual([2, 1], [weight for _, weight in weighted_permutations])
+
+  def _run_test(self, player_class):
+    game_state = GameState.new(random_seed=0)
+    game_view = CloseTheTalonAction(game_state.next_player).execute(
+      game_state).next_player_view()
+    merged_weights = []
+
+    def merge_scoring_info_func(actions_with_scores_list, weights):
+      self.assertEqual(len(actions_with_scores_list), len(weights))
+      merged_weights.append(weights)
+      return average_ucb(actions_with_scores_list, weights)
+
+    options = MctsPlayerOptions(
+      num_processes=1, max_permutations=50, max_iterations=10,
+      perm_generator=lexicographic_perm_generator,
+      permutations_batch_size=7, collapse_equivalent_permutations=True,
+      merge_scoring_info_func=merge_scoring_info_func)
+    player = player_class(game_view.next_player, False, options)
+    player.request_next_action(game_view)
+    # The merge function sees one entry per group of equivalent permutations,
+    # weighted by the size of the group.
+    self.assertEqual(1, len(merged_weights))
+    self.assertEqual(50, sum(merged_weights[0]))
+    self.assertLess(len(merged_weights[0]), 50)
+
+  def test_mcts_player(self):
+    self._run_test(MctsPlayer)
+
+  def test_cython_mcts_player(self):
+    self._run_test(CythonMctsPlayer)
@@ -4,12 +4,110 @@
 
 import dataclasses
 import logging
+import math
 import pprint
 from collections import Counter, defaultdict
 from typing import List, Tuple, Callable, Dict, Optional, Union
 
 from model.player_action import PlayerAction, ExchangeTrumpCardAction, \
-  CloseTheTalonAction, AnnounceMarriageAction, PlayCardAction
+  CloseTheTalonAction, AnnounceMarriageAction, PlayCardAction, NUM_ACTION_IDS
+
+
+@dataclasses.dataclass
+class RewardStats:
+  """
+  Running statistics for the rewards obtained on all paths going through an
+  action. It is the streaming alternative to ScoringInfo.rewards: it uses a
+  constant amount of memory, regardless of the number of Mcts iterations.
+  The mean and the variance are updated using Welford's algorithm.
+  """
+  count: int = 0
+  mean: float = 0
+  m2: float = 0
+  """The sum of the squared differences from the mean."""
+  min: float = math.inf
+  max: float = -math.inf
+  histogram: Optional[List[int]] = None
+  """
+  Optional counts of the rewards falling in equal-width bins that cover the
+  interval [-1, 1]. See reward_histogram_bin().
+  """
+
+  @property
+  def variance(self) -> float:
+    """The sample variance of the rewards."""
+    if self.count < 2:
+      return 0
+    return self.m2 / (self.count - 1)
+
+  def add(self, reward: float) -> None:
+    """Updates the statistics with one more reward."""
+    self.count += 1
+    delta = reward - self.mean
+    self.mean += delta / self.count
+    self.m2 += delta * (reward - self.mean)
+    self.min = min(self.min, reward)
+    self.max = max(self.max, reward)
+    if self.histogram is not None:
+      self.histogram[reward_histogram_bin(reward, len(self.histogram))] += 1
+
+  def merge(self, other: Optional["RewardStats"]) -> "RewardStats":
+    """
+    Returns the statistics for the union of the rewards summarized by this
+    instance and by other (Chan et al.'s parallel algorithm). If other is None,
+    it is treated as an empty instance. The result has a histogram only if both
+    non-empty instances have one.
+    """
+    if other is None or other.count == 0:
+      return dataclasses.replace(self, histogram=_copy_list(self.histogram))
+    if self.count == 0:
+      return dataclasses.replace(other, histogram=_copy_list(other.histogram))
+    count = self.count + other.count
+    delta = other.mean - self.mean
+    histogram = None
+    if self.histogram is not None and other.histogram is not None:
+      assert len(self.histogram) == len(other.histogram)
+      histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+    return RewardStats(
+      count=count, mean=self.mean + delta * other.count / count,
+      m2=self.m2 + other.m2 + delta * delta * self.count * other.count / count,
+      min=min(self.min, other.min), max=max(self.max, other.max),
+      histogram=histogram)
+
+  def negated(self) -> "RewardStats":
+    """Returns the statistics for the same rewards, with the sign flipped."""
+    return RewardStats(
+      count=self.count, mean=-self.mean, m2=self.m2, min=-self.max,
+      max=-self.min,
+      histogram=None if self.histogram is None else self.histogram[::-1])
+
+  @staticmethod
+  def from_constant(reward: float, count: int,
+                    num_bins: int = 0) -> "RewardStats":
+    """
+    Returns the statistics for count identical rewards. If num_bins is not zero,
+    it also fills a histogram with num_bins bins.
+    """
+    histogram = None
+    if num_bins > 0:
+      histogram = [0] * num_bins
+      histogram[reward_histogram_bin(reward, num_bins)] = count
+    return RewardStats(count=count, mean=reward, m2=0, min=reward, max=reward,
+                       histogram=histogram)
+
+
+def _copy_list(values: Optional[List]) -> Optional[List]:
+  return None if values is None else list(values)
+
+
+def reward_histogram_bin(reward: float, num_bins: int) -> int:
+  """
+  Returns the index of the bin that contains the given reward, if the interval
+  [-1, 1] is split in num_bins equal-width bins. Rewards outside this interval
+  are counted in the first or the last bin.
+  """
+  index = int((reward + 1) / 2 * num_bins)
+  return min(max(index, 0), num_bins - 1)
 
 
 @dataclasses.dataclass
@@ -36,7 +134,15 @@ class ScoringInfo:
   rewards: Optional[List[float]] = None
   """
   Individual rewards from all paths going through this action. This is filled
-  only if MctsPlayerOptions.save_rewards is True.
+  only if MctsPlayerOptions.save_rewards is True and
+  MctsPlayerOptions.stream_rewards is False.
+  """
+
+  reward_stats: Optional[RewardStats] = None
+  """
+  Running statistics for the rewards from all paths going through this action.
+  This is filled only if MctsPlayerOptions.save_rewards and
+  MctsPlayerOptions.stream_rewards are True.
   """
 
 
@@ -55,30 +161,72 @@ A list containing each action and its aggregated score. An action should only
 appear once in the output.
 """
 
-MergeScoringInfosFunc = Callable[[List[ActionsWithScores]], AggregatedScores]
+
+def merge_reward_stats(
+    actions_with_scores_list: List[ActionsWithScores]) -> Dict[
+  PlayerAction, RewardStats]:
+  """
+  Merges the reward statistics of each action across all permutations. A fully
+  simulated action counts as score.n rewards equal to score.score, with a
+  histogram that has the same number of bins as the other statistics. An action
+  that is not fully simulated and has no reward_stats adds no rewards.
+  """
+  num_bins = 0
+  for actions_with_scores in actions_with_scores_list:
+    for score in actions_with_scores.values():
+      if score.reward_stats is not None and \
+          score.reward_stats.histogram is not None:
+        num_bins = len(score.reward_stats.histogram)
+  stats = defaultdict(RewardStats)
+  for actions_with_scores in actions_with_scores_list:
+    for action, score in actions_with_scores.items():
+      if score.fully_simulated:
+        other = RewardStats.from_constant(score.score, score.n, num_bins)
+      else:
+        other = score.reward_stats
+      stats[action] = stats[action].merge(other)
+  return dict(stats)
+
+
+MergeScoringInfosFunc = Callable[..., AggregatedScores]
 """
 Function that receives the ActionWithScores dictionaries for all the
 processed permutations (i.e., one dictionary per root node) and returns a list
 with (action, score) tuples, where the score is some aggregation across all the
 root nodes for that particular action.
+If MctsPlayerOptions.collapse_equivalent_permutations is True, it also receives
+a weights keyword argument: the number of equivalent permutations that each
+dictionary stands for. The functions that compute averages weight each
+dictionary accordingly; the ones that compute confidence intervals count each
+dictionary once, since the equivalent permutations are not independent samples.
 """
 
 
+def _get_weights(actions_with_scores_list: List[ActionsWithScores],
+                 weights: Optional[List[int]]) -> List[int]:
+  if weights is None:
+    return [1] * len(actions_with_scores_list)
+  assert len(weights) == len(actions_with_scores_list)
+  return weights
+
+
 def best_action_frequency(
-    actions_with_scores_list: List[ActionsWithScores]) -> AggregatedScores:
+    actions_with_scores_list: List[ActionsWithScores],
+    weights: Optional[List[int]] = None) -> AggregatedScores:
   """
   The aggregated score returned for each action is the number of permutations
   for which the action is the best action. One or more actions are considered
   the best action(s) for a permutation if they have the maximum score among all
   actions for that particular permutation.
   """
-  best_actions = []
-  for actions_with_scores in actions_with_scores_list:
+  counter = Counter()
+  for actions_with_scores, weight in zip(
+      actions_with_scores_list, _get_weights(actions_with_scores_list,
+                                             weights)):
     max_score = max(score.score for _, score in actions_with_scores.items())
-    best_actions.extend(
-      [action for action, score in actions_with_scores.items() if
-       score.score == max_score])
-  counter = Counter(best_actions)
+    for action, score in actions_with_scores.items():
+      if score.score == max_score:
+        counter[action] += weight
   actions_and_scores = counter.most_common(10)
   logging.info("MctsPlayer: Best action counts:\n%s",
                pprint.pformat(actions_and_scores, indent=True))
@@ -113,13 +261,26 @@ def _weighted_average_merge_ucbs_func(ucbs: List[Tuple[float, int]]) -> float:
 
 
 def _average_ucb_for_fully_simulated_trees(
-    actions_with_scores_list: List[ActionsWithScores]) -> AggregatedScores:
-  stats = defaultdict(list)
-  for actions_with_scores in actions_with_scores_list:
+    actions_with_scores_list: List[ActionsWithScores],
+    weights: Optional[List[int]] = None) -> AggregatedScores:
+  # The sums and counts are indexed by PlayerAction.action_id. The action ids
+  # are also stored in the order in which the actions are first seen, so the
+  # output order is the same as when using a dict.
+  sums = [0.0] * NUM_ACTION_IDS
+  counts = [0] * NUM_ACTION_IDS
+  action_ids = []
+  for actions_with_scores, weight in zip(
+      actions_with_scores_list, _get_weights(actions_with_scores_list,
+                                             weights)):
     for action, score in actions_with_scores.items():
-      stats[action].append(score.score)
-  actions_and_scores = [(action, sum(ucb) / len(ucb)) for action, ucb in
-                        stats.items()]
+      action_id = action.action_id
+      if counts[action_id] == 0:
+        action_ids.append(action_id)
+      sums[action_id] += score.score * weight
+      counts[action_id] += weight
+  actions_and_scores = [
+    (PlayerAction.from_action_id(action_id),
+     sums[action_id] / counts[action_id]) for action_id in action_ids]
   # noinspection PyUnreachableCode
   if __debug__:
     logging.debug("MctsPlayer: Average UCBs:\n%s",
@@ -129,9 +290,12 @@ def _average_ucb_for_fully_simulated_trees(
 
 def _average_ucb_for_partially_simulated_trees(
     actions_with_scores_list: List[ActionsWithScores],
-    merge_ucb_func: MergeUcbsFunc) -> AggregatedScores:
+    merge_ucb_func: MergeUcbsFunc,
+    weights: Optional[List[int]]) -> AggregatedScores:
   stats = defaultdict(list)
-  for actions_with_scores in actions_with_scores_list:
+  for actions_with_scores, weight in zip(
+      actions_with_scores_list, _get_weights(actions_with_scores_list,
+                                             weights)):
     for action, score in actions_with_scores.items():
       if score.fully_simulated:
         q = score.score * score.n
@@ -139,7 +303,7 @@ def _average_ucb_for_partially_simulated_trees(
       else:
         q = score.q
         n = score.n
-      stats[action].append((q, n))
+      stats[action].extend([(q, n)] * weight)
   actions_and_scores = [(action, merge_ucb_func(ucbs)) for action, ucbs in
                         stats.items()]
   return actions_and_scores
@@ -158,14 +322,15 @@ def _average_ucb_for_partially_simulated_trees(
 # one.
 def _merge_ucbs(
     actions_with_scores_list: List[ActionsWithScores],
-    merge_ucb_func: MergeUcbsFunc) -> AggregatedScores:
+    merge_ucb_func: MergeUcbsFunc,
+    weights: Optional[List[int]] = None) -> AggregatedScores:
   is_fully_simulated = are_all_nodes_fully_simulated(actions_with_scores_list)
   if is_fully_simulated:
     actions_and_scores = _average_ucb_for_fully_simulated_trees(
-      actions_with_scores_list)
+      actions_with_scores_list, weights)
   else:
     actions_and_scores = _average_ucb_for_partially_simulated_trees(
-      actions_with_scores_list, merge_ucb_func)
+      actions_with_scores_list, merge_ucb_func, weights)
   # noinspection PyUnreachableCode
   if __debug__:
     logging.debug("MctsPlayer: Merged UCBs:\n%s",
@@ -175,23 +340,28 @@ def _merge_ucbs(
 
 
 def merge_ucbs_using_simple_average(
-    actions_with_scores_list: List[ActionsWithScores]) -> AggregatedScores:
-  return _merge_ucbs(actions_with_scores_list, _simple_average_merge_ucbs_func)
+    actions_with_scores_list: List[ActionsWithScores],
+    weights: Optional[List[int]] = None) -> AggregatedScores:
+  return _merge_ucbs(actions_with_scores_list, _simple_average_merge_ucbs_func,
+                     weights)
 
 
 def merge_ucbs_using_weighted_average(
-    actions_with_scores_list: List[ActionsWithScores]) -> AggregatedScores:
+    actions_with_scores_list: List[ActionsWithScores],
+    weights: Optional[List[int]] = None) -> AggregatedScores:
   return _merge_ucbs(actions_with_scores_list,
-                     _weighted_average_merge_ucbs_func)
+                     _weighted_average_merge_ucbs_func, weights)
 
 
 def average_ucb(
-    actions_with_scores_list: List[ActionsWithScores]) -> AggregatedScores:
+    actions_with_scores_list: List[ActionsWithScores],
+    weights: Optional[List[int]] = None) -> AggregatedScores:
   """
   The aggregated score for each action is the arithmetic mean of its scores
   from each permutation.
   """
-  return _average_ucb_for_fully_simulated_trees(actions_with_scores_list)
+  return _average_ucb_for_fully_simulated_trees(actions_with_scores_list,
+                                                weights)
 
 
 def _sign(score: float) -> float:
@@ -211,26 +381,36 @@ def _card_value(action: PlayerAction) -> float:
 
 
 def average_score_with_tiebreakers(
-    actions_with_scores_list: List[ActionsWithScores]) -> AggregatedScores:
+    actions_with_scores_list: List[ActionsWithScores],
+    weights: Optional[List[int]] = None) -> AggregatedScores:
   """
   The aggregated score for each action is the arithmetic mean of its scores
   from each permutation. It also uses two tiebreakers:
   * avg(q/n)
   * sign(score) * card_value
   """
-  scores = defaultdict(list)
-  rewards = defaultdict(list)
-  for actions_with_scores in actions_with_scores_list:
+  # See _average_ucb_for_fully_simulated_trees() for the array layout.
+  score_sums = [0.0] * NUM_ACTION_IDS
+  reward_sums = [0.0] * NUM_ACTION_IDS
+  counts = [0] * NUM_ACTION_IDS
+  action_ids = []
+  for actions_with_scores, weight in zip(
+      actions_with_scores_list, _get_weights(actions_with_scores_list,
+                                             weights)):
     for action, score in actions_with_scores.items():
-      scores[action].append(score.score)
-      rewards[action].append(score.q / score.n)
-  scores = {action: sum(value) / len(value) for action, value in scores.items()}
-  rewards = {action: sum(value) / len(value) for action, value in
-             rewards.items()}
-  card_values = {action: _sign(score) * _card_value(action) for action, score in
-                 scores.items()}
-  actions_and_scores = [(action, (score, rewards[action], card_values[action]))
-                        for action, score in scores.items()]
+      action_id = action.action_id
+      if counts[action_id] == 0:
+        action_ids.append(action_id)
+      score_sums[action_id] += score.score * weight
+      reward_sums[action_id] += score.q / score.n * weight
+      counts[action_id] += weight
+  actions_and_scores = []
+  for action_id in action_ids:
+    action = PlayerAction.from_action_id(action_id)
+    score = score_sums[action_id] / counts[action_id]
+    reward = reward_sums[action_id] / counts[action_id]
+    actions_and_scores.append(
+      (action, (score, reward, _sign(score) * _card_value(action))))
   # noinspection PyUnreachableCode
   if __debug__:
     logging.debug("MctsPlayer: Average UCBs with tiebreakers:\n%s",
@@ -239,7 +419,8 @@ def average_score_with_tiebreakers(
 
 
 def count_visits(
-    actions_with_scores_list: List[ActionsWithScores]) -> AggregatedScores:
+    actions_with_scores_list: List[ActionsWithScores],
+    weights: Optional[List[int]] = None) -> AggregatedScores:
   """
   If all permutations are fully simulated, this is identical to average_ucb().
   Otherwise, the aggregated score for each action is the total number of visits
@@ -248,9 +429,19 @@ def count_visits(
   is_fully_simulated = are_all_nodes_fully_simulated(actions_with_scores_list)
   if is_fully_simulated:
     return _average_ucb_for_fully_simulated_trees(
-      actions_with_scores_list)
-  stats = defaultdict(float)
-  for action_with_scores in actions_with_scores_list:
+      actions_with_scores_list, weights)
+  # See _average_ucb_for_fully_simulated_trees() for the array layout.
+  visits = [0.0] * NUM_ACTION_IDS
+  seen = [False] * NUM_ACTION_IDS
+  action_ids = []
+  for action_with_scores, weight in zip(
+      actions_with_scores_list, _get_weights(actions_with_scores_list,
+                                             weights)):
     for action, scoring_info in action_with_scores.items():
-      stats[action] += scoring_info.n
-  return list(stats.items())
+      action_id = action.action_id
+      if not seen[action_id]:
+        seen[action_id] = True
+        action_ids.append(action_id)
+      visits[action_id] += scoring_info.n * weight
+  return [(PlayerAction.from_action_id(action_id), visits[action_id])
+          for action_id in action_ids]
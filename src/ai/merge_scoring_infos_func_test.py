@@ -2,14 +2,17 @@
 #  Use of this source code is governed by a BSD-style license that can be
 #  found in the LICENSE file.
 
+import statistics
 import unittest
-from typing import Dict
+from typing import Dict, List
 
 from ai.merge_scoring_infos_func import ScoringInfo, best_action_frequency, \
   average_ucb, count_visits, merge_ucbs_using_simple_average, \
-  merge_ucbs_using_weighted_average, average_score_with_tiebreakers
+  merge_ucbs_using_weighted_average, average_score_with_tiebreakers, \
+  RewardStats, reward_histogram_bin, merge_reward_stats
 from ai.merge_scoring_infos_func_with_deps import \
-  merge_ucbs_using_lower_ci_bound, lower_ci_bound_on_raw_rewards
+  merge_ucbs_using_lower_ci_bound, lower_ci_bound_on_raw_rewards, \
+  reward_stats_confidence_interval
 from model.card import Card
 from model.card_value import CardValue
 from model.player_action import PlayCardAction, PlayerAction, \
@@ -18,6 +21,83 @@ from model.player_id import PlayerId
 from model.suit import Suit
 
 
+def _reward_stats(rewards: List[float], num_bins: int = 0) -> RewardStats:
+  reward_stats = RewardStats(histogram=[0] * num_bins if num_bins else None)
+  for reward in rewards:
+    reward_stats.add(reward)
+  return reward_stats
+
+
+class RewardStatsTest(unittest.TestCase):
+  def test_empty(self):
+    reward_stats = RewardStats()
+    self.assertEqual(0, reward_stats.count)
+    self.assertEqual(0, reward_stats.mean)
+    self.assertEqual(0, reward_stats.variance)
+
+  def test_add(self):
+    rewards = [1, 0.33, -0.66, 1, -1, 0.33, 0.66]
+    reward_stats = _reward_stats(rewards, num_bins=4)
+    self.assertEqual(len(rewards), reward_stats.count)
+    self.assertAlmostEqual(statistics.mean(rewards), reward_stats.mean)
+    self.assertAlmostEqual(statistics.variance(rewards), reward_stats.variance)
+    self.assertEqual(-1, reward_stats.min)
+    self.assertEqual(1, reward_stats.max)
+    self.assertEqual([2, 0, 2, 3], reward_stats.histogram)
+
+  def test_merge(self):
+    rewards_1 = [1, 0.33, -0.66, 1]
+    rewards_2 = [-1, 0.33, 0.66]
+    merged = _reward_stats(rewards_1, 4).merge(_reward_stats(rewards_2, 4))
+    expected = _reward_stats(rewards_1 + rewards_2, 4)
+    self.assertEqual(expected.count, merged.count)
+    self.assertAlmostEqual(expected.mean, merged.mean)
+    self.assertAlmostEqual(expected.m2, merged.m2)
+    self.assertEqual(expected.min, merged.min)
+    self.assertEqual(expected.max, merged.max)
+    self.assertEqual(expected.histogram, merged.histogram)
+
+    merged = RewardStats().merge(_reward_stats(rewards_1))
+    self.assertEqual(_reward_stats(rewards_1), merged)
+    merged = _reward_stats(rewards_1).merge(RewardStats())
+    self.assertEqual(_reward_stats(rewards_1), merged)
+    merged = _reward_stats(rewards_1, 4).merge(None)
+    self.assertEqual(_reward_stats(rewards_1, 4), merged)
+
+  def test_merge_with_constant_keeps_the_histogram(self):
+    rewards = [1, 0.33, -0.66, 1]
+    merged = _reward_stats(rewards, 4).merge(
+      RewardStats.from_constant(-0.33, 3, num_bins=4))
+    self.assertEqual(_reward_stats(rewards + [-0.33] * 3, 4).histogram,
+                     merged.histogram)
+
+  def test_negated(self):
+    reward_stats = _reward_stats([1, 0.33, 0.66, -0.66], num_bins=4).negated()
+    expected = _reward_stats([-1, -0.33, -0.66, 0.66], num_bins=4)
+    self.assertEqual(expected.count, reward_stats.count)
+    self.assertAlmostEqual(expected.mean, reward_stats.mean)
+    self.assertAlmostEqual(expected.m2, reward_stats.m2)
+    self.assertEqual(expected.min, reward_stats.min)
+    self.assertEqual(expected.max, reward_stats.max)
+    self.assertEqual(expected.histogram, reward_stats.histogram)
+
+  def test_from_constant(self):
+    self.assertEqual(_reward_stats([0.33] * 5),
+                     RewardStats.from_constant(0.33, 5))
+    self.assertEqual(_reward_stats([0.33] * 5, num_bins=4),
+                     RewardStats.from_constant(0.33, 5, num_bins=4))
+
+  def test_histogram_bin(self):
+    self.assertEqual(0, reward_histogram_bin(-1, 4))
+    self.assertEqual(0, reward_histogram_bin(-0.6, 4))
+    self.assertEqual(1, reward_histogram_bin(-0.33, 4))
+    self.assertEqual(2, reward_histogram_bin(0, 4))
+    self.assertEqual(3, reward_histogram_bin(0.66, 4))
+    self.assertEqual(3, reward_histogram_bin(1, 4))
+    self.assertEqual(0, reward_histogram_bin(-3, 4))
+    self.assertEqual(3, reward_histogram_bin(3, 4))
+
+
 class BestActionFrequencyTest(unittest.TestCase):
   def test(self):
     actions_and_scores_list = [
@@ -639,3 +719,123 @@ class LowerCiBoundOnRawRewardsTest(unittest.TestCase):
     }
     for action, score in actions_and_scores:
       self.assertAlmostEqual(expected_scores[action], score, delta=0.1)
+
+  def test_streamed_rewards(self):
+    ace = PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.ACE))
+    ten = PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.TEN))
+    king = PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.KING))
+    ace_rewards = [[1, 1, 1, 1, 1, 0], [1, 1, 1, 0, 0, 0, -1, 0.33]]
+    ten_rewards = [[2, 2, 0.33, -0.33], [1, 1, 1, 2, 0, 0]]
+    actions_and_scores_list = [
+      {
+        ace: ScoringInfo(q=5, n=6, score=5 / 6, fully_simulated=False,
+                         terminal=False,
+                         reward_stats=_reward_stats(ace_rewards[0])),
+        ten: ScoringInfo(q=4, n=4, score=1, fully_simulated=False,
+                         terminal=False,
+                         reward_stats=_reward_stats(ten_rewards[0])),
+        king: ScoringInfo(q=3, n=3, score=1, fully_simulated=True,
+                          terminal=False),
+      },
+      {
+        ace: ScoringInfo(q=2.33, n=8, score=2.33 / 8, fully_simulated=False,
+                         terminal=False,
+                         reward_stats=_reward_stats(ace_rewards[1])),
+        ten: ScoringInfo(q=5, n=6, score=5 / 6, fully_simulated=False,
+                         terminal=False,
+                         reward_stats=_reward_stats(ten_rewards[1])),
+      },
+    ]
+    actions_and_scores = lower_ci_bound_on_raw_rewards(actions_and_scores_list,
+                                                       debug=True)
+    expected_ci = {
+      ace: reward_stats_confidence_interval(
+        _reward_stats(ace_rewards[0] + ace_rewards[1])),
+      ten: reward_stats_confidence_interval(
+        _reward_stats(ten_rewards[0] + ten_rewards[1])),
+      king: (1, 1),
+    }
+    self.assertEqual(3, len(actions_and_scores))
+    for action, score, score_low, score_upp in actions_and_scores:
+      self.assertAlmostEqual(expected_ci[action][0], score)
+      self.assertAlmostEqual(expected_ci[action][0], score_low)
+      self.assertAlmostEqual(expected_ci[action][1], score_upp)
+    self.assertLess(expected_ci[ace][0], expected_ci[ace][1])
+    self.assertLess(expected_ci[ten][0], expected_ci[ten][1])
+
+  def test_streamed_rewards_with_missing_reward_stats(self):
+    ace = PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.ACE))
+    ten = PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.TEN))
+    actions_and_scores_list = [
+      {
+        ace: ScoringInfo(q=2, n=3, score=2 / 3, fully_simulated=False,
+                         terminal=False,
+                         reward_stats=_reward_stats([1, 1, 0], num_bins=4)),
+        ten: ScoringInfo(q=0, n=0, score=0, fully_simulated=False,
+                         terminal=False),
+      },
+      {
+        ace: ScoringInfo(q=2, n=2, score=1, fully_simulated=True,
+                         terminal=False),
+        ten: ScoringInfo(q=-1, n=1, score=-1, fully_simulated=False,
+                         terminal=False,
+                         reward_stats=_reward_stats([-1], num_bins=4)),
+      },
+    ]
+    merged_stats = merge_reward_stats(actions_and_scores_list)
+    self.assertEqual(_reward_stats([1, 1, 0, 1, 1], num_bins=4).histogram,
+                     merged_stats[ace].histogram)
+    self.assertEqual(_reward_stats([-1], num_bins=4), merged_stats[ten])
+    actions_and_scores = lower_ci_bound_on_raw_rewards(actions_and_scores_list)
+    self.assertEqual(2, len(actions_and_scores))
+    self.assertEqual(-1, dict(actions_and_scores)[ten])
+
+
+class WeightsTest(unittest.TestCase):
+  def setUp(self):
+    ace = PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.ACE))
+    ten = PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.TEN))
+    self._actions_and_scores_list = [
+      {
+        ace: ScoringInfo(q=5, n=6, score=5 / 6, fully_simulated=False,
+                         terminal=False, rewards=[1, 1, 1, 1, 1, 0]),
+        ten: ScoringInfo(q=2, n=4, score=0.5, fully_simulated=False,
+                         terminal=False, rewards=[1, 1, 0, 0]),
+      },
+      {
+        ace: ScoringInfo(q=-1, n=4, score=-0.25, fully_simulated=False,
+                         terminal=False, rewards=[1, -1, -1, 0]),
+        ten: ScoringInfo(q=3, n=3, score=1, fully_simulated=True,
+                         terminal=False),
+      },
+    ]
+    self._weights = [3, 1]
+    self._replicated_list = \
+      [self._actions_and_scores_list[0]] * 3 + \
+      [self._actions_and_scores_list[1]]
+
+  def test_averages_are_weighted(self):
+    for merge_func in [best_action_frequency, average_ucb, count_visits,
+                       average_score_with_tiebreakers,
+                       merge_ucbs_using_simple_average,
+                       merge_ucbs_using_weighted_average]:
+      self.assertEqual(
+        merge_func(self._replicated_list),
+        merge_func(self._actions_and_scores_list, weights=self._weights),
+        msg=merge_func.__name__)
+
+  def test_confidence_intervals_count_each_group_once(self):
+    for actions_with_scores in self._actions_and_scores_list:
+      for score in actions_with_scores.values():
+        if score.rewards is not None:
+          score.reward_stats = _reward_stats(score.rewards)
+    unweighted = lower_ci_bound_on_raw_rewards(self._actions_and_scores_list,
+                                               debug=True)
+    self.assertEqual(unweighted, lower_ci_bound_on_raw_rewards(
+      self._actions_and_scores_list, debug=True, weights=self._weights))
+    # Replicating a group would make the confidence intervals narrower.
+    replicated = dict((action, (low, upp)) for action, _, low, upp in
+                      lower_ci_bound_on_raw_rewards(self._replicated_list,
+                                                    debug=True))
+    for action, _, low, upp in unweighted:
+      self.assertLess(replicated[action][1] - replicated[action][0], upp - low)
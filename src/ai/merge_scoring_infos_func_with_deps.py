@@ -9,14 +9,14 @@ import logging
 import pprint
 from collections import defaultdict
 
-from typing import List, Tuple, Union
+from typing import List, Tuple, Union, Dict, Optional
 
 import numpy as np
-from scipy.stats import bootstrap
+from scipy.stats import bootstrap, t
 
 from ai.merge_scoring_infos_func import ActionsWithScores, AggregatedScores, \
   _merge_ucbs, are_all_nodes_fully_simulated, \
-  _average_ucb_for_fully_simulated_trees
+  _average_ucb_for_fully_simulated_trees, RewardStats, merge_reward_stats
 from model.player_action import PlayerAction
 
 
@@ -29,55 +29,95 @@ def _lower_ci_bound(ucbs: List[Tuple[float, int]]) -> float:
 
 
 def merge_ucbs_using_lower_ci_bound(
-    actions_with_scores_list: List[ActionsWithScores]) -> AggregatedScores:
+    actions_with_scores_list: List[ActionsWithScores],
+    weights: Optional[List[int]] = None) -> AggregatedScores:
   """
   The aggregated score is the lower CI bound of the mean of the scores coming
-  from each permutation.
+  from each permutation. The weights are only used if all the permutations are
+  fully simulated and the scores are averaged; otherwise each group of
+  equivalent permutations is counted once (see MergeScoringInfosFunc).
   """
+  if are_all_nodes_fully_simulated(actions_with_scores_list):
+    return _average_ucb_for_fully_simulated_trees(actions_with_scores_list,
+                                                  weights)
   return _merge_ucbs(actions_with_scores_list, _lower_ci_bound)
 
 
+def reward_stats_confidence_interval(
+    reward_stats: RewardStats,
+    confidence_level: float = 0.95) -> Tuple[float, float]:
+  """
+  Returns the confidence interval for the mean of the rewards summarized by
+  reward_stats, computed using the t-distribution.
+  """
+  if reward_stats.count < 2 or reward_stats.m2 == 0:
+    return reward_stats.mean, reward_stats.mean
+  std_error = np.sqrt(reward_stats.variance / reward_stats.count)
+  low, high = t.interval(confidence_level, reward_stats.count - 1,
+                         loc=reward_stats.mean, scale=std_error)
+  return float(low), float(high)
+
+
+def _bootstrap_confidence_interval(rewards: List[float]) -> Tuple[float, float]:
+  if len(rewards) == 1:
+    return rewards[0], rewards[0]
+  bootstrap_result = bootstrap((rewards,), np.mean, method='percentile',
+                               n_resamples=1000)
+  confidence_interval = bootstrap_result.confidence_interval
+  return confidence_interval.low, confidence_interval.high
+
+
+def _get_confidence_intervals(
+    actions_with_scores_list: List[ActionsWithScores]) -> Dict[
+  PlayerAction, Tuple[float, float]]:
+  """
+  Returns the confidence interval for the mean reward of each action. It uses
+  the merged RewardStats if the rewards were streamed and bootstrapping on the
+  individual rewards otherwise.
+  """
+  if any(score.reward_stats is not None
+         for actions_with_scores in actions_with_scores_list
+         for score in actions_with_scores.values()):
+    return {action: reward_stats_confidence_interval(reward_stats) for
+            action, reward_stats in
+            merge_reward_stats(actions_with_scores_list).items()}
+  rewards = defaultdict(list)
+  for actions_with_scores in actions_with_scores_list:
+    for action, score in actions_with_scores.items():
+      rewards[action].extend(
+        [score.score] * score.n if score.fully_simulated else score.rewards)
+  return {action: _bootstrap_confidence_interval(action_rewards) for
+          action, action_rewards in rewards.items()}
+
+
 def lower_ci_bound_on_raw_rewards(
     actions_with_scores_list: List[ActionsWithScores],
-    debug: bool = False) -> Union[
+    debug: bool = False, weights: Optional[List[int]] = None) -> Union[
   AggregatedScores, List[Tuple[PlayerAction, float, float, float]]]:
   """
   The aggregated score is the lower CI bound of the mean of all the individual
   rewards across all permutations (i.e., it doesn't compute averages for each
   permutation first). This requires MctsPlayerOptions.save_rewards to be True.
+  If MctsPlayerOptions.stream_rewards is also True, the CI is computed from the
+  merged RewardStats using the t-distribution instead of bootstrapping.
   If debug is True, the output contains the CI limits as well.
-  WARNING: This is very slow.
+  The weights are only used if all the permutations are fully simulated and the
+  scores are averaged; otherwise each group of equivalent permutations is
+  counted once (see MergeScoringInfosFunc).
+  WARNING: This is very slow, unless the rewards are streamed.
   """
-  # pylint: disable=too-many-branches
   is_fully_simulated = are_all_nodes_fully_simulated(actions_with_scores_list)
   if is_fully_simulated:
-    return _average_ucb_for_fully_simulated_trees(actions_with_scores_list)
-
-  stats = defaultdict(list)
-  for actions_with_scores in actions_with_scores_list:
-    for action, score in actions_with_scores.items():
-      if score.fully_simulated:
-        stats[action].extend([score.score for _ in range(score.n)])
-      else:
-        stats[action].extend(score.rewards)
+    return _average_ucb_for_fully_simulated_trees(actions_with_scores_list,
+                                                  weights)
 
   actions_and_scores = []
-  for action, rewards in stats.items():
-    if len(rewards) == 1:
-      if debug:
-        actions_and_scores.append((action, rewards[0], rewards[0], rewards[0]))
-      else:
-        actions_and_scores.append((action, rewards[0]))
+  for action, (ci_low, ci_upp) in _get_confidence_intervals(
+      actions_with_scores_list).items():
+    if debug:
+      actions_and_scores.append((action, ci_low, ci_low, ci_upp))
     else:
-      bootstrap_result = bootstrap((rewards,), np.mean, method='percentile',
-                                   n_resamples=1000)
-      confidence_interval = bootstrap_result.confidence_interval
-      if debug:
-        actions_and_scores.append((action, confidence_interval.low,
-                                   confidence_interval.low,
-                                   confidence_interval.high))
-      else:
-        actions_and_scores.append((action, confidence_interval.low))
+      actions_and_scores.append((action, ci_low))
   # noinspection PyUnreachableCode
   if __debug__:
     logging.debug("MctsPlayer: Lower CI bounds on raw rewards:\n%s",
@@ -4,12 +4,15 @@
 
 # pylint: disable=invalid-name
 
+import functools
 import itertools
 import logging
 import math
 import random
-from typing import List, Callable, Optional, Generator, TypeVar, Any
+from typing import List, Callable, Optional, Generator, TypeVar, Any, Tuple, \
+  Iterator
 
+from ai.sims_table_increments import SIMS_TABLE_INCREMENTS
 from model.card import Card
 
 _T = TypeVar("_T")
@@ -65,20 +68,21 @@ def dispersion(permutations: List[Permutation], m: int) -> float:
 
 
 PermutationsGenerator = Callable[
-  [List[Card], int, Optional[int]], List[List[Card]]]
+  [List[Card], int, Optional[int]], Iterator[List[Card]]]
 """
 A function that receives the list of unknown cards, the number of unknown cards
 in the opponent's hand (M) and an optional number of permutations requested (N).
-It returns N permutations of unknown cards, where the first M are always sorted.
-If N is None, it returns all possible permutations of unknown cards where the
-first M are sorted.
+It returns an iterator over N permutations of unknown cards, where the first M
+are always sorted. If N is None, it iterates over all possible permutations of
+unknown cards where the first M are sorted. The permutations are generated
+lazily, so the callers that stop early don't pay for the rest of them.
 """
 
 
 def random_perm_generator(cards_set: List[Card],
                           num_opponent_unknown_cards: int,
                           num_permutations_requested: Optional[int],
-                          seed: Optional[Any] = None) -> List[
+                          seed: Optional[Any] = None) -> Iterator[
   Permutation[Card]]:
   """
   A simple implementation of a PermutationsGenerator. It generates permutations
@@ -86,30 +90,37 @@ def random_perm_generator(cards_set: List[Card],
   manages to generate num_permutations_requested unique examples.
   Advantages: High dispersion. Fast for a small number of permutations.
   Disadvantages: Slow for a high number of permutations requested (e.g., 1000).
+  Its memory usage is deliberately not flat: the rejection of duplicates needs
+  all the permutations generated so far, so it grows linearly with the number
+  of permutations, even if the caller consumes them in batches. Use
+  floyd_perm_generator() for unique random permutations that only keep a small
+  integer rank per permutation.
   """
   assert num_opponent_unknown_cards <= len(cards_set)
   rng = random.Random(seed)
-  permutations = set()
+  generated_permutations = set()
   if num_permutations_requested is None:
     num_unknown_cards = len(cards_set)
     num_permutations_requested = \
       math.comb(num_unknown_cards, num_opponent_unknown_cards) * \
       math.perm(num_unknown_cards - num_opponent_unknown_cards)
-  while len(permutations) < num_permutations_requested:
-    permutation = [card.copy() for card in cards_set]
+  while len(generated_permutations) < num_permutations_requested:
+    permutation = list(cards_set)
     rng.shuffle(permutation)
     # noinspection PyTypeChecker
     permutation = sorted(permutation[:num_opponent_unknown_cards]) + \
                   permutation[num_opponent_unknown_cards:]
-    permutations.add(tuple(permutation))
-  permutations = list(list(p) for p in permutations)
-  return permutations
+    key = tuple(permutation)
+    if key in generated_permutations:
+      continue
+    generated_permutations.add(key)
+    yield permutation
 
 
 def lexicographic_perm_generator(
     cards_set: List[Card],
     num_opponent_unknown_cards: int,
-    num_permutations_requested: Optional[int]) -> List[Permutation[Card]]:
+    num_permutations_requested: Optional[int]) -> Iterator[Permutation[Card]]:
   """
   A PermutationsGenerator that generates permutations in lexicographic order:
   for each sorted combination of num_opponent_unknown_cards from cards_set, it
@@ -120,17 +131,101 @@ def lexicographic_perm_generator(
   Disadvantages: Very very low dispersion.
   """
   assert num_opponent_unknown_cards <= len(cards_set)
-  permutations = []
+  num_permutations_generated = 0
   for opponent_cards in itertools.combinations(cards_set,
                                                num_opponent_unknown_cards):
     remaining_cards = set(cards_set) - set(opponent_cards)
     for remaining_cards_permutation in itertools.permutations(remaining_cards):
-      permutations.append(
-        list(opponent_cards) + list(remaining_cards_permutation))
+      yield list(opponent_cards) + list(remaining_cards_permutation)
+      num_permutations_generated += 1
       if num_permutations_requested is not None:
-        if len(permutations) >= num_permutations_requested:
-          return permutations
-  return permutations
+        if num_permutations_generated >= num_permutations_requested:
+          return
+
+
+def _unrank_combination(rank: int, n: int, m: int) -> List[int]:
+  """
+  Returns the combination of m elements from [0, 1, ..., n-1] that has the
+  given rank in lexicographic order. The combination is sorted.
+  """
+  combination = []
+  x = 0
+  for k in range(m, 0, -1):
+    while True:
+      num_combinations_starting_with_x = math.comb(n - x - 1, k - 1)
+      if rank < num_combinations_starting_with_x:
+        break
+      rank -= num_combinations_starting_with_x
+      x += 1
+    combination.append(x)
+    x += 1
+  return combination
+
+
+def unrank_permutation(rank: int, n: int, m: int) -> Permutation[int]:
+  """
+  Maps an integer from [0, comb(n, m) * perm(n - m)) to a permutation of
+  [0, 1, ..., n-1], where the first m entries are sorted. The rank is split in
+  the rank of the combination formed by the first m entries (lexicographic
+  order) and the Lehmer code of the order of the remaining n - m entries.
+  """
+  num_orders = math.factorial(n - m)
+  combination_rank, order_rank = divmod(rank, num_orders)
+  assert combination_rank < math.comb(n, m), (rank, n, m)
+  combination = _unrank_combination(combination_rank, n, m)
+  remaining = sorted(set(range(n)).difference(combination))
+  permutation = combination
+  for i in range(n - m, 0, -1):
+    index, order_rank = divmod(order_rank, math.factorial(i - 1))
+    permutation.append(remaining.pop(index))
+  return permutation
+
+
+def _floyd_sample(population_size: int, sample_size: int,
+                  rng: random.Random) -> List[int]:
+  """
+  Samples sample_size distinct integers from [0, population_size) using
+  Floyd's algorithm: it needs exactly sample_size random numbers, regardless of
+  how close sample_size is to population_size. The result is shuffled.
+  """
+  sample = set()
+  for j in range(population_size - sample_size, population_size):
+    t = rng.randint(0, j)
+    sample.add(j if t in sample else t)
+  sample = list(sample)
+  rng.shuffle(sample)
+  return sample
+
+
+def floyd_perm_generator(cards_set: List[Card],
+                         num_opponent_unknown_cards: int,
+                         num_permutations_requested: Optional[int],
+                         seed: Optional[Any] = None) -> Iterator[
+  Permutation[Card]]:
+  """
+  A PermutationsGenerator that samples num_permutations_requested distinct
+  ranks using Floyd's algorithm and converts each one of them to a permutation
+  using unrank_permutation().
+  Advantages: High dispersion. Constant work per permutation, even if all the
+  possible permutations are requested.
+  Disadvantages: Slower than random_perm_generator for a small number of
+  permutations requested.
+  """
+  assert num_opponent_unknown_cards <= len(cards_set)
+  rng = random.Random(seed)
+  n = len(cards_set)
+  m = num_opponent_unknown_cards
+  total_permutations = math.comb(n, m) * math.perm(n - m)
+  if num_permutations_requested is None:
+    num_permutations_requested = total_permutations
+  num_permutations_requested = min(num_permutations_requested,
+                                   total_permutations)
+  for rank in _floyd_sample(total_permutations, num_permutations_requested,
+                            rng):
+    permutation = unrank_permutation(rank, n, m)
+    # noinspection PyTypeChecker
+    yield sorted(cards_set[i] for i in permutation[:m]) + \
+          [cards_set[i] for i in permutation[m:]]
 
 
 def _is_relative_prime(x: int, y: int) -> bool:
@@ -158,6 +253,26 @@ def _next_relative_prime(i: int, r: int) -> int:
 MixedRadixNumber = List[int]
 """The order of digits is from the least significant to the most significant."""
 
+SCHNAPSEN_N_M_PAIRS: List[Tuple[int, int]] = [
+  (n, m) for n in range(1, 15) for m in range(min(5, n) + 1)]
+"""
+All the (n, m) pairs for which SimsTablePermGenerator can be used in a game of
+Schnapsen: there are at most 14 unseen cards (20 cards, minus the five cards in
+the player's hand and the trump card) and at most five of them can be in the
+opponent's hand.
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def get_best_increment(n: int, m: int) -> Optional[int]:
+  """
+  Returns the precomputed increment that maximizes the dispersion of the
+  permutations generated by SimsTablePermGenerator(n, m) or None if (n, m) is
+  not in SCHNAPSEN_N_M_PAIRS. The table is generated by
+  ai/eval/generate_sims_table_increments.py.
+  """
+  return SIMS_TABLE_INCREMENTS.get((n, m), None)
+
 
 class SimsTablePermGenerator:
   def __init__(self, n: int, m: int = 0, counter: Optional[int] = None,
@@ -175,7 +290,8 @@ class SimsTablePermGenerator:
     randomly.
     :param increment: An integer used to define the order in which the
     following permutations are generated. If None, it will be initialized with a
-    value that maximizes the dispersion.
+    value that maximizes the dispersion, using the precomputed table if (n, m)
+    is in SCHNAPSEN_N_M_PAIRS or searching for it otherwise.
     """
     assert 0 <= m <= n, (n, m)
     self._n = n
@@ -184,9 +300,8 @@ class SimsTablePermGenerator:
     self._counter = counter if m != n else 0
     if counter is None:
       self._counter = random.randint(0, self._r - 1)
-    # TODO(optimization): Maybe precompute this for all (n, m) combinations in a
-    #  game of Schnapsen.
-    self._increment = increment or self._find_best_increment()
+    self._increment = \
+      increment or get_best_increment(n, m) or self._find_best_increment()
     assert self._increment > 0, self._increment
 
   def _find_best_increment(self, max_searches: int = 100) -> int:
@@ -268,7 +383,7 @@ class SimsTablePermGenerator:
 def sims_table_perm_generator(
     cards_set: List[Card],
     num_opponent_unknown_cards: int,
-    num_permutations_requested: Optional[int]) -> List[Permutation[Card]]:
+    num_permutations_requested: Optional[int]) -> Iterator[Permutation[Card]]:
   """
   A PermutationsGenerator that tries to generate the permutations in an order
   that maximizes dispersion.
@@ -280,5 +395,5 @@ def sims_table_perm_generator(
   assert num_opponent_unknown_cards <= len(cards_set)
   perm_generator = SimsTablePermGenerator(len(cards_set),
                                           num_opponent_unknown_cards)
-  permutations = list(perm_generator.permutations(num_permutations_requested))
-  return [[cards_set[i] for i in permutation] for permutation in permutations]
+  for permutation in perm_generator.permutations(num_permutations_requested):
+    yield [cards_set[i] for i in permutation]
@@ -4,6 +4,7 @@
 
 # pylint: disable=invalid-name
 
+import math
 import os
 import time
 import unittest
@@ -12,9 +13,11 @@ from typing import List
 import pandas
 from matplotlib import pyplot as plt
 
+from ai import permutations_with_deps
 from ai.permutations import random_perm_generator, lexicographic_perm_generator, \
   SimsTablePermGenerator, distance, dispersion, sims_table_perm_generator, \
-  PermutationsGenerator
+  PermutationsGenerator, get_best_increment, SCHNAPSEN_N_M_PAIRS, \
+  floyd_perm_generator, unrank_permutation
 from model.card import Card
 
 
@@ -23,17 +26,17 @@ class RandomPermGeneratorTest(unittest.TestCase):
     all_cards = Card.get_all_cards()
     seed = 1234
 
-    permutations = random_perm_generator(all_cards[:6], 0, 10, seed)
+    permutations = list(random_perm_generator(all_cards[:6], 0, 10, seed))
     self.assertEqual(10, len(permutations))
     self.assertEqual(len(set(tuple(p) for p in permutations)),
                      len(permutations))
 
-    permutations = random_perm_generator(all_cards[:6], 0, None, seed)
+    permutations = list(random_perm_generator(all_cards[:6], 0, None, seed))
     self.assertEqual(720, len(permutations))
     self.assertEqual(len(set(tuple(p) for p in permutations)),
                      len(permutations))
 
-    permutations = random_perm_generator(all_cards[:6], 4, None, seed)
+    permutations = list(random_perm_generator(all_cards[:6], 4, None, seed))
     self.assertEqual(30, len(permutations))
     self.assertEqual(len(set(tuple(p) for p in permutations)),
                      len(permutations))
@@ -42,30 +45,91 @@ class RandomPermGeneratorTest(unittest.TestCase):
       self.assertEqual(sorted(permutation[:4]), permutation[:4], msg=i)
 
     with self.assertRaises(AssertionError):
-      random_perm_generator(all_cards[:6], 20, 10)
+      list(random_perm_generator(all_cards[:6], 20, 10))
 
     # Test the default RNG
-    permutations = random_perm_generator(all_cards[:6], 0, 10)
+    permutations = list(random_perm_generator(all_cards[:6], 0, 10))
     self.assertEqual(10, len(permutations))
     self.assertEqual(len(set(tuple(p) for p in permutations)),
                      len(permutations))
 
 
+class FloydPermGeneratorTest(unittest.TestCase):
+  def test_unrank_permutation(self):
+    for n, m in [(1, 0), (4, 0), (5, 2), (6, 4), (5, 5)]:
+      total = math.comb(n, m) * math.perm(n - m)
+      permutations = [unrank_permutation(rank, n, m) for rank in range(total)]
+      self.assertEqual(total, len(set(tuple(p) for p in permutations)))
+      for permutation in permutations:
+        self.assertEqual(list(range(n)), sorted(permutation))
+        self.assertEqual(sorted(permutation[:m]), permutation[:m])
+      # The ranks follow the lexicographic order.
+      self.assertEqual(sorted(permutations), permutations)
+    self.assertEqual([0, 1, 2, 3, 4], unrank_permutation(0, 5, 2))
+    self.assertEqual([0, 1, 2, 4, 3], unrank_permutation(1, 5, 2))
+    self.assertEqual([0, 2, 1, 3, 4], unrank_permutation(6, 5, 2))
+    self.assertEqual([3, 4, 2, 1, 0], unrank_permutation(59, 5, 2))
+    with self.assertRaises(AssertionError):
+      unrank_permutation(60, 5, 2)
+
+  def test(self):
+    all_cards = Card.get_all_cards()
+    seed = 1234
+
+    permutations = list(floyd_perm_generator(all_cards[:6], 0, 10, seed))
+    self.assertEqual(10, len(permutations))
+    self.assertEqual(len(set(tuple(p) for p in permutations)),
+                     len(permutations))
+    self.assertEqual(permutations,
+                     list(floyd_perm_generator(all_cards[:6], 0, 10, seed)))
+
+    permutations = list(floyd_perm_generator(all_cards[:6], 0, None, seed))
+    self.assertEqual(720, len(permutations))
+    self.assertEqual(len(set(tuple(p) for p in permutations)),
+                     len(permutations))
+
+    permutations = list(floyd_perm_generator(all_cards[:6], 4, None, seed))
+    self.assertEqual(30, len(permutations))
+    self.assertEqual(len(set(tuple(p) for p in permutations)),
+                     len(permutations))
+    for i, permutation in enumerate(permutations):
+      # noinspection PyTypeChecker
+      self.assertEqual(sorted(permutation[:4]), permutation[:4], msg=i)
+
+    # The number of requested permutations is higher than the total number of
+    # permutations that can be generated.
+    permutations = list(floyd_perm_generator(all_cards[:6], 4, 70, seed))
+    self.assertEqual(30, len(set(tuple(p) for p in permutations)))
+
+    # All the cards are in the opponent's hand.
+    permutations = list(floyd_perm_generator(all_cards[:6], 6, 10, seed))
+    self.assertEqual([sorted(all_cards[:6])], permutations)
+
+    with self.assertRaises(AssertionError):
+      list(floyd_perm_generator(all_cards[:6], 20, 10))
+
+    # Test the default RNG
+    permutations = list(floyd_perm_generator(all_cards[:14], 5, 1000))
+    self.assertEqual(1000, len(permutations))
+    self.assertEqual(len(set(tuple(p) for p in permutations)),
+                     len(permutations))
+
+
 class LexicographicPermGeneratorTest(unittest.TestCase):
   def test(self):
     all_cards = Card.get_all_cards()
 
-    permutations = lexicographic_perm_generator(all_cards[:6], 0, 10)
+    permutations = list(lexicographic_perm_generator(all_cards[:6], 0, 10))
     self.assertEqual(10, len(permutations))
     self.assertEqual(len(set(tuple(p) for p in permutations)),
                      len(permutations))
 
-    permutations = lexicographic_perm_generator(all_cards[:6], 0, None)
+    permutations = list(lexicographic_perm_generator(all_cards[:6], 0, None))
     self.assertEqual(720, len(permutations))
     self.assertEqual(len(set(tuple(p) for p in permutations)),
                      len(permutations))
 
-    permutations = lexicographic_perm_generator(all_cards[:6], 4, None)
+    permutations = list(lexicographic_perm_generator(all_cards[:6], 4, None))
     self.assertEqual(30, len(permutations))
     self.assertEqual(len(set(tuple(p) for p in permutations)),
                      len(permutations))
@@ -76,18 +140,19 @@ class LexicographicPermGeneratorTest(unittest.TestCase):
     # The number of requested permutations is higher than the total number of
     # permutations that can be generated.
     self.assertEqual(permutations,
-                     lexicographic_perm_generator(all_cards[:6], 4, 70))
+                     list(lexicographic_perm_generator(all_cards[:6], 4, 70)))
 
     # Test that the permutations are generated in the expected order.
     index_permutations = [[0, 1, 2, 3, 4], [0, 1, 2, 4, 3], [0, 1, 3, 4, 2],
                           [0, 2, 3, 4, 1], [1, 2, 3, 4, 0]]
     expected_permutations = [[all_cards[index] for index in perm] for perm in
                              index_permutations]
-    self.assertEqual(expected_permutations,
-                     lexicographic_perm_generator(all_cards[:5], 4, None))
+    self.assertEqual(
+      expected_permutations,
+      list(lexicographic_perm_generator(all_cards[:5], 4, None)))
 
     with self.assertRaises(AssertionError):
-      lexicographic_perm_generator(all_cards[:6], 20, 10)
+      list(lexicographic_perm_generator(all_cards[:6], 20, 10))
 
 
 class SimsTablePermGeneratorTest(unittest.TestCase):
@@ -211,6 +276,18 @@ class SimsTablePermGeneratorTest(unittest.TestCase):
                                 "Not all permutations have the same size"):
       dispersion([[0, 1, 2, 3, 4], [0, 1, 2]], 2)
 
+  def test_precomputed_increments(self):
+    for n, m in SCHNAPSEN_N_M_PAIRS:
+      r = math.factorial(n) // math.factorial(m)
+      increment = get_best_increment(n, m)
+      self.assertIsNotNone(increment, msg=(n, m))
+      self.assertGreater(increment, 0, msg=(n, m))
+      self.assertEqual(1, math.gcd(increment, r), msg=(n, m))
+      # pylint: disable=protected-access
+      self.assertEqual(increment, SimsTablePermGenerator(n, m)._increment)
+    self.assertIsNone(get_best_increment(15, 5))
+    self.assertIsNone(get_best_increment(7, 6))
+
   @unittest.skip("Should only be run manually for debugging")
   @staticmethod
   def test_best_increment():
@@ -233,17 +310,17 @@ class SimsTablePermGeneratorTest(unittest.TestCase):
   def test_sims_table_permutations(self):
     all_cards = Card.get_all_cards()
 
-    permutations = sims_table_perm_generator(all_cards[:6], 0, 10)
+    permutations = list(sims_table_perm_generator(all_cards[:6], 0, 10))
     self.assertEqual(10, len(permutations))
     self.assertEqual(len(set(tuple(p) for p in permutations)),
                      len(permutations))
 
-    permutations = sims_table_perm_generator(all_cards[:6], 0, None)
+    permutations = list(sims_table_perm_generator(all_cards[:6], 0, None))
     self.assertEqual(720, len(permutations))
     self.assertEqual(len(set(tuple(p) for p in permutations)),
                      len(permutations))
 
-    permutations = sims_table_perm_generator(all_cards[:6], 4, None)
+    permutations = list(sims_table_perm_generator(all_cards[:6], 4, None))
     self.assertEqual(30, len(permutations))
     self.assertEqual(len(set(tuple(p) for p in permutations)),
                      len(permutations))
@@ -258,7 +335,44 @@ class SimsTablePermGeneratorTest(unittest.TestCase):
                          sims_table_perm_generator(all_cards[:6], 4, 70)))
 
     with self.assertRaises(AssertionError):
-      sims_table_perm_generator(all_cards[:6], 20, 10)
+      list(sims_table_perm_generator(all_cards[:6], 20, 10))
+
+
+class VectorizedMetricsTest(unittest.TestCase):
+  def test_to_index_matrix(self):
+    cards = Card.get_all_cards()[:4]
+    permutations = [[cards[2], cards[0], cards[3], cards[1]],
+                    [cards[0], cards[1], cards[2], cards[3]]]
+    self.assertEqual([[2, 0, 3, 1], [0, 1, 2, 3]],
+                     permutations_with_deps.to_index_matrix(
+                       permutations).tolist())
+
+  def test_distance_matrix(self):
+    cards = Card.get_all_cards()[:9]
+    for m in range(6):
+      permutations = list(random_perm_generator(cards, m, 20, seed=m))
+      distances = permutations_with_deps.distance_matrix(permutations, m)
+      for i, p1 in enumerate(permutations):
+        for j, p2 in enumerate(permutations):
+          self.assertAlmostEqual(distance(p1, p2, m), distances[i, j],
+                                 msg=(m, i, j))
+
+  def test_dispersion(self):
+    cards = Card.get_all_cards()[:14]
+    for perm_generator in [random_perm_generator,
+                           lexicographic_perm_generator,
+                           sims_table_perm_generator]:
+      for m in [0, 3, 5]:
+        permutations = list(perm_generator(cards, m, 50))
+        for chunk_size in [1, 7, 512]:
+          self.assertAlmostEqual(
+            dispersion(permutations, m),
+            permutations_with_deps.dispersion(permutations, m,
+                                              chunk_size=chunk_size),
+            msg=(perm_generator.__name__, m, chunk_size))
+    self.assertEqual(1, permutations_with_deps.dispersion(
+      [[0, 1, 2, 3, 4], [3, 2, 1, 4, 0]], 2))
+    self.assertEqual(0, permutations_with_deps.dispersion([[0, 1, 2, 3, 4]], 2))
 
 
 class PermutationsEval(unittest.TestCase):
@@ -273,8 +387,8 @@ class PermutationsEval(unittest.TestCase):
       if run_id % 10 == 0:
         print(".", end="", flush=True)
       start_time = time.process_time()
-      permutations = perm_gen(cards_set, num_opponent_unknown_cards,
-                              num_permutations_requested)
+      permutations = list(perm_gen(cards_set, num_opponent_unknown_cards,
+                                   num_permutations_requested))
       end_time = time.process_time()
       assert len(permutations) > 0
       timing_data.append(end_time - start_time)
@@ -287,7 +401,8 @@ class PermutationsEval(unittest.TestCase):
     num_runs = 10
     permutations_generators = [random_perm_generator,
                                lexicographic_perm_generator,
-                               sims_table_perm_generator]
+                               sims_table_perm_generator,
+                               floyd_perm_generator]
     num_generators = len(permutations_generators)
     generator_columns = []
     series = []
@@ -340,10 +455,10 @@ class PermutationsEval(unittest.TestCase):
     for run_id in range(num_runs):
       if run_id % 10 == 0:
         print(".", end="", flush=True)
-      permutations = perm_gen(cards_set, num_opponent_unknown_cards,
-                              num_permutations_requested)
-      dispersion_data.append(
-        dispersion(permutations, num_opponent_unknown_cards))
+      permutations = list(perm_gen(cards_set, num_opponent_unknown_cards,
+                                   num_permutations_requested))
+      dispersion_data.append(permutations_with_deps.dispersion(
+        permutations, num_opponent_unknown_cards))
     return dispersion_data
 
   @unittest.skip("Should only be run manually for eval purposes")
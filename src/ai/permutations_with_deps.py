@@ -0,0 +1,141 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+# This file contains the vectorized versions of the permutation metrics from
+# ai/permutations.py. They add a dependency on numpy and are only used for
+# evaluating the permutation generators.
+
+# pylint: disable=invalid-name
+
+import dataclasses
+import math
+from typing import Sequence
+
+import numpy as np
+
+from ai.permutations import Permutation
+
+
+def to_index_matrix(permutations: Sequence[Permutation]) -> np.ndarray:
+  """
+  Converts a list of N permutations of the same n elements (e.g., Cards) to an
+  (N x n) integer matrix, where each element is replaced by its index in the
+  sorted list of elements.
+  """
+  assert len(set(len(permutation) for permutation in permutations)) == 1, \
+    "Not all permutations have the same size"
+  elements = {element: i for i, element in enumerate(sorted(permutations[0]))}
+  return np.array(
+    [[elements[element] for element in permutation] for permutation in
+     permutations], dtype=np.int64).reshape(len(permutations), -1)
+
+
+def _one_hot(permutations: np.ndarray, num_values: int,
+             weights: np.ndarray) -> np.ndarray:
+  """
+  Returns a (N x (n * num_values)) matrix where row i has weights[j] in column
+  j * num_values + permutations[i, j] and zeros everywhere else.
+  """
+  num_permutations, n = permutations.shape
+  one_hot = np.zeros((num_permutations, n * num_values))
+  columns = np.arange(n) * num_values + permutations
+  one_hot[np.arange(num_permutations)[:, None], columns] = weights
+  return one_hot
+
+
+@dataclasses.dataclass(frozen=True)
+class _Encodings:
+  """
+  The one-hot encodings needed to express the two components of distance() as
+  matrix multiplications:
+    * the number of common elements in the first m positions of two
+      permutations is the dot product of their indicator vectors;
+    * the weighted number of equal elements in the remaining positions is the
+      dot product of their weighted one-hot encodings.
+  """
+
+  m: int
+  w: float
+
+  prefix: np.ndarray
+  """The indicator vectors of the first m elements of each permutation."""
+
+  weighted_suffix: np.ndarray
+  """The weighted one-hot encodings of the remaining elements."""
+
+  suffix: np.ndarray
+  """The one-hot encodings of the remaining elements."""
+
+  total_weight: float
+  normalization: float
+
+
+def _encode(permutations: np.ndarray, m: int, w: float) -> _Encodings:
+  num_permutations, n = permutations.shape
+  num_values = int(permutations.max()) + 1 if permutations.size > 0 else 0
+  prefix = np.zeros((num_permutations, num_values))
+  if m > 0:
+    rows = np.arange(num_permutations)[:, None]
+    prefix[rows, permutations[:, :m]] = 1
+  suffix = permutations[:, m:]
+  weights = np.array(
+    [2 ** math.ceil((n - 1 - i) / 2) for i in range(m, n)], dtype=float)
+  return _Encodings(
+    m=m, w=w, prefix=prefix,
+    weighted_suffix=_one_hot(suffix, num_values, weights),
+    suffix=_one_hot(suffix, num_values, np.ones_like(weights)),
+    total_weight=weights.sum(),
+    normalization=1 / (4 * (2 ** ((n - m - 1) / 2)) - 3))
+
+
+def _distances(encodings: _Encodings, start: int, end: int) -> np.ndarray:
+  """
+  Returns the ((end - start) x N) matrix with the distances between the
+  permutations from the rows [start, end) and all permutations.
+  """
+  m = encodings.m
+  if m > 0:
+    common_in_first_m = encodings.prefix[start:end] @ encodings.prefix.T
+    first_term = (m - common_in_first_m) / m
+  else:
+    first_term = 0
+  equal_weights = \
+    encodings.weighted_suffix[start:end] @ encodings.suffix.T
+  second_term = \
+    (encodings.total_weight - equal_weights) * encodings.normalization
+  return (encodings.w * first_term + second_term) / (encodings.w + 1)
+
+
+def distance_matrix(permutations: Sequence[Permutation], m: int,
+                    w: float = 2) -> np.ndarray:
+  """
+  Returns the (N x N) matrix with the distances between all pairs of
+  permutations, as defined by ai.permutations.distance(). The permutations can
+  be a list of lists or an (N x n) integer matrix.
+  """
+  if not isinstance(permutations, np.ndarray):
+    permutations = to_index_matrix(permutations)
+  return _distances(_encode(permutations, m, w), 0, permutations.shape[0])
+
+
+def dispersion(permutations: Sequence[Permutation], m: int, w: float = 2,
+               chunk_size: int = 512) -> float:
+  """
+  Vectorized version of ai.permutations.dispersion(). It computes the distances
+  for chunk_size permutations at a time, so the memory usage is
+  O(chunk_size * N) instead of O(N^2).
+  """
+  if not isinstance(permutations, np.ndarray):
+    permutations = to_index_matrix(permutations)
+  num_permutations = permutations.shape[0]
+  if num_permutations < 2:
+    # There are no pairs of permutations.
+    return 0.0
+  encodings = _encode(permutations, m, w)
+  total = 0
+  for start in range(0, num_permutations, chunk_size):
+    end = min(start + chunk_size, num_permutations)
+    total += _distances(encodings, start, end).sum()
+  # The distance matrix is symmetric and the diagonal is zero.
+  return total / (num_permutations * (num_permutations - 1))
@@ -111,7 +111,7 @@ class RandomPlayerTest(unittest.TestCase):
       ace_clubs = game_state.trump_card
       game_state.trump_card = jack_spades
       game_state.trump = jack_spades.suit
-      jack_spades.public = True
+      game_state.set_public(jack_spades)
       game_state.cards_in_hand.one.append(ace_clubs)
     self.assertEqual({AnnounceMarriageAction(PlayerId.TWO, king_clubs),
                       AnnounceMarriageAction(PlayerId.TWO, queen_clubs),
@@ -0,0 +1,88 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+# Generated by ai/eval/generate_sims_table_increments.py. Do not edit.
+
+from typing import Dict, Tuple
+
+SIMS_TABLE_INCREMENTS: Dict[Tuple[int, int], int] = {
+  (1, 0): 1,
+  (1, 1): 1,
+  (2, 0): 1,
+  (2, 1): 1,
+  (2, 2): 1,
+  (3, 0): 5,
+  (3, 1): 5,
+  (3, 2): 2,
+  (3, 3): 1,
+  (4, 0): 11,
+  (4, 1): 11,
+  (4, 2): 5,
+  (4, 3): 3,
+  (4, 4): 1,
+  (5, 0): 17,
+  (5, 1): 89,
+  (5, 2): 7,
+  (5, 3): 17,
+  (5, 4): 4,
+  (5, 5): 1,
+  (6, 0): 403,
+  (6, 1): 103,
+  (6, 2): 257,
+  (6, 3): 67,
+  (6, 4): 13,
+  (6, 5): 5,
+  (7, 0): 3397,
+  (7, 1): 4457,
+  (7, 2): 1543,
+  (7, 3): 617,
+  (7, 4): 163,
+  (7, 5): 37,
+  (8, 0): 14237,
+  (8, 1): 31459,
+  (8, 2): 11657,
+  (8, 3): 5557,
+  (8, 4): 1297,
+  (8, 5): 277,
+  (9, 0): 328723,
+  (9, 1): 223747,
+  (9, 2): 79057,
+  (9, 3): 50051,
+  (9, 4): 13187,
+  (9, 5): 1285,
+  (10, 0): 3167021,
+  (10, 1): 2449957,
+  (10, 2): 293477,
+  (10, 3): 135337,
+  (10, 4): 125243,
+  (10, 5): 8453,
+  (11, 0): 26701613,
+  (11, 1): 25567067,
+  (11, 2): 10635377,
+  (11, 3): 5154953,
+  (11, 4): 97183,
+  (11, 5): 189611,
+  (12, 0): 88616267,
+  (12, 1): 330773141,
+  (12, 2): 215665447,
+  (12, 3): 31987817,
+  (12, 4): 11016139,
+  (12, 5): 593909,
+  (13, 0): 5056139009,
+  (13, 1): 3970159619,
+  (13, 2): 1331429887,
+  (13, 3): 227946097,
+  (13, 4): 181179373,
+  (13, 5): 13671971,
+  (14, 0): 12144281573,
+  (14, 1): 60208531847,
+  (14, 2): 39103748063,
+  (14, 3): 11005761857,
+  (14, 4): 1138591277,
+  (14, 5): 384564233,
+}
+"""
+The increment that maximizes the average dispersion of the first six
+permutations generated by SimsTablePermGenerator(n, m), keyed by (n, m).
+"""
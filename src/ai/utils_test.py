@@ -315,7 +315,7 @@ class GetUnseenCardsTest(unittest.TestCase):
 
   def test_game_view_with_public_talon_cards(self):
     game_state = get_game_state_for_tests()
-    game_state.talon[0].public = True
+    game_state.set_public(game_state.talon[0])
     game_view = game_state.next_player_view()
     unseen_cards = get_unseen_cards(game_view)
     self.assertEqual([Card(Suit.SPADES, CardValue.JACK),
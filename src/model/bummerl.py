@@ -58,7 +58,8 @@ class Bummerl:
     """
     assert self._game is None, "Game in progress"
     assert not self.is_over, f"Bummerl is over: {self.game_points}"
-    self._game = Game(dealer=self._next_dealer, seed=seed or int(time.time()))
+    self._game = Game(dealer=self._next_dealer,
+                      seed=seed if seed is not None else int(time.time()))
     self._next_dealer = self._next_dealer.opponent()
     return self._game
 
@@ -5,11 +5,17 @@
 import dataclasses
 
 from model.card_value import CardValue
+from model.slotted_dataclass import SLOTS, SlottedDataclass
 from model.suit import Suit
 
 
-@dataclasses.dataclass(order=True, unsafe_hash=True)
-class Card:
+# Default value for the Card.__new__() arguments, used to distinguish between a
+# missing argument and None.
+_NO_ARGUMENT = object()
+
+
+@dataclasses.dataclass(order=True, frozen=True, init=False, **SLOTS)
+class Card(SlottedDataclass):
   """
   Class representing a playing card.
 
@@ -19,23 +25,60 @@ class Card:
   To check if a card wins a trick against a different card, given a trump suit,
   use Card.wins().
 
-  The public field tells whether the card was seen by both players in a game of
-  Schnapsen (e.g., the card was played, or it's the trump card).
+  Cards are immutable and interned: there is only one instance for each of the
+  20 cards, so Card(suit, card_value) always returns the same object and cards
+  can be shared between game states without copying them. Whether a card was
+  seen by both players in a game of Schnapsen (e.g., the card was played, or
+  it's the trump card) is tracked by GameState.is_public().
   """
   suit: Suit
   card_value: CardValue
-  public: bool = dataclasses.field(default=False, repr=False, compare=False,
-                                   hash=False)
-
-  def __post_init__(self):
-    if self.card_value is None or self.suit is None:
-      raise ValueError("card_value and suit cannot be None")
-    if not isinstance(self.suit, Suit):
-      raise TypeError(
-        f"suit must be an instance of Suit, not {type(self.suit)}.")
-    if not isinstance(self.card_value, CardValue):
-      raise TypeError("card_value must be an instance of CardValue, " +
-                      f"not {type(self.card_value)}.")
+  index: int = dataclasses.field(repr=False, compare=False)
+  """The position of this card in Card.get_all_cards(), in [0, 20)."""
+
+  def __new__(cls, suit: Suit = _NO_ARGUMENT,
+              card_value: CardValue = _NO_ARGUMENT) -> "Card":
+    if suit is _NO_ARGUMENT and card_value is _NO_ARGUMENT:
+      # Only used when unpickling the cards that were pickled before the cards
+      # were interned. See __setstate__().
+      return object.__new__(cls)
+    if __debug__:
+      if card_value is None or suit is None:
+        raise ValueError("card_value and suit cannot be None")
+      if not isinstance(suit, Suit):
+        raise TypeError(f"suit must be an instance of Suit, not {type(suit)}.")
+      if not isinstance(card_value, CardValue):
+        raise TypeError("card_value must be an instance of CardValue, " +
+                        f"not {type(card_value)}.")
+    return _CARDS[(suit, card_value)]
+
+  def __eq__(self, other):
+    if self is other:
+      return True
+    if not isinstance(other, Card):
+      return NotImplemented
+    # Only cards unpickled from legacy pickles are not interned.
+    return self.index == other.index
+
+  def __hash__(self):
+    return self.index
+
+  def __reduce__(self):
+    return Card, (self.suit, self.card_value)
+
+  def __setstate__(self, state) -> None:
+    # Cards pickled before they were interned also store a public flag, which
+    # is now tracked by GameState.
+    object.__setattr__(self, "suit", state["suit"])
+    object.__setattr__(self, "card_value", state["card_value"])
+    object.__setattr__(self, "index",
+                       _CARDS[(self.suit, self.card_value)].index)
+
+  def __copy__(self) -> "Card":
+    return self
+
+  def __deepcopy__(self, memo) -> "Card":
+    return self
 
   def __str__(self):
     return f"{self.card_value}{self.suit}"
@@ -43,11 +86,7 @@ class Card:
   @staticmethod
   def get_all_cards():
     """Returns all the 20 cards sorted in display order."""
-    deck = []
-    for suit in Suit:
-      for card_value in CardValue:
-        deck.append(Card(suit, card_value))
-    return deck
+    return list(_CARDS.values())
 
   def wins(self, other: "Card", trump_suit: Suit) -> bool:
     """
@@ -89,7 +128,21 @@ class Card:
 
   def copy(self) -> "Card":
     """
-    Returns a new card instance having the same suit and card value as this
-    card.
+    Cards are immutable and interned, so this returns the same instance. It is
+    kept for backwards compatibility.
     """
-    return Card(suit=self.suit, card_value=self.card_value, public=self.public)
+    return self
+
+
+def _create_card(suit: Suit, card_value: CardValue, index: int) -> Card:
+  card = object.__new__(Card)
+  object.__setattr__(card, "suit", suit)
+  object.__setattr__(card, "card_value", card_value)
+  object.__setattr__(card, "index", index)
+  return card
+
+
+_CARDS = {}
+for _suit in Suit:
+  for _card_value in CardValue:
+    _CARDS[(_suit, _card_value)] = _create_card(_suit, _card_value, len(_CARDS))
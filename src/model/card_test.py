@@ -2,6 +2,8 @@
 #  Use of this source code is governed by a BSD-style license that can be
 #  found in the LICENSE file.
 
+import copy
+import dataclasses
 import random
 import unittest
 from pickle import dumps, loads
@@ -42,54 +44,53 @@ class CardTest(unittest.TestCase):
   def test_serialization(self):
     for card_value in CardValue:
       for suit in Suit:
-        card = Card(suit, card_value, True)
-        self.assertEqual(card, loads(dumps(card)))
+        card = Card(suit, card_value)
+        self.assertIs(card, loads(dumps(card)))
+
+  def test_unpickle_legacy_cards(self):
+    # Cards pickled before they were interned store their fields in a dict,
+    # including the public flag.
+    card = Card.__new__(Card)
+    card.__setstate__({"suit": Suit.DIAMONDS, "card_value": CardValue.ACE,
+                       "public": True})
+    self.assertIsNot(Card(Suit.DIAMONDS, CardValue.ACE), card)
+    self.assertEqual(Card(Suit.DIAMONDS, CardValue.ACE), card)
+    self.assertEqual(hash(Card(Suit.DIAMONDS, CardValue.ACE)), hash(card))
+    self.assertIn(card, Card.get_all_cards())
 
   def test_hash_and_eq(self):
     card_set = {Card(Suit.DIAMONDS, CardValue.ACE),
                 Card(Suit.DIAMONDS, CardValue.KING)}
     self.assertEqual(2, len(card_set), card_set)
     card_set = {Card(Suit.DIAMONDS, CardValue.ACE),
-                Card(Suit.DIAMONDS, CardValue.ACE, True),
+                Card(Suit.DIAMONDS, CardValue.ACE),
                 Card(Suit.DIAMONDS, CardValue.KING)}
     self.assertEqual(2, len(card_set), card_set)
     self.assertEqual({Card(Suit.DIAMONDS, CardValue.ACE),
                       Card(Suit.DIAMONDS, CardValue.KING)}, card_set)
-    self.assertEqual({Card(Suit.DIAMONDS, CardValue.ACE, True),
-                      Card(Suit.DIAMONDS, CardValue.KING)},
-                     card_set)
-    card_set = {Card(Suit.DIAMONDS, CardValue.ACE),
-                Card(Suit.DIAMONDS, CardValue.ACE, True),
-                Card(Suit.DIAMONDS, CardValue.KING, True)}
-    self.assertEqual(2, len(card_set), card_set)
-    self.assertEqual({Card(Suit.DIAMONDS, CardValue.ACE),
-                      Card(Suit.DIAMONDS, CardValue.KING)}, card_set)
-    self.assertEqual({Card(Suit.DIAMONDS, CardValue.ACE, True),
-                      Card(Suit.DIAMONDS, CardValue.KING)},
-                     card_set)
-    card_set = {Card(Suit.DIAMONDS, CardValue.ACE),
-                Card(Suit.DIAMONDS, CardValue.ACE, True),
-                Card(Suit.DIAMONDS, CardValue.ACE, False),
-                Card(Suit.DIAMONDS, CardValue.ACE, True)}
-    self.assertEqual(1, len(card_set), card_set)
     self.assertNotEqual(object(), Card(Suit.DIAMONDS, CardValue.ACE))
+    self.assertNotEqual(Card(Suit.DIAMONDS, CardValue.KING),
+                        Card(Suit.DIAMONDS, CardValue.ACE))
+
+  def test_interned(self):
+    self.assertIs(Card(Suit.DIAMONDS, CardValue.ACE),
+                  Card(Suit.DIAMONDS, CardValue.ACE))
+    self.assertIs(Card(Suit.DIAMONDS, CardValue.ACE),
+                  Card.from_string("ad"))
+    self.assertIs(Card(Suit.DIAMONDS, CardValue.KING),
+                  Card(Suit.DIAMONDS, CardValue.QUEEN).marriage_pair)
+    for index, card in enumerate(Card.get_all_cards()):
+      self.assertEqual(index, card.index)
+      self.assertIs(card, Card(card.suit, card.card_value))
 
   def test_order(self):
     # Sort by suit first.
     self.assertLess(Card(Suit.HEARTS, CardValue.ACE),
                     Card(Suit.DIAMONDS, CardValue.KING))
-    self.assertLess(Card(Suit.HEARTS, CardValue.ACE, True),
-                    Card(Suit.DIAMONDS, CardValue.KING, False))
-    self.assertLess(Card(Suit.HEARTS, CardValue.ACE, False),
-                    Card(Suit.DIAMONDS, CardValue.KING, True))
 
     # For same suit, sort by card value.
     self.assertLess(Card(Suit.HEARTS, CardValue.KING),
                     Card(Suit.HEARTS, CardValue.ACE))
-    self.assertLess(Card(Suit.HEARTS, CardValue.KING, True),
-                    Card(Suit.HEARTS, CardValue.ACE), False)
-    self.assertLess(Card(Suit.HEARTS, CardValue.KING, False),
-                    Card(Suit.HEARTS, CardValue.ACE), True)
 
     # Sort the whole deck, check the first and last card.
     deck = Card.get_all_cards()
@@ -152,20 +153,9 @@ class CardTest(unittest.TestCase):
       Card.from_string("multiple_chars")
 
   def test_copy(self):
-    card1 = Card(Suit.HEARTS, CardValue.TEN, True)
-    card2 = card1.copy()
-    self.assertEqual(card1, card2)
-    self.assertIsNot(card1, card2)
-    card2.suit = Suit.DIAMONDS
-    self.assertNotEqual(card1, card2)
-    self.assertEqual(Suit.HEARTS, card1.suit)
-    card2.suit = Suit.HEARTS
-    self.assertEqual(card1, card2)
-    card2.card_value = CardValue.ACE
-    self.assertNotEqual(card1, card2)
-    self.assertEqual(CardValue.TEN, card1.card_value)
-    card2.card_value = CardValue.TEN
-    self.assertEqual(card1, card2)
-    card2.public = False
-    self.assertEqual(card1, card2)
-    self.assertTrue(card1.public)
+    card = Card(Suit.HEARTS, CardValue.TEN)
+    self.assertIs(card, card.copy())
+    self.assertIs(card, copy.copy(card))
+    self.assertIs(card, copy.deepcopy(card))
+    with self.assertRaises(dataclasses.FrozenInstanceError):
+      card.suit = Suit.DIAMONDS
@@ -2,10 +2,11 @@
 #  Use of this source code is governed by a BSD-style license that can be
 #  found in the LICENSE file.
 
-from typing import List, Any
+import bisect
+from typing import List, Any, Optional
 
 from model.game_state import GameState
-from model.player_action import PlayerAction
+from model.player_action import PlayerAction, PlayCardAction
 from model.player_id import PlayerId
 
 
@@ -15,16 +16,33 @@ class Game:
   the dealer ID and the random seed used to shuffle the deck) and a list of
   player actions that were performed so far. The game could not be over yet.
   It supports pickling/unpickling.
+
+  It also keeps a snapshot of the game state at the beginning of the game and
+  after each completed trick, so state_at() only has to replay the actions from
+  the current trick. The snapshots are deep copies, so they are not affected if
+  the current game state is modified in place (e.g., by PlayerAction.apply()).
   """
 
   def __init__(self, dealer: PlayerId, seed: Any):
     self._dealer = dealer
     self._seed = seed
-    self._game_state: GameState = GameState.new(dealer=dealer, random_seed=seed)
+    self._game_state: Optional[GameState] = GameState.new(dealer=dealer,
+                                                          random_seed=seed)
     self._actions: List[PlayerAction] = []
+    # The number of actions executed before each snapshot, in increasing order,
+    # and the corresponding game states.
+    self._snapshot_action_counts: Optional[List[int]] = [0]
+    self._snapshots: Optional[List[GameState]] = [
+      self._game_state.deep_copy()]
 
   @property
   def game_state(self) -> GameState:
+    """
+    The current state of the game. After unpickling, it is recreated the first
+    time it is accessed.
+    """
+    if self._game_state is None:
+      self._replay()
     return self._game_state
 
   @property
@@ -47,27 +65,74 @@ class Game:
     Executes the given player action. The action must be a legal action in the
     current state of the game.
     """
-    assert not self._game_state.is_game_over
+    assert not self.game_state.is_game_over
     self._actions.append(action)
+    self._execute(action)
+
+  def state_at(self, num_actions: int) -> GameState:
+    """
+    Returns the game state after the first num_actions actions were executed.
+    It replays at most the actions from one trick, starting from the closest
+    snapshot. The returned game state can be shared with the Game object, its
+    snapshots and the other states returned by this method, so it must not be
+    modified in place (use GameState.deep_copy() for that).
+    """
+    if not 0 <= num_actions <= len(self._actions):
+      raise IndexError(f"Invalid number of actions: {num_actions}")
+    if self._game_state is None:
+      self._replay()
+    if num_actions == len(self._actions):
+      return self._game_state
+    i = bisect.bisect_right(self._snapshot_action_counts, num_actions) - 1
+    game_state = self._snapshots[i]
+    for action in self._actions[self._snapshot_action_counts[i]:num_actions]:
+      game_state = action.execute(game_state)
+    return game_state
+
+  def _execute(self, action: PlayerAction) -> None:
+    """
+    Executes the last action from self._actions and saves a snapshot if it
+    completed a trick.
+    """
     self._game_state = action.execute(self._game_state)
+    if isinstance(action, PlayCardAction) and \
+        self._game_state.current_trick.one is None and \
+        self._game_state.current_trick.two is None:
+      self._snapshot_action_counts.append(len(self._actions))
+      self._snapshots.append(self._game_state.deep_copy())
+
+  def _replay(self) -> None:
+    """Recreates the game state and the snapshots by executing all actions."""
+    actions = self._actions
+    self._game_state = GameState.new(dealer=self._dealer,
+                                     random_seed=self._seed)
+    self._snapshot_action_counts = [0]
+    self._snapshots = [self._game_state.deep_copy()]
+    self._actions = []
+    for action in actions:
+      self._actions.append(action)
+      self._execute(action)
 
   def __getstate__(self):
     """
     Returns the object that should be saved during pickling.
-    Doesn't export the current game state. It can be recreated by starting from
-    the same initial state and performing all the actions when unpickling.
+    Doesn't export the current game state and the snapshots. They can be
+    recreated by starting from the same initial state and performing all the
+    actions.
     """
     state = self.__dict__.copy()
     del state['_game_state']
+    del state['_snapshot_action_counts']
+    del state['_snapshots']
     return state
 
   def __setstate__(self, state):
     """
-    Restore the instance variable and recreate the game state by executing all
-    the player actions.
+    Restore the instance variables. The game state and the snapshots are
+    recreated lazily, the first time they are needed, so unpickling many games
+    (e.g., to only read their seeds and actions) is cheap.
     """
     self.__dict__.update(state)
-    self._game_state: GameState = GameState.new(dealer=self._dealer,
-                                                random_seed=self._seed)
-    for action in self._actions:
-      self._game_state = action.execute(self._game_state)
+    self._game_state = None
+    self._snapshot_action_counts = None
+    self._snapshots = None
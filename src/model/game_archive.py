@@ -0,0 +1,365 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+"""
+An append-only binary archive for recorded games. A game is fully determined by
+its dealer, the seed used to shuffle the deck and the list of player actions, so
+the archive only stores these and uses PlayerAction.action_id to store each
+action in one byte. A typical game takes about 30 bytes, compared to about
+800 bytes for a pickled Game object.
+
+An archive consists of two files:
+
+  * The data file (e.g., "games.sga") starts with _MAGIC followed by the game
+    records. Each record has a fixed-size header (see _RECORD_HEADER) followed
+    by the seed (eight bytes, either an int64 or a float64) and the action ids.
+  * The index file (the data file path + ".idx") stores the offset of each
+    record in the data file, as little-endian uint64 values.
+
+Both files are only appended to, the records are never modified. If a writer is
+interrupted, the index can be behind the data file or the data file can end with
+a partial record; the next writer truncates the partial record and rebuilds the
+index, while readers ignore the partial record and scan the data file if the
+index is not consistent with it.
+
+The games from the same bummerl share the same bummerl_id and are stored in the
+order in which they were played, so the Bummerl objects can be recreated as
+well.
+"""
+
+import dataclasses
+import mmap
+import os
+import struct
+from typing import Union, Optional, Iterator, List
+
+from model.bummerl import Bummerl
+from model.game import Game
+from model.player_action import PlayerAction
+from model.player_id import PlayerId
+
+_MAGIC = b"SGA\x01"
+_INDEX_SUFFIX = ".idx"
+
+# Flags (bit 0: the dealer is player TWO; bit 1: the seed is a float), the
+# number of actions and the bummerl id.
+_RECORD_HEADER = struct.Struct("<BBI")
+_INT_SEED = struct.Struct("<q")
+_FLOAT_SEED = struct.Struct("<d")
+_OFFSET = struct.Struct("<Q")
+
+_DEALER_IS_TWO = 1
+_FLOAT_SEED_FLAG = 2
+_NO_BUMMERL = 0xFFFFFFFF
+
+Seed = Union[int, float]
+
+
+@dataclasses.dataclass(frozen=True)
+class GameRecord:
+  """The minimal information needed to recreate a Game."""
+
+  seed: Seed
+  """The seed used to shuffle the deck at the beginning of the game."""
+
+  dealer: PlayerId
+  """The player that was the dealer at the beginning of the game."""
+
+  action_ids: bytes
+  """The action ids of the player actions executed in the game, in order."""
+
+  bummerl_id: Optional[int] = None
+  """
+  The games from the same bummerl have the same bummerl_id. It is None for games
+  that are not part of a bummerl.
+  """
+
+  @staticmethod
+  def from_game(game: Game, bummerl_id: Optional[int] = None) -> "GameRecord":
+    return GameRecord(game.seed, game.dealer,
+                      bytes(action.action_id for action in game.actions),
+                      bummerl_id)
+
+  def to_game(self) -> Game:
+    """Recreates the Game by executing all the actions from the record."""
+    game = Game(dealer=self.dealer, seed=self.seed)
+    for action_id in self.action_ids:
+      game.play_action(PlayerAction.from_action_id(action_id))
+    return game
+
+
+def get_index_path(path: str) -> str:
+  """Returns the path of the index file for the archive stored at path."""
+  return path + _INDEX_SUFFIX
+
+
+def _encode_record(record: GameRecord) -> bytes:
+  flags = _DEALER_IS_TWO if record.dealer == PlayerId.TWO else 0
+  if isinstance(record.seed, float):
+    flags |= _FLOAT_SEED_FLAG
+    seed = _FLOAT_SEED.pack(record.seed)
+  elif isinstance(record.seed, int) and -2 ** 63 <= record.seed < 2 ** 63:
+    seed = _INT_SEED.pack(record.seed)
+  else:
+    raise ValueError(
+      f"Only int64 and float seeds can be archived: {record.seed!r}")
+  if len(record.action_ids) > 0xFF:
+    raise ValueError(f"Too many actions: {len(record.action_ids)}")
+  bummerl_id = _NO_BUMMERL if record.bummerl_id is None else record.bummerl_id
+  return _RECORD_HEADER.pack(flags, len(record.action_ids),
+                             bummerl_id) + seed + record.action_ids
+
+
+def _get_record_size(data, offset: int) -> int:
+  """
+  Returns the size of the record that starts at offset, or -1 if data only
+  contains a partial record at that offset.
+  """
+  if offset + _RECORD_HEADER.size > len(data):
+    return -1
+  num_actions = data[offset + 1]
+  size = _RECORD_HEADER.size + _INT_SEED.size + num_actions
+  return size if offset + size <= len(data) else -1
+
+
+def _decode_record(data, offset: int) -> GameRecord:
+  flags, num_actions, bummerl_id = _RECORD_HEADER.unpack_from(data, offset)
+  offset += _RECORD_HEADER.size
+  seed_struct = _FLOAT_SEED if flags & _FLOAT_SEED_FLAG else _INT_SEED
+  seed = seed_struct.unpack_from(data, offset)[0]
+  offset += seed_struct.size
+  return GameRecord(
+    seed=seed,
+    dealer=PlayerId.TWO if flags & _DEALER_IS_TWO else PlayerId.ONE,
+    action_ids=bytes(data[offset:offset + num_actions]),
+    bummerl_id=None if bummerl_id == _NO_BUMMERL else bummerl_id)
+
+
+def _scan_offsets(data) -> List[int]:
+  """Returns the offsets of all the complete records from the data file."""
+  offsets = []
+  offset = len(_MAGIC)
+  while True:
+    size = _get_record_size(data, offset)
+    if size < 0:
+      return offsets
+    offsets.append(offset)
+    offset += size
+
+
+def _check_magic(data, path: str) -> None:
+  if bytes(data[:len(_MAGIC)]) != _MAGIC:
+    raise ValueError(f"Not a game archive: {path}")
+
+
+def _index_is_consistent(data, index) -> bool:
+  """
+  Returns True if the index contains exactly the offsets of all the complete
+  records from the data file. It only checks the last record, since the files
+  are only appended to.
+  """
+  if len(index) % _OFFSET.size != 0:
+    return False
+  if len(index) == 0:
+    return _get_record_size(data, len(_MAGIC)) < 0
+  last_offset = _OFFSET.unpack_from(index, len(index) - _OFFSET.size)[0]
+  if last_offset < len(_MAGIC) or last_offset >= len(data):
+    return False
+  size = _get_record_size(data, last_offset)
+  return _get_record_size(data, last_offset + size) < 0 < size
+
+
+class GameArchiveWriter:
+  """
+  Appends games to an archive. If the archive doesn't exist, it is created. It
+  can be used as a context manager, which closes the archive on exit. The
+  records are buffered, so they are visible to readers only after flush() or
+  close().
+  """
+
+  def __init__(self, path: str):
+    self._path = path
+    index_path = get_index_path(path)
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+      with open(path, "wb") as data_file:
+        data_file.write(_MAGIC)
+      with open(index_path, "wb"):
+        pass
+      self._next_bummerl_id = 0
+    else:
+      self._next_bummerl_id = self._recover(path, index_path)
+    # pylint: disable=consider-using-with
+    self._data_file = open(path, "ab")
+    self._index_file = open(index_path, "ab")
+    # pylint: enable=consider-using-with
+    self._offset = self._data_file.tell()
+
+  @staticmethod
+  def _recover(path: str, index_path: str) -> int:
+    """
+    Truncates the partial record at the end of the data file, if any, rebuilds
+    the index if it's not consistent with the data file and returns the next
+    unused bummerl id.
+    """
+    with open(path, "rb") as data_file:
+      data = data_file.read()
+    _check_magic(data, path)
+    index = b""
+    if os.path.exists(index_path):
+      with open(index_path, "rb") as index_file:
+        index = index_file.read()
+    if _index_is_consistent(data, index):
+      offsets = [offset for offset, in _OFFSET.iter_unpack(index)]
+    else:
+      offsets = _scan_offsets(data)
+      with open(index_path, "wb") as index_file:
+        index_file.write(b"".join(_OFFSET.pack(offset) for offset in offsets))
+    end = len(_MAGIC)
+    if len(offsets) > 0:
+      end = offsets[-1] + _get_record_size(data, offsets[-1])
+    if end != len(data):
+      os.truncate(path, end)
+    for offset in reversed(offsets):
+      bummerl_id = _decode_record(data, offset).bummerl_id
+      if bummerl_id is not None:
+        return bummerl_id + 1
+    return 0
+
+  def append(self, record: GameRecord) -> None:
+    """Appends one game record to the archive."""
+    encoded_record = _encode_record(record)
+    self._data_file.write(encoded_record)
+    self._index_file.write(_OFFSET.pack(self._offset))
+    self._offset += len(encoded_record)
+
+  def append_game(self, game: Game) -> None:
+    """Appends a game that is not part of a bummerl to the archive."""
+    self.append(GameRecord.from_game(game))
+
+  def append_bummerl(self, bummerl: Bummerl) -> int:
+    """
+    Appends all the games from a bummerl to the archive, including the game in
+    progress, if any. Returns the bummerl_id assigned to the bummerl.
+    """
+    bummerl_id = self._next_bummerl_id
+    self._next_bummerl_id += 1
+    games = list(bummerl.completed_games)
+    if bummerl.game is not None:
+      games.append(bummerl.game)
+    for game in games:
+      self.append(GameRecord.from_game(game, bummerl_id))
+    return bummerl_id
+
+  def flush(self) -> None:
+    # The data is flushed first, so the index never points to missing records
+    # unless the process is killed between the two calls.
+    self._data_file.flush()
+    self._index_file.flush()
+
+  def close(self) -> None:
+    self.flush()
+    self._data_file.close()
+    self._index_file.close()
+
+  def __enter__(self) -> "GameArchiveWriter":
+    return self
+
+  def __exit__(self, exc_type, exc_val, exc_tb):
+    self.close()
+
+
+class GameArchiveReader:
+  """
+  Reads the games from an archive. The data and the index files are
+  memory-mapped, so opening an archive and accessing a record by its index
+  don't depend on the size of the archive. The reader only sees the records that
+  were flushed before it was opened. It can be used as a context manager, which
+  closes the archive on exit.
+  """
+
+  def __init__(self, path: str):
+    with open(path, "rb") as data_file:
+      self._data = mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ)
+    _check_magic(self._data, path)
+    self._index = b""
+    index_path = get_index_path(path)
+    if os.path.exists(index_path) and os.path.getsize(index_path) > 0:
+      with open(index_path, "rb") as index_file:
+        self._index = mmap.mmap(index_file.fileno(), 0,
+                                access=mmap.ACCESS_READ)
+    if not _index_is_consistent(self._data, self._index):
+      self._close_index()
+      self._index = b"".join(
+        _OFFSET.pack(offset) for offset in _scan_offsets(self._data))
+    self._num_records = len(self._index) // _OFFSET.size
+
+  def __len__(self) -> int:
+    return self._num_records
+
+  def __getitem__(self, index: int) -> GameRecord:
+    """Returns the record with the given index, in the order they were added."""
+    if index < 0:
+      index += self._num_records
+    if not 0 <= index < self._num_records:
+      raise IndexError(f"Record index out of range: {index}")
+    offset = _OFFSET.unpack_from(self._index, index * _OFFSET.size)[0]
+    return _decode_record(self._data, offset)
+
+  def __iter__(self) -> Iterator[GameRecord]:
+    """
+    Iterates over all the records, in the order they were added. It reads the
+    data file sequentially and doesn't use the index.
+    """
+    offset = len(_MAGIC)
+    for _ in range(self._num_records):
+      yield _decode_record(self._data, offset)
+      offset += _get_record_size(self._data, offset)
+
+  def games(self) -> Iterator[Game]:
+    """Iterates over all the games from the archive."""
+    for record in self:
+      yield record.to_game()
+
+  def bummerls(self) -> Iterator[Bummerl]:
+    """
+    Iterates over the bummerls from the archive. The games that are not part of
+    a bummerl are skipped. If the last game of a bummerl is not over, it is the
+    game in progress of the returned Bummerl.
+    """
+    bummerl = None
+    bummerl_id = None
+    for record in self:
+      if record.bummerl_id is None:
+        continue
+      if record.bummerl_id != bummerl_id:
+        if bummerl is not None:
+          yield bummerl
+        bummerl = Bummerl(next_dealer=record.dealer)
+        bummerl_id = record.bummerl_id
+      if bummerl.game is not None:
+        raise ValueError(f"Bummerl {bummerl_id} has more than one game that "
+                         f"is not over")
+      game = bummerl.start_game(seed=record.seed)
+      if game.dealer != record.dealer:
+        raise ValueError(f"Invalid dealer in bummerl {bummerl_id}")
+      for action_id in record.action_ids:
+        game.play_action(PlayerAction.from_action_id(action_id))
+      if game.game_state.is_game_over:
+        bummerl.finalize_game()
+    if bummerl is not None:
+      yield bummerl
+
+  def _close_index(self) -> None:
+    if isinstance(self._index, mmap.mmap):
+      self._index.close()
+
+  def close(self) -> None:
+    self._close_index()
+    self._data.close()
+
+  def __enter__(self) -> "GameArchiveReader":
+    return self
+
+  def __exit__(self, exc_type, exc_val, exc_tb):
+    self.close()
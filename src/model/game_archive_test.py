@@ -0,0 +1,191 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+import os
+import random
+import tempfile
+import unittest
+from typing import List
+
+from model.bummerl import Bummerl
+from model.game import Game
+from model.game_archive import GameRecord, GameArchiveWriter, \
+  GameArchiveReader, get_index_path
+from model.player_action import get_available_actions
+from model.player_id import PlayerId
+
+
+def _play_random_game(game: Game, rng: random.Random,
+                      max_actions: int = 100) -> Game:
+  while not game.game_state.is_game_over and max_actions > 0:
+    game.play_action(rng.choice(get_available_actions(game.game_state)))
+    max_actions -= 1
+  return game
+
+
+def _get_random_games(num_games: int) -> List[Game]:
+  rng = random.Random(1234)
+  games = []
+  for i in range(num_games):
+    dealer = PlayerId.ONE if i % 2 == 0 else PlayerId.TWO
+    games.append(_play_random_game(Game(dealer, seed=i), rng))
+  return games
+
+
+def _get_random_bummerl(seed: int, finish_last_game: bool = True) -> Bummerl:
+  """
+  Plays a random bummerl. If finish_last_game is False, it stops in the middle
+  of the third game.
+  """
+  rng = random.Random(seed)
+  bummerl = Bummerl(next_dealer=PlayerId.TWO)
+  while not bummerl.is_over:
+    game = bummerl.start_game(seed=rng.random())
+    if not finish_last_game and len(bummerl.completed_games) == 2:
+      _play_random_game(game, rng, max_actions=3)
+      break
+    _play_random_game(game, rng)
+    bummerl.finalize_game()
+  return bummerl
+
+
+class GameArchiveTest(unittest.TestCase):
+  def setUp(self):
+    # pylint: disable=consider-using-with
+    self._temp_dir = tempfile.TemporaryDirectory()
+    # pylint: enable=consider-using-with
+    self._path = os.path.join(self._temp_dir.name, "games.sga")
+
+  def tearDown(self):
+    self._temp_dir.cleanup()
+
+  def _assert_same_game(self, expected: Game, actual: Game):
+    self.assertEqual(expected.seed, actual.seed)
+    self.assertEqual(expected.dealer, actual.dealer)
+    self.assertEqual(expected.actions, actual.actions)
+    self.assertEqual(expected.game_state, actual.game_state)
+
+  def _assert_same_bummerl(self, expected: Bummerl, actual: Bummerl):
+    self.assertEqual(expected.game_points, actual.game_points)
+    self.assertEqual(len(expected.completed_games),
+                     len(actual.completed_games))
+    for expected_game, actual_game in zip(expected.completed_games,
+                                          actual.completed_games):
+      self._assert_same_game(expected_game, actual_game)
+    if expected.game is None:
+      self.assertIsNone(actual.game)
+    else:
+      self._assert_same_game(expected.game, actual.game)
+
+  def test_game_record_round_trip(self):
+    for game in _get_random_games(10):
+      record = GameRecord.from_game(game)
+      self.assertEqual(len(game.actions), len(record.action_ids))
+      self._assert_same_game(game, record.to_game())
+
+  def test_write_and_read_games(self):
+    games = _get_random_games(20)
+    # The last game is not over.
+    games.append(_play_random_game(Game(PlayerId.ONE, seed=-5),
+                                   random.Random(0), max_actions=5))
+    games.append(Game(PlayerId.TWO, seed=0.25))
+    with GameArchiveWriter(self._path) as writer:
+      for game in games:
+        writer.append_game(game)
+    with GameArchiveReader(self._path) as reader:
+      self.assertEqual(len(games), len(reader))
+      for i in [0, 7, len(games) - 1, 3, -1, -len(games)]:
+        self._assert_same_game(games[i], reader[i].to_game())
+      with self.assertRaises(IndexError):
+        _ = reader[len(games)]
+      with self.assertRaises(IndexError):
+        _ = reader[-len(games) - 1]
+      records = list(reader)
+      self.assertEqual([reader[i] for i in range(len(games))], records)
+      for expected_game, actual_game in zip(games, reader.games()):
+        self._assert_same_game(expected_game, actual_game)
+      self.assertEqual([], list(reader.bummerls()))
+
+  def test_empty_archive(self):
+    GameArchiveWriter(self._path).close()
+    with GameArchiveReader(self._path) as reader:
+      self.assertEqual(0, len(reader))
+      self.assertEqual([], list(reader))
+
+  def test_append_to_existing_archive(self):
+    games = _get_random_games(6)
+    for i in range(0, len(games), 2):
+      with GameArchiveWriter(self._path) as writer:
+        writer.append_game(games[i])
+        writer.append_game(games[i + 1])
+      with GameArchiveReader(self._path) as reader:
+        self.assertEqual(i + 2, len(reader))
+        self._assert_same_game(games[i + 1], reader[-1].to_game())
+
+  def test_write_and_read_bummerls(self):
+    bummerls = [_get_random_bummerl(0), _get_random_bummerl(1),
+                _get_random_bummerl(2, finish_last_game=False)]
+    game = _get_random_games(1)[0]
+    with GameArchiveWriter(self._path) as writer:
+      self.assertEqual(0, writer.append_bummerl(bummerls[0]))
+      writer.append_game(game)
+    with GameArchiveWriter(self._path) as writer:
+      self.assertEqual(1, writer.append_bummerl(bummerls[1]))
+      self.assertEqual(2, writer.append_bummerl(bummerls[2]))
+    with GameArchiveReader(self._path) as reader:
+      self.assertEqual(
+        sum(len(bummerl.completed_games) for bummerl in bummerls) + 2,
+        len(reader))
+      actual_bummerls = list(reader.bummerls())
+      self.assertEqual(len(bummerls), len(actual_bummerls))
+      for expected, actual in zip(bummerls, actual_bummerls):
+        self._assert_same_bummerl(expected, actual)
+      self._assert_same_game(
+        game, reader[len(bummerls[0].completed_games)].to_game())
+
+  def test_recover_after_interrupted_writer(self):
+    games = _get_random_games(5)
+    with GameArchiveWriter(self._path) as writer:
+      for game in games[:3]:
+        writer.append_game(game)
+    data_size = os.path.getsize(self._path)
+    index_path = get_index_path(self._path)
+
+    # The last record is only partially written and the index is missing it.
+    with open(self._path, "ab") as data_file:
+      data_file.write(b"\x00\x10\x00")
+    with open(index_path, "r+b") as index_file:
+      index_file.truncate(16)
+    with GameArchiveReader(self._path) as reader:
+      self.assertEqual(3, len(reader))
+      self._assert_same_game(games[2], reader[2].to_game())
+    with GameArchiveWriter(self._path) as writer:
+      writer.append_game(games[3])
+    self.assertEqual(os.path.getsize(index_path), 4 * 8)
+    with GameArchiveReader(self._path) as reader:
+      self.assertEqual(4, len(reader))
+      for expected_game, actual_game in zip(games, reader.games()):
+        self._assert_same_game(expected_game, actual_game)
+
+    # The index points past the end of the data file.
+    with open(self._path, "r+b") as data_file:
+      data_file.truncate(data_size)
+    with GameArchiveReader(self._path) as reader:
+      self.assertEqual(3, len(reader))
+      self._assert_same_game(games[2], reader[-1].to_game())
+
+  def test_invalid_seeds(self):
+    with GameArchiveWriter(self._path) as writer:
+      with self.assertRaisesRegex(ValueError, "seeds can be archived"):
+        writer.append(GameRecord("seed", PlayerId.ONE, b""))
+      with self.assertRaisesRegex(ValueError, "seeds can be archived"):
+        writer.append(GameRecord(2 ** 63, PlayerId.ONE, b""))
+
+  def test_not_an_archive(self):
+    with open(self._path, "wb") as data_file:
+      data_file.write(b"not an archive")
+    with self.assertRaisesRegex(ValueError, "Not a game archive"):
+      GameArchiveReader(self._path)
+    with self.assertRaisesRegex(ValueError, "Not a game archive"):
+      GameArchiveWriter(self._path)
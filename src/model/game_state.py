@@ -6,10 +6,12 @@ import dataclasses
 import random
 from typing import List, Optional, Any
 
+from model import zobrist
 from model.card import Card
 from model.card_value import CardValue
 from model.player_id import PlayerId
 from model.player_pair import PlayerPair
+from model.slotted_dataclass import SLOTS, SlottedDataclass
 from model.suit import Suit
 
 
@@ -72,8 +74,8 @@ players to play their card.
 """
 
 
-@dataclasses.dataclass
-class GameState:
+@dataclasses.dataclass(**SLOTS)
+class GameState(SlottedDataclass):
   """
   Stores all the information about a game at a specific point in time. If the
   instance represents the view from one player's perspective, then the hidden
@@ -135,27 +137,79 @@ class GameState:
   current_trick: Trick = dataclasses.field(
     default_factory=lambda: Trick(None, None))
 
-  # noinspection PyTypeChecker
+  # A bitmask with the cards that were seen by both players (e.g., the trump
+  # card, the cards from an announced marriage). Bit i corresponds to the card
+  # with Card.index == i. Use is_public() and set_public() instead of accessing
+  # this directly. It is not taken into account when comparing game states.
+  public_cards: int = dataclasses.field(default_factory=int, compare=False)
+
+  # For each player, a bitmask like public_cards with the talon cards that the
+  # player knows are in the talon, although they didn't see them. Once the
+  # talon is closed, the opponent has to follow suit, so the cards they play
+  # can rule out some of the unseen cards (see PlayCardAction). Unlike the
+  # public cards, these cards are only visible in the game view of the player
+  # that made the inference. Use is_inferred_talon_card() and
+  # set_inferred_talon_card() instead of accessing this directly. It is not
+  # taken into account when comparing game states.
+  inferred_talon_cards: PlayerPair[int] = dataclasses.field(
+    default_factory=lambda: PlayerPair(0, 0), compare=False)
+
+  # The Zobrist key of this game state, if it is known. It is computed lazily
+  # by zobrist_key and then updated incrementally by PlayerAction.execute().
+  # If the game state is modified directly, it must be reset to None.
+  cached_zobrist_key: Optional[int] = dataclasses.field(default=None,
+                                                        compare=False,
+                                                        repr=False)
+
   def __hash__(self):
-    # TODO(refactor): Maybe add dynamically the fields based in dataclasses
-    #  utils.
-    items = tuple(
-      self.cards_in_hand.one + self.cards_in_hand.two +
-      [self.trump] + [self.trump_card] +
-      self.talon + [self.next_player, self.player_that_closed_the_talon] +
-      [self.opponent_points_when_talon_was_closed] +
-      [card for trick in self.won_tricks.one for card in
-       [trick.one, trick.two]] +
-      [card for trick in self.won_tricks.two for card in
-       [trick.one, trick.two]] +
-      self.marriage_suits.one + self.marriage_suits.two +
-      [self.trick_points.one, self.trick_points.two] +
-      [self.current_trick.one, self.current_trick.two])
-    return hash(items)
+    return self.zobrist_key
+
+  @property
+  def zobrist_key(self) -> int:
+    """
+    A 64-bit hash of this game state. Equal game states have equal keys. It is
+    computed once per game (or per deep_copy()) and then each PlayerAction
+    updates it in O(1), so it can be used as a cheap key for caches and
+    transposition tables.
+    """
+    if self.cached_zobrist_key is None:
+      self.cached_zobrist_key = self.compute_zobrist_key()
+    return self.cached_zobrist_key
+
+  def compute_zobrist_key(self) -> int:
+    """
+    Computes the Zobrist key of this game state from scratch. The unknown cards
+    (i.e., None) are ignored. See model/zobrist.py.
+    """
+    key = zobrist.TRUMP[self.trump] ^ zobrist.NEXT_PLAYER[self.next_player]
+    if self.trump_card is not None:
+      key ^= zobrist.TRUMP_CARD[self.trump_card.index]
+    num_talon_cards = len(self.talon)
+    for i, card in enumerate(self.talon):
+      if card is not None:
+        key ^= zobrist.TALON[card.index][num_talon_cards - 1 - i]
+    if self.player_that_closed_the_talon is not None:
+      key ^= zobrist.CLOSED_THE_TALON[self.player_that_closed_the_talon]
+      key ^= zobrist.OPPONENT_POINTS[
+        self.opponent_points_when_talon_was_closed % zobrist.MAX_POINTS]
+    for player in PlayerId:
+      for card in self.cards_in_hand[player]:
+        if card is not None:
+          key ^= zobrist.HAND[player][card.index]
+      for trick in self.won_tricks[player]:
+        key ^= zobrist.WON_TRICKS[player][trick.one.index]
+        key ^= zobrist.WON_TRICKS[player][trick.two.index]
+      for suit in self.marriage_suits[player]:
+        key ^= zobrist.MARRIAGE_SUITS[player][suit]
+      key ^= zobrist.TRICK_POINTS[player][
+        self.trick_points[player] % zobrist.MAX_POINTS]
+      if self.current_trick[player] is not None:
+        key ^= zobrist.CURRENT_TRICK[player][self.current_trick[player].index]
+    return key
 
   def __post_init__(self):
     if self.trump_card is not None:
-      self.trump_card.public = True
+      self.set_public(self.trump_card)
     for player in PlayerId:
       for marriage_suit in self.marriage_suits[player]:
         for card in self.cards_in_hand[player]:
@@ -163,7 +217,29 @@ class GameState:
             continue
           if card.suit == marriage_suit:
             if card.card_value in [CardValue.QUEEN, CardValue.KING]:
-              card.public = True
+              self.set_public(card)
+
+  def is_public(self, card: Card) -> bool:
+    """
+    Returns True if the given card was seen by both players in this game (e.g.,
+    the card was played, or it's the trump card).
+    """
+    return (self.public_cards >> card.index) & 1 == 1
+
+  def set_public(self, card: Card) -> None:
+    """Marks the given card as seen by both players."""
+    self.public_cards |= 1 << card.index
+
+  def is_inferred_talon_card(self, card: Card, player_id: PlayerId) -> bool:
+    """
+    Returns True if the given player knows that the given card is in the talon,
+    because their opponent cannot hold it (see inferred_talon_cards).
+    """
+    return (self.inferred_talon_cards[player_id] >> card.index) & 1 == 1
+
+  def set_inferred_talon_card(self, card: Card, player_id: PlayerId) -> None:
+    """Marks the given card as known to be in the talon by player_id."""
+    self.inferred_talon_cards[player_id] |= 1 << card.index
 
   def is_to_lead(self, player_id):
     """
@@ -198,6 +274,11 @@ class GameState:
     self.player_that_closed_the_talon = self.next_player
     self.opponent_points_when_talon_was_closed = self.trick_points[
       self.player_that_closed_the_talon.opponent()]
+    if self.cached_zobrist_key is not None:
+      self.cached_zobrist_key ^= \
+        zobrist.CLOSED_THE_TALON[self.player_that_closed_the_talon] ^ \
+        zobrist.OPPONENT_POINTS[
+          self.opponent_points_when_talon_was_closed % zobrist.MAX_POINTS]
 
   @staticmethod
   def new(dealer: PlayerId = PlayerId.ONE,
@@ -257,15 +338,16 @@ class GameState:
     """
     Returns the GameState that represents the game as seen from the
     next_player's perspective. It replaces the opponent's non-public cards and
-    the non-public talon cards with None.
+    the talon cards that are not public or inferred by next_player with None.
     """
     view = self.deep_copy()
     played_card = self.current_trick[self.next_player.opponent()]
     for i, card in enumerate(self.cards_in_hand[self.next_player.opponent()]):
-      if not card.public and card != played_card:
+      if not self.is_public(card) and card != played_card:
         view.cards_in_hand[self.next_player.opponent()][i] = None
     for i, card in enumerate(self.talon):
-      if not card.public:
+      if not self.is_public(card) and \
+          not self.is_inferred_talon_card(card, self.next_player):
         view.talon[i] = None
     return view
 
@@ -273,26 +355,22 @@ class GameState:
     """
     Creates and returns a deep copy of this game state. This is faster than
     using copy.deepcopy(), see GameStateCopyTest.test_deep_copy_alternatives*.
+    The cards are immutable, so they are shared with this game state. The
+    Zobrist key is not copied, since the copy is usually modified directly
+    (e.g., by next_player_view()).
     """
-
-    def copy_card(card: Card) -> Card:
-      return None if card is None else card.copy()
-
-    cards_in_hand = PlayerPair(
-      one=[copy_card(card) for card in self.cards_in_hand.one],
-      two=[copy_card(card) for card in self.cards_in_hand.two])
-    talon = [copy_card(card) for card in self.talon]
+    cards_in_hand = PlayerPair(one=list(self.cards_in_hand.one),
+                               two=list(self.cards_in_hand.two))
+    talon = list(self.talon)
     won_tricks = PlayerPair(
-      one=[PlayerPair(copy_card(trick.one), copy_card(trick.two)) for trick in
-           self.won_tricks.one],
-      two=[PlayerPair(copy_card(trick.one), copy_card(trick.two)) for trick in
-           self.won_tricks.two])
+      one=[PlayerPair(trick.one, trick.two) for trick in self.won_tricks.one],
+      two=[PlayerPair(trick.one, trick.two) for trick in self.won_tricks.two])
     marriage_suits = PlayerPair(one=list(self.marriage_suits.one),
                                 two=list(self.marriage_suits.two))
     return GameState(
       cards_in_hand=cards_in_hand, talon=talon,
       trump=self.trump,
-      trump_card=copy_card(self.trump_card),
+      trump_card=self.trump_card,
       next_player=self.next_player,
       player_that_closed_the_talon=self.player_that_closed_the_talon,
       opponent_points_when_talon_was_closed=
@@ -300,5 +378,7 @@ class GameState:
       won_tricks=won_tricks,
       marriage_suits=marriage_suits,
       trick_points=PlayerPair(self.trick_points.one, self.trick_points.two),
-      current_trick=PlayerPair(copy_card(self.current_trick.one),
-                               copy_card(self.current_trick.two)))
+      current_trick=PlayerPair(self.current_trick.one, self.current_trick.two),
+      public_cards=self.public_cards,
+      inferred_talon_cards=PlayerPair(self.inferred_talon_cards.one,
+                                      self.inferred_talon_cards.two))
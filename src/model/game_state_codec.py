@@ -0,0 +1,239 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+"""
+A compact, fixed-size binary encoding of a GameState (or a game view). The code
+of a game state has GAME_STATE_CODE_SIZE bytes, with the following layout:
+
+  * bytes 0-19: the location of each card, indexed by Card.index. The high four
+    bits store where the card is (see the _LOCATION_* constants below) and the
+    low four bits store its position there (e.g., the index in the player's
+    hand, the index in the talon or the index of the won trick). The cards that
+    are not visible in a game view are stored as _UNKNOWN.
+  * bytes 20-22: GameState.public_cards, as a little-endian 24-bit integer.
+  * bytes 23-24: the trick points of player ONE and player TWO.
+  * byte 25: GameState.opponent_points_when_talon_was_closed, or 0 if the talon
+    is not closed.
+  * byte 26: the trump suit (bits 0-1), the next player (bit 2) and the player
+    that closed the talon, if any (bits 3-4).
+  * byte 27: the number of cards in the hand of player ONE (bits 0-2) and player
+    TWO (bits 3-5), including the unknown cards.
+  * byte 28: the number of cards in the talon, including the unknown cards.
+  * bytes 29-31: the marriage suits announced by each player, as a
+    little-endian 24-bit integer. Each player uses 11 bits: the number of
+    marriages (3 bits), followed by the suits in the order in which they were
+    announced (2 bits each).
+
+GameState.inferred_talon_cards is not encoded. In a game view, the talon cards
+inferred by the player are visible, so they are encoded with their location.
+
+The decoding reads the code directly from any object that supports the buffer
+protocol (e.g., bytes, bytearray, memoryview, shared memory, rows of a NumPy
+array), so it doesn't need to copy it. The player actions don't need a separate
+encoding: PlayerAction.action_id already fits in one byte.
+"""
+
+import dataclasses
+from typing import Optional, List
+
+from model.card import Card
+from model.game_state import GameState, Trick
+from model.player_id import PlayerId
+from model.player_pair import PlayerPair
+from model.suit import Suit
+
+GAME_STATE_CODE_SIZE = 32
+
+# The locations of a card. The cards in the tricks won by a player are stored
+# as _LOCATION_WON_TRICKS + 2 * winner + player, where winner is the index of
+# the player that won the trick and player is the index of the player that
+# played the card. A card played in the current trick stays in the player's
+# hand until the trick is completed, so it is stored as
+# _LOCATION_HAND_AND_CURRENT_TRICK + player and its position in the hand. The
+# cards that are only in the current trick are stored as
+# _LOCATION_CURRENT_TRICK + player.
+_LOCATION_HAND = 0  # + the index of the player
+_LOCATION_TALON = 2
+_LOCATION_TRUMP_CARD = 3
+_LOCATION_CURRENT_TRICK = 4  # + the index of the player
+_LOCATION_WON_TRICKS = 6
+_LOCATION_HAND_AND_CURRENT_TRICK = 10  # + the index of the player
+_UNKNOWN = 0xFF
+
+_PUBLIC_CARDS = 20
+_TRICK_POINTS = 23
+_OPPONENT_POINTS = 25
+_FLAGS = 26
+_HAND_SIZES = 27
+_TALON_SIZE = 28
+_MARRIAGES = 29
+
+_NUM_CARDS = 20
+_PLAYERS = (PlayerId.ONE, PlayerId.TWO)
+_SUITS = list(Suit)
+_MARRIAGE_BITS = 11
+
+
+def _encode_card_locations(game_state: GameState, code: memoryview) -> None:
+  """Writes the location of each card in the first _NUM_CARDS bytes of code."""
+  code[:_NUM_CARDS] = bytes([_UNKNOWN]) * _NUM_CARDS
+  for player_index, player in enumerate(_PLAYERS):
+    for i, card in enumerate(game_state.cards_in_hand[player]):
+      if card is not None:
+        code[card.index] = (_LOCATION_HAND + player_index) << 4 | i
+    card = game_state.current_trick[player]
+    if card is not None:
+      if card in game_state.cards_in_hand[player]:
+        code[card.index] += \
+          (_LOCATION_HAND_AND_CURRENT_TRICK - _LOCATION_HAND) << 4
+      else:
+        code[card.index] = (_LOCATION_CURRENT_TRICK + player_index) << 4
+    for i, trick in enumerate(game_state.won_tricks[player]):
+      location = _LOCATION_WON_TRICKS + 2 * player_index
+      code[trick.one.index] = location << 4 | i
+      code[trick.two.index] = (location + 1) << 4 | i
+  for i, card in enumerate(game_state.talon):
+    if card is not None:
+      code[card.index] = _LOCATION_TALON << 4 | i
+  if game_state.trump_card is not None:
+    code[game_state.trump_card.index] = _LOCATION_TRUMP_CARD << 4
+
+
+def _encode_marriage_suits(marriage_suits: PlayerPair[List[Suit]]) -> int:
+  marriages = 0
+  for player_index, player in enumerate(_PLAYERS):
+    bits = len(marriage_suits[player])
+    for i, suit in enumerate(marriage_suits[player]):
+      bits |= _SUITS.index(suit) << (3 + 2 * i)
+    marriages |= bits << (_MARRIAGE_BITS * player_index)
+  return marriages
+
+
+def encode_game_state_into(game_state: GameState, buffer,
+                           offset: int = 0) -> None:
+  """
+  Writes the code of game_state into a writable buffer (e.g., a bytearray, a
+  shared memory block or a row of a NumPy array) starting at offset.
+  """
+  code = memoryview(buffer).cast("B")[offset:offset + GAME_STATE_CODE_SIZE]
+  if len(code) != GAME_STATE_CODE_SIZE:
+    raise ValueError(
+      f"The buffer needs {GAME_STATE_CODE_SIZE} bytes starting at {offset}")
+  _encode_card_locations(game_state, code)
+  code[_PUBLIC_CARDS:_PUBLIC_CARDS + 3] = game_state.public_cards.to_bytes(
+    3, "little")
+  code[_TRICK_POINTS] = game_state.trick_points.one
+  code[_TRICK_POINTS + 1] = game_state.trick_points.two
+  closed_the_talon = game_state.player_that_closed_the_talon
+  code[_OPPONENT_POINTS] = \
+    0 if closed_the_talon is None else \
+    game_state.opponent_points_when_talon_was_closed
+  code[_FLAGS] = \
+    _SUITS.index(game_state.trump) | \
+    _PLAYERS.index(game_state.next_player) << 2 | \
+    (0 if closed_the_talon is None else
+     _PLAYERS.index(closed_the_talon) + 1) << 3
+  code[_HAND_SIZES] = len(game_state.cards_in_hand.one) | len(
+    game_state.cards_in_hand.two) << 3
+  code[_TALON_SIZE] = len(game_state.talon)
+  code[_MARRIAGES:_MARRIAGES + 3] = _encode_marriage_suits(
+    game_state.marriage_suits).to_bytes(3, "little")
+
+
+def encode_game_state(game_state: GameState) -> bytes:
+  """Returns the GAME_STATE_CODE_SIZE bytes that encode game_state."""
+  code = bytearray(GAME_STATE_CODE_SIZE)
+  encode_game_state_into(game_state, code)
+  return bytes(code)
+
+
+@dataclasses.dataclass
+class _CardLocations:
+  """The cards decoded from the first _NUM_CARDS bytes of a code."""
+
+  cards_in_hand: List[List[Optional[Card]]]
+  talon: List[Optional[Card]]
+  trump_card: Optional[Card] = None
+  current_trick: List[Optional[Card]] = dataclasses.field(
+    default_factory=lambda: [None, None])
+
+  won_tricks: List[List[List[Optional[Card]]]] = dataclasses.field(
+    default_factory=lambda: [[], []])
+  """The cards in each won trick, indexed by [winner][trick][player]."""
+
+  def add_won_trick_card(self, card: Card, location: int, position: int):
+    winner, player = divmod(location - _LOCATION_WON_TRICKS, 2)
+    tricks = self.won_tricks[winner]
+    while len(tricks) <= position:
+      tricks.append([None, None])
+    tricks[position][player] = card
+
+
+def _decode_card_locations(code: memoryview) -> _CardLocations:
+  cards = _CardLocations(
+    cards_in_hand=[[None] * (code[_HAND_SIZES] & 0b111),
+                   [None] * (code[_HAND_SIZES] >> 3 & 0b111)],
+    talon=[None] * code[_TALON_SIZE])
+  for card in Card.get_all_cards():
+    location, position = code[card.index] >> 4, code[card.index] & 0b1111
+    if location < _LOCATION_TALON:
+      cards.cards_in_hand[location - _LOCATION_HAND][position] = card
+    elif location == _LOCATION_TALON:
+      cards.talon[position] = card
+    elif location == _LOCATION_TRUMP_CARD:
+      cards.trump_card = card
+    elif location < _LOCATION_WON_TRICKS:
+      cards.current_trick[location - _LOCATION_CURRENT_TRICK] = card
+    elif location < _LOCATION_HAND_AND_CURRENT_TRICK:
+      cards.add_won_trick_card(card, location, position)
+    elif code[card.index] != _UNKNOWN:
+      player = location - _LOCATION_HAND_AND_CURRENT_TRICK
+      cards.cards_in_hand[player][position] = card
+      cards.current_trick[player] = card
+  return cards
+
+
+def _decode_marriage_suits(code: memoryview) -> PlayerPair[List[Suit]]:
+  marriages = int.from_bytes(code[_MARRIAGES:_MARRIAGES + 3], "little")
+  marriage_suits = []
+  for player_index in range(2):
+    bits = marriages >> (_MARRIAGE_BITS * player_index)
+    marriage_suits.append(
+      [_SUITS[bits >> (3 + 2 * i) & 0b11] for i in range(bits & 0b111)])
+  return PlayerPair(*marriage_suits)
+
+
+def decode_game_state(buffer, offset: int = 0) -> GameState:
+  """
+  Decodes the game state whose code starts at offset in the given buffer. This
+  is the inverse of encode_game_state_into(); the result is equal to the
+  encoded game state and has the same public_cards.
+  """
+  code = memoryview(buffer).cast("B")[offset:offset + GAME_STATE_CODE_SIZE]
+  if len(code) != GAME_STATE_CODE_SIZE:
+    raise ValueError(
+      f"The buffer needs {GAME_STATE_CODE_SIZE} bytes starting at {offset}")
+  cards = _decode_card_locations(code)
+  flags = code[_FLAGS]
+  closed_the_talon = flags >> 3 & 0b11
+  game_state = GameState(
+    cards_in_hand=PlayerPair(*cards.cards_in_hand),
+    trump=_SUITS[flags & 0b11],
+    trump_card=cards.trump_card,
+    talon=cards.talon,
+    next_player=_PLAYERS[flags >> 2 & 1],
+    player_that_closed_the_talon=(
+      None if closed_the_talon == 0 else _PLAYERS[closed_the_talon - 1]),
+    opponent_points_when_talon_was_closed=(
+      None if closed_the_talon == 0 else code[_OPPONENT_POINTS]),
+    won_tricks=PlayerPair(*[[Trick(*trick) for trick in tricks] for tricks in
+                            cards.won_tricks]),
+    marriage_suits=_decode_marriage_suits(code),
+    trick_points=PlayerPair(code[_TRICK_POINTS], code[_TRICK_POINTS + 1]),
+    current_trick=Trick(*cards.current_trick))
+  # GameState.__post_init__() already marks some of the cards as public, so the
+  # saved bitmask is restored after the constructor.
+  game_state.public_cards = int.from_bytes(
+    code[_PUBLIC_CARDS:_PUBLIC_CARDS + 3], "little")
+  return game_state
@@ -0,0 +1,114 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+import random
+import unittest
+from typing import List
+
+import numpy as np
+
+from model.game_state import GameState
+from model.game_state_codec import GAME_STATE_CODE_SIZE, encode_game_state, \
+  encode_game_state_into, decode_game_state
+from model.game_state_codec_with_deps import encode_game_states, \
+  decode_game_states
+from model.game_state_test_utils import get_game_state_for_tests, \
+  get_game_state_with_empty_talon_for_tests, \
+  get_game_state_with_all_tricks_played, \
+  get_game_state_for_know_your_opponent_puzzle, get_game_view_for_duck_puzzle
+from model.player_action import get_available_actions
+from model.player_id import PlayerId
+from model.suit import Suit
+
+
+def _get_game_states_and_views(num_games: int) -> List[GameState]:
+  """
+  Returns all the game states from num_games random games, together with the
+  game views for the next player and their opponent.
+  """
+  game_states = []
+  for seed in range(num_games):
+    rng = random.Random(seed)
+    game_state = GameState.new(random_seed=seed)
+    while True:
+      game_states.append(game_state)
+      game_states.append(game_state.next_player_view())
+      if game_state.is_game_over:
+        break
+      action = rng.choice(get_available_actions(game_state))
+      game_state = action.execute(game_state)
+  return game_states
+
+
+class GameStateCodecTest(unittest.TestCase):
+  def _assert_round_trip(self, game_state: GameState):
+    code = encode_game_state(game_state)
+    self.assertEqual(GAME_STATE_CODE_SIZE, len(code))
+    decoded_game_state = decode_game_state(code)
+    self.assertEqual(game_state, decoded_game_state)
+    self.assertEqual(game_state.public_cards, decoded_game_state.public_cards)
+
+  def test_test_utils_game_states(self):
+    for game_state in [get_game_state_for_tests(),
+                       get_game_state_with_empty_talon_for_tests(),
+                       get_game_state_with_all_tricks_played(),
+                       get_game_state_for_know_your_opponent_puzzle(),
+                       get_game_view_for_duck_puzzle()]:
+      self._assert_round_trip(game_state)
+
+  def test_random_games(self):
+    for game_state in _get_game_states_and_views(num_games=20):
+      self._assert_round_trip(game_state)
+
+  def test_closed_talon_and_marriages(self):
+    game_state = get_game_state_for_tests()
+    game_state.close_talon()
+    game_state.marriage_suits.one.extend([Suit.CLUBS, Suit.HEARTS])
+    game_state.marriage_suits.two.extend(
+      [Suit.SPADES, Suit.DIAMONDS, Suit.CLUBS, Suit.HEARTS])
+    decoded_game_state = decode_game_state(encode_game_state(game_state))
+    self.assertEqual(PlayerId.ONE,
+                     decoded_game_state.player_that_closed_the_talon)
+    self.assertEqual(game_state.opponent_points_when_talon_was_closed,
+                     decoded_game_state.opponent_points_when_talon_was_closed)
+    self.assertEqual(game_state.marriage_suits,
+                     decoded_game_state.marriage_suits)
+
+  def test_encode_into_buffer_with_offset(self):
+    game_state = get_game_state_for_tests()
+    buffer = bytearray(3 * GAME_STATE_CODE_SIZE)
+    encode_game_state_into(game_state, buffer, GAME_STATE_CODE_SIZE)
+    self.assertEqual(bytes(GAME_STATE_CODE_SIZE),
+                     buffer[:GAME_STATE_CODE_SIZE])
+    self.assertEqual(bytes(GAME_STATE_CODE_SIZE),
+                     buffer[2 * GAME_STATE_CODE_SIZE:])
+    self.assertEqual(encode_game_state(game_state),
+                     buffer[GAME_STATE_CODE_SIZE:2 * GAME_STATE_CODE_SIZE])
+    self.assertEqual(game_state,
+                     decode_game_state(memoryview(buffer),
+                                       GAME_STATE_CODE_SIZE))
+
+  def test_buffer_too_small(self):
+    game_state = get_game_state_for_tests()
+    buffer = bytearray(GAME_STATE_CODE_SIZE + 1)
+    with self.assertRaisesRegex(ValueError, "needs 32 bytes"):
+      encode_game_state_into(game_state, buffer, 2)
+    with self.assertRaisesRegex(ValueError, "needs 32 bytes"):
+      decode_game_state(buffer, 2)
+
+  def test_batch_encode_and_decode(self):
+    game_states = _get_game_states_and_views(num_games=5)
+    codes = encode_game_states(game_states)
+    self.assertEqual((len(game_states), GAME_STATE_CODE_SIZE), codes.shape)
+    self.assertEqual(encode_game_state(game_states[3]), codes[3].tobytes())
+    self.assertEqual(game_states, decode_game_states(codes))
+    self.assertEqual(game_states[::2], decode_game_states(codes[::2]))
+
+    out = np.zeros((len(game_states), GAME_STATE_CODE_SIZE), dtype=np.uint8)
+    self.assertIs(out, encode_game_states(game_states, out))
+    np.testing.assert_array_equal(codes, out)
+    with self.assertRaisesRegex(ValueError, "Expected"):
+      encode_game_states(game_states, out[1:])
+    with self.assertRaisesRegex(ValueError, "Expected"):
+      decode_game_states(codes.astype(np.int32))
@@ -0,0 +1,53 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+# This file contains the batch versions of the functions from
+# model/game_state_codec.py. They add a dependency on numpy and are only used
+# for storing and processing large numbers of game states (e.g., evaluations).
+
+from typing import Sequence, List
+
+import numpy as np
+
+from model.game_state import GameState
+from model.game_state_codec import GAME_STATE_CODE_SIZE, \
+  encode_game_state_into, decode_game_state
+
+
+def encode_game_states(game_states: Sequence[GameState],
+                       out: np.ndarray = None) -> np.ndarray:
+  """
+  Encodes the game states into the rows of a (N x GAME_STATE_CODE_SIZE) uint8
+  array. If out is provided, it must have this shape and dtype and it is
+  filled in place (e.g., it can be backed by shared memory or a memory-mapped
+  file); otherwise, a new array is allocated.
+  """
+  shape = (len(game_states), GAME_STATE_CODE_SIZE)
+  if out is None:
+    out = np.empty(shape, dtype=np.uint8)
+  elif out.shape != shape or out.dtype != np.uint8 or \
+      not out.flags.c_contiguous:
+    raise ValueError(
+      f"Expected a contiguous uint8 array of shape {shape}, got {out.dtype} "
+      f"{out.shape}")
+  buffer = out.data.cast("B")
+  for i, game_state in enumerate(game_states):
+    encode_game_state_into(game_state, buffer, i * GAME_STATE_CODE_SIZE)
+  return out
+
+
+def decode_game_states(codes: np.ndarray) -> List[GameState]:
+  """
+  Decodes the game states from the rows of a (N x GAME_STATE_CODE_SIZE) uint8
+  array, without copying it.
+  """
+  if codes.ndim != 2 or codes.shape[1] != GAME_STATE_CODE_SIZE or \
+      codes.dtype != np.uint8:
+    raise ValueError(
+      f"Expected a uint8 array of shape (N, {GAME_STATE_CODE_SIZE}), got "
+      f"{codes.dtype} {codes.shape}")
+  codes = np.ascontiguousarray(codes)
+  buffer = codes.data.cast("B")
+  return [decode_game_state(buffer, i * GAME_STATE_CODE_SIZE) for i in
+          range(len(codes))]
@@ -49,7 +49,7 @@ class GameStateNewGameTest(unittest.TestCase):
       field.name for field in fields
       if field.default != dataclasses.MISSING
          or field.default_factory != dataclasses.MISSING]
-    self.assertEqual(7, len(args_with_default))
+    self.assertEqual(10, len(args_with_default))
     args_with_default_values = [
       (field.name, field.default) for field in fields
       if field.default != dataclasses.MISSING
@@ -86,7 +86,7 @@ class GameStateNewGameTest(unittest.TestCase):
       game_state.trick_points.one += 28
       game_state.marriage_suits.one.append(Suit.HEARTS)
       queen_hearts = game_state.cards_in_hand.one[1]
-      queen_hearts.public = True
+      game_state.set_public(queen_hearts)
       game_state.cards_in_hand.one.append(game_state.talon.pop(0))
       game_state.cards_in_hand.two.append(game_state.talon.pop(0))
       game_state.current_trick.one = game_state.cards_in_hand.one[0]
@@ -303,6 +303,42 @@ class GameStateTest(unittest.TestCase):
     self.assertIn(get_game_state_for_tests(), game_state_set)
     self.assertNotIn(get_game_state_with_all_tricks_played(), game_state_set)
 
+  def test_zobrist_key(self):
+    game_state = get_game_state_for_tests()
+    self.assertIsNone(game_state.cached_zobrist_key)
+    zobrist_key = game_state.zobrist_key
+    self.assertEqual(zobrist_key, game_state.cached_zobrist_key)
+    self.assertEqual(zobrist_key, game_state.compute_zobrist_key())
+    self.assertEqual(hash(zobrist_key), hash(game_state))
+    self.assertEqual(zobrist_key, get_game_state_for_tests().zobrist_key)
+    self.assertNotEqual(zobrist_key,
+                        get_game_state_with_all_tricks_played().zobrist_key)
+    # The public cards are not taken into account.
+    game_state_with_public_card = get_game_state_for_tests()
+    game_state_with_public_card.set_public(game_state.talon[0])
+    self.assertEqual(zobrist_key, game_state_with_public_card.zobrist_key)
+
+  def test_zobrist_key_of_game_views(self):
+    game_state = get_game_state_for_tests()
+    game_view = game_state.next_player_view()
+    self.assertNotEqual(game_state.zobrist_key, game_view.zobrist_key)
+    self.assertEqual(game_view.compute_zobrist_key(), game_view.zobrist_key)
+
+  def test_zobrist_key_is_updated_when_closing_the_talon(self):
+    game_state = get_game_state_for_tests()
+    zobrist_key = game_state.zobrist_key
+    game_state.close_talon()
+    self.assertNotEqual(zobrist_key, game_state.zobrist_key)
+    self.assertEqual(game_state.compute_zobrist_key(), game_state.zobrist_key)
+
+  def test_zobrist_key_is_reset_by_game_state_validator(self):
+    game_state = get_game_state_for_tests()
+    zobrist_key = game_state.zobrist_key
+    with GameStateValidator(game_state):
+      game_state.next_player = PlayerId.TWO
+    self.assertIsNone(game_state.cached_zobrist_key)
+    self.assertNotEqual(zobrist_key, game_state.zobrist_key)
+
 
 class GetGamePointsTest(unittest.TestCase):
   """Tests for the get_game_points() function."""
@@ -414,13 +450,24 @@ class GameStateNextPlayerViewTest(unittest.TestCase):
 
   def test_public_cards_in_the_talon(self):
     game_state = GameState.new(dealer=PlayerId.ONE, random_seed=0)
-    game_state.talon[0].public = True
-    game_state.talon[5].public = True
+    game_state.set_public(game_state.talon[0])
+    game_state.set_public(game_state.talon[5])
     view = game_state.next_player_view()
     self.assertEqual([Card(Suit.SPADES, CardValue.KING), None, None, None, None,
                       Card(Suit.SPADES, CardValue.TEN), None, None, None],
                      view.talon)
 
+  def test_inferred_talon_cards(self):
+    game_state = GameState.new(dealer=PlayerId.ONE, random_seed=0)
+    game_state.set_inferred_talon_card(game_state.talon[0],
+                                       game_state.next_player)
+    game_state.set_inferred_talon_card(game_state.talon[5],
+                                       game_state.next_player.opponent())
+    self.assertFalse(game_state.is_public(game_state.talon[0]))
+    view = game_state.next_player_view()
+    self.assertEqual([Card(Suit.SPADES, CardValue.KING), None, None, None, None,
+                      None, None, None, None], view.talon)
+
 
 class GameStateCopyTest(unittest.TestCase):
   def _assert_is_copy(self, obj1, obj2):
@@ -429,8 +476,9 @@ class GameStateCopyTest(unittest.TestCase):
 
   def _assert_list_is_copy(self, list1, list2):
     self._assert_is_copy(list1, list2)
+    # The cards are immutable, so they are shared.
     for item1, item2 in zip(list1, list2):
-      self._assert_is_copy(item1, item2)
+      self.assertIs(item1, item2)
 
   def _assert_is_deep_copy(self, game_state_1: GameState,
                            game_state_2: GameState):
@@ -442,20 +490,18 @@ class GameStateCopyTest(unittest.TestCase):
     self._assert_list_is_copy(game_state_1.cards_in_hand.two,
                               game_state_2.cards_in_hand.two)
     self._assert_list_is_copy(game_state_1.talon, game_state_2.talon)
-    self._assert_is_copy(game_state_1.trump_card, game_state_2.trump_card)
+    self.assertIs(game_state_1.trump_card, game_state_2.trump_card)
     self._assert_is_copy(game_state_1.won_tricks, game_state_2.won_tricks)
-    self._assert_list_is_copy(game_state_1.won_tricks.one,
-                              game_state_2.won_tricks.one)
+    self._assert_is_copy(game_state_1.won_tricks.one,
+                         game_state_2.won_tricks.one)
     for trick1, trick2 in zip(game_state_1.won_tricks.one,
                               game_state_2.won_tricks.one):
-      self._assert_is_copy(trick1.one, trick2.one)
-      self._assert_is_copy(trick1.two, trick2.two)
-    self._assert_list_is_copy(game_state_1.won_tricks.two,
-                              game_state_2.won_tricks.two)
+      self._assert_is_copy(trick1, trick2)
+    self._assert_is_copy(game_state_1.won_tricks.two,
+                         game_state_2.won_tricks.two)
     for trick1, trick2 in zip(game_state_1.won_tricks.two,
                               game_state_2.won_tricks.two):
-      self._assert_is_copy(trick1.one, trick2.one)
-      self._assert_is_copy(trick1.two, trick2.two)
+      self._assert_is_copy(trick1, trick2)
     self._assert_is_copy(game_state_1.marriage_suits,
                          game_state_2.marriage_suits)
     self._assert_is_copy(game_state_1.marriage_suits.one,
@@ -464,6 +510,10 @@ class GameStateCopyTest(unittest.TestCase):
                          game_state_2.marriage_suits.two)
     self._assert_is_copy(game_state_1.trick_points, game_state_2.trick_points)
     self._assert_is_copy(game_state_1.current_trick, game_state_2.current_trick)
+    self.assertEqual(game_state_1.public_cards, game_state_2.public_cards)
+    self._assert_is_copy(game_state_1.inferred_talon_cards,
+                         game_state_2.inferred_talon_cards)
+    self.assertIsNone(game_state_2.cached_zobrist_key)
 
   def test_make_deep_copy_initial_game_state(self):
     game_state = GameState.new(random_seed=100)
@@ -2,9 +2,12 @@
 #  Use of this source code is governed by a BSD-style license that can be
 #  found in the LICENSE file.
 
+import dataclasses
+import enum
+import os
 from collections import Counter
 from functools import wraps
-from typing import List
+from typing import List, Callable, Tuple, Optional, Set
 
 from model.card import Card
 from model.card_value import CardValue
@@ -31,7 +34,7 @@ def _validate_trump_and_trump_card(game_state: GameState) -> None:
   if game_state.trump_card is not None:
     if game_state.trump_card.suit != game_state.trump:
       raise InvalidGameStateError("trump and trump_card.suit do not match")
-    if not game_state.trump_card.public:
+    if not game_state.is_public(game_state.trump_card):
       raise InvalidGameStateError("The trump card should be public")
   if game_state.trump_card is None and len(game_state.talon) > 0:
     raise InvalidGameStateError("trump_card is missing")
@@ -102,6 +105,13 @@ def _verify_there_are_twenty_unique_cards(game_state: GameState) -> None:
   if len(all_cards) != 20:
     raise InvalidGameStateError(
       f"Total number of cards must be 20, not {len(all_cards)}")
+  # Fast path: each card sets its own bit, so there are no duplicates if all
+  # the 20 bits are set.
+  cards_mask = 0
+  for card in all_cards:
+    cards_mask |= 1 << card.index
+  if cards_mask == (1 << 20) - 1:
+    return
   duplicated_card_names = [str(card) for card, count in
                            Counter(all_cards).items() if count > 1]
   if len(duplicated_card_names) != 0:
@@ -139,7 +149,7 @@ def _validate_marriage_suits(game_state: GameState) -> None:
             " card. The other card is not in their hand.")
         index = game_state.cards_in_hand[player_id].index(marriage[0])
         unplayed_card = game_state.cards_in_hand[player_id][index]
-        if not unplayed_card.public:
+        if not game_state.is_public(unplayed_card):
           raise InvalidGameStateError(
             f"Marriage card should be public: {unplayed_card}")
 
@@ -168,6 +178,40 @@ def _validate_won_tricks(game_state: GameState) -> None:
           f"{player_id} cannot win this trick: {trick.one}, {trick.two}")
 
 
+def _validate_zobrist_key(game_state: GameState) -> None:
+  if game_state.cached_zobrist_key is None:
+    return
+  expected_key = game_state.compute_zobrist_key()
+  if game_state.cached_zobrist_key != expected_key:
+    raise InvalidGameStateError(
+      f"Invalid Zobrist key. Expected {expected_key}, "
+      + f"actual {game_state.cached_zobrist_key}")
+
+
+# The checks run by validate() together with the GameState fields they depend
+# on. A check only needs to run again if at least one of these fields changed.
+_CHECKS: List[Tuple[Callable[[GameState], None], Tuple[str, ...]]] = [
+  (_validate_trump_and_trump_card,
+   ("trump", "trump_card", "talon", "public_cards")),
+  (_verify_there_are_twenty_unique_cards,
+   ("trump_card", "cards_in_hand", "talon", "won_tricks")),
+  (_validate_num_cards_in_hand,
+   ("cards_in_hand", "talon", "player_that_closed_the_talon", "won_tricks")),
+  (_validate_current_trick_and_next_player,
+   ("current_trick", "next_player", "won_tricks")),
+  (_validate_talon,
+   ("talon", "player_that_closed_the_talon",
+    "opponent_points_when_talon_was_closed", "trick_points")),
+  (_validate_marriage_suits,
+   ("marriage_suits", "won_tricks", "current_trick", "cards_in_hand",
+    "public_cards")),
+  (_validate_trick_points,
+   ("trick_points", "won_tricks", "marriage_suits", "trump")),
+  (_validate_won_tricks, ("won_tricks", "trump")),
+  (_validate_zobrist_key, ("cached_zobrist_key",)),
+]
+
+
 def validate(game_state: GameState) -> None:
   """
   Runs a series of checks to validate the current game state (e.g., no
@@ -179,14 +223,39 @@ def validate(game_state: GameState) -> None:
   from a valid new-game state.
   :exception InvalidGameStateError if an inconsistency is found.
   """
-  _validate_trump_and_trump_card(game_state)
-  _verify_there_are_twenty_unique_cards(game_state)
-  _validate_num_cards_in_hand(game_state)
-  _validate_current_trick_and_next_player(game_state)
-  _validate_talon(game_state)
-  _validate_marriage_suits(game_state)
-  _validate_trick_points(game_state)
-  _validate_won_tricks(game_state)
+  for check, _ in _CHECKS:
+    check(game_state)
+
+
+def _validate_changed_fields(game_state: GameState,
+                             changed_fields: Set[str]) -> None:
+  """Runs only the checks that depend on at least one of changed_fields."""
+  for check, fields in _CHECKS:
+    if not changed_fields.isdisjoint(fields):
+      check(game_state)
+
+
+# The names of all the GameState fields.
+_FIELD_NAMES: Tuple[str, ...] = tuple(
+  field.name for field in dataclasses.fields(GameState))
+
+
+def _get_fields(game_state: GameState) -> Tuple:
+  return tuple(getattr(game_state, name) for name in _FIELD_NAMES)
+
+
+def _get_changed_fields(old_fields: Tuple, new_fields: Tuple) -> Set[str]:
+  """
+  Returns the names of the fields that were reassigned. GameState fields are
+  not modified in place by PlayerAction.execute() (e.g., a new list is created
+  if a card is added to a player's hand), so the values are compared by
+  identity. The functions that modify the fields in place (e.g.,
+  PlayerAction.apply()) must be decorated with
+  @validate_game_states(modifies_in_place=True).
+  """
+  return {name for name, old_value, new_value in
+          zip(_FIELD_NAMES, old_fields, new_fields) if
+          old_value is not new_value}
 
 
 class GameStateValidator:
@@ -214,33 +283,188 @@ class GameStateValidator:
     validate(self._game_state)
 
   def __exit__(self, exc_type, exc_val, exc_tb) -> bool:
+    # The manual changes are not reflected in the Zobrist key.
+    self._game_state.cached_zobrist_key = None
     validate(self._game_state)
     return False
 
 
+@enum.unique
+class ValidationLevel(enum.Enum):
+  """
+  Controls how much validation is done by the @validate_game_states decorator.
+  """
+  OFF = enum.auto()
+  """No validation is done."""
+
+  SAMPLED = enum.auto()
+  """Only one in every N calls to a decorated function is fully validated."""
+
+  INCREMENTAL = enum.auto()
+  """
+  The GameState arguments are assumed to be valid when the decorated function is
+  called. Afterwards, only the checks that depend on the GameState fields that
+  were reassigned by the decorated function are run. The fields modified in
+  place are not detected, so the functions decorated with
+  @validate_game_states(modifies_in_place=True) are fully validated after the
+  call.
+  """
+
+  FULL = enum.auto()
+  """All GameState arguments and return values are fully validated."""
+
+
+# The environment variables that can be used to override the default validation
+# level and sample rate (e.g., SCHNAPSEN_VALIDATION_LEVEL=incremental).
+VALIDATION_LEVEL_ENV_VAR = "SCHNAPSEN_VALIDATION_LEVEL"
+VALIDATION_SAMPLE_RATE_ENV_VAR = "SCHNAPSEN_VALIDATION_SAMPLE_RATE"
+
+@dataclasses.dataclass
+class _ValidationSettings:
+  """The settings used by the @validate_game_states decorator."""
+
+  level: ValidationLevel = ValidationLevel.FULL
+  sample_rate: int = 100
+
+  num_calls: int = 0
+  """
+  The number of calls to decorated functions since the validation level was
+  set. Only used if level is ValidationLevel.SAMPLED.
+  """
+
+
+_SETTINGS = _ValidationSettings()
+
+
+def get_validation_level() -> ValidationLevel:
+  return _SETTINGS.level
+
+
+def set_validation_level(level: ValidationLevel,
+                         sample_rate: Optional[int] = None) -> None:
+  """
+  Sets the validation level used by the @validate_game_states decorator.
+  :param level: The new validation level.
+  :param sample_rate: Only used if level is ValidationLevel.SAMPLED. One in
+    every sample_rate calls will be validated. If None, the current sample rate
+    is not changed.
+  """
+  if sample_rate is not None:
+    if sample_rate < 1:
+      raise ValueError(f"sample_rate must be positive: {sample_rate}")
+    _SETTINGS.sample_rate = sample_rate
+  _SETTINGS.level = level
+  _SETTINGS.num_calls = 0
+
+
+def _set_validation_level_from_env() -> None:
+  level_name = os.environ.get(VALIDATION_LEVEL_ENV_VAR)
+  sample_rate = os.environ.get(VALIDATION_SAMPLE_RATE_ENV_VAR)
+  level = _SETTINGS.level
+  if level_name is not None:
+    try:
+      level = ValidationLevel[level_name.upper()]
+    except KeyError as key_error:
+      raise ValueError(
+        f"Invalid {VALIDATION_LEVEL_ENV_VAR}: {level_name}") from key_error
+  set_validation_level(level,
+                       int(sample_rate) if sample_rate is not None else None)
+
+
+def _full_validation_wrapper(func, *args, **kwds):
+  game_states = []
+  game_states += [arg for arg in args if isinstance(arg, GameState)]
+  game_states += [value for name, value in kwds.items() if
+                  isinstance(value, GameState)]
+  for game_state in game_states:
+    validate(game_state)
+  return_value = func(*args, **kwds)
+  for game_state in game_states:
+    validate(game_state)
+  if isinstance(return_value, GameState):
+    validate(return_value)
+  return return_value
+
+
+def _incremental_validation_wrapper(func, *args, **kwds):
+  game_states = []
+  game_states += [arg for arg in args if isinstance(arg, GameState)]
+  game_states += [value for name, value in kwds.items() if
+                  isinstance(value, GameState)]
+  old_fields = [_get_fields(game_state) for game_state in game_states]
+  return_value = func(*args, **kwds)
+  for game_state, fields in zip(game_states, old_fields):
+    _validate_changed_fields(game_state,
+                             _get_changed_fields(fields,
+                                                 _get_fields(game_state)))
+  if isinstance(return_value, GameState):
+    if len(game_states) == 0:
+      validate(return_value)
+    elif all(return_value is not game_state for game_state in game_states):
+      # Only the fields that differ from the first input can be invalid.
+      _validate_changed_fields(
+        return_value,
+        _get_changed_fields(old_fields[0], _get_fields(return_value)))
+  return return_value
+
+
+def _in_place_validation_wrapper(func, *args, **kwds):
+  game_states = []
+  game_states += [arg for arg in args if isinstance(arg, GameState)]
+  game_states += [value for name, value in kwds.items() if
+                  isinstance(value, GameState)]
+  return_value = func(*args, **kwds)
+  # The fields modified in place cannot be detected by comparing identities, so
+  # the arguments are fully validated, but only after the call.
+  for game_state in game_states:
+    validate(game_state)
+  return return_value
+
+
 # noinspection PyUnreachableCode
-def validate_game_states(func):
+def validate_game_states(func=None, *, modifies_in_place: bool = False):
   """
   Function decorator that calls validate() on all GameState arguments passed to
   the decorated function before and after the decorated function is called. If
   the function returns a GameState object, validate() will also be called on it.
-  It has no effect if __debug__ is False.
+  The amount of validation is controlled by the current ValidationLevel (see
+  set_validation_level()). It has no effect if __debug__ is False.
+
+  ::
+    @validate_game_states
+    def execute(game_state: GameState) -> GameState: ...
+
+    @validate_game_states(modifies_in_place=True)
+    def apply(game_state: GameState) -> UndoToken: ...
+
+  :param modifies_in_place: Must be True if the decorated function modifies
+    the GameState arguments in place (e.g., appends a card to a list in
+    cards_in_hand). In this case ValidationLevel.INCREMENTAL runs all the
+    checks on the GameState arguments after the call, since the in-place
+    changes cannot be detected by comparing the field identities.
   """
+  if func is None:
+    return lambda f: validate_game_states(f,
+                                          modifies_in_place=modifies_in_place)
   if __debug__:
+    incremental_wrapper = _in_place_validation_wrapper if modifies_in_place \
+      else _incremental_validation_wrapper
+
     @wraps(func)  # pragma: no cover
     def wrapper(*args, **kwds):
-      game_states = []
-      game_states += [arg for arg in args if isinstance(arg, GameState)]
-      game_states += [value for name, value in kwds.items() if
-                      isinstance(value, GameState)]
-      for game_state in game_states:
-        validate(game_state)
-      return_value = func(*args, **kwds)
-      for game_state in game_states:
-        validate(game_state)
-      if isinstance(return_value, GameState):
-        validate(return_value)
-      return return_value
+      level = _SETTINGS.level
+      if level == ValidationLevel.FULL:
+        return _full_validation_wrapper(func, *args, **kwds)
+      if level == ValidationLevel.INCREMENTAL:
+        return incremental_wrapper(func, *args, **kwds)
+      if level == ValidationLevel.SAMPLED:
+        _SETTINGS.num_calls += 1
+        if _SETTINGS.num_calls % _SETTINGS.sample_rate == 0:
+          return _full_validation_wrapper(func, *args, **kwds)
+      return func(*args, **kwds)
 
     return wrapper
   return func  # pragma: no cover
+
+
+_set_validation_level_from_env()
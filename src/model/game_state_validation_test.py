@@ -12,7 +12,9 @@ from model.game_state import GameState
 from model.game_state_test_utils import get_game_state_for_tests, \
   get_game_state_with_empty_talon_for_tests
 from model.game_state_validation import validate, GameStateValidator, \
-  validate_game_states, InvalidGameStateError
+  validate_game_states, InvalidGameStateError, ValidationLevel, \
+  set_validation_level, get_validation_level, VALIDATION_LEVEL_ENV_VAR
+from model.player_action import CloseTheTalonAction
 from model.player_id import PlayerId
 from model.player_pair import PlayerPair
 from model.suit import Suit
@@ -39,7 +41,7 @@ class ValidateTest(unittest.TestCase):
       validate(self.game_state)
 
   def test_trump_card_is_public(self):
-    self.game_state.trump_card.public = False
+    self.game_state.public_cards &= ~(1 << self.game_state.trump_card.index)
     with self.assertRaisesRegex(InvalidGameStateError,
                                 "The trump card should be public"):
       validate(self.game_state)
@@ -258,7 +260,7 @@ class ValidateTest(unittest.TestCase):
     with self.assertRaisesRegex(InvalidGameStateError,
                                 "Marriage card should be public: Q♥"):
       validate(self.game_state)
-    self.game_state.cards_in_hand.one[0].public = True
+    self.game_state.set_public(self.game_state.cards_in_hand.one[0])
     validate(self.game_state)
 
     # Both cards were played, but by different players.
@@ -437,3 +439,123 @@ class ValidateGameStatesDecoratorTest(unittest.TestCase):
     print(str(completed_process.stderr))
     self.assertEqual(0, completed_process.returncode)
     self.assertRegex(str(completed_process.stdout), "Success")
+
+  def test_validation_level_from_env(self):
+    # pylint: disable=subprocess-run-check
+    file_name = os.path.join(
+      os.path.dirname(__file__), "game_state_validation_test_module.py")
+
+    # Validation is disabled. It should not raise InvalidGameStateError.
+    env = dict(os.environ)
+    env[VALIDATION_LEVEL_ENV_VAR] = "off"
+    completed_process = subprocess.run([sys.executable, file_name],
+                                       capture_output=True, env=env)
+    self.assertEqual(0, completed_process.returncode, msg=completed_process)
+    self.assertRegex(str(completed_process.stdout), "Success")
+
+    # Invalid validation level.
+    env[VALIDATION_LEVEL_ENV_VAR] = "invalid-level"
+    completed_process = subprocess.run([sys.executable, file_name],
+                                       capture_output=True, env=env)
+    self.assertNotEqual(0, completed_process.returncode, msg=completed_process)
+    self.assertRegex(str(completed_process.stderr),
+                     f"Invalid {VALIDATION_LEVEL_ENV_VAR}: invalid-level")
+
+
+class ValidationLevelTest(unittest.TestCase):
+  """Tests for the validation levels used by @validate_game_states."""
+
+  def setUp(self):
+    self._previous_level = get_validation_level()
+
+  def tearDown(self):
+    set_validation_level(self._previous_level)
+
+  @unittest.skipIf(VALIDATION_LEVEL_ENV_VAR in os.environ,
+                   "The default validation level is overridden")
+  def test_default_level_is_full(self):
+    self.assertEqual(ValidationLevel.FULL, self._previous_level)
+
+  def test_off(self):
+    set_validation_level(ValidationLevel.OFF)
+
+    @validate_game_states
+    def func(game_state: GameState) -> None:
+      game_state.trick_points = PlayerPair(0, 0)
+
+    func(get_game_state_for_tests())
+
+  def test_sampled(self):
+    set_validation_level(ValidationLevel.SAMPLED, sample_rate=3)
+
+    @validate_game_states
+    def func(game_state: GameState) -> None:
+      game_state.trick_points = PlayerPair(0, 0)
+
+    func(get_game_state_for_tests())
+    func(get_game_state_for_tests())
+    with self.assertRaisesRegex(InvalidGameStateError, "Invalid trick points"):
+      func(get_game_state_for_tests())
+    func(get_game_state_for_tests())
+
+  def test_invalid_sample_rate(self):
+    with self.assertRaisesRegex(ValueError, "sample_rate must be positive"):
+      set_validation_level(ValidationLevel.SAMPLED, sample_rate=0)
+
+  def test_incremental_checks_the_reassigned_fields(self):
+    set_validation_level(ValidationLevel.INCREMENTAL)
+
+    @validate_game_states
+    def func(game_state: GameState) -> None:
+      game_state.trick_points = PlayerPair(0, 0)
+
+    with self.assertRaisesRegex(InvalidGameStateError, "Invalid trick points"):
+      func(get_game_state_for_tests())
+
+  def test_incremental_checks_the_returned_game_state(self):
+    set_validation_level(ValidationLevel.INCREMENTAL)
+
+    @validate_game_states
+    def func(game_state: GameState) -> GameState:
+      new_game_state = copy.copy(game_state)
+      new_game_state.trick_points = PlayerPair(0, 0)
+      return new_game_state
+
+    with self.assertRaisesRegex(InvalidGameStateError, "Invalid trick points"):
+      func(get_game_state_for_tests())
+
+  def test_incremental_skips_the_unchanged_fields(self):
+    set_validation_level(ValidationLevel.INCREMENTAL)
+
+    @validate_game_states
+    def func(game_state: GameState) -> None:
+      game_state.next_player = game_state.next_player.opponent()
+
+    # The trick points are invalid, but they are not changed by func().
+    game_state = get_game_state_for_tests()
+    game_state.trick_points = PlayerPair(0, 0)
+    func(game_state)
+
+    # In-place changes are not detected.
+    @validate_game_states
+    def func_with_in_place_changes(game_state: GameState) -> None:
+      game_state.trick_points.one = 0
+
+    func_with_in_place_changes(get_game_state_for_tests())
+
+  def test_incremental_validates_in_place_changes(self):
+    set_validation_level(ValidationLevel.INCREMENTAL)
+
+    class BrokenCloseTheTalonAction(CloseTheTalonAction):
+      @validate_game_states(modifies_in_place=True)
+      def apply(self, game_state: GameState):
+        undo_token = super().apply(game_state)
+        # The talon list is not reassigned, but one card goes missing.
+        game_state.talon.pop()
+        return undo_token
+
+    game_state = get_game_state_for_tests()
+    action = BrokenCloseTheTalonAction(game_state.next_player)
+    with self.assertRaisesRegex(InvalidGameStateError,
+                                "Total number of cards must be 20, not 19"):
+      action.apply(game_state)
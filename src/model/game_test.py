@@ -2,13 +2,17 @@
 #  Use of this source code is governed by a BSD-style license that can be
 #  found in the LICENSE file.
 
+import random
 import unittest
 from pickle import loads, dumps
+from unittest.mock import patch
 
 from model.card import Card
 from model.card_value import CardValue
 from model.game import Game
-from model.player_action import PlayCardAction, CloseTheTalonAction
+from model.game_state import GameState
+from model.player_action import PlayCardAction, CloseTheTalonAction, \
+  get_available_actions
 from model.player_id import PlayerId
 from model.player_pair import PlayerPair
 from model.suit import Suit
@@ -107,3 +111,77 @@ class GameTest(unittest.TestCase):
     self.assertTrue(unpickled_game.game_state.is_game_over)
     self.assertEqual(PlayerPair(13, 67), unpickled_game.game_state.trick_points)
     self.assertEqual(PlayerPair(0, 3), unpickled_game.game_state.game_points)
+
+  def test_state_at(self):
+    for seed in range(10):
+      rng = random.Random(seed)
+      game = Game(PlayerId.ONE if seed % 2 else PlayerId.TWO, seed=seed)
+      expected_game_states = [GameState.new(game.dealer, seed)]
+      while not game.game_state.is_game_over:
+        action = rng.choice(get_available_actions(game.game_state))
+        game.play_action(action)
+        expected_game_states.append(
+          action.execute(expected_game_states[-1]))
+      for num_actions, expected_game_state in enumerate(expected_game_states):
+        self.assertEqual(expected_game_state, game.state_at(num_actions))
+      self.assertIs(game.game_state, game.state_at(len(game.actions)))
+      unpickled_game: Game = loads(dumps(game))
+      self.assertEqual(expected_game_states[3], unpickled_game.state_at(3))
+      with self.assertRaises(IndexError):
+        game.state_at(-1)
+      with self.assertRaises(IndexError):
+        game.state_at(len(game.actions) + 1)
+
+  def test_state_at_replays_at_most_one_trick(self):
+    game = Game(PlayerId.ONE, seed=2)
+    actions = [
+      PlayCardAction(PlayerId.TWO, Card(Suit.HEARTS, CardValue.JACK)),
+      PlayCardAction(PlayerId.ONE, Card(Suit.CLUBS, CardValue.KING)),
+      CloseTheTalonAction(PlayerId.TWO),
+      PlayCardAction(PlayerId.TWO, Card(Suit.DIAMONDS, CardValue.TEN)),
+      PlayCardAction(PlayerId.ONE, Card(Suit.DIAMONDS, CardValue.JACK)),
+    ]
+    for action in actions:
+      game.play_action(action)
+    with patch.object(CloseTheTalonAction, "execute",
+                      wraps=actions[2].execute) as execute:
+      self.assertTrue(game.state_at(3).is_talon_closed)
+      self.assertEqual(1, execute.call_count)
+    with patch.object(PlayCardAction, "execute") as execute:
+      self.assertEqual(PlayerPair(0, 6), game.state_at(2).trick_points)
+      self.assertEqual(PlayerPair(0, 18), game.state_at(5).trick_points)
+      execute.assert_not_called()
+
+  def test_snapshots_are_not_modified_in_place(self):
+    game = Game(PlayerId.ONE, seed=2)
+    game.play_action(
+      PlayCardAction(PlayerId.TWO, Card(Suit.HEARTS, CardValue.JACK)))
+    game.play_action(
+      PlayCardAction(PlayerId.ONE, Card(Suit.CLUBS, CardValue.KING)))
+    expected_game_states = [game.state_at(i).deep_copy() for i in range(3)]
+    # The second action completed a trick, so the last snapshot was saved for
+    # the current game state.
+    get_available_actions(game.game_state)[0].apply(game.game_state)
+    game.play_action(get_available_actions(game.game_state)[0])
+    for i, expected_game_state in enumerate(expected_game_states):
+      self.assertEqual(expected_game_state, game.state_at(i))
+
+  def test_unpickling_is_lazy(self):
+    game = Game(PlayerId.ONE, seed=2)
+    game.play_action(
+      PlayCardAction(PlayerId.TWO, Card(Suit.HEARTS, CardValue.JACK)))
+    pickled_game = dumps(game)
+    with patch.object(GameState, "new", wraps=GameState.new) as new:
+      unpickled_game: Game = loads(pickled_game)
+      self.assertEqual(game.actions, unpickled_game.actions)
+      new.assert_not_called()
+      self.assertEqual(game.game_state, unpickled_game.game_state)
+      self.assertEqual(game.game_state, unpickled_game.game_state)
+      new.assert_called_once()
+
+    # Play an action before accessing the game state.
+    unpickled_game: Game = loads(pickled_game)
+    unpickled_game.play_action(
+      PlayCardAction(PlayerId.ONE, Card(Suit.CLUBS, CardValue.KING)))
+    self.assertEqual(2, len(unpickled_game.actions))
+    self.assertEqual(PlayerPair(0, 6), unpickled_game.game_state.trick_points)
@@ -4,11 +4,12 @@
 
 import abc
 import copy
-from typing import List
+from typing import List, Dict, Optional, Tuple
 
+from model import zobrist
 from model.card import Card
 from model.card_value import CardValue
-from model.game_state import GameState
+from model.game_state import GameState, Trick
 from model.game_state_validation import validate_game_states
 from model.player_id import PlayerId
 from model.player_pair import PlayerPair
@@ -21,6 +22,85 @@ def _add_marriage_points(game_state: GameState, player_id: PlayerId,
   game_state.trick_points[player_id] += marriage_value
 
 
+# The value returned by PlayerAction.apply(), which must be passed back to
+# PlayerAction.undo(). Its content is an implementation detail of each action.
+UndoToken = Tuple
+
+
+def _save_scalar_fields(game_state: GameState) -> Tuple:
+  """
+  Saves the fields of a game state that can be restored by assigning them back
+  (see _restore_scalar_fields()). They are part of the undo tokens.
+  """
+  return (game_state.next_player, game_state.trump_card,
+          game_state.trick_points.one, game_state.trick_points.two,
+          game_state.public_cards, game_state.inferred_talon_cards.one,
+          game_state.inferred_talon_cards.two, game_state.cached_zobrist_key)
+
+
+def _restore_scalar_fields(game_state: GameState, scalar_fields: Tuple):
+  game_state.next_player, game_state.trump_card, game_state.trick_points.one, \
+  game_state.trick_points.two, game_state.public_cards, \
+  game_state.inferred_talon_cards.one, game_state.inferred_talon_cards.two, \
+  game_state.cached_zobrist_key = scalar_fields
+
+
+# Each action has a dense integer id in [0, NUM_ACTION_IDS), which can be used
+# to index arrays instead of hashing the actions (see PlayerAction.action_id).
+# The ids of player TWO's actions are the ids of player ONE's actions plus
+# _NUM_ACTION_IDS_PER_PLAYER. For each player, the ids are:
+#   * PlayCardAction: Card.index, in [0, 20).
+#   * AnnounceMarriageAction: 20 + Card.index, in [20, 40).
+#   * ExchangeTrumpCardAction: 40.
+#   * CloseTheTalonAction: 41.
+# The Cython engine uses the same ids (see cython_mcts_player/player_action).
+_NUM_ACTION_IDS_PER_PLAYER = 42
+_MARRIAGE_ACTION_ID_OFFSET = 20
+_EXCHANGE_TRUMP_CARD_ACTION_ID = 40
+_CLOSE_THE_TALON_ACTION_ID = 41
+NUM_ACTION_IDS = 2 * _NUM_ACTION_IDS_PER_PLAYER
+
+
+def _get_first_action_id(player_id: PlayerId) -> int:
+  return 0 if player_id == PlayerId.ONE else _NUM_ACTION_IDS_PER_PLAYER
+
+
+def _get_trick_points_key_delta(old_trick_points: PlayerPair[int],
+                                new_trick_points: PlayerPair[int]) -> int:
+  """
+  Returns the value that must be XOR-ed with a Zobrist key to replace the old
+  trick points with the new trick points.
+  """
+  delta = 0
+  for player_id in PlayerId:
+    if old_trick_points[player_id] != new_trick_points[player_id]:
+      delta ^= zobrist.TRICK_POINTS[player_id][
+        old_trick_points[player_id] % zobrist.MAX_POINTS]
+      delta ^= zobrist.TRICK_POINTS[player_id][
+        new_trick_points[player_id] % zobrist.MAX_POINTS]
+  return delta
+
+
+def _cannot_be_held_by_follower(card: Card, trick: Trick, leader: PlayerId,
+                                trump: Suit) -> bool:
+  """
+  Checks if the follower, who had to follow suit when completing the given
+  trick, could have held the given card in their hand. If they played a lower
+  card of the lead suit, they could not head the trick, so they cannot hold a
+  higher card of the lead suit. If they played another suit, they cannot hold
+  any card of the lead suit and, unless they played a trump card, they cannot
+  hold any trump card either.
+  """
+  lead_card = trick[leader]
+  played_card = trick[leader.opponent()]
+  if played_card.suit == lead_card.suit:
+    return card.suit == lead_card.suit and \
+           played_card.card_value < lead_card.card_value < card.card_value
+  if card.suit == lead_card.suit:
+    return True
+  return played_card.suit != trump and card.suit == trump
+
+
 class PlayerAction(abc.ABC):
   """
   Abstract base class for all possible player actions.
@@ -41,11 +121,41 @@ class PlayerAction(abc.ABC):
     """
     assert player_id is not None
     self._player_id = player_id
+    self._action_id = -1
 
   @property
   def player_id(self):
     return self._player_id
 
+  @property
+  def action_id(self) -> int:
+    """
+    A dense integer id in [0, NUM_ACTION_IDS) that uniquely identifies this
+    action. It is also used as the hash of the action.
+    """
+    return self._action_id
+
+  @staticmethod
+  def from_action_id(action_id: int) -> "PlayerAction":
+    """
+    Returns the interned action that has the given action_id. The returned
+    action is shared, so it should not be modified.
+    """
+    action = _ACTIONS_BY_ID[action_id] if 0 <= action_id < NUM_ACTION_IDS \
+      else None
+    if action is None:
+      raise ValueError(f"Invalid action id: {action_id}")
+    return action
+
+  @abc.abstractmethod
+  def _get_action_id(self) -> int:
+    """Computes the value returned by action_id."""
+
+  def __setstate__(self, state):
+    # Actions pickled before the action ids were added don't store them.
+    self.__dict__.update(state)
+    self._action_id = self._get_action_id()
+
   @abc.abstractmethod
   def can_execute_on(self, game_state: GameState) -> bool:
     """
@@ -61,6 +171,30 @@ class PlayerAction(abc.ABC):
     argument. The input and output game states share as much info as possible.
     The action must be a legal action given the current state of the game.
     This can be checked with can_execute_on().
+    If the Zobrist key of the input game state is known, the output game state
+    has its Zobrist key updated incrementally, in O(1).
+    """
+
+  @abc.abstractmethod
+  def apply(self, game_state: GameState) -> UndoToken:
+    """
+    Abstract method that performs this player action on the game state provided
+    as an argument, by modifying it in place. The result is equal to the game
+    state returned by execute(), but nothing is copied, so it is cheaper when
+    the intermediate game states don't have to be kept (e.g., Mcts rollouts).
+    The game state must not share its lists and player pairs with other game
+    states (e.g., it was obtained with deep_copy() and only modified with
+    apply() and undo() since then). The action must be a legal action given the
+    current state of the game.
+    :return: A token that can be passed to undo() to revert this change.
+    """
+
+  @abc.abstractmethod
+  def undo(self, game_state: GameState, undo_token: UndoToken) -> None:
+    """
+    Abstract method that reverts the changes made to game_state by apply(). The
+    game state must be in the state left by the apply() call that returned
+    undo_token, so multiple actions must be undone in the reverse order.
     """
 
 
@@ -78,11 +212,15 @@ class PlayCardAction(PlayerAction):
     assert card is not None
     super().__init__(player_id)
     self._card = card
+    self._action_id = self._get_action_id()
 
   @property
   def card(self) -> Card:
     return self._card
 
+  def _get_action_id(self) -> int:
+    return _get_first_action_id(self._player_id) + self._card.index
+
   def can_execute_on(self, game_state: GameState) -> bool:
     if game_state.next_player != self.player_id:
       return False
@@ -155,6 +293,10 @@ class PlayCardAction(PlayerAction):
     if new_game_state.current_trick[self.player_id.opponent()] is None:
       # The player lead the trick. Wait for the other player to play a card.
       new_game_state.next_player = self.player_id.opponent()
+      if game_state.cached_zobrist_key is not None:
+        new_game_state.cached_zobrist_key ^= \
+          zobrist.CURRENT_TRICK[self.player_id][self._card.index] ^ \
+          zobrist.NEXT_PLAYER.one ^ zobrist.NEXT_PLAYER.two
       return new_game_state
 
     # The player completes a trick. Check who won it.
@@ -193,24 +335,24 @@ class PlayCardAction(PlayerAction):
       new_game_state.cards_in_hand[player_id].remove(
         new_game_state.current_trick[player_id])
 
-    # In case the talon is closed and the player could not follow the lead
-    # suit, reveal the lead-suit cards in the talon. This will allow an AI
-    # player to know which cards cannot be in the opponent's hand, if it has to
-    # make a decision in the future.
-    lead_suit = new_game_state.current_trick[self.player_id.opponent()].suit
-    played_suit = new_game_state.current_trick[self.player_id].suit
-    if new_game_state.is_talon_closed and lead_suit != played_suit:
-      new_game_state.talon = list(game_state.talon)
-      for i, card in enumerate(new_game_state.talon):
-        if card.suit == lead_suit:
-          new_game_state.talon[i] = card.copy()
-          new_game_state.talon[i].public = True
-        # In case the player didn't follow suit and didn't play a trump card,
-        # reveal all the trump cards in the talon as well.
-        if card.suit == new_game_state.trump and \
-            played_suit != new_game_state.trump:
-          new_game_state.talon[i] = card.copy()
-          new_game_state.talon[i].public = True
+    # In case the talon is closed, the player had to follow suit. Reveal to
+    # the opponent the cards in the talon that the player could not have held
+    # given the card they played (e.g., the lead-suit cards if they could not
+    # follow suit). The talon is closed, so the cards unseen by the opponent
+    # are either in the player's hand or in the talon. This will allow an AI
+    # opponent to know which cards cannot be in the player's hand, if it has to
+    # make a decision in the future, and to only consider the card
+    # permutations that are consistent with the play so far. The cards are not
+    # made public, since the player doesn't know which cards are in the talon.
+    if new_game_state.is_talon_closed:
+      leader = self.player_id.opponent()
+      new_game_state.inferred_talon_cards = PlayerPair(
+        game_state.inferred_talon_cards.one,
+        game_state.inferred_talon_cards.two)
+      for card in new_game_state.talon:
+        if _cannot_be_held_by_follower(card, new_game_state.current_trick,
+                                       leader, new_game_state.trump):
+          new_game_state.set_inferred_talon_card(card, leader)
 
     # Clear current trick.
     new_game_state.current_trick = PlayerPair(None, None)
@@ -226,21 +368,149 @@ class PlayCardAction(PlayerAction):
         new_game_state.cards_in_hand[winner.opponent()].append(
           new_game_state.trump_card)
         new_game_state.trump_card = None
-    # TODO(ai): If the talon is closed and the opponent cannot play the same
-    #  suit or trump, make the cards of that suit and trump public in the talon.
 
     # Update the next player
     new_game_state.next_player = winner
 
+    if game_state.cached_zobrist_key is not None:
+      new_game_state.cached_zobrist_key ^= self._get_zobrist_key_delta(
+        game_state, winner) ^ _get_trick_points_key_delta(
+        game_state.trick_points, new_game_state.trick_points)
+
     return new_game_state
 
+  @validate_game_states(modifies_in_place=True)
+  def apply(self, game_state: GameState) -> UndoToken:
+    """Same as execute(), but modifies game_state in place."""
+    # pylint: disable=too-many-branches
+    assert self.can_execute_on(game_state)
+    scalar_fields = _save_scalar_fields(game_state)
+    opponent = self.player_id.opponent()
+    trick = game_state.current_trick
+    if trick[opponent] is None:
+      # The player lead the trick. Wait for the other player to play a card.
+      trick[self.player_id] = self._card
+      game_state.next_player = opponent
+      if game_state.cached_zobrist_key is not None:
+        game_state.cached_zobrist_key ^= \
+          zobrist.CURRENT_TRICK[self.player_id][self._card.index] ^ \
+          zobrist.NEXT_PLAYER.one ^ zobrist.NEXT_PLAYER.two
+      return scalar_fields, None
+
+    # The player completes a trick. Check who won it.
+    if self._card.wins(trick[opponent], game_state.trump):
+      winner = self.player_id
+    else:
+      winner = opponent
+    draws_cards = len(game_state.talon) > 0 and not game_state.is_talon_closed
+    if game_state.cached_zobrist_key is not None:
+      # The delta depends on the talon, so it is computed before drawing cards.
+      game_state.cached_zobrist_key ^= self._get_zobrist_key_delta(
+        game_state, winner)
+    trick[self.player_id] = self._card
+
+    # Update won_tricks and trick_points, including any pending marriage points.
+    trick_points = game_state.trick_points
+    if trick_points[winner] == 0:
+      for suit in game_state.marriage_suits[winner]:
+        _add_marriage_points(game_state, winner, suit)
+    game_state.won_tricks[winner].append(trick)
+    trick_points[winner] += trick.one.card_value
+    trick_points[winner] += trick.two.card_value
+    if game_state.cached_zobrist_key is not None:
+      game_state.cached_zobrist_key ^= _get_trick_points_key_delta(
+        PlayerPair(scalar_fields[2], scalar_fields[3]), trick_points)
+
+    # Remove the cards from players' hands. Their positions are saved, so they
+    # can be put back by undo().
+    hand_indices = []
+    for player_id in PlayerId:
+      hand = game_state.cards_in_hand[player_id]
+      hand_index = hand.index(trick[player_id])
+      del hand[hand_index]
+      hand_indices.append(hand_index)
+
+    # See the comment in execute().
+    if game_state.is_talon_closed:
+      for card in game_state.talon:
+        if _cannot_be_held_by_follower(card, trick, opponent,
+                                       game_state.trump):
+          game_state.set_inferred_talon_card(card, opponent)
+
+    game_state.current_trick = PlayerPair(None, None)
+
+    # Maybe draw new cards from the talon.
+    if draws_cards:
+      talon = game_state.talon
+      game_state.cards_in_hand[winner].append(talon.pop(0))
+      if len(talon) > 0:
+        game_state.cards_in_hand[winner.opponent()].append(talon.pop(0))
+      else:
+        game_state.cards_in_hand[winner.opponent()].append(
+          game_state.trump_card)
+        game_state.trump_card = None
+
+    game_state.next_player = winner
+    return scalar_fields, (trick, winner, hand_indices, draws_cards)
+
+  @validate_game_states(modifies_in_place=True)
+  def undo(self, game_state: GameState, undo_token: UndoToken) -> None:
+    scalar_fields, completed_trick_info = undo_token
+    if completed_trick_info is None:
+      game_state.current_trick[self.player_id] = None
+      _restore_scalar_fields(game_state, scalar_fields)
+      return
+    trick, winner, hand_indices, draws_cards = completed_trick_info
+    if draws_cards:
+      opponent_card = game_state.cards_in_hand[winner.opponent()].pop()
+      # If the trump card was drawn, it is restored with the scalar fields.
+      if game_state.trump_card is not None:
+        game_state.talon.insert(0, opponent_card)
+      game_state.talon.insert(0, game_state.cards_in_hand[winner].pop())
+    for player_id, hand_index in zip(PlayerId, hand_indices):
+      game_state.cards_in_hand[player_id].insert(hand_index, trick[player_id])
+    game_state.won_tricks[winner].pop()
+    trick[self.player_id] = None
+    game_state.current_trick = trick
+    _restore_scalar_fields(game_state, scalar_fields)
+
+  def _get_zobrist_key_delta(self, game_state: GameState,
+                             winner: PlayerId) -> int:
+    """
+    Returns the value that must be XOR-ed with the Zobrist key of game_state to
+    obtain the Zobrist key of the game state obtained after self completes a
+    trick, except for the change in trick points.
+    """
+    opponent = self.player_id.opponent()
+    opponent_card = game_state.current_trick[opponent]
+    delta = zobrist.HAND[self.player_id][self._card.index] ^ \
+            zobrist.HAND[opponent][opponent_card.index] ^ \
+            zobrist.CURRENT_TRICK[opponent][opponent_card.index] ^ \
+            zobrist.WON_TRICKS[winner][self._card.index] ^ \
+            zobrist.WON_TRICKS[winner][opponent_card.index]
+    if len(game_state.talon) > 0 and not game_state.is_talon_closed:
+      num_talon_cards = len(game_state.talon)
+      card = game_state.talon[0]
+      delta ^= zobrist.TALON[card.index][num_talon_cards - 1] ^ \
+               zobrist.HAND[winner][card.index]
+      if num_talon_cards > 1:
+        card = game_state.talon[1]
+        delta ^= zobrist.TALON[card.index][num_talon_cards - 2]
+      else:
+        card = game_state.trump_card
+        delta ^= zobrist.TRUMP_CARD[card.index]
+      delta ^= zobrist.HAND[winner.opponent()][card.index]
+    if winner != self.player_id:
+      delta ^= zobrist.NEXT_PLAYER.one ^ zobrist.NEXT_PLAYER.two
+    return delta
+
   def __eq__(self, other):
     if not isinstance(other, PlayCardAction):
       return False
     return self._player_id == other._player_id and self._card == other._card
 
   def __hash__(self):
-    return hash((self._player_id, self._card))
+    return self._action_id
 
   def __repr__(self):
     return f"PlayCardAction({self.player_id}, {self._card})"
@@ -258,11 +528,16 @@ class AnnounceMarriageAction(PlayerAction):
     assert card.card_value in [CardValue.QUEEN, CardValue.KING]
     super().__init__(player_id)
     self._card = card
+    self._action_id = self._get_action_id()
 
   @property
   def card(self) -> Card:
     return self._card
 
+  def _get_action_id(self) -> int:
+    return _get_first_action_id(self._player_id) + \
+           _MARRIAGE_ACTION_ID_OFFSET + self._card.index
+
   def can_execute_on(self, game_state: GameState) -> bool:
     if not game_state.is_to_lead(self.player_id):
       return False
@@ -286,21 +561,14 @@ class AnnounceMarriageAction(PlayerAction):
     """
     assert self.can_execute_on(game_state)
     new_game_state = copy.copy(game_state)
-    player_cards = list(game_state.cards_in_hand[self.player_id])
-    marriage_pair_index = player_cards.index(self._card.marriage_pair)
-    player_cards[marriage_pair_index] = self._card.marriage_pair.copy()
-    player_cards[marriage_pair_index].public = True
+    new_game_state.set_public(self._card.marriage_pair)
     if self.player_id == PlayerId.ONE:
-      new_game_state.cards_in_hand = PlayerPair(player_cards,
-                                                game_state.cards_in_hand.two)
       new_game_state.current_trick = PlayerPair(self._card,
                                                 game_state.current_trick.two)
       new_game_state.marriage_suits = PlayerPair(
         list(game_state.marriage_suits.one), game_state.marriage_suits.two)
       new_game_state.marriage_suits.one.append(self._card.suit)
     else:
-      new_game_state.cards_in_hand = PlayerPair(game_state.cards_in_hand.one,
-                                                player_cards)
       new_game_state.current_trick = PlayerPair(game_state.current_trick.one,
                                                 self._card)
       new_game_state.marriage_suits = PlayerPair(
@@ -311,15 +579,49 @@ class AnnounceMarriageAction(PlayerAction):
     if new_game_state.trick_points[self.player_id] > 0:
       _add_marriage_points(new_game_state, self.player_id, self._card.suit)
     new_game_state.next_player = self.player_id.opponent()
+    if game_state.cached_zobrist_key is not None:
+      new_game_state.cached_zobrist_key ^= \
+        zobrist.CURRENT_TRICK[self.player_id][self._card.index] ^ \
+        zobrist.MARRIAGE_SUITS[self.player_id][self._card.suit] ^ \
+        zobrist.NEXT_PLAYER.one ^ zobrist.NEXT_PLAYER.two ^ \
+        _get_trick_points_key_delta(game_state.trick_points,
+                                    new_game_state.trick_points)
     return new_game_state
 
+  @validate_game_states(modifies_in_place=True)
+  def apply(self, game_state: GameState) -> UndoToken:
+    """Same as execute(), but modifies game_state in place."""
+    assert self.can_execute_on(game_state)
+    scalar_fields = _save_scalar_fields(game_state)
+    game_state.set_public(self._card.marriage_pair)
+    game_state.current_trick[self.player_id] = self._card
+    game_state.marriage_suits[self.player_id].append(self._card.suit)
+    if game_state.trick_points[self.player_id] > 0:
+      _add_marriage_points(game_state, self.player_id, self._card.suit)
+    game_state.next_player = self.player_id.opponent()
+    if game_state.cached_zobrist_key is not None:
+      game_state.cached_zobrist_key ^= \
+        zobrist.CURRENT_TRICK[self.player_id][self._card.index] ^ \
+        zobrist.MARRIAGE_SUITS[self.player_id][self._card.suit] ^ \
+        zobrist.NEXT_PLAYER.one ^ zobrist.NEXT_PLAYER.two ^ \
+        _get_trick_points_key_delta(
+          PlayerPair(scalar_fields[2], scalar_fields[3]),
+          game_state.trick_points)
+    return scalar_fields
+
+  @validate_game_states(modifies_in_place=True)
+  def undo(self, game_state: GameState, undo_token: UndoToken) -> None:
+    game_state.current_trick[self.player_id] = None
+    game_state.marriage_suits[self.player_id].pop()
+    _restore_scalar_fields(game_state, undo_token)
+
   def __eq__(self, other):
     if not isinstance(other, AnnounceMarriageAction):
       return False
     return self._player_id == other._player_id and self._card == other._card
 
   def __hash__(self):
-    return hash((self._player_id, self._card))
+    return self._action_id
 
   def __repr__(self):
     return f"AnnounceMarriageAction({self.player_id}, {self._card})"
@@ -328,6 +630,14 @@ class AnnounceMarriageAction(PlayerAction):
 class ExchangeTrumpCardAction(PlayerAction):
   """Exchanges the trump jack in the player's hand with the trump card."""
 
+  def __init__(self, player_id: PlayerId):
+    super().__init__(player_id)
+    self._action_id = self._get_action_id()
+
+  def _get_action_id(self) -> int:
+    return _get_first_action_id(self._player_id) + \
+           _EXCHANGE_TRUMP_CARD_ACTION_ID
+
   def can_execute_on(self, game_state: GameState) -> bool:
     if not game_state.is_to_lead(self.player_id):
       return False
@@ -355,16 +665,52 @@ class ExchangeTrumpCardAction(PlayerAction):
       cards_in_hand = PlayerPair(game_state.cards_in_hand.one, new_player_cards)
     new_game_state.cards_in_hand = cards_in_hand
     new_game_state.trump_card = trump_jack
-    new_game_state.trump_card.public = True
+    new_game_state.set_public(trump_jack)
+    if game_state.cached_zobrist_key is not None:
+      old_trump_card = game_state.trump_card
+      new_game_state.cached_zobrist_key ^= \
+        zobrist.HAND[self.player_id][trump_jack.index] ^ \
+        zobrist.TRUMP_CARD[trump_jack.index] ^ \
+        zobrist.TRUMP_CARD[old_trump_card.index] ^ \
+        zobrist.HAND[self.player_id][old_trump_card.index]
     return new_game_state
 
+  @validate_game_states(modifies_in_place=True)
+  def apply(self, game_state: GameState) -> UndoToken:
+    """Same as execute(), but modifies game_state in place."""
+    assert self.can_execute_on(game_state)
+    scalar_fields = _save_scalar_fields(game_state)
+    trump_jack = Card(suit=game_state.trump, card_value=CardValue.JACK)
+    old_trump_card = game_state.trump_card
+    hand = game_state.cards_in_hand[self.player_id]
+    hand_index = hand.index(trump_jack)
+    del hand[hand_index]
+    hand.append(old_trump_card)
+    game_state.trump_card = trump_jack
+    game_state.set_public(trump_jack)
+    if game_state.cached_zobrist_key is not None:
+      game_state.cached_zobrist_key ^= \
+        zobrist.HAND[self.player_id][trump_jack.index] ^ \
+        zobrist.TRUMP_CARD[trump_jack.index] ^ \
+        zobrist.TRUMP_CARD[old_trump_card.index] ^ \
+        zobrist.HAND[self.player_id][old_trump_card.index]
+    return scalar_fields, hand_index
+
+  @validate_game_states(modifies_in_place=True)
+  def undo(self, game_state: GameState, undo_token: UndoToken) -> None:
+    scalar_fields, hand_index = undo_token
+    hand = game_state.cards_in_hand[self.player_id]
+    hand.pop()
+    hand.insert(hand_index, game_state.trump_card)
+    _restore_scalar_fields(game_state, scalar_fields)
+
   def __eq__(self, other):
     if not isinstance(other, ExchangeTrumpCardAction):
       return False
     return self._player_id == other._player_id
 
   def __hash__(self):
-    return hash(self._player_id)
+    return self._action_id
 
   def __repr__(self):
     return f"ExchangeTrumpCardAction({self.player_id})"
@@ -373,6 +719,13 @@ class ExchangeTrumpCardAction(PlayerAction):
 class CloseTheTalonAction(PlayerAction):
   """The player who is to lead closes the talon."""
 
+  def __init__(self, player_id: PlayerId):
+    super().__init__(player_id)
+    self._action_id = self._get_action_id()
+
+  def _get_action_id(self) -> int:
+    return _get_first_action_id(self._player_id) + _CLOSE_THE_TALON_ACTION_ID
+
   def can_execute_on(self, game_state: GameState) -> bool:
     if not game_state.is_to_lead(self.player_id):
       return False
@@ -389,41 +742,138 @@ class CloseTheTalonAction(PlayerAction):
     new_game_state.close_talon()
     return new_game_state
 
+  @validate_game_states(modifies_in_place=True)
+  def apply(self, game_state: GameState) -> UndoToken:
+    """Same as execute(), but modifies game_state in place."""
+    assert self.can_execute_on(game_state)
+    scalar_fields = _save_scalar_fields(game_state)
+    game_state.close_talon()
+    return scalar_fields
+
+  @validate_game_states(modifies_in_place=True)
+  def undo(self, game_state: GameState, undo_token: UndoToken) -> None:
+    game_state.player_that_closed_the_talon = None
+    game_state.opponent_points_when_talon_was_closed = None
+    _restore_scalar_fields(game_state, undo_token)
+
   def __eq__(self, other):
     if not isinstance(other, CloseTheTalonAction):
       return False
     return self._player_id == other._player_id
 
   def __hash__(self):
-    return hash(self._player_id)
+    return self._action_id
 
   def __repr__(self):
     return f"CloseTheTalonAction({self.player_id})"
 
 
+def _get_cards_mask(cards: List[Card]) -> int:
+  """Returns a bitmask with the bits corresponding to the given cards set."""
+  mask = 0
+  for card in cards:
+    mask |= 1 << card.index
+  return mask
+
+
+# The lookup tables used by get_available_actions(). The masks are indexed by
+# Card.index; bit i corresponds to the card with Card.index == i.
+
+# The cards of each suit.
+_SUIT_MASKS: Dict[Suit, int] = {
+  suit: _get_cards_mask(
+    [card for card in Card.get_all_cards() if card.suit == suit])
+  for suit in Suit}
+
+# For each card, the cards of the same suit that would head the trick if this
+# card was played first.
+_HIGHER_CARDS_MASKS: List[int] = [
+  _get_cards_mask([other for other in Card.get_all_cards() if
+                   other.suit == card.suit and
+                   other.card_value > card.card_value])
+  for card in Card.get_all_cards()]
+
+# For each queen or king, the other card from the marriage. Zero for the other
+# cards.
+_MARRIAGE_PAIR_MASKS: List[int] = [
+  1 << card.marriage_pair.index
+  if card.card_value in [CardValue.QUEEN, CardValue.KING] else 0
+  for card in Card.get_all_cards()]
+
+
+def _get_all_actions_by_id() -> List[Optional[PlayerAction]]:
+  actions: List[Optional[PlayerAction]] = [None] * NUM_ACTION_IDS
+  for player_id in PlayerId:
+    player_actions: List[PlayerAction] = [
+      ExchangeTrumpCardAction(player_id), CloseTheTalonAction(player_id)]
+    for card in Card.get_all_cards():
+      player_actions.append(PlayCardAction(player_id, card))
+      if card.card_value in [CardValue.QUEEN, CardValue.KING]:
+        player_actions.append(AnnounceMarriageAction(player_id, card))
+    for action in player_actions:
+      actions[action.action_id] = action
+  return actions
+
+
+# The interned actions returned by PlayerAction.from_action_id() and
+# get_available_actions(), indexed by action_id. Actions are immutable, so they
+# can be shared. The ids of the marriages with jacks, tens or aces are None.
+_ACTIONS_BY_ID: List[Optional[PlayerAction]] = _get_all_actions_by_id()
+
+
+def _get_follow_suit_mask(lead_card: Card, trump: Suit, hand_mask: int) -> int:
+  """
+  Returns the subset of hand_mask that can be played in response to lead_card
+  when the player must follow suit. See PlayCardAction._is_following_suit().
+  """
+  legal_cards = hand_mask & _HIGHER_CARDS_MASKS[lead_card.index]
+  if legal_cards:
+    return legal_cards
+  legal_cards = hand_mask & _SUIT_MASKS[lead_card.suit]
+  if legal_cards:
+    return legal_cards
+  legal_cards = hand_mask & _SUIT_MASKS[trump]
+  if legal_cards:
+    return legal_cards
+  return hand_mask
+
+
 def get_available_actions(game_state: GameState) -> List[PlayerAction]:
   """
   Returns a list of all the valid actions that can be performed in a given game
-  state.
+  state. The actions are shared between calls, so they should not be modified.
+
+  The actions are the same, and in the same order, as the ones obtained by
+  calling can_execute_on() for each card in the player's hand followed by the
+  exchange and close actions, but the legality checks use the precomputed card
+  masks above instead of scanning the player's hand for each action.
   """
-  actions: List[PlayerAction] = []
   player_id = game_state.next_player
-  is_to_lead = game_state.is_to_lead(player_id)
-  for card in game_state.cards_in_hand[player_id]:
-    # TODO(options): Allow Queen/King to be played without announcing marriage?
-    if card.card_value in [CardValue.QUEEN, CardValue.KING] and is_to_lead:
-      marriage = AnnounceMarriageAction(player_id, card)
-      if marriage.can_execute_on(game_state):
-        actions.append(marriage)
-        continue
-    play_card = PlayCardAction(player_id, card)
-    if play_card.can_execute_on(game_state):
-      actions.append(play_card)
-  if is_to_lead:
-    exchange_trump = ExchangeTrumpCardAction(player_id)
-    if exchange_trump.can_execute_on(game_state):
-      actions.append(exchange_trump)
-    close_talon = CloseTheTalonAction(player_id)
-    if close_talon.can_execute_on(game_state):
-      actions.append(close_talon)
+  cards_in_hand = game_state.cards_in_hand[player_id]
+  hand_mask = _get_cards_mask(cards_in_hand)
+  first_action_id = _get_first_action_id(player_id)
+  if not game_state.is_to_lead(player_id):
+    if game_state.must_follow_suit():
+      hand_mask = _get_follow_suit_mask(
+        game_state.current_trick[player_id.opponent()], game_state.trump,
+        hand_mask)
+    return [_ACTIONS_BY_ID[first_action_id + card.index] for card in
+            cards_in_hand if (hand_mask >> card.index) & 1]
+
+  # TODO(options): Allow Queen/King to be played without announcing marriage?
+  marriage_action_id = first_action_id + _MARRIAGE_ACTION_ID_OFFSET
+  actions: List[PlayerAction] = [
+    _ACTIONS_BY_ID[marriage_action_id + card.index]
+    if hand_mask & _MARRIAGE_PAIR_MASKS[card.index]
+    else _ACTIONS_BY_ID[first_action_id + card.index]
+    for card in cards_in_hand]
+  if not game_state.is_talon_closed:
+    if game_state.trump_card is not None:
+      trump_jack = Card(game_state.trump, CardValue.JACK)
+      if (hand_mask >> trump_jack.index) & 1:
+        actions.append(_ACTIONS_BY_ID[
+                         first_action_id + _EXCHANGE_TRUMP_CARD_ACTION_ID])
+    if len(game_state.talon) > 0:
+      actions.append(
+        _ACTIONS_BY_ID[first_action_id + _CLOSE_THE_TALON_ACTION_ID])
   return actions
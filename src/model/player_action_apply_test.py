@@ -0,0 +1,63 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+import random
+import unittest
+
+from model.card import Card
+from model.card_value import CardValue
+from model.game_state import GameState
+from model.game_state_test_utils import get_game_state_for_tests
+from model.player_action import PlayCardAction, get_available_actions
+from model.player_id import PlayerId
+from model.suit import Suit
+
+
+class ApplyAndUndoTest(unittest.TestCase):
+  def test_apply_is_the_same_as_execute(self):
+    for seed in range(100):
+      rng = random.Random(seed)
+      game_state = GameState.new(random_seed=seed)
+      self.assertIsNotNone(game_state.zobrist_key)
+      mutable_game_state = game_state.deep_copy()
+      mutable_game_state.public_cards = game_state.public_cards
+      self.assertIsNotNone(mutable_game_state.zobrist_key)
+      game_states = [game_state]
+      actions_and_undo_tokens = []
+      while not game_state.is_game_over:
+        action = rng.choice(get_available_actions(game_state))
+        game_state = action.execute(game_state)
+        undo_token = action.apply(mutable_game_state)
+        self.assertEqual(game_state, mutable_game_state, msg=action)
+        self.assertEqual(game_state.public_cards,
+                         mutable_game_state.public_cards, msg=action)
+        self.assertEqual(game_state.inferred_talon_cards,
+                         mutable_game_state.inferred_talon_cards, msg=action)
+        self.assertEqual(game_state.cached_zobrist_key,
+                         mutable_game_state.cached_zobrist_key, msg=action)
+        game_states.append(game_state)
+        actions_and_undo_tokens.append((action, undo_token))
+      game_states.pop()
+      for action, undo_token in reversed(actions_and_undo_tokens):
+        action.undo(mutable_game_state, undo_token)
+        game_state = game_states.pop()
+        self.assertEqual(game_state, mutable_game_state, msg=action)
+        self.assertEqual(game_state.public_cards,
+                         mutable_game_state.public_cards, msg=action)
+        self.assertEqual(game_state.inferred_talon_cards,
+                         mutable_game_state.inferred_talon_cards, msg=action)
+        self.assertEqual(game_state.cached_zobrist_key,
+                         mutable_game_state.cached_zobrist_key, msg=action)
+
+  def test_apply_modifies_the_game_state_in_place(self):
+    game_state = get_game_state_for_tests()
+    cards_in_hand = game_state.cards_in_hand.one
+    action = PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.ACE))
+    undo_token = action.apply(game_state)
+    self.assertIs(cards_in_hand, game_state.cards_in_hand.one)
+    self.assertEqual(Card(Suit.SPADES, CardValue.ACE),
+                     game_state.current_trick.one)
+    self.assertEqual(PlayerId.TWO, game_state.next_player)
+    action.undo(game_state, undo_token)
+    self.assertEqual(get_game_state_for_tests(), game_state)
@@ -0,0 +1,267 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+import random
+import unittest
+from typing import List
+
+from model.card import Card
+from model.card_value import CardValue
+from model.game_state import GameState
+from model.game_state_test_utils import \
+  get_game_state_with_empty_talon_for_tests, get_game_state_for_tests, \
+  get_game_state_with_all_tricks_played
+from model.game_state_validation import GameStateValidator
+from model.player_action import CloseTheTalonAction, ExchangeTrumpCardAction, \
+  AnnounceMarriageAction, PlayCardAction, get_available_actions, PlayerAction
+from model.player_id import PlayerId
+from model.suit import Suit
+
+
+def _get_available_actions_using_can_execute_on(
+    game_state: GameState) -> List[PlayerAction]:
+  """Reference implementation for get_available_actions()."""
+  actions: List[PlayerAction] = []
+  player_id = game_state.next_player
+  is_to_lead = game_state.is_to_lead(player_id)
+  for card in game_state.cards_in_hand[player_id]:
+    if card.card_value in [CardValue.QUEEN, CardValue.KING] and is_to_lead:
+      marriage = AnnounceMarriageAction(player_id, card)
+      if marriage.can_execute_on(game_state):
+        actions.append(marriage)
+        continue
+    play_card = PlayCardAction(player_id, card)
+    if play_card.can_execute_on(game_state):
+      actions.append(play_card)
+  if is_to_lead:
+    exchange_trump = ExchangeTrumpCardAction(player_id)
+    if exchange_trump.can_execute_on(game_state):
+      actions.append(exchange_trump)
+    close_talon = CloseTheTalonAction(player_id)
+    if close_talon.can_execute_on(game_state):
+      actions.append(close_talon)
+  return actions
+
+
+class AvailableActionsTest(unittest.TestCase):
+  """Tests for the get_available_actions() functions."""
+
+  def test_same_actions_as_can_execute_on(self):
+    for seed in range(100):
+      rng = random.Random(seed)
+      game_state = GameState.new(random_seed=seed)
+      while not game_state.is_game_over:
+        actions = get_available_actions(game_state)
+        self.assertEqual(
+          _get_available_actions_using_can_execute_on(game_state), actions)
+        game_view = game_state.next_player_view()
+        self.assertEqual(
+          _get_available_actions_using_can_execute_on(game_view),
+          get_available_actions(game_view))
+        game_state = rng.choice(actions).execute(game_state)
+
+  def test_actions_are_interned(self):
+    game_state = get_game_state_for_tests()
+    actions = get_available_actions(game_state)
+    for action, other_action in zip(actions,
+                                    get_available_actions(game_state)):
+      self.assertIs(action, other_action)
+
+  def test_actions_when_player_is_to_lead(self):
+    game_state = get_game_state_for_tests()
+
+    actions = get_available_actions(game_state)
+    self.assertEqual(set(actions),
+                     set(get_available_actions(game_state.next_player_view())))
+    expected_actions = [
+      AnnounceMarriageAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.QUEEN)),
+      AnnounceMarriageAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.KING)),
+      PlayCardAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.TEN)),
+      PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.TEN)),
+      PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.ACE)),
+      CloseTheTalonAction(PlayerId.ONE),
+    ]
+    self.assertSetEqual(set(expected_actions), set(actions))
+
+    with GameStateValidator(game_state):
+      game_state.next_player = PlayerId.TWO
+
+    actions = get_available_actions(game_state)
+    self.assertEqual(set(actions),
+                     set(get_available_actions(game_state.next_player_view())))
+    expected_actions = [
+      PlayCardAction(PlayerId.TWO, Card(Suit.DIAMONDS, CardValue.QUEEN)),
+      AnnounceMarriageAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.KING)),
+      PlayCardAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.JACK)),
+      AnnounceMarriageAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.QUEEN)),
+      PlayCardAction(PlayerId.TWO, Card(Suit.SPADES, CardValue.JACK)),
+      ExchangeTrumpCardAction(PlayerId.TWO),
+      CloseTheTalonAction(PlayerId.TWO),
+    ]
+    self.assertSetEqual(set(expected_actions), set(actions))
+
+  def test_actions_after_the_opponent_played_one_card(self):
+    game_state = get_game_state_for_tests()
+    action = PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.TEN))
+    game_state = action.execute(game_state)
+
+    actions = get_available_actions(game_state)
+    self.assertEqual(set(actions),
+                     set(get_available_actions(game_state.next_player_view())))
+    expected_actions = [
+      PlayCardAction(PlayerId.TWO, Card(Suit.DIAMONDS, CardValue.QUEEN)),
+      PlayCardAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.KING)),
+      PlayCardAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.JACK)),
+      PlayCardAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.QUEEN)),
+      PlayCardAction(PlayerId.TWO, Card(Suit.SPADES, CardValue.JACK)),
+    ]
+    self.assertSetEqual(set(expected_actions), set(actions))
+
+    game_state = get_game_state_for_tests()
+    with GameStateValidator(game_state):
+      game_state.next_player = PlayerId.TWO
+    action = PlayCardAction(PlayerId.TWO, Card(Suit.DIAMONDS, CardValue.QUEEN))
+    game_state = action.execute(game_state)
+
+    actions = get_available_actions(game_state)
+    self.assertEqual(set(actions),
+                     set(get_available_actions(game_state.next_player_view())))
+    expected_actions = [
+      PlayCardAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.QUEEN)),
+      PlayCardAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.KING)),
+      PlayCardAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.TEN)),
+      PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.TEN)),
+      PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.ACE)),
+    ]
+    self.assertSetEqual(set(expected_actions), set(actions))
+
+  def test_actions_when_player_is_to_lead_talon_is_closed(self):
+    game_state = get_game_state_for_tests()
+    game_state = CloseTheTalonAction(PlayerId.ONE).execute(game_state)
+
+    actions = get_available_actions(game_state)
+    self.assertEqual(set(actions),
+                     set(get_available_actions(game_state.next_player_view())))
+    expected_actions = [
+      AnnounceMarriageAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.QUEEN)),
+      AnnounceMarriageAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.KING)),
+      PlayCardAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.TEN)),
+      PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.TEN)),
+      PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.ACE)),
+    ]
+    self.assertSetEqual(set(expected_actions), set(actions))
+
+    game_state = get_game_state_for_tests()
+    with GameStateValidator(game_state):
+      game_state.next_player = PlayerId.TWO
+    game_state = CloseTheTalonAction(PlayerId.TWO).execute(game_state)
+
+    actions = get_available_actions(game_state)
+    self.assertEqual(set(actions),
+                     set(get_available_actions(game_state.next_player_view())))
+    expected_actions = [
+      PlayCardAction(PlayerId.TWO, Card(Suit.DIAMONDS, CardValue.QUEEN)),
+      AnnounceMarriageAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.KING)),
+      PlayCardAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.JACK)),
+      AnnounceMarriageAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.QUEEN)),
+      PlayCardAction(PlayerId.TWO, Card(Suit.SPADES, CardValue.JACK)),
+    ]
+    self.assertSetEqual(set(expected_actions), set(actions))
+
+  def test_actions_after_the_opponent_played_one_card_talon_is_closed(self):
+    game_state = get_game_state_for_tests()
+    game_state = CloseTheTalonAction(PlayerId.ONE).execute(game_state)
+    action = PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.TEN))
+    game_state = action.execute(game_state)
+
+    actions = get_available_actions(game_state)
+    self.assertEqual(set(actions),
+                     set(get_available_actions(game_state.next_player_view())))
+    expected_actions = [
+      PlayCardAction(PlayerId.TWO, Card(Suit.SPADES, CardValue.JACK)),
+    ]
+    self.assertSetEqual(set(expected_actions), set(actions))
+
+    game_state = get_game_state_for_tests()
+    with GameStateValidator(game_state):
+      game_state.next_player = PlayerId.TWO
+    game_state = CloseTheTalonAction(PlayerId.TWO).execute(game_state)
+    action = PlayCardAction(PlayerId.TWO, Card(Suit.SPADES, CardValue.JACK))
+    game_state = action.execute(game_state)
+
+    actions = get_available_actions(game_state)
+    self.assertEqual(set(actions),
+                     set(get_available_actions(game_state.next_player_view())))
+    expected_actions = [
+      PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.TEN)),
+      PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.ACE)),
+    ]
+    self.assertSetEqual(set(expected_actions), set(actions))
+
+  def test_actions_when_player_is_to_lead_talon_is_empty(self):
+    game_state = get_game_state_with_empty_talon_for_tests()
+
+    actions = get_available_actions(game_state)
+    self.assertEqual(set(actions),
+                     set(get_available_actions(game_state.next_player_view())))
+    expected_actions = [
+      PlayCardAction(PlayerId.ONE, Card(Suit.CLUBS, CardValue.ACE)),
+      PlayCardAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.KING)),
+      PlayCardAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.TEN)),
+      PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.TEN)),
+    ]
+    self.assertSetEqual(set(expected_actions), set(actions))
+
+    game_state = get_game_state_with_empty_talon_for_tests()
+    with GameStateValidator(game_state):
+      game_state.next_player = PlayerId.TWO
+
+    actions = get_available_actions(game_state)
+    self.assertEqual(set(actions),
+                     set(get_available_actions(game_state.next_player_view())))
+    expected_actions = [
+      PlayCardAction(PlayerId.TWO, Card(Suit.DIAMONDS, CardValue.JACK)),
+      AnnounceMarriageAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.KING)),
+      PlayCardAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.JACK)),
+      AnnounceMarriageAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.QUEEN)),
+    ]
+    self.assertSetEqual(set(expected_actions), set(actions))
+
+  def test_actions_after_the_opponent_played_one_card_talon_is_empty(self):
+    game_state = get_game_state_with_empty_talon_for_tests()
+    action = PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.TEN))
+    game_state = action.execute(game_state)
+
+    actions = get_available_actions(game_state)
+    self.assertEqual(set(actions),
+                     set(get_available_actions(game_state.next_player_view())))
+    expected_actions = [
+      PlayCardAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.KING)),
+      PlayCardAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.JACK)),
+      PlayCardAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.QUEEN)),
+    ]
+    self.assertSetEqual(set(expected_actions), set(actions))
+
+    game_state = get_game_state_with_empty_talon_for_tests()
+    with GameStateValidator(game_state):
+      game_state.next_player = PlayerId.TWO
+    action = PlayCardAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.JACK))
+    game_state = action.execute(game_state)
+
+    actions = get_available_actions(game_state)
+    self.assertEqual(set(actions),
+                     set(get_available_actions(game_state.next_player_view())))
+    expected_actions = [
+      PlayCardAction(PlayerId.ONE, Card(Suit.CLUBS, CardValue.ACE)),
+    ]
+    self.assertSetEqual(set(expected_actions), set(actions))
+
+  def test_no_actions_available_when_game_is_over(self):
+    game_state = get_game_state_with_all_tricks_played()
+    self.assertEqual([], get_available_actions(game_state))
+    self.assertEqual([], get_available_actions(game_state.next_player_view()))
+    with GameStateValidator(game_state):
+      game_state.next_player = PlayerId.TWO
+    self.assertEqual([], get_available_actions(game_state))
+    self.assertEqual([], get_available_actions(game_state.next_player_view()))
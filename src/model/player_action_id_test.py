@@ -0,0 +1,63 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+import pickle
+import unittest
+from typing import List
+
+from model.card import Card
+from model.card_value import CardValue
+from model.player_action import CloseTheTalonAction, ExchangeTrumpCardAction, \
+  AnnounceMarriageAction, PlayCardAction, PlayerAction, NUM_ACTION_IDS
+from model.player_id import PlayerId
+
+
+def _get_all_actions() -> List[PlayerAction]:
+  actions = []
+  for player_id in PlayerId:
+    for card in Card.get_all_cards():
+      actions.append(PlayCardAction(player_id, card))
+      if card.card_value in [CardValue.QUEEN, CardValue.KING]:
+        actions.append(AnnounceMarriageAction(player_id, card))
+    actions.append(ExchangeTrumpCardAction(player_id))
+    actions.append(CloseTheTalonAction(player_id))
+  return actions
+
+
+class ActionIdTest(unittest.TestCase):
+  def test_action_ids_are_unique_and_in_range(self):
+    actions = _get_all_actions()
+    self.assertEqual(60, len(actions))
+    action_ids = [action.action_id for action in actions]
+    self.assertEqual(len(actions), len(set(action_ids)))
+    for action_id in action_ids:
+      self.assertGreaterEqual(action_id, 0)
+      self.assertLess(action_id, NUM_ACTION_IDS)
+
+  def test_from_action_id(self):
+    for action in _get_all_actions():
+      interned_action = PlayerAction.from_action_id(action.action_id)
+      self.assertEqual(action, interned_action)
+      self.assertIs(interned_action,
+                    PlayerAction.from_action_id(action.action_id))
+
+  def test_from_invalid_action_id(self):
+    marriage_with_jack_id = 20
+    for action_id in [-1, marriage_with_jack_id, NUM_ACTION_IDS]:
+      with self.assertRaisesRegex(ValueError, "Invalid action id"):
+        PlayerAction.from_action_id(action_id)
+
+  def test_hash_is_action_id(self):
+    for action in _get_all_actions():
+      self.assertEqual(action.action_id, hash(action))
+
+  def test_unpickle_actions_saved_without_action_id(self):
+    for action in _get_all_actions():
+      state = dict(action.__dict__)
+      del state["_action_id"]
+      unpickled_action = type(action).__new__(type(action))
+      unpickled_action.__setstate__(state)
+      self.assertEqual(action, unpickled_action)
+      self.assertEqual(action.action_id, unpickled_action.action_id)
+      self.assertEqual(action, pickle.loads(pickle.dumps(action)))
@@ -2,13 +2,14 @@
 #  Use of this source code is governed by a BSD-style license that can be
 #  found in the LICENSE file.
 
+import random
 import unittest
 
 from model.card import Card
 from model.card_value import CardValue
+from model.game_state import GameState
 from model.game_state_test_utils import \
   get_game_state_with_empty_talon_for_tests, get_game_state_for_tests, \
-  get_game_state_with_all_tricks_played, \
   get_game_state_with_multiple_cards_in_the_talon_for_tests
 from model.game_state_validation import GameStateValidator
 from model.player_action import CloseTheTalonAction, ExchangeTrumpCardAction, \
@@ -157,7 +158,8 @@ class ExchangeTrumpCardActionTest(unittest.TestCase):
     self.assertEqual(game_state.trump_card, trump_jack)
     self.assertTrue(trump_card in game_state.cards_in_hand.two)
     index = game_state.cards_in_hand.two.index(trump_card)
-    self.assertTrue(game_state.cards_in_hand.two[index].public)
+    self.assertTrue(
+      game_state.is_public(game_state.cards_in_hand.two[index]))
     self.assertEqual(PlayerId.TWO, game_state.next_player)
 
   def test_cannot_execute_illegal_action(self):
@@ -230,7 +232,7 @@ class AnnounceMarriageActionTest(unittest.TestCase):
       queen_spades = game_state.cards_in_hand.two.pop()
       game_state.cards_in_hand.two.append(game_state.trump_card)
       game_state.trump_card = queen_spades
-      game_state.trump_card.public = True
+      game_state.set_public(game_state.trump_card)
     action = AnnounceMarriageAction(PlayerId.TWO, queen_spades)
     self.assertFalse(action.can_execute_on(game_state))
     self.assertFalse(action.can_execute_on(game_state.next_player_view()))
@@ -246,7 +248,7 @@ class AnnounceMarriageActionTest(unittest.TestCase):
     self.assertEqual([Suit.HEARTS], game_state.marriage_suits[PlayerId.ONE])
     self.assertEqual(PlayerId.TWO, game_state.next_player)
     king_hearts = game_state.cards_in_hand.one[1]
-    self.assertTrue(king_hearts.public)
+    self.assertTrue(game_state.is_public(king_hearts))
 
   def test_announce_trump_marriage(self):
     game_state = get_game_state_for_tests()
@@ -262,7 +264,7 @@ class AnnounceMarriageActionTest(unittest.TestCase):
                      game_state.marriage_suits[PlayerId.TWO])
     self.assertEqual(PlayerId.ONE, game_state.next_player)
     king_clubs = game_state.cards_in_hand.two[1]
-    self.assertTrue(king_clubs.public)
+    self.assertTrue(game_state.is_public(king_clubs))
 
   def test_announce_marriage_without_scoring_any_trick(self):
     game_state = get_game_state_for_tests()
@@ -284,7 +286,7 @@ class AnnounceMarriageActionTest(unittest.TestCase):
     self.assertEqual([Suit.HEARTS], game_state.marriage_suits[PlayerId.ONE])
     self.assertEqual(PlayerId.TWO, game_state.next_player)
     king_hearts = game_state.cards_in_hand.one[1]
-    self.assertTrue(king_hearts.public)
+    self.assertTrue(game_state.is_public(king_hearts))
 
   def test_announcing_marriage_is_enough_to_win_the_game(self):
     game_state = get_game_state_for_tests()
@@ -295,7 +297,7 @@ class AnnounceMarriageActionTest(unittest.TestCase):
     self.assertTrue(action.can_execute_on(game_state))
     game_state = action.execute(game_state)
     queen_clubs = game_state.cards_in_hand.two[4]
-    self.assertTrue(queen_clubs.public)
+    self.assertTrue(game_state.is_public(queen_clubs))
     self.assertEqual(93, game_state.trick_points[PlayerId.TWO])
     self.assertTrue(game_state.is_game_over)
 
@@ -706,17 +708,21 @@ class PlayCardActionTest(unittest.TestCase):
       game_state.trick_points.two = 0
     game_state.close_talon()
     self.assertEqual([False, False, False, False, False],
-                     [card.public for card in game_state.talon])
+                     [game_state.is_public(card) for card in game_state.talon])
     action = PlayCardAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.TEN))
     self.assertTrue(action.can_execute_on(game_state))
     game_state = action.execute(game_state)
     self.assertEqual([False, False, False, False, False],
-                     [card.public for card in game_state.talon])
+                     [game_state.is_public(card) for card in game_state.talon])
     action = PlayCardAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.JACK))
     self.assertTrue(action.can_execute_on(game_state))
     game_state = action.execute(game_state)
+    self.assertEqual([False, False, False, False, False],
+                     [game_state.is_public(card) for card in game_state.talon])
     self.assertEqual([False, True, True, False, False],
-                     [card.public for card in game_state.talon])
+                     [game_state.is_inferred_talon_card(card, PlayerId.ONE)
+                      for card in game_state.talon])
+    self.assertEqual(0, game_state.inferred_talon_cards.two)
 
   def test_play_trick_talon_closed_opponent_cannot_follow_suit_or_trump(self):
     game_state = get_game_state_for_tests()
@@ -734,216 +740,73 @@ class PlayCardActionTest(unittest.TestCase):
       game_state.next_player = PlayerId.TWO
     game_state.close_talon()
     self.assertEqual([False, False, False, False, False],
-                     [card.public for card in game_state.talon])
+                     [game_state.is_public(card) for card in game_state.talon])
     action = PlayCardAction(PlayerId.TWO, Card(Suit.DIAMONDS, CardValue.QUEEN))
     self.assertTrue(action.can_execute_on(game_state))
     game_state = action.execute(game_state)
     self.assertEqual([False, False, False, False, False],
-                     [card.public for card in game_state.talon])
+                     [game_state.is_public(card) for card in game_state.talon])
     action = PlayCardAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.QUEEN))
     self.assertTrue(action.can_execute_on(game_state))
     game_state = action.execute(game_state)
+    self.assertEqual([False, False, False, False, False],
+                     [game_state.is_public(card) for card in game_state.talon])
     self.assertEqual([True, False, False, True, True],
-                     [card.public for card in game_state.talon])
-
-
-class AvailableActionsTest(unittest.TestCase):
-  """Tests for the get_available_actions() functions."""
-
-  def test_actions_when_player_is_to_lead(self):
-    game_state = get_game_state_for_tests()
-
-    actions = get_available_actions(game_state)
-    self.assertEqual(set(actions),
-                     set(get_available_actions(game_state.next_player_view())))
-    expected_actions = [
-      AnnounceMarriageAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.QUEEN)),
-      AnnounceMarriageAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.KING)),
-      PlayCardAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.TEN)),
-      PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.TEN)),
-      PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.ACE)),
-      CloseTheTalonAction(PlayerId.ONE),
-    ]
-    self.assertSetEqual(set(expected_actions), set(actions))
-
-    with GameStateValidator(game_state):
-      game_state.next_player = PlayerId.TWO
-
-    actions = get_available_actions(game_state)
-    self.assertEqual(set(actions),
-                     set(get_available_actions(game_state.next_player_view())))
-    expected_actions = [
-      PlayCardAction(PlayerId.TWO, Card(Suit.DIAMONDS, CardValue.QUEEN)),
-      AnnounceMarriageAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.KING)),
-      PlayCardAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.JACK)),
-      AnnounceMarriageAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.QUEEN)),
-      PlayCardAction(PlayerId.TWO, Card(Suit.SPADES, CardValue.JACK)),
-      ExchangeTrumpCardAction(PlayerId.TWO),
-      CloseTheTalonAction(PlayerId.TWO),
-    ]
-    self.assertSetEqual(set(expected_actions), set(actions))
-
-  def test_actions_after_the_opponent_played_one_card(self):
-    game_state = get_game_state_for_tests()
-    action = PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.TEN))
-    game_state = action.execute(game_state)
-
-    actions = get_available_actions(game_state)
-    self.assertEqual(set(actions),
-                     set(get_available_actions(game_state.next_player_view())))
-    expected_actions = [
-      PlayCardAction(PlayerId.TWO, Card(Suit.DIAMONDS, CardValue.QUEEN)),
-      PlayCardAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.KING)),
-      PlayCardAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.JACK)),
-      PlayCardAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.QUEEN)),
-      PlayCardAction(PlayerId.TWO, Card(Suit.SPADES, CardValue.JACK)),
-    ]
-    self.assertSetEqual(set(expected_actions), set(actions))
-
-    game_state = get_game_state_for_tests()
-    with GameStateValidator(game_state):
-      game_state.next_player = PlayerId.TWO
-    action = PlayCardAction(PlayerId.TWO, Card(Suit.DIAMONDS, CardValue.QUEEN))
-    game_state = action.execute(game_state)
-
-    actions = get_available_actions(game_state)
-    self.assertEqual(set(actions),
-                     set(get_available_actions(game_state.next_player_view())))
-    expected_actions = [
-      PlayCardAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.QUEEN)),
-      PlayCardAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.KING)),
-      PlayCardAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.TEN)),
-      PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.TEN)),
-      PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.ACE)),
-    ]
-    self.assertSetEqual(set(expected_actions), set(actions))
-
-  def test_actions_when_player_is_to_lead_talon_is_closed(self):
-    game_state = get_game_state_for_tests()
-    game_state = CloseTheTalonAction(PlayerId.ONE).execute(game_state)
-
-    actions = get_available_actions(game_state)
-    self.assertEqual(set(actions),
-                     set(get_available_actions(game_state.next_player_view())))
-    expected_actions = [
-      AnnounceMarriageAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.QUEEN)),
-      AnnounceMarriageAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.KING)),
-      PlayCardAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.TEN)),
-      PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.TEN)),
-      PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.ACE)),
-    ]
-    self.assertSetEqual(set(expected_actions), set(actions))
+                     [game_state.is_inferred_talon_card(card, PlayerId.TWO)
+                      for card in game_state.talon])
+    self.assertEqual(0, game_state.inferred_talon_cards.one)
 
+  def test_play_trick_talon_closed_opponent_cannot_head_the_trick(self):
     game_state = get_game_state_for_tests()
     with GameStateValidator(game_state):
-      game_state.next_player = PlayerId.TWO
-    game_state = CloseTheTalonAction(PlayerId.TWO).execute(game_state)
-
-    actions = get_available_actions(game_state)
-    self.assertEqual(set(actions),
-                     set(get_available_actions(game_state.next_player_view())))
-    expected_actions = [
-      PlayCardAction(PlayerId.TWO, Card(Suit.DIAMONDS, CardValue.QUEEN)),
-      AnnounceMarriageAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.KING)),
-      PlayCardAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.JACK)),
-      AnnounceMarriageAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.QUEEN)),
-      PlayCardAction(PlayerId.TWO, Card(Suit.SPADES, CardValue.JACK)),
-    ]
-    self.assertSetEqual(set(expected_actions), set(actions))
-
-  def test_actions_after_the_opponent_played_one_card_talon_is_closed(self):
-    game_state = get_game_state_for_tests()
-    game_state = CloseTheTalonAction(PlayerId.ONE).execute(game_state)
-    action = PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.TEN))
-    game_state = action.execute(game_state)
-
-    actions = get_available_actions(game_state)
-    self.assertEqual(set(actions),
-                     set(get_available_actions(game_state.next_player_view())))
-    expected_actions = [
-      PlayCardAction(PlayerId.TWO, Card(Suit.SPADES, CardValue.JACK)),
-    ]
-    self.assertSetEqual(set(expected_actions), set(actions))
-
-    game_state = get_game_state_for_tests()
-    with GameStateValidator(game_state):
-      game_state.next_player = PlayerId.TWO
-    game_state = CloseTheTalonAction(PlayerId.TWO).execute(game_state)
-    action = PlayCardAction(PlayerId.TWO, Card(Suit.SPADES, CardValue.JACK))
-    game_state = action.execute(game_state)
-
-    actions = get_available_actions(game_state)
-    self.assertEqual(set(actions),
-                     set(get_available_actions(game_state.next_player_view())))
-    expected_actions = [
-      PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.TEN)),
-      PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.ACE)),
-    ]
-    self.assertSetEqual(set(expected_actions), set(actions))
-
-  def test_actions_when_player_is_to_lead_talon_is_empty(self):
-    game_state = get_game_state_with_empty_talon_for_tests()
-
-    actions = get_available_actions(game_state)
-    self.assertEqual(set(actions),
-                     set(get_available_actions(game_state.next_player_view())))
-    expected_actions = [
-      PlayCardAction(PlayerId.ONE, Card(Suit.CLUBS, CardValue.ACE)),
-      PlayCardAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.KING)),
-      PlayCardAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.TEN)),
-      PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.TEN)),
-    ]
-    self.assertSetEqual(set(expected_actions), set(actions))
-
-    game_state = get_game_state_with_empty_talon_for_tests()
-    with GameStateValidator(game_state):
-      game_state.next_player = PlayerId.TWO
-
-    actions = get_available_actions(game_state)
-    self.assertEqual(set(actions),
-                     set(get_available_actions(game_state.next_player_view())))
-    expected_actions = [
-      PlayCardAction(PlayerId.TWO, Card(Suit.DIAMONDS, CardValue.JACK)),
-      AnnounceMarriageAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.KING)),
-      PlayCardAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.JACK)),
-      AnnounceMarriageAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.QUEEN)),
-    ]
-    self.assertSetEqual(set(expected_actions), set(actions))
-
-  def test_actions_after_the_opponent_played_one_card_talon_is_empty(self):
-    game_state = get_game_state_with_empty_talon_for_tests()
-    action = PlayCardAction(PlayerId.ONE, Card(Suit.SPADES, CardValue.TEN))
+      trick = game_state.won_tricks.two.pop(0)
+      game_state.talon.append(trick.one)
+      game_state.talon.append(trick.two)
+      game_state.trick_points.two -= trick.one.card_value
+      game_state.trick_points.two -= trick.two.card_value
+      game_state.cards_in_hand.one[0], game_state.cards_in_hand.two[3] = \
+        game_state.cards_in_hand.two[3], game_state.cards_in_hand.one[0]
+    game_state.close_talon()
+    self.assertEqual([Card(Suit.DIAMONDS, CardValue.JACK),
+                      Card(Suit.HEARTS, CardValue.JACK),
+                      Card(Suit.HEARTS, CardValue.ACE)], game_state.talon)
+    action = PlayCardAction(PlayerId.ONE, Card(Suit.HEARTS, CardValue.KING))
+    self.assertTrue(action.can_execute_on(game_state))
     game_state = action.execute(game_state)
-
-    actions = get_available_actions(game_state)
-    self.assertEqual(set(actions),
-                     set(get_available_actions(game_state.next_player_view())))
-    expected_actions = [
-      PlayCardAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.KING)),
-      PlayCardAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.JACK)),
-      PlayCardAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.QUEEN)),
-    ]
-    self.assertSetEqual(set(expected_actions), set(actions))
-
-    game_state = get_game_state_with_empty_talon_for_tests()
-    with GameStateValidator(game_state):
-      game_state.next_player = PlayerId.TWO
-    action = PlayCardAction(PlayerId.TWO, Card(Suit.CLUBS, CardValue.JACK))
+    self.assertEqual([False, False, False],
+                     [game_state.is_public(card) for card in game_state.talon])
+    # Player TWO plays a lower heart, so they cannot have the Ace of Hearts.
+    action = PlayCardAction(PlayerId.TWO, Card(Suit.HEARTS, CardValue.QUEEN))
+    self.assertTrue(action.can_execute_on(game_state))
     game_state = action.execute(game_state)
-
-    actions = get_available_actions(game_state)
-    self.assertEqual(set(actions),
-                     set(get_available_actions(game_state.next_player_view())))
-    expected_actions = [
-      PlayCardAction(PlayerId.ONE, Card(Suit.CLUBS, CardValue.ACE)),
-    ]
-    self.assertSetEqual(set(expected_actions), set(actions))
-
-  def test_no_actions_available_when_game_is_over(self):
-    game_state = get_game_state_with_all_tricks_played()
-    self.assertEqual([], get_available_actions(game_state))
-    self.assertEqual([], get_available_actions(game_state.next_player_view()))
-    with GameStateValidator(game_state):
-      game_state.next_player = PlayerId.TWO
-    self.assertEqual([], get_available_actions(game_state))
-    self.assertEqual([], get_available_actions(game_state.next_player_view()))
+    self.assertEqual([False, False, False],
+                     [game_state.is_public(card) for card in game_state.talon])
+    self.assertEqual([False, False, True],
+                     [game_state.is_inferred_talon_card(card, PlayerId.ONE)
+                      for card in game_state.talon])
+    self.assertEqual(0, game_state.inferred_talon_cards.two)
+    # Only player ONE sees the Ace of Hearts in their game view.
+    self.assertEqual(PlayerId.ONE, game_state.next_player)
+    self.assertEqual([None, None, Card(Suit.HEARTS, CardValue.ACE)],
+                     game_state.next_player_view().talon)
+    game_state.next_player = PlayerId.TWO
+    self.assertEqual([None, None, None], game_state.next_player_view().talon)
+
+
+class ZobristKeyTest(unittest.TestCase):
+  def test_zobrist_key_is_updated_incrementally(self):
+    for seed in range(100):
+      rng = random.Random(seed)
+      game_state = GameState.new(random_seed=seed)
+      self.assertIsNotNone(game_state.zobrist_key)
+      while not game_state.is_game_over:
+        action = rng.choice(get_available_actions(game_state))
+        game_state = action.execute(game_state)
+        self.assertIsNotNone(game_state.cached_zobrist_key, msg=action)
+        self.assertEqual(game_state.compute_zobrist_key(),
+                         game_state.cached_zobrist_key, msg=action)
+
+  def test_zobrist_key_is_not_computed_by_default(self):
+    game_state = get_game_state_for_tests()
+    for action in get_available_actions(game_state):
+      self.assertIsNone(action.execute(game_state).cached_zobrist_key)
@@ -6,13 +6,14 @@ import dataclasses
 from typing import TypeVar, Generic, Optional
 
 from model.player_id import PlayerId
+from model.slotted_dataclass import SLOTS, SlottedDataclass
 
 _TypeName = TypeVar('_TypeName')
 
 
 # TODO(tests): Add tests for hashing.
-@dataclasses.dataclass(unsafe_hash=True)
-class PlayerPair(Generic[_TypeName]):
+@dataclasses.dataclass(unsafe_hash=True, **SLOTS)
+class PlayerPair(SlottedDataclass, Generic[_TypeName]):
   """
   Generic class that stores a pair of variables, one for each of the two players
   in a game of Schnapsen. It can be keyed by PlayerId.
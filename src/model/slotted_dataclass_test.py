@@ -0,0 +1,63 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+import copy
+import dataclasses
+import pickle
+import sys
+import unittest
+
+from model.card import Card
+from model.card_value import CardValue
+from model.game_state import GameState
+from model.game_state_test_utils import get_game_state_for_tests
+from model.player_pair import PlayerPair
+from model.suit import Suit
+
+
+class SlottedDataclassTest(unittest.TestCase):
+  @unittest.skipIf(sys.version_info < (3, 10),
+                   "Dataclasses support slots starting with Python 3.10")
+  def test_no_instance_dict(self):
+    for instance in [Card(Suit.HEARTS, CardValue.ACE), PlayerPair(1, 2),
+                     get_game_state_for_tests()]:
+      self.assertFalse(hasattr(instance, "__dict__"), msg=instance)
+
+  def test_pickle(self):
+    game_state = get_game_state_for_tests()
+    unpickled_game_state = pickle.loads(pickle.dumps(game_state))
+    self.assertEqual(game_state, unpickled_game_state)
+    self.assertEqual(game_state.public_cards,
+                     unpickled_game_state.public_cards)
+
+  def test_unpickle_instances_saved_without_slots(self):
+    # Instances pickled before the classes used __slots__ store their __dict__.
+    card = Card.__new__(Card)
+    card.__setstate__(
+      {"suit": Suit.HEARTS, "card_value": CardValue.ACE, "public": True})
+    self.assertEqual(Card(Suit.HEARTS, CardValue.ACE), card)
+    player_pair = PlayerPair.__new__(PlayerPair)
+    player_pair.__setstate__({"one": 1, "two": 2})
+    self.assertEqual(PlayerPair(1, 2), player_pair)
+
+  @unittest.skipIf(sys.version_info < (3, 10),
+                   "Dataclasses support slots starting with Python 3.10")
+  def test_unpickle_instances_saved_before_new_fields_were_added(self):
+    game_state = get_game_state_for_tests()
+    new_fields = ["public_cards", "cached_zobrist_key"]
+    state = {field.name: getattr(game_state, field.name) for field in
+             dataclasses.fields(GameState) if field.name not in new_fields}
+    unpickled_game_state = GameState.__new__(GameState)
+    unpickled_game_state.__setstate__(state)
+    self.assertEqual(game_state, unpickled_game_state)
+    self.assertEqual(0, unpickled_game_state.public_cards)
+    self.assertIsNone(unpickled_game_state.cached_zobrist_key)
+
+  def test_copy(self):
+    game_state = get_game_state_for_tests()
+    game_state_copy = copy.copy(game_state)
+    self.assertIsInstance(game_state_copy, GameState)
+    self.assertEqual(game_state, game_state_copy)
+    self.assertIsNot(game_state, game_state_copy)
+    self.assertIs(game_state.talon, game_state_copy.talon)
@@ -0,0 +1,80 @@
+#  Copyright (c) 2021 Cristian Patrasciuc. All rights reserved.
+#  Use of this source code is governed by a BSD-style license that can be
+#  found in the LICENSE file.
+
+"""
+The random 64-bit keys used to compute the Zobrist key of a GameState (see
+GameState.zobrist_key). The key of a game state is the XOR of the keys of all
+its features (e.g., "the queen of hearts is in player ONE's hand", "player TWO
+has 33 trick points"), so it can be updated in O(1) whenever a feature changes,
+by XOR-ing out the old key and XOR-ing in the new one.
+
+The keys are generated with a fixed seed, so they are the same in all the
+processes.
+"""
+
+import random
+from typing import List, Dict
+
+from model.player_pair import PlayerPair
+from model.suit import Suit
+
+# The number of cards in a game of Schnapsen. It is also the number of
+# positions in the talon.
+NUM_CARDS = 20
+
+# The points are mapped to their key modulo this value.
+MAX_POINTS = 256
+
+_rng = random.Random(1337)
+
+
+def _get_keys(num_keys: int) -> List[int]:
+  return [_rng.getrandbits(64) for _ in range(num_keys)]
+
+
+def _get_suit_keys() -> Dict[Suit, int]:
+  return {suit: _rng.getrandbits(64) for suit in Suit}
+
+
+# The keys for the cards in each player's hand, indexed by Card.index.
+HAND: PlayerPair[List[int]] = PlayerPair(_get_keys(NUM_CARDS),
+                                         _get_keys(NUM_CARDS))
+
+# The keys for the cards in the current trick, indexed by Card.index.
+CURRENT_TRICK: PlayerPair[List[int]] = PlayerPair(_get_keys(NUM_CARDS),
+                                                  _get_keys(NUM_CARDS))
+
+# The keys for the cards in the tricks won by each player, indexed by
+# Card.index.
+WON_TRICKS: PlayerPair[List[int]] = PlayerPair(_get_keys(NUM_CARDS),
+                                               _get_keys(NUM_CARDS))
+
+# The keys for the trump card, indexed by Card.index.
+TRUMP_CARD: List[int] = _get_keys(NUM_CARDS)
+
+# The keys for the cards in the talon, indexed by Card.index and then by the
+# position of the card counted from the bottom of the talon. Cards are drawn
+# from the top of the talon, so the positions of the remaining cards don't
+# change when a card is drawn.
+TALON: List[List[int]] = [_get_keys(NUM_CARDS) for _ in range(NUM_CARDS)]
+
+# The keys for the trump suit.
+TRUMP: Dict[Suit, int] = _get_suit_keys()
+
+# The keys for the player that is expected to make the next move.
+NEXT_PLAYER: PlayerPair[int] = PlayerPair(*_get_keys(2))
+
+# The keys for the player that closed the talon, if any.
+CLOSED_THE_TALON: PlayerPair[int] = PlayerPair(*_get_keys(2))
+
+# The keys for the opponent points when the talon was closed, if it was closed.
+OPPONENT_POINTS: List[int] = _get_keys(MAX_POINTS)
+
+# The keys for the suits of the marriages announced by each player.
+MARRIAGE_SUITS: PlayerPair[Dict[Suit, int]] = PlayerPair(_get_suit_keys(),
+                                                         _get_suit_keys())
+
+# The keys for the trick points of each player.
+TRICK_POINTS: PlayerPair[List[int]] = PlayerPair(_get_keys(MAX_POINTS),
+                                                 _get_keys(MAX_POINTS))
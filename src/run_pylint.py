@@ -37,6 +37,7 @@ def run_pylint():
   ]
   extension_pkgs = [
     "ai.cython_mcts_player.mcts_debug",
+    "ai.cython_mcts_player.permutations",
     "ai.cython_mcts_player.player",
   ]
   pylint_opts = [
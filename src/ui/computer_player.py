@@ -12,6 +12,8 @@ from kivy.clock import Clock
 from ai.player import Player as AIPlayer
 from ai.random_player import RandomPlayer
 from model.game_state import GameState
+from model.game_state_codec import GAME_STATE_CODE_SIZE, encode_game_state, \
+  decode_game_state
 from model.player_action import PlayerAction
 from model.player_id import PlayerId
 from model.player_pair import PlayerPair
@@ -39,6 +41,28 @@ class ComputerPlayer(Player):
     return self._player.cheater
 
 
+def _encode_request(game_view: GameState,
+                    game_points: Optional[PlayerPair[int]]) -> bytes:
+  """
+  Encodes a request sent from the UI process to the AIProcess: the game view
+  (see model.game_state_codec), followed by the game points, if any.
+  """
+  request = encode_game_state(game_view)
+  if game_points is not None:
+    request += bytes([game_points.one, game_points.two])
+  return request
+
+
+def _decode_request(
+    request: bytes) -> Tuple[GameState, Optional[PlayerPair[int]]]:
+  game_view = decode_game_state(request)
+  game_points = None
+  if len(request) > GAME_STATE_CODE_SIZE:
+    game_points = PlayerPair(request[GAME_STATE_CODE_SIZE],
+                             request[GAME_STATE_CODE_SIZE + 1])
+  return game_view, game_points
+
+
 def _player_process(conn: Connection, player_class: Type[AIPlayer],
                     player_args: Tuple[Any]) -> None:  # pragma: no cover
   """
@@ -52,7 +76,7 @@ def _player_process(conn: Connection, player_class: Type[AIPlayer],
   while True:
     logging.info("AIProcess: Waiting for a GameView from the UI process...")
     try:
-      game_view, game_points = conn.recv()
+      game_view, game_points = _decode_request(conn.recv_bytes())
     except EOFError:
       logging.info("AIProcess: The pipe was closed. Exiting.")
       break
@@ -60,7 +84,7 @@ def _player_process(conn: Connection, player_class: Type[AIPlayer],
     action = player.request_next_action(game_view, game_points)
     logging.info("AIProcess: Sending action (%s) to the UI process", action)
     try:
-      conn.send(action)
+      conn.send_bytes(bytes([action.action_id]))
     except BrokenPipeError:
       logging.info("AIProcess: The pipe was closed. Exiting.")
       break
@@ -79,8 +103,10 @@ class OutOfProcessComputerPlayer(Player):
     Instantiates a new OutOfProcessComputerPlayer and starts the corresponding
     AIProcess. This process receives the class and constructor arguments for an
     AIPlayer, instantiates the AIPlayer and replies with the value of
-    AIPlayer.cheater. Then, in a loop, it waits for GameView objects, calls the
-    AIPlayer.request_next_action() on them and replies with the result.
+    AIPlayer.cheater. Then, in a loop, it waits for GameViews, calls the
+    AIPlayer.request_next_action() on them and replies with the result. The
+    GameViews are sent using the fixed-size encoding from
+    model.game_state_codec and the replies are PlayerAction.action_id bytes.
     :param player_class: The class used to instantiate the AIPlayer.
     :param player_args: The arguments to be passed to the AIPlayer constructor.
     """
@@ -110,7 +136,7 @@ class OutOfProcessComputerPlayer(Player):
     reply before the next frame is drawn. One should not send a GameView to the
     AIProcess before a reply for the previous GameView is received.
     """
-    self._conn.send((game_view, game_points))
+    self._conn.send_bytes(_encode_request(game_view, game_points))
     Clock.schedule_once(lambda *_: self._poll_for_ai_reply(callback))
 
   def _poll_for_ai_reply(self,
@@ -123,7 +149,7 @@ class OutOfProcessComputerPlayer(Player):
     if self._conn.closed:
       return
     if self._conn.poll():
-      callback(self._conn.recv())
+      callback(PlayerAction.from_action_id(self._conn.recv_bytes()[0]))
     else:
       Clock.schedule_once(lambda *_: self._poll_for_ai_reply(callback))
 
@@ -18,7 +18,8 @@ from model.player_action import PlayCardAction, PlayerAction
 from model.player_id import PlayerId
 from model.player_pair import PlayerPair
 from model.suit import Suit
-from ui.computer_player import ComputerPlayer, OutOfProcessComputerPlayer
+from ui.computer_player import ComputerPlayer, OutOfProcessComputerPlayer, \
+  _encode_request, _decode_request
 from ui.test_utils import GraphicUnitTest
 
 
@@ -41,6 +42,17 @@ class ComputerPlayerTest(unittest.TestCase):
     self.assertEqual(action, callback.call_args.args[0])
 
 
+class RequestEncodingTest(unittest.TestCase):
+  def test_encode_and_decode(self):
+    game_view = get_game_state_for_tests().next_player_view()
+    for game_points in [None, PlayerPair(0, 0), PlayerPair(2, 6)]:
+      actual_game_view, actual_game_points = _decode_request(
+        _encode_request(game_view, game_points))
+      self.assertEqual(game_view, actual_game_view)
+      self.assertEqual(game_view.public_cards, actual_game_view.public_cards)
+      self.assertEqual(game_points, actual_game_points)
+
+
 class _OutOfProcessTestPlayer(AIPlayer):
   def __init__(self, player_id: PlayerId, cheater: bool, event: Event):
     super().__init__(player_id, cheater)
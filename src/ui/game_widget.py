@@ -4,7 +4,7 @@
 
 import logging
 import os.path
-from typing import Dict, Tuple, Optional, List, Callable
+from typing import Dict, Tuple, Optional, List, Callable, Set
 
 from kivy.animation import Animation
 from kivy.base import runTouchApp
@@ -73,18 +73,18 @@ def _delete_widget(widget: Widget) -> None:
   del widget
 
 
-def _sort_cards_for_player(cards: List[Card], player: PlayerId) -> List[Card]:
+def _sort_cards_for_player(cards: List[Card], player: PlayerId,
+                           public_cards: Set[Card]) -> List[Card]:
   """
   For the human player (ONE), it sorts the cards in hand based on suit first and
   then card value. For the computer player (TWO), it sorts the public cards by
   suit and then card value. The non-public cards are left as they are.
   """
-  cards_copy = [card.copy() for card in cards]
   if player == PlayerId.ONE:
     # noinspection PyTypeChecker
-    return list(sorted(cards_copy))
-  public_cards = [card for card in cards_copy if card.public]
-  non_public_cards = [card for card in cards_copy if not card.public]
+    return list(sorted(cards))
+  non_public_cards = [card for card in cards if card not in public_cards]
+  public_cards = [card for card in cards if card in public_cards]
   # noinspection PyTypeChecker
   return list(sorted(public_cards)) + non_public_cards
 
@@ -95,8 +95,6 @@ def _get_card_list(card_slots_widget: CardSlotsLayout) -> List[Card]:
     card_widget = card_slots_widget.at(0, col)
     if card_widget is None:
       continue
-    card = card_widget.card
-    card.public = card_widget.visible
     cards.append(card_widget.card)
   return cards
 
@@ -142,6 +140,9 @@ class GameWidget(FloatLayout, Player, metaclass=GameWidgetMeta):
     # The cards in the players' hands, sorted in display order.
     self._sorted_cards: Optional[PlayerPair[List[Card]]] = None
 
+    # The cards that were revealed to both players.
+    self._public_cards: Set[Card] = set()
+
     # Widgets that store the cards.
     self._player_card_widgets: Optional[PlayerPair[CardSlotsLayout]] = None
     self._tricks_widgets: Optional[PlayerPair[CardSlotsLayout]] = None
@@ -256,6 +257,7 @@ class GameWidget(FloatLayout, Player, metaclass=GameWidgetMeta):
       _delete_widget(card_widget)
     self._cards = {}
     self._sorted_cards = None
+    self._public_cards = set()
     self._init_widgets()
 
   @property
@@ -323,9 +325,13 @@ class GameWidget(FloatLayout, Player, metaclass=GameWidgetMeta):
     :param game_score The Bummerl game score.
     """
     # Init the cards for each player.
+    self._public_cards = {card for card in Card.get_all_cards() if
+                          game_state.is_public(card)}
     self._sorted_cards = PlayerPair(
-      _sort_cards_for_player(game_state.cards_in_hand.one, PlayerId.ONE),
-      _sort_cards_for_player(game_state.cards_in_hand.two, PlayerId.TWO))
+      _sort_cards_for_player(game_state.cards_in_hand.one, PlayerId.ONE,
+                             self._public_cards),
+      _sort_cards_for_player(game_state.cards_in_hand.two, PlayerId.TWO,
+                             self._public_cards))
     self._update_cards_in_hand_after_animation()
 
     # Init the won tricks for each player.
@@ -462,10 +468,11 @@ class GameWidget(FloatLayout, Player, metaclass=GameWidgetMeta):
 
     cards_in_hand = _get_card_list(card_slots_widget)
     cards_in_hand.append(trump_card_widget.card)
-    cards_in_hand[-1].public = True
+    self._public_cards.add(trump_card_widget.card)
     assert len(cards_in_hand) == 5, \
       "Cannot exchange trump with less then five cards in hand"
-    self._sorted_cards[player] = _sort_cards_for_player(cards_in_hand, player)
+    self._sorted_cards[player] = _sort_cards_for_player(cards_in_hand, player,
+                                                        self._public_cards)
 
     def bring_trump_card_to_front(*_):
       self.remove_widget(trump_card_widget)
@@ -643,6 +650,7 @@ class GameWidget(FloatLayout, Player, metaclass=GameWidgetMeta):
     elif isinstance(action, PlayCardAction):
       self._animate_card_to_play_area(action.player_id, action.card)
     elif isinstance(action, AnnounceMarriageAction):
+      self._public_cards.add(action.card.marriage_pair)
       center = self._get_default_play_location(action.player_id)
       delta = self._get_card_pos_delta(action.player_id)
       pair_center = center[0] + delta[0], center[1] + delta[1]
@@ -730,8 +738,10 @@ class GameWidget(FloatLayout, Player, metaclass=GameWidgetMeta):
 
     # Update the list of sorted cards for each player.
     self._sorted_cards = PlayerPair(
-      _sort_cards_for_player(cards_in_hand.one, PlayerId.ONE),
-      _sort_cards_for_player(cards_in_hand.two, PlayerId.TWO))
+      _sort_cards_for_player(cards_in_hand.one, PlayerId.ONE,
+                             self._public_cards),
+      _sort_cards_for_player(cards_in_hand.two, PlayerId.TWO,
+                             self._public_cards))
 
     self._animation_controller.start(
       lambda: self._on_trick_completed_after_animations(trick, winner,
@@ -818,7 +828,8 @@ class GameWidget(FloatLayout, Player, metaclass=GameWidgetMeta):
         card_widget.grayed_out = True
       else:
         card_widget.visible = (
-            card.public or self._game_options.computer_cards_visible)
+            card in self._public_cards or
+            self._game_options.computer_cards_visible)
       self._player_card_widgets[player].add_card(card_widget, 0, i)
       card_widget.check_aspect_ratio(True)
 
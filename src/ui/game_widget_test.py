@@ -211,7 +211,8 @@ class GameWidgetInitTest(_GameWidgetBaseTest):
         if player == PlayerId.ONE:
           self.assertTrue(card_widgets[card].visible)
         else:
-          self.assertEqual(card.public, card_widgets[card].visible)
+          self.assertEqual(game_state.is_public(card),
+                           card_widgets[card].visible)
 
     # Cards for already played tricks are in the right widgets.
     tricks_widgets = game_widget.tricks_widgets
@@ -300,7 +301,8 @@ class GameWidgetInitTest(_GameWidgetBaseTest):
     with GameStateValidator(game_state):
       game_state.current_trick.one = king_hearts
       game_state.marriage_suits.one.append(Suit.HEARTS)
-      game_state.cards_in_hand.one[0].public = True  # queen diamonds
+      # Queen of diamonds.
+      game_state.set_public(game_state.cards_in_hand.one[0])
       game_state.trick_points = PlayerPair(42, 53)
       game_state.next_player = PlayerId.TWO
     self._run_init_from_game_state(game_state,
@@ -497,6 +499,15 @@ class GameWidgetGraphicTest(_GameWidgetBaseTest):
       def execute(self, game_state):
         return game_state
 
+      def apply(self, _):
+        return None
+
+      def undo(self, _game_state, _undo_token):
+        pass
+
+      def _get_action_id(self):
+        return 0
+
     game_widget = self.create_game_widget()
     self.render(game_widget)
     with self.assertRaisesRegex(AssertionError, "Should not reach this code"):